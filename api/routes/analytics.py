@@ -1,6 +1,6 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, jsonify
 from services.analytics_service import AnalyticsService
-from utils.decorators import validate_excel_upload, validate_date_range
+from utils.decorators import get_excel_source, validate_excel_upload, validate_date_range
 from utils.temp_file_manager import temporary_excel_file
 from datetime import datetime
 import traceback
@@ -36,12 +36,10 @@ def analytics(file, fecha_inicio, fecha_fin):
 @analytics_bp.route('/analytics_pendientes_efectivo', methods=['POST'])
 def analytics_pendientes_efectivo():
     """Endpoint simplificado para analytics de efectivo, sin decoradores por ahora para mantener compatibilidad exacta"""
-    if 'file' not in request.files:
-        return jsonify({'error': 'No se envió archivo'}), 400
-    
-    file = request.files['file']
-    if not file.filename:
-        return jsonify({'error': 'Nombre de archivo vacío'}), 400
+    # Solo exige un nombre de archivo, sin la validación completa de validate_excel_upload
+    file, error = get_excel_source(validar=lambda f: (bool(f.filename), 'Nombre de archivo vacío'))
+    if error is not None:
+        return error
     
     try:
         with temporary_excel_file(file) as temp_path:
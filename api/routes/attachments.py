@@ -0,0 +1,55 @@
+from flask import Blueprint, request, jsonify
+from core.attachments import AttachmentError, cleanup_expired_attachments, find_missing_attachments, save_attachment
+from config.config import get_config_value
+
+attachments_bp = Blueprint('attachments_bp', __name__)
+
+
+def missing_attachments_response(*listas):
+    """
+    Respuesta 400 si alguna lista de imágenes referencia adjuntos que no
+    existen o expiraron; None si están todos.
+    """
+    faltantes = [id_ for lista in listas for id_ in find_missing_attachments(lista)]
+    if not faltantes:
+        return None
+    return jsonify({
+        'error': 'Hay adjuntos que no existen o expiraron; vuelva a subirlos a /api/attachments',
+        'attachments': faltantes
+    }), 400
+
+
+@attachments_bp.route('/attachments', methods=['POST'])
+def subir_adjuntos():
+    """
+    Endpoint para subir imágenes como archivos binarios (campo files, uno o
+    varios). Retorna un id por archivo para enviar a los endpoints de PDF en
+    lugar del base64.
+    """
+    archivos = request.files.getlist('files') + request.files.getlist('file')
+    if not archivos:
+        return jsonify({'error': 'No se enviaron archivos'}), 400
+
+    try:
+        cleanup_expired_attachments()
+        adjuntos, invalidos = [], []
+        for archivo in archivos:
+            try:
+                adjunto = save_attachment(archivo.stream)
+            except AttachmentError as e:
+                invalidos.append({'filename': archivo.filename, 'error': str(e)})
+                continue
+            adjuntos.append({**adjunto, 'filename': archivo.filename})
+
+        respuesta = {
+            'attachments': adjuntos,
+            'expires_in': int(get_config_value('ATTACHMENT_TTL_SECONDS'))
+        }
+        if invalidos:
+            respuesta['error'] = 'Algunos archivos no son imágenes válidas'
+            respuesta['invalid'] = invalidos
+            return jsonify(respuesta), 400
+        return jsonify(respuesta), 201
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,6 +1,9 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify
 from services.report_service import ReportService
-import io
+from api.routes.jobs import wants_async, enqueue_pdf, send_pdf
+from api.routes.attachments import missing_attachments_response
+from core.job_queue import JobError
+from utils.temp_file_manager import new_pdf_spool
 import traceback
 
 expenses_bp = Blueprint('expenses_bp', __name__)
@@ -10,19 +13,46 @@ def generar_pdf_gasto():
     """Endpoint para generar PDF de gastos."""
     try:
         data = request.get_json()
+
+        # Las imágenes pueden venir en base64 o como ids de /api/attachments
+        if isinstance(data, dict):
+            faltantes = missing_attachments_response(*(
+                data.get(clave) for clave in ('imagenesGastos', 'imagenesConsignaciones', 'imagenesDevoluciones')
+            ))
+            if faltantes:
+                return faltantes
+
+        if wants_async(data):
+            return enqueue_pdf(_generar_pdf_gasto, data)
         
-        success, result, pdf_bytes = ReportService.generate_expenses_pdf(data)
-        
+        spool = new_pdf_spool()
+        try:
+            success, result, pdf = ReportService.generate_expenses_pdf(data, destino=spool)
+        except Exception:
+            spool.close()
+            raise
+
         if success:
-             return send_file(
-                io.BytesIO(pdf_bytes),
-                mimetype='application/pdf',
-                as_attachment=True,
-                download_name=result['filename']
-            )
+            # send_pdf cierra el spool al terminar de enviarlo
+            return send_pdf(pdf, result['filename'])
         else:
+            spool.close()
             return jsonify(result), 500
 
     except Exception as e:
         error_trace = traceback.format_exc()
         return jsonify({'error': f'Error al generar PDF: {str(e)}', 'traceback': error_trace}), 500
+
+
+def _generar_pdf_gasto(data):
+    """Tarea de /gastos/generar-pdf con async=1. Retorna (spool del PDF, nombre)."""
+    spool = new_pdf_spool()
+    try:
+        success, result, pdf = ReportService.generate_expenses_pdf(data, destino=spool)
+    except Exception:
+        spool.close()
+        raise
+    if not success:
+        spool.close()
+        raise JobError(result, pdf if isinstance(pdf, int) else 500)
+    return pdf, result['filename']
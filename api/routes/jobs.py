@@ -0,0 +1,103 @@
+from flask import Blueprint, request, jsonify, send_file, url_for
+from core.job_queue import get_job, get_job_queue, get_result_path, ESTADO_PENDIENTE, ESTADO_COMPLETADO, ESTADO_ERROR
+from utils.temp_file_manager import spool_upload
+import io
+import os
+
+jobs_bp = Blueprint('jobs_bp', __name__)
+
+
+def wants_async(data=None):
+    """Indica si la petición pidió generar el PDF en segundo plano (async=1)."""
+    valor = request.args.get('async') or request.form.get('async')
+    if valor is None and isinstance(data, dict):
+        valor = data.get('async')
+    return str(valor).lower() in ('1', 'true')
+
+
+def enqueue_pdf(tarea, *args, upload=None, **kwargs):
+    """
+    Encola la generación de un PDF y retorna la respuesta 202 con el
+    job_id y las URLs para consultar el estado y descargar el resultado.
+
+    Con upload (el file de validate_excel_upload) la tarea recibe como
+    primer argumento una copia del Excel que sobrevive a la petición y se
+    libera al terminar el trabajo; un snapshot se pasa tal cual.
+    """
+    al_terminar = None
+    if upload is not None:
+        if not isinstance(upload, str):
+            upload = spool_upload(upload)
+            al_terminar = upload.close
+        args = (upload, *args)
+    try:
+        job_id = get_job_queue().submit(tarea, *args, al_terminar=al_terminar, **kwargs)
+    except Exception:
+        if al_terminar is not None:
+            al_terminar()
+        raise
+    return jsonify({
+        'job_id': job_id,
+        'status': ESTADO_PENDIENTE,
+        'status_url': url_for('jobs_bp.estado_job', job_id=job_id),
+        'result_url': url_for('jobs_bp.resultado_job', job_id=job_id),
+    }), 202
+
+
+def send_pdf(contenido, nombre):
+    """
+    Respuesta de descarga de un PDF generado. contenido son los bytes o el
+    archivo donde se escribió (p. ej. new_pdf_spool()); el archivo se envía
+    por bloques desde el inicio y se cierra al terminar la respuesta.
+    """
+    if isinstance(contenido, (bytes, bytearray)):
+        contenido = io.BytesIO(contenido)
+    tamano = contenido.seek(0, os.SEEK_END)
+    contenido.seek(0)
+    respuesta = send_file(
+        contenido,
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=nombre
+    )
+    # send_file solo conoce el tamaño de un BytesIO
+    respuesta.content_length = tamano
+    return respuesta
+
+
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+def estado_job(job_id):
+    """Endpoint para consultar el estado de un trabajo en segundo plano."""
+    estado = get_job(job_id)
+    if estado is None:
+        return jsonify({'error': 'Trabajo no encontrado o expirado'}), 404
+
+    respuesta = {'job_id': job_id, 'status': estado['status']}
+    if estado['status'] == ESTADO_COMPLETADO:
+        respuesta['filename'] = estado.get('filename')
+        respuesta['result_url'] = url_for('jobs_bp.resultado_job', job_id=job_id)
+    elif estado['status'] == ESTADO_ERROR:
+        respuesta.update(estado.get('resultado') or {})
+        respuesta['error'] = estado.get('error')
+    return jsonify(respuesta), 200
+
+
+@jobs_bp.route('/jobs/<job_id>/result', methods=['GET'])
+def resultado_job(job_id):
+    """Endpoint para descargar el PDF de un trabajo terminado."""
+    estado = get_job(job_id)
+    if estado is None:
+        return jsonify({'error': 'Trabajo no encontrado o expirado'}), 404
+
+    if estado['status'] == ESTADO_ERROR:
+        return jsonify({**(estado.get('resultado') or {}), 'error': estado.get('error')}), estado.get('http_status', 500)
+    ruta_pdf = get_result_path(job_id)
+    if estado['status'] != ESTADO_COMPLETADO or not os.path.isfile(ruta_pdf):
+        return jsonify({'job_id': job_id, 'status': estado['status'], 'error': 'El PDF aún no está listo'}), 409
+
+    return send_file(
+        ruta_pdf,
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=estado.get('filename') or f'{job_id}.pdf'
+    )
@@ -1,9 +1,11 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify
 from services.report_service import ReportService
 from utils.decorators import validate_excel_upload, validate_date_range, extract_form_params
-from utils.temp_file_manager import temporary_excel_file
+from utils.temp_file_manager import temporary_excel_file, new_pdf_spool
+from api.routes.jobs import wants_async, enqueue_pdf, send_pdf
+from api.routes.attachments import missing_attachments_response
+from core.job_queue import JobError
 from datetime import datetime
-import io
 import json
 
 reports_bp = Blueprint('reports_bp', __name__)
@@ -93,17 +95,25 @@ def pdf_pendientes(file, fecha_inicio, fecha_fin, notas, nombre_pdf):
         if not fecha_fin:
             fecha_fin = datetime(current_year, 12, 31)
 
-        with temporary_excel_file(file) as temp_path:
-            success, result, extra = ReportService.generate_pending_services_pdf(
-                temp_path, fecha_inicio, fecha_fin, nombre_pdf, notas
-            )
-            
-            if not success:
-                return jsonify(result), extra
-            
-            # Si success es True, extra es el status code 200 y result es la ruta
-            ruta_pdf = result
-            return send_file(ruta_pdf, as_attachment=True)
+        if wants_async():
+            return enqueue_pdf(_generar_pdf_pendientes, fecha_inicio, fecha_fin, nombre_pdf, notas, upload=file)
+
+        spool = new_pdf_spool()
+        try:
+            with temporary_excel_file(file) as temp_path:
+                success, result, extra = ReportService.generate_pending_services_pdf(
+                    temp_path, fecha_inicio, fecha_fin, nombre_pdf, notas, destino=spool
+                )
+        except Exception:
+            spool.close()
+            raise
+
+        if not success:
+            spool.close()
+            return jsonify(result), extra
+
+        # send_pdf cierra el spool al terminar de enviarlo
+        return send_pdf(extra, result['filename'])
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -128,29 +138,76 @@ def pdf_relacion_servicios(file, fecha_inicio, fecha_fin, notas, nombre_pdf):
             imagenes = json.loads(imagenes_json)
         except Exception:
             imagenes = []
+        # Cada imagen puede ser un base64 o un id de /api/attachments
+        faltantes = missing_attachments_response(imagenes if isinstance(imagenes, list) else [])
+        if faltantes:
+            return faltantes
+
+        if wants_async():
+            return enqueue_pdf(_generar_pdf_relacion_servicios, fecha_inicio, fecha_fin, notas, nombre_pdf, imagenes,
+                               upload=file)
 
         # Callback para logs
         logs = []
         def log_callback(msg, level='info'):
             logs.append({'level': level, 'text': msg})
         
-        with temporary_excel_file(file) as temp_path:
-            success, result_dict, pdf_bytes = ReportService.generate_cash_services_pdf(
-                temp_path, fecha_inicio, fecha_fin, notas, nombre_pdf, imagenes, log_callback
-            )
-            
-            if not success:
-                if isinstance(result_dict, dict) and 'logs' not in result_dict:
-                    result_dict['logs'] = logs
-                return jsonify(result_dict), 400 if 'error' in result_dict else 500
-
-            # Enviar el PDF
-            return send_file(
-                io.BytesIO(pdf_bytes),
-                mimetype='application/pdf',
-                as_attachment=True,
-                download_name=result_dict['filename']
-            )
+        spool = new_pdf_spool()
+        try:
+            with temporary_excel_file(file) as temp_path:
+                success, result_dict, pdf = ReportService.generate_cash_services_pdf(
+                    temp_path, fecha_inicio, fecha_fin, notas, nombre_pdf, imagenes, log_callback, destino=spool
+                )
+        except Exception:
+            spool.close()
+            raise
+
+        if not success:
+            spool.close()
+            if isinstance(result_dict, dict) and 'logs' not in result_dict:
+                result_dict['logs'] = logs
+            return jsonify(result_dict), 400 if 'error' in result_dict else 500
+
+        # Enviar el PDF; send_pdf cierra el spool al terminar de enviarlo
+        return send_pdf(pdf, result_dict['filename'])
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+def _generar_pdf_pendientes(temp_path, fecha_inicio, fecha_fin, nombre_pdf, notas):
+    """Tarea de /pdf_pendientes con async=1. Retorna (spool del PDF, nombre)."""
+    spool = new_pdf_spool()
+    try:
+        success, result, extra = ReportService.generate_pending_services_pdf(
+            temp_path, fecha_inicio, fecha_fin, nombre_pdf, notas, destino=spool
+        )
+    except Exception:
+        spool.close()
+        raise
+    if not success:
+        spool.close()
+        raise JobError(result, extra)
+    return extra, result['filename']
+
+
+def _generar_pdf_relacion_servicios(temp_path, fecha_inicio, fecha_fin, notas, nombre_pdf, imagenes):
+    """Tarea de /pdf_relacion_servicios con async=1. Retorna (spool del PDF, nombre)."""
+    logs = []
+    def log_callback(msg, level='info'):
+        logs.append({'level': level, 'text': msg})
+
+    spool = new_pdf_spool()
+    try:
+        success, result_dict, pdf = ReportService.generate_cash_services_pdf(
+            temp_path, fecha_inicio, fecha_fin, notas, nombre_pdf, imagenes, log_callback, destino=spool
+        )
+    except Exception:
+        spool.close()
+        raise
+    if not success:
+        spool.close()
+        if isinstance(result_dict, dict) and 'logs' not in result_dict:
+            result_dict['logs'] = logs
+        raise JobError(result_dict, 400 if 'error' in result_dict else 500)
+    return pdf, result_dict['filename']
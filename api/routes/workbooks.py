@@ -0,0 +1,25 @@
+from flask import Blueprint, jsonify
+from services.workbook_service import WorkbookService
+from utils.decorators import validate_excel_upload
+from utils.temp_file_manager import temporary_excel_file
+
+workbooks_bp = Blueprint('workbooks_bp', __name__)
+
+@workbooks_bp.route('/workbooks', methods=['POST'])
+@validate_excel_upload
+def registrar_workbook(file):
+    """
+    Endpoint para subir un libro una sola vez.
+    Retorna el workbook_id que se puede enviar a los endpoints de analytics
+    y reportes en lugar del archivo.
+    """
+    if isinstance(file, str):
+        return jsonify({'error': 'Envíe el archivo Excel para registrarlo'}), 400
+
+    try:
+        with temporary_excel_file(file) as temp_path:
+            result = WorkbookService.register_workbook(temp_path, file.filename)
+            return jsonify(result), 201
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
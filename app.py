@@ -22,10 +22,20 @@ def create_app():
     from api.routes.analytics import analytics_bp
     from api.routes.reports import reports_bp
     from api.routes.expenses import expenses_bp
+    from api.routes.workbooks import workbooks_bp
+    from api.routes.jobs import jobs_bp
+    from api.routes.attachments import attachments_bp
 
     app.register_blueprint(analytics_bp, url_prefix='/api')
     app.register_blueprint(reports_bp, url_prefix='/api')
     app.register_blueprint(expenses_bp, url_prefix='/api')
+    app.register_blueprint(workbooks_bp, url_prefix='/api')
+    app.register_blueprint(jobs_bp, url_prefix='/api')
+    app.register_blueprint(attachments_bp, url_prefix='/api')
+
+    # Fuentes y estilos de los PDF listos antes de la primera petición
+    from core.pdf_templates import warm_templates
+    warm_templates()
 
     # Configurar JSON Provider personalizado (Flask 3.x+)
     from utils.json_encoder import CustomJSONProvider
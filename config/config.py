@@ -6,6 +6,36 @@ class Config:
     BASE_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'temp')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB limit
+    # Presupuesto en bytes de la caché de libros Excel ya parseados
+    WORKBOOK_CACHE_MAX_BYTES = int(os.environ.get('WORKBOOK_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    # Segundos que se conserva el snapshot de un libro subido sin volver a usarse
+    WORKBOOK_SNAPSHOT_TTL_SECONDS = int(os.environ.get('WORKBOOK_SNAPSHOT_TTL_SECONDS', 7 * 24 * 3600))
+    # Tamaño hasta el que un Excel subido se mantiene en memoria antes de pasar a disco
+    UPLOAD_SPOOL_MAX_BYTES = int(os.environ.get('UPLOAD_SPOOL_MAX_BYTES', 32 * 1024 * 1024))
+    # Tamaño hasta el que un PDF generado se mantiene en memoria antes de pasar a disco
+    PDF_SPOOL_MAX_BYTES = int(os.environ.get('PDF_SPOOL_MAX_BYTES', 1024 * 1024))
+    # Filas por bloque al formatear y dibujar la tabla de la relación de servicios
+    PDF_TABLE_BLOCK_ROWS = int(os.environ.get('PDF_TABLE_BLOCK_ROWS', 2000))
+    # Procesos para leer las hojas de un libro en paralelo (0 o 1 = en serie)
+    EXCEL_PARSE_WORKERS = int(os.environ.get('EXCEL_PARSE_WORKERS', 0))
+    # Filas por bloque al armar el cubo de análisis por partes (0 = siempre completo)
+    ANALYTICS_BLOCK_ROWS = int(os.environ.get('ANALYTICS_BLOCK_ROWS', 512))
+    # Hilos que generan los PDF pedidos con async=1
+    PDF_JOB_WORKERS = int(os.environ.get('PDF_JOB_WORKERS', 2))
+    # Segundos que se conservan el estado y el PDF de un trabajo terminado
+    JOB_RESULT_TTL_SECONDS = int(os.environ.get('JOB_RESULT_TTL_SECONDS', 3600))
+    # Segundos sin actualizarse tras los que un trabajo pendiente o en proceso se da por abandonado
+    JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', 6 * 3600))
+    # Hilos para preparar las imágenes adjuntas a un PDF (0 o 1 = en serie)
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 4))
+    # Resolución a la que se reducen las imágenes según el tamaño al que se dibujan en el PDF
+    PDF_IMAGE_DPI = int(os.environ.get('PDF_IMAGE_DPI', 200))
+    # Calidad JPEG de las fotos reducidas
+    PDF_IMAGE_JPEG_QUALITY = int(os.environ.get('PDF_IMAGE_JPEG_QUALITY', 85))
+    # Presupuesto en bytes de la caché en disco de imágenes ya preparadas (0 = sin caché)
+    IMAGE_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    # Segundos que se conserva un adjunto subido a /api/attachments sin volver a usarse
+    ATTACHMENT_TTL_SECONDS = int(os.environ.get('ATTACHMENT_TTL_SECONDS', 24 * 3600))
 
 class DevelopmentConfig(Config):
     """Development config."""
@@ -16,8 +46,20 @@ class ProductionConfig(Config):
     """Production config."""
     DEBUG = False
     ENV = 'production'
-    
+
 class TestingConfig(Config):
     """Testing config."""
     TESTING = True
     DEBUG = True
+
+
+def get_config_value(name, default=None):
+    """
+    Obtiene un valor de configuración de la app activa.
+    Fuera de un contexto de Flask usa los valores de la clase Config.
+    """
+    try:
+        from flask import current_app
+        return current_app.config.get(name, getattr(Config, name, default))
+    except RuntimeError:
+        return getattr(Config, name, default)
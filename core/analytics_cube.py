@@ -0,0 +1,360 @@
+"""
+Cubo de agregados de un libro de servicios para los análisis del dashboard.
+
+El dashboard pide /analytics, /analytics_pendientes_efectivo y
+/analytics_pendientes_cobrar seguidos y los tres agregan las mismas filas por
+mes. El cubo se arma una sola vez por libro agrupando por
+MES × FORMA_PAGO × ESTADO × TIPO_CLIENTE × SERVICIO, con la cantidad de
+servicios, las sumas de PARA JG, PARA ABRECAR e IVA y la fecha más antigua y
+más reciente de cada grupo. Los filtros de los análisis son cortes del cubo
+(slice) y los resúmenes se suman sobre él (totals) en lugar de recorrer las
+filas de nuevo.
+
+El cubo se guarda en la caché de libros junto a las hojas parseadas, y si el
+libro es un snapshot (ver core.workbook_snapshots) también en su directorio,
+así sobrevive a un reinicio del servidor.
+
+Cuando el libro no está en la caché el cubo se arma por bloques de
+ANALYTICS_BLOCK_ROWS filas de cada hoja. Cada bloque se identifica por la
+huella de sus filas (junto con el encabezado) y su cubo parcial queda en la
+caché, así al volver a subir el libro con filas agregadas al final solo se
+agregan los bloques nuevos y el último que cambió; las hojas sin cambios se
+reutilizan completas. Una edición en filas antiguas solo rehace su bloque, y
+si se insertan filas en medio se rehacen los bloques desde ese punto.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, Hashable, Iterable, Sequence, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from config.config import get_config_value
+from config.settings import EXCEL_COLUMNS
+from core.client_classifier import ClientClassifier
+from core.column_mapper import ColumnMapper, ColumnSchema
+from core.frame_normalizer import concat_frames, has_values
+from core.workbook_cache import get_sheets, get_workbook_cache, workbook_digest
+from core.workbook_snapshots import is_snapshot
+
+
+# Estados y formas de pago que el cubo distingue; el resto se agrupa
+ESTADOS_RESUMEN = ['YA RELACIONADO', 'PENDIENTE COBRAR', 'COTIZACION', 'NO PAGARON DOMICILIO',
+                   'GARANTIA', 'NO SE COBRA DOMICILIO', 'CANCELADO']
+ESTADO_OTRO = 'OTRO'
+FORMAS_PAGO_RESUMEN = ['EFECTIVO', 'TRANSFERENCIA']
+FORMA_PAGO_OTRA = 'OTRA'
+
+# Columnas (claves de ColumnMapper) que leen el cubo y los análisis. Todos
+# piden la misma proyección, así el libro se parsea una sola vez por subida
+COLUMNAS_ANALISIS = ['ESTADO DEL SERVICIO', 'X50_PORCIENTO', EXCEL_COLUMNS['FECHA'], 'PARA_JG', 'PARA_ABRECAR',
+                     'IVA', EXCEL_COLUMNS['FORMA_PAGO'], EXCEL_COLUMNS['TORRE_APTO'], EXCEL_COLUMNS['DIRECCION'],
+                     EXCEL_COLUMNS['FECHA_RELACION'], EXCEL_COLUMNS['SERVICIO_REALIZADO']]
+
+# Medidas de cada grupo a partir de las filas
+_AGREGADOS = dict(cantidad=('jg', 'size'), jg=('jg', 'sum'), abrecar=('abrecar', 'sum'), iva=('iva', 'sum'),
+                  fecha_min=('fecha', 'min'), fecha_max=('fecha', 'max'))
+
+# Archivo del cubo dentro del directorio de un snapshot
+CUBO_ARCHIVO = 'cubo_v1.arrow'
+
+
+class AnalyticsCube:
+    """
+    Tabla agregada con una fila por combinación de dimensiones presente en
+    el libro. MES es el primer día del mes (NaT para filas sin fecha).
+    """
+
+    DIMENSIONES = ('MES', 'FORMA_PAGO', 'ESTADO', 'TIPO_CLIENTE', 'SERVICIO')
+    SUMAS = ('cantidad', 'jg', 'abrecar', 'iva')
+
+    def __init__(self, tabla: pd.DataFrame, columnas: Sequence[str]):
+        self.tabla = tabla
+        # Encabezado del libro con el que se armó el cubo
+        self.columnas = tuple(columnas)
+
+    @property
+    def esquema(self) -> ColumnSchema:
+        """Columnas reales del libro para cada clave de ColumnMapper."""
+        return ColumnMapper.resolve_all(self.columnas)
+
+    @classmethod
+    def build(cls, df: pd.DataFrame) -> 'AnalyticsCube':
+        """
+        Agrega una hoja normalizada (ver core.frame_normalizer) en una sola
+        pasada por todas las dimensiones.
+
+        Args:
+            df: Filas de todas las hojas con los tipos ya normalizados
+
+        Returns:
+            AnalyticsCube: Cubo del libro
+        """
+        tabla = (cls._grupos(df).groupby(list(cls.DIMENSIONES), dropna=False, observed=True, sort=False)
+                 .agg(**_AGREGADOS)
+                 .reset_index())
+        return cls(tabla, [str(col) for col in df.columns])
+
+    @classmethod
+    def build_blocks(cls, df: pd.DataFrame, bloques) -> Dict[Hashable, 'AnalyticsCube']:
+        """
+        Arma en una sola pasada un cubo por cada bloque de filas de df.
+
+        Args:
+            df: Filas normalizadas
+            bloques: Bloque de cada fila de df
+
+        Returns:
+            dict: {bloque: AnalyticsCube} en el orden en que aparecen
+        """
+        grupos = cls._grupos(df)
+        grupos.insert(0, 'BLOQUE', bloques)
+        tabla = (grupos.groupby(['BLOQUE', *cls.DIMENSIONES], dropna=False, observed=True, sort=False)
+                 .agg(**_AGREGADOS)
+                 .reset_index())
+        columnas = [str(col) for col in df.columns]
+        cubos = {}
+        for bloque, parte in tabla.groupby('BLOQUE', sort=False):
+            parte = parte.drop(columns='BLOQUE').reset_index(drop=True)
+            for dimension in ('TIPO_CLIENTE', 'SERVICIO'):
+                parte[dimension] = parte[dimension].cat.remove_unused_categories()
+            cubos[bloque] = cls(parte, columnas)
+        return cubos
+
+    @staticmethod
+    def _grupos(df: pd.DataFrame) -> pd.DataFrame:
+        """Dimensiones, fecha y montos de cada fila, listos para agrupar."""
+        esquema = ColumnMapper.resolve_all(df.columns)
+        col_fecha = esquema[EXCEL_COLUMNS['FECHA']]
+        col_forma_pago = esquema[EXCEL_COLUMNS['FORMA_PAGO']]
+        col_estado = esquema['ESTADO DEL SERVICIO']
+        col_servicio = esquema[EXCEL_COLUMNS['SERVICIO_REALIZADO']]
+        # Sin TORRE/APTO el tipo de cliente sale de la dirección
+        col_cliente = esquema[EXCEL_COLUMNS['TORRE_APTO']] or esquema[EXCEL_COLUMNS['DIRECCION']]
+
+        def columna(col, defecto):
+            return df[col] if col else pd.Series(defecto, index=df.index)
+
+        fechas = pd.to_datetime(columna(col_fecha, pd.NaT))
+        if col_servicio:
+            servicio = df[col_servicio].astype(str).str.strip().str.upper()
+            servicio = servicio.mask(servicio.isin(['NAN', 'NONE', '']))
+        else:
+            servicio = pd.Series(None, index=df.index, dtype=object)
+        montos = {clave: columna(esquema[logica], 0.0)
+                  for clave, logica in (('jg', 'PARA_JG'), ('abrecar', 'PARA_ABRECAR'), ('iva', 'IVA'))}
+
+        return pd.DataFrame({
+            'MES': fechas.dt.to_period('M').dt.to_timestamp(),
+            'FORMA_PAGO': _categorizar(columna(col_forma_pago, ''), FORMAS_PAGO_RESUMEN, FORMA_PAGO_OTRA),
+            'ESTADO': _categorizar(columna(col_estado, None), ESTADOS_RESUMEN, ESTADO_OTRO),
+            'TIPO_CLIENTE': (ClientClassifier.classify(df[col_cliente]) if col_cliente
+                             else pd.Series(None, index=df.index, dtype=object)).astype('category'),
+            'SERVICIO': servicio.astype('category'),
+            'fecha': fechas,
+            **montos,
+        })
+
+    @classmethod
+    def merge(cls, cubos: Sequence['AnalyticsCube']) -> 'AnalyticsCube':
+        """
+        Une cubos armados sobre partes del mismo libro (mismo encabezado),
+        sumando los grupos que aparecen en más de una parte. El resultado es
+        el mismo que armar el cubo con todas las filas juntas.
+
+        Args:
+            cubos: Cubos parciales, en el orden de las filas
+
+        Returns:
+            AnalyticsCube: Cubo de todas las partes
+        """
+        tabla = (pd.concat([cubo.tabla for cubo in cubos], ignore_index=True)
+                 .groupby(list(cls.DIMENSIONES), dropna=False, observed=True, sort=False)
+                 .agg(cantidad=('cantidad', 'sum'), jg=('jg', 'sum'), abrecar=('abrecar', 'sum'),
+                      iva=('iva', 'sum'), fecha_min=('fecha_min', 'min'), fecha_max=('fecha_max', 'max'))
+                 .reset_index())
+        # pd.concat pasa a object las dimensiones cuyas categorías difieren entre partes
+        tabla['FORMA_PAGO'] = pd.Categorical(tabla['FORMA_PAGO'], categories=FORMAS_PAGO_RESUMEN + [FORMA_PAGO_OTRA])
+        tabla['ESTADO'] = pd.Categorical(tabla['ESTADO'], categories=ESTADOS_RESUMEN + [ESTADO_OTRO])
+        for dimension in ('TIPO_CLIENTE', 'SERVICIO'):
+            tabla[dimension] = tabla[dimension].astype(object).astype('category')
+        return cls(tabla, cubos[0].columnas)
+
+    def slice(self, **filtros) -> 'AnalyticsCube':
+        """
+        Corte del cubo. Cada filtro es una dimensión con un valor, una lista
+        de valores o una función que recibe la columna y retorna la máscara,
+        p. ej. slice(FORMA_PAGO='EFECTIVO', MES=pd.Series.notna).
+        """
+        mascara = pd.Series(True, index=self.tabla.index)
+        for dimension, valor in filtros.items():
+            columna = self.tabla[dimension]
+            if callable(valor):
+                mascara &= valor(columna)
+            elif isinstance(valor, (list, tuple, set)):
+                mascara &= columna.isin(valor)
+            else:
+                mascara &= columna == valor
+        return AnalyticsCube(self.tabla[mascara], self.columnas)
+
+    def totals(self, por: Union[str, Iterable[str]] = ()) -> pd.DataFrame:
+        """
+        Suma el cubo por las dimensiones indicadas; sin dimensiones retorna
+        una sola fila con el total. Los valores nulos de una dimensión forman
+        su propio grupo (se quitan antes con slice si no interesan).
+
+        Returns:
+            pd.DataFrame: Dimensiones, cantidad, jg, abrecar, iva, fecha_min y fecha_max
+        """
+        por = [por] if isinstance(por, str) else list(por)
+        medidas = {**{medida: (medida, 'sum') for medida in self.SUMAS},
+                   'fecha_min': ('fecha_min', 'min'), 'fecha_max': ('fecha_max', 'max')}
+        if not por:
+            return pd.DataFrame([{medida: self.tabla[columna].agg(funcion)
+                                  for medida, (columna, funcion) in medidas.items()}])
+        return (self.tabla.groupby(por, dropna=False, observed=True, sort=True)
+                .agg(**medidas)
+                .reset_index())
+
+    def __len__(self) -> int:
+        return len(self.tabla)
+
+
+def _categorizar(serie: pd.Series, categorias, otra) -> pd.Categorical:
+    """Categórico con las categorías dadas; lo que no está en ellas queda como otra."""
+    return pd.Categorical(serie, categories=categorias + [otra]).fillna(otra)
+
+
+def read_analysis_frame(file_path) -> pd.DataFrame:
+    """
+    Lee las columnas de COLUMNAS_ANALISIS de todas las hojas, con los tipos
+    normalizados, y las concatena. En attrs['filas_por_hoja'] queda cuántas
+    filas aporta cada hoja, para armar el cubo por bloques.
+    """
+    hojas = get_sheets(file_path, columnas=COLUMNAS_ANALISIS, normalizar=True)
+    if not hojas:
+        raise ValueError('No se encontraron hojas en el archivo Excel.')
+    dfs = []
+    for df_hoja in hojas.values():
+        df_hoja.columns = [str(col).strip() for col in df_hoja.columns]
+        dfs.append(df_hoja)
+    df = concat_frames(dfs)
+    # Las hojas sin valores no aportan filas a la concatenación
+    df.attrs['filas_por_hoja'] = [len(df_hoja) if has_values(df_hoja) else 0 for df_hoja in dfs]
+    return df
+
+
+def get_cube(file_path, df: pd.DataFrame = None) -> AnalyticsCube:
+    """
+    Retorna el cubo del libro, armándolo la primera vez.
+
+    Se busca primero en la caché de libros y luego en el directorio del
+    snapshot; si no está se arma con df (o leyendo el libro), por bloques
+    reutilizando los ya agregados, y se guarda en ambos.
+
+    Args:
+        file_path: Ruta al Excel, archivo abierto o directorio de un snapshot
+        df: Filas ya leídas con read_analysis_frame, para no volver a concatenar
+
+    Returns:
+        AnalyticsCube: Cubo del libro
+    """
+    cache = get_workbook_cache()
+    clave = (workbook_digest(file_path), 'cubo')
+    guardado = cache.get(clave)
+    if guardado is not None:
+        return AnalyticsCube(guardado['cubo'], guardado['cubo'].attrs['columnas'])
+
+    cubo = _load_from_snapshot(file_path)
+    if cubo is None:
+        cubo = build_incremental(read_analysis_frame(file_path) if df is None else df)
+        _save_to_snapshot(file_path, cubo)
+    tabla = cubo.tabla.copy(deep=False)
+    tabla.attrs['columnas'] = cubo.columnas
+    cache.put(clave, {'cubo': tabla})
+    return cubo
+
+
+def build_incremental(df: pd.DataFrame, filas_bloque: int = None) -> AnalyticsCube:
+    """
+    Arma el cubo uniendo los cubos de bloques de filas de cada hoja; los
+    bloques cuyo contenido ya se agregó antes se toman de la caché.
+
+    Args:
+        df: Filas de read_analysis_frame; sin attrs['filas_por_hoja'] se
+            trata como una sola hoja
+        filas_bloque: Filas por bloque; por defecto ANALYTICS_BLOCK_ROWS
+            (0 arma el cubo completo sin bloques)
+
+    Returns:
+        AnalyticsCube: Cubo del libro
+    """
+    if filas_bloque is None:
+        filas_bloque = int(get_config_value('ANALYTICS_BLOCK_ROWS', 0))
+    filas_por_hoja = df.attrs.get('filas_por_hoja') or [len(df)]
+    if filas_bloque <= 0 or sum(filas_por_hoja) != len(df) or df.empty:
+        return AnalyticsCube.build(df)
+
+    cache = get_workbook_cache()
+    # El mismo bloque con otro encabezado puede resolver otras columnas
+    encabezado = tuple((str(col), str(dtype)) for col, dtype in df.dtypes.items())
+    huellas = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    # Los bloques empiezan en cada hoja, así lo agregado a una hoja no corre los de las siguientes
+    rangos = []
+    inicio_hoja = 0
+    for filas in filas_por_hoja:
+        rangos += [(inicio, min(inicio + filas_bloque, inicio_hoja + filas))
+                   for inicio in range(inicio_hoja, inicio_hoja + filas, filas_bloque)]
+        inicio_hoja += filas
+
+    claves = [('cubo_bloque', encabezado, hashlib.blake2b(huellas[inicio:fin].tobytes(), digest_size=16).hexdigest())
+              for inicio, fin in rangos]
+    columnas = [str(col) for col in df.columns]
+    cubos = {}
+    for clave in claves:
+        guardado = cache.get(clave)
+        if guardado is not None:
+            cubos[clave] = AnalyticsCube(guardado['cubo'], columnas)
+
+    # Los bloques nuevos o modificados se agregan juntos en una sola pasada
+    faltantes = [i for i, clave in enumerate(claves) if clave not in cubos]
+    if faltantes:
+        filas = np.concatenate([np.arange(*rangos[i]) for i in faltantes])
+        bloques = np.repeat(faltantes, [rangos[i][1] - rangos[i][0] for i in faltantes])
+        for i, cubo in AnalyticsCube.build_blocks(df.iloc[filas], bloques).items():
+            cache.put(claves[i], {'cubo': cubo.tabla})
+            cubos[claves[i]] = cubo
+    return AnalyticsCube.merge([cubos[clave] for clave in claves])
+
+
+def _load_from_snapshot(file_path):
+    """Cubo guardado en el directorio del snapshot, o None."""
+    if not is_snapshot(file_path) or not os.path.isfile(os.path.join(file_path, CUBO_ARCHIVO)):
+        return None
+    with pa.memory_map(os.path.join(file_path, CUBO_ARCHIVO), 'r') as source:
+        tabla = pa.ipc.open_file(source).read_all()
+    columnas = json.loads(tabla.schema.metadata[b'columnas'])
+    return AnalyticsCube(tabla.to_pandas(), columnas)
+
+
+def _save_to_snapshot(file_path, cubo: AnalyticsCube):
+    """Escribe el cubo en el directorio del snapshot; se ignora si no es un snapshot."""
+    if not is_snapshot(file_path):
+        return
+    tabla = pa.Table.from_pandas(cubo.tabla, preserve_index=False)
+    tabla = tabla.replace_schema_metadata({**tabla.schema.metadata,
+                                           b'columnas': json.dumps(cubo.columnas).encode('utf-8')})
+    # Se escribe en un temporal y se renombra, así un lector nunca ve el archivo a medias
+    descriptor, temporal = tempfile.mkstemp(prefix='.cubo_', dir=file_path)
+    os.close(descriptor)
+    try:
+        with pa.OSFile(temporal, 'wb') as sink:
+            with pa.ipc.new_file(sink, tabla.schema) as writer:
+                writer.write_table(tabla)
+        os.replace(temporal, os.path.join(file_path, CUBO_ARCHIVO))
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
@@ -0,0 +1,174 @@
+"""
+Almacén en disco de imágenes adjuntas subidas por separado.
+
+En lugar de enviar los comprobantes como base64 dentro del JSON de
+/gastos/generar-pdf o del campo imagenes de /pdf_relacion_servicios (un 33%
+más de bytes, todo cargado en memoria y reenviado en cada reintento), el
+cliente los sube una vez como archivos binarios a POST /api/attachments y
+luego envía solo los ids.
+
+El id de un adjunto es el SHA-256 de su contenido, así la misma foto subida
+dos veces se guarda una sola vez. Los archivos quedan en
+UPLOAD_FOLDER/attachments/<id>.<extensión> y se eliminan pasado
+ATTACHMENT_TTL_SECONDS desde la última vez que se subieron o se usaron en
+un PDF (ver cleanup_expired_attachments).
+"""
+import glob
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from typing import IO, Iterable, List, Optional
+
+from PIL import Image as PILImage
+
+from config.config import get_config_value
+
+
+ATTACHMENTS_SUBDIR = 'attachments'
+
+# Un id de adjunto es el SHA-256 hexadecimal del contenido
+_ATTACHMENT_ID_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# Formatos de imagen aceptados y la extensión con que se guardan
+_EXTENSIONES = {
+    'JPEG': '.jpg',
+    'MPO': '.jpg',  # JPEG de varias imágenes de algunos celulares
+    'PNG': '.png',
+    'WEBP': '.webp',
+    'GIF': '.gif',
+    'BMP': '.bmp',
+    'TIFF': '.tif',
+}
+
+
+class AttachmentError(ValueError):
+    """El archivo subido no es una imagen aceptada."""
+
+
+def is_valid_attachment_id(attachment_id) -> bool:
+    """Valida que el valor tenga el formato de un id de adjunto."""
+    return isinstance(attachment_id, str) and bool(_ATTACHMENT_ID_RE.match(attachment_id))
+
+
+def get_attachments_root() -> str:
+    """Directorio donde se guardan los adjuntos."""
+    return os.path.join(get_config_value('UPLOAD_FOLDER'), ATTACHMENTS_SUBDIR)
+
+
+def get_attachment_path(attachment_id: str) -> Optional[str]:
+    """
+    Ruta del archivo de un adjunto.
+
+    Returns:
+        str: Ruta o None si el id no es válido, no existe o expiró
+    """
+    if not is_valid_attachment_id(attachment_id):
+        return None
+    for ruta in glob.glob(os.path.join(get_attachments_root(), attachment_id + '.*')):
+        return ruta
+    return None
+
+
+def attachment_header(ruta: str) -> str:
+    """Cabecera data: equivalente a la del base64, según la extensión guardada."""
+    mime = mimetypes.guess_type(ruta)[0] or 'application/octet-stream'
+    return f'data:{mime};base64'
+
+
+def save_attachment(stream: IO[bytes], chunk_size: int = 1024 * 1024) -> dict:
+    """
+    Guarda un archivo subido calculando su hash por bloques, sin cargarlo
+    entero en memoria.
+
+    Args:
+        stream: Archivo abierto en binario (p. ej. FileStorage.stream)
+
+    Returns:
+        dict: {'id', 'size', 'duplicate'}; duplicate indica que ya estaba
+
+    Raises:
+        AttachmentError: Si el archivo no es una imagen aceptada
+    """
+    root = get_attachments_root()
+    os.makedirs(root, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(prefix='.adjunto_', dir=root)
+    try:
+        hasher = hashlib.sha256()
+        tamano = 0
+        with os.fdopen(descriptor, 'wb') as f:
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                hasher.update(chunk)
+                f.write(chunk)
+                tamano += len(chunk)
+        attachment_id = hasher.hexdigest()
+
+        existente = get_attachment_path(attachment_id)
+        if existente is not None:
+            # Renueva el TTL del adjunto ya guardado
+            os.utime(existente)
+            return {'id': attachment_id, 'size': tamano, 'duplicate': True}
+
+        extension = _validar_imagen(temporal)
+        os.replace(temporal, os.path.join(root, attachment_id + extension))
+        return {'id': attachment_id, 'size': tamano, 'duplicate': False}
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def _validar_imagen(ruta: str) -> str:
+    """Verifica que el archivo sea una imagen aceptada y retorna su extensión."""
+    try:
+        with PILImage.open(ruta) as imagen:
+            formato = imagen.format
+            imagen.verify()
+    except Exception as e:
+        raise AttachmentError(f'El archivo no es una imagen válida: {e}')
+    if formato not in _EXTENSIONES:
+        raise AttachmentError(f'Formato de imagen no soportado: {formato}')
+    return _EXTENSIONES[formato]
+
+
+def find_missing_attachments(valores: Iterable) -> List[str]:
+    """
+    Ids de adjuntos que no existen entre los valores de una lista de
+    imágenes (los base64 se ignoran). Los que existen renuevan su TTL, así
+    no expiran mientras un trabajo en segundo plano espera su turno.
+    """
+    faltantes = []
+    for valor in valores or []:
+        if not is_valid_attachment_id(valor):
+            continue
+        ruta = get_attachment_path(valor)
+        if ruta is None:
+            faltantes.append(valor)
+            continue
+        try:
+            os.utime(ruta)
+        except OSError:
+            faltantes.append(valor)
+    return faltantes
+
+
+def cleanup_expired_attachments(ttl_seconds: Optional[int] = None):
+    """
+    Elimina los adjuntos no subidos ni usados en ttl_seconds (por defecto
+    ATTACHMENT_TTL_SECONDS).
+    """
+    if ttl_seconds is None:
+        ttl_seconds = int(get_config_value('ATTACHMENT_TTL_SECONDS'))
+    root = get_attachments_root()
+    if not os.path.isdir(root):
+        return
+    limite = time.time() - ttl_seconds
+    for nombre in os.listdir(root):
+        ruta = os.path.join(root, nombre)
+        try:
+            if os.path.isfile(ruta) and os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+        except OSError:
+            # Otro worker pudo eliminarlo primero
+            pass
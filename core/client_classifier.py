@@ -0,0 +1,81 @@
+"""
+Clasificador vectorizado del tipo de cliente a partir de la columna TORRE/APTO.
+
+Las reglas se aplican en el mismo orden de prioridad que la versión fila por
+fila: ADMINISTRACIÓN (salvo que mencione APTO, CASA, LOCAL...), EMPRESA,
+LOCAL, CASA y APTO (cualquier dígito). Como las direcciones se repiten mucho,
+cada texto distinto se clasifica una sola vez y el resultado se expande a
+todas las filas.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+
+def _alternancia(palabras):
+    """Regex que busca cualquiera de las palabras como subcadena literal."""
+    return re.compile('|'.join(re.escape(p) for p in palabras))
+
+
+class ClientClassifier:
+    """Clasifica valores de TORRE/APTO en tipos de cliente"""
+
+    ADMINISTRACION = 'ADMINISTRACIÓN'
+    EMPRESA = 'EMPRESA'
+    LOCAL = 'LOCAL'
+    CASA = 'CASA'
+    APTO = 'APTO'
+    OTROS = 'OTROS'
+
+    # Palabras clave fuertes para ADMINISTRACION
+    PATRON_ADMINISTRACION = _alternancia(['ADMINISTRACION', 'ADMON', 'CONJUNTO', 'EDIFICIO', 'TORRE',
+                                          'P.H.', 'PROPIEDAD', 'AGRUPACION'])
+    # Si dice "CONJUNTO XYZ CASA 1" es CASA, no la administración
+    PATRON_EXCEPCION_ADMINISTRACION = _alternancia(['APTO', 'CASA', 'LOCAL', 'CONSULTORIO', 'OFICINA', 'BODEGA'])
+    PATRON_EMPRESA = _alternancia(['EMPRESA', 'SAS', 'LTDA', 'PARROQUIA', 'COLEGIO', 'IGLESIA'])
+    # Incluye errores tipográficos comunes como CONSULTIRIO
+    PATRON_LOCAL = _alternancia(['LOCAL', 'TIENDA', 'C.C', 'BAR', 'BODEGA', 'CONSULTORIO', 'CONSULTIRIO',
+                                 'OFICINA', 'RESTAURANTE'])
+    PATRON_CASA = _alternancia(['CASA', 'URBANIZACION', 'VIVIENDA'])
+    # Solo números o palabras de apto con número (Bloque, Int, Ap)
+    PATRON_APTO = re.compile(r'\d')
+
+    @classmethod
+    def classify_unique(cls, textos: pd.Series) -> np.ndarray:
+        """
+        Clasifica textos ya distintos entre sí.
+
+        Args:
+            textos: Serie de strings (sin normalizar)
+
+        Returns:
+            np.ndarray: Tipo de cliente de cada texto
+        """
+        s = textos.str.strip().str.upper()
+        condiciones = [
+            (s == '') | (s == 'NAN'),
+            s.str.contains(cls.PATRON_ADMINISTRACION) & ~s.str.contains(cls.PATRON_EXCEPCION_ADMINISTRACION),
+            s.str.contains(cls.PATRON_EMPRESA),
+            s.str.contains(cls.PATRON_LOCAL),
+            s.str.contains(cls.PATRON_CASA),
+            s.str.contains(cls.PATRON_APTO),
+        ]
+        opciones = [cls.OTROS, cls.ADMINISTRACION, cls.EMPRESA, cls.LOCAL, cls.CASA, cls.APTO]
+        return np.select(condiciones, opciones, default=cls.OTROS)
+
+    @classmethod
+    def classify(cls, valores: pd.Series) -> pd.Series:
+        """
+        Clasifica cada valor de TORRE/APTO en un tipo de cliente.
+
+        Args:
+            valores: Columna TORRE/APTO tal como viene del Excel
+
+        Returns:
+            pd.Series: Tipo de cliente por fila, con el mismo índice
+        """
+        # str() por valor para tratar números y vacíos igual que el texto del Excel
+        codigos, unicos = pd.factorize(valores.map(str))
+        tipos = cls.classify_unique(pd.Series(unicos, dtype=object))
+        return pd.Series(tipos[codigos], index=valores.index, dtype=object)
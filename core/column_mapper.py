@@ -1,18 +1,146 @@
 """
 Módulo centralizado para el mapeo y normalización de columnas de Excel.
+
+Las variantes de cada columna estándar se definen una sola vez al importar el
+módulo y se guardan ya normalizadas en un índice inmutable. Resolver todas las
+columnas de un encabezado es una sola pasada sobre sus nombres, y el resultado
+(un ColumnSchema) se reutiliza para cualquier hoja con el mismo encabezado.
+
+Si una columna estándar no tiene ninguna variante exacta en el encabezado, se
+busca por aproximación (palabras en común, abreviaturas como 'F.' o 'VR' y
+distancia de edición) entre las columnas que no son variante de nada. Esas
+coincidencias quedan en el esquema con su confianza para poder advertirlas.
 """
+import re
+from collections.abc import Mapping
+from difflib import SequenceMatcher
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
 import pandas as pd
 from unidecode import unidecode
-from typing import List, Dict, Optional, Any
 from config.settings import EXCEL_COLUMNS
 
+
+_VARIANTES = MappingProxyType({
+    EXCEL_COLUMNS.get('FECHA', 'FECHA'): (
+        'FECHA', 'Fecha', 'fecha', 'FECHA SERVICIO', 'Fecha Servicio', 'FECHA DE SERVICIO'
+    ),
+    EXCEL_COLUMNS.get('DIRECCION', 'DIRECCION'): (
+        'DIRECCION', 'Direccion', 'direccion', 'DIRECCIÓN', 'Dirección',
+        'DIRECCION CLIENTE', 'UBICACION', 'UBICACIÓN'
+    ),
+    EXCEL_COLUMNS.get('NOMBRE_CLIENTE', 'NOMBRE CLIENTE'): (
+        'NOMBRE CLIENTE', 'Nombre Cliente', 'nombre cliente', 'CLIENTE', 'Cliente',
+        'NOMBRE', 'Nombre'
+    ),
+    EXCEL_COLUMNS.get('SERVICIO_REALIZADO', 'SERVICIO REALIZADO'): (
+        'SERVICIO REALIZADO', 'Servicio Realizado', 'servicio realizado',
+        'SERVICIO', 'Servicio', 'DESCRIPCION', 'Descripción', 'TRABAJO'
+    ),
+    EXCEL_COLUMNS.get('ESTADO_SERVICIO', 'ESTADO DEL SERVICIO'): (
+        'ESTADO DEL SERVICIO', 'Estado del Servicio', 'estado del servicio',
+        'ESTADO', 'Estado', 'STATUS', 'Status'
+    ),
+    EXCEL_COLUMNS.get('FORMA_PAGO', 'FORMA DE PAGO'): (
+        'FORMA DE PAGO', 'FORMA_PAGO', 'FORMA PAGO', 'PAGO', 'METODO PAGO'
+    ),
+    'X50_PORCIENTO': (
+        'X50%/X25%', 'X50%', 'X25%', 'PORCENTAJE', 'PORCENTAJE PAGO', 'X50'
+    ),
+    'PARA_JG': (
+        'PARA JG', 'Para JG', 'para jg', 'JG', 'J.G.', 'PARA J.G.'
+    ),
+    'PARA_ABRECAR': (
+        'PARA ABRECAR', 'Para Abrecar', 'para abrecar', 'ABRECAR', 'Abrecar'
+    ),
+    'IVA': (
+        'IVA 19%', 'IVA', 'Iva', 'iva', 'IVA%', 'IVA %', 'IVA TOTAL',
+        'TOTAL IVA', 'IMPUESTO', 'Impuesto'
+    ),
+    'DOMICILIO': (
+        'DOMICILIO', 'Domicilio', 'domicilio', 'VALOR DOMICILIO'
+    ),
+    'VALOR_SERVICIO': (
+        'VALOR SERVICIO', 'Valor Servicio', 'VALOR', 'Valor', 'PRECIO'
+    ),
+    EXCEL_COLUMNS.get('TORRE_APTO', 'TORRE/APTO'): (
+        'TORRE/APTO', 'Torre/Apto', 'TORRE', 'Torre', 'APTO', 'Apto',
+        'INTERIOR', 'Interior', 'OFICINA', 'Oficina', 'DIRECCION', 'Direccion' # Fallback a Dirección si es necesario, pero mejor explícito
+    ),
+    EXCEL_COLUMNS.get('FECHA_RELACION', 'FECHA DE RELACION DEL SERVICIO'): (
+        'FECHA DE RELACION DEL SERVICIO', 'Fecha de Relación del Servicio', 'FECHA RELACION', 'Fecha Relacion',
+        'FECHA PAGO', 'Fecha Pago', 'FECHA DE PAGO'
+    ),
+})
+
+
+class ColumnSchema(Mapping):
+    """
+    Resultado inmutable de resolver un encabezado: columna estándar ->
+    nombre real en el DataFrame (None si la hoja no la tiene).
+    """
+
+    __slots__ = ('_columnas', '_aproximadas', 'confidence')
+
+    def __init__(self, columnas: Dict[str, Optional[Hashable]],
+                 aproximadas: Optional[Dict[str, float]] = None):
+        self._columnas = MappingProxyType(dict(columnas))
+        self._aproximadas = MappingProxyType(dict(aproximadas or {}))
+        # 1.0 para coincidencias exactas, el puntaje para las aproximadas y 0.0 si falta
+        self.confidence = MappingProxyType({
+            col: self._aproximadas.get(col, 0.0 if real is None else 1.0)
+            for col, real in self._columnas.items()
+        })
+
+    def __getitem__(self, columna: str) -> Optional[Hashable]:
+        return self._columnas[columna]
+
+    def __iter__(self):
+        return iter(self._columnas)
+
+    def __len__(self) -> int:
+        return len(self._columnas)
+
+    def __repr__(self) -> str:
+        return f"ColumnSchema({dict(self._columnas)!r})"
+
+    def missing(self, columnas: Iterable[str]) -> List[str]:
+        """Columnas estándar pedidas que no están en el encabezado."""
+        return [col for col in columnas if self._columnas[col] is None]
+
+    def fuzzy(self) -> Dict[str, Tuple[Hashable, float]]:
+        """Columnas resueltas por aproximación: {estándar: (nombre_real, confianza)}."""
+        return {col: (self._columnas[col], conf) for col, conf in self._aproximadas.items()}
+
+    def warnings(self, columnas: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Mensajes para las columnas resueltas por aproximación.
+
+        Args:
+            columnas: Limitar a estas columnas estándar; None las incluye todas
+
+        Returns:
+            list: Un texto por columna, p. ej. "Se usó 'F. SERVICIO' como 'FECHA' (confianza 93%)"
+        """
+        aproximadas = self.fuzzy()
+        if columnas is not None:
+            aproximadas = {col: aproximadas[col] for col in columnas if col in aproximadas}
+        return [
+            f"Se usó '{real}' como '{col}' (confianza {conf:.0%})"
+            for col, (real, conf) in aproximadas.items()
+        ]
+
+
 class ColumnMapper:
     """
     Clase encargada de identificar y normalizar columnas en DataFrames de Excel
     basándose en variantes conocidas.
     """
-    
+
     @staticmethod
+    @lru_cache(maxsize=4096, typed=True)
     def normalize_name(col_name: Any) -> str:
         """
         Normaliza el nombre de una columna para hacer comparaciones más flexibles.
@@ -24,80 +152,179 @@ class ColumnMapper:
         return unidecode(str(col_name).strip().upper().replace(' ', '').replace('_', '').replace('.', ''))
 
     @classmethod
-    def find_column(cls, df: pd.DataFrame, target_variants: List[str]) -> Optional[str]:
+    def find_column(cls, df: pd.DataFrame, target_variants: Sequence[str]) -> Optional[str]:
         """
         Busca una columna en el DataFrame que coincida con alguna de las variantes.
-        
+        Solo compara nombres normalizados; las aproximaciones las hace resolve_all.
+
         Args:
-            df: DataFrame donde buscar
+            df: DataFrame donde buscar (o directamente sus nombres de columna)
             target_variants: Lista de posibles nombres de la columna
-            
+
         Returns:
             Nombre real de la columna en el DataFrame o None si no se encuentra
         """
-        # Crear un mapa de {nombre_normalizado: nombre_real}
-        df_columns_normalized = {cls.normalize_name(col): col for col in df.columns}
-        
+        # Mapa {nombre_normalizado: nombre_real}, calculado una vez por encabezado
+        df_columns_normalized = _normalized_columns(tuple(getattr(df, 'columns', df)))
+
         for variant in target_variants:
             normalized_variant = cls.normalize_name(variant)
             if normalized_variant in df_columns_normalized:
                 return df_columns_normalized[normalized_variant]
-        
+
         return None
 
     @classmethod
-    def get_column_variants(cls) -> Dict[str, List[str]]:
+    def resolve_all(cls, columns: Iterable[Hashable]) -> ColumnSchema:
         """
-        Retorna el diccionario de variantes para cada columna estándar.
+        Resuelve todas las columnas estándar de un encabezado en una pasada.
+
+        Para las columnas con alguna variante exacta da el mismo resultado que
+        find_column; las demás se buscan por aproximación (ver fuzzy_score).
+        El esquema se guarda en caché por encabezado (la tupla de nombres).
+
+        Args:
+            columns: Nombres de columna (p. ej. df.columns)
+
+        Returns:
+            ColumnSchema: Columna estándar -> nombre real o None
         """
-        return {
-            EXCEL_COLUMNS.get('FECHA', 'FECHA'): [
-                'FECHA', 'Fecha', 'fecha', 'FECHA SERVICIO', 'Fecha Servicio', 'FECHA DE SERVICIO'
-            ],
-            EXCEL_COLUMNS.get('DIRECCION', 'DIRECCION'): [
-                'DIRECCION', 'Direccion', 'direccion', 'DIRECCIÓN', 'Dirección', 
-                'DIRECCION CLIENTE', 'UBICACION', 'UBICACIÓN'
-            ],
-            EXCEL_COLUMNS.get('NOMBRE_CLIENTE', 'NOMBRE CLIENTE'): [
-                'NOMBRE CLIENTE', 'Nombre Cliente', 'nombre cliente', 'CLIENTE', 'Cliente', 
-                'NOMBRE', 'Nombre'
-            ],
-            EXCEL_COLUMNS.get('SERVICIO_REALIZADO', 'SERVICIO REALIZADO'): [
-                'SERVICIO REALIZADO', 'Servicio Realizado', 'servicio realizado', 
-                'SERVICIO', 'Servicio', 'DESCRIPCION', 'Descripción', 'TRABAJO'
-            ],
-            EXCEL_COLUMNS.get('ESTADO_SERVICIO', 'ESTADO DEL SERVICIO'): [
-                'ESTADO DEL SERVICIO', 'Estado del Servicio', 'estado del servicio', 
-                'ESTADO', 'Estado', 'STATUS', 'Status'
-            ],
-            EXCEL_COLUMNS.get('FORMA_PAGO', 'FORMA DE PAGO'): [
-                'FORMA DE PAGO', 'FORMA_PAGO', 'FORMA PAGO', 'PAGO', 'METODO PAGO'
-            ],
-            'X50_PORCIENTO': [
-                'X50%/X25%', 'X50%', 'X25%', 'PORCENTAJE', 'PORCENTAJE PAGO', 'X50'
-            ],
-            'PARA_JG': [
-                'PARA JG', 'Para JG', 'para jg', 'JG', 'J.G.', 'PARA J.G.'
-            ],
-            'PARA_ABRECAR': [
-                'PARA ABRECAR', 'Para Abrecar', 'para abrecar', 'ABRECAR', 'Abrecar'
-            ],
-            'IVA': [
-                'IVA 19%', 'IVA', 'Iva', 'iva', 'IVA%', 'IVA %', 'IVA TOTAL', 
-                'TOTAL IVA', 'IMPUESTO', 'Impuesto'
-            ],
-            'DOMICILIO': [
-                'DOMICILIO', 'Domicilio', 'domicilio', 'VALOR DOMICILIO'
-            ],
-            'VALOR_SERVICIO': [
-                'VALOR SERVICIO', 'Valor Servicio', 'VALOR', 'Valor', 'PRECIO'
-            ],
-            EXCEL_COLUMNS.get('TORRE_APTO', 'TORRE/APTO'): [
-                'TORRE/APTO', 'Torre/Apto', 'TORRE', 'Torre', 'APTO', 'Apto', 
-                'INTERIOR', 'Interior', 'OFICINA', 'Oficina', 'DIRECCION', 'Direccion' # Fallback a Dirección si es necesario, pero mejor explícito
-            ],
-            EXCEL_COLUMNS.get('FECHA_RELACION', 'FECHA DE RELACION DEL SERVICIO'): [
-                'FECHA DE RELACION DEL SERVICIO', 'Fecha de Relación del Servicio', 'FECHA RELACION', 'Fecha Relacion', 
-                'FECHA PAGO', 'Fecha Pago', 'FECHA DE PAGO'
-            ]
-        }
+        return _resolve_header(tuple(columns))
+
+    @classmethod
+    def logical_columns(cls, col_name: Any) -> Tuple[str, ...]:
+        """Columnas estándar de las que col_name es una variante."""
+        return tuple(logica for logica, _ in _INDICE_VARIANTES.get(cls.normalize_name(col_name), ()))
+
+    @classmethod
+    def fuzzy_score(cls, col_name: Any, variant: str) -> float:
+        """
+        Similitud entre 0 y 1 de un nombre de columna con una variante.
+
+        Promedia, en ambos sentidos, la mejor coincidencia de cada palabra:
+        1 si es igual, 0.85 si una abrevia a la otra ('F' de FECHA, 'VR' de
+        VALOR) y si no el ratio de distancia de edición (desde 0.7).
+        """
+        return _puntaje(_palabras(col_name), _palabras(variant))
+
+    @classmethod
+    def get_column_variants(cls) -> Mapping:
+        """
+        Retorna el diccionario (inmutable) de variantes para cada columna estándar.
+        """
+        return _VARIANTES
+
+
+def _indexar_variantes():
+    """Índice {variante_normalizada: ((columna_estándar, prioridad), ...)}."""
+    indice = {}
+    for logica, variantes in _VARIANTES.items():
+        normalizadas = list(dict.fromkeys(ColumnMapper.normalize_name(v) for v in variantes))
+        for prioridad, normalizada in enumerate(normalizadas):
+            indice.setdefault(normalizada, []).append((logica, prioridad))
+    return MappingProxyType({k: tuple(v) for k, v in indice.items()})
+
+
+_INDICE_VARIANTES = _indexar_variantes()
+
+# Puntaje mínimo para aceptar una coincidencia aproximada
+UMBRAL_APROXIMADO = 0.8
+
+# Confianza máxima de una coincidencia aproximada: aunque las palabras sean
+# las mismas ('FECHA RELACIÓN SERVICIO'), 1.0 queda para las variantes exactas
+CONFIANZA_MAXIMA_APROXIMADA = 0.99
+
+_PALABRAS_VACIAS = frozenset({'DE', 'DEL', 'LA', 'EL', 'LOS', 'LAS', 'Y'})
+
+
+@lru_cache(maxsize=4096)
+def _palabras(col_name: Any) -> Tuple[str, ...]:
+    if pd.isna(col_name):
+        return ()
+    palabras = re.findall(r'[A-Z0-9]+', unidecode(str(col_name)).upper())
+    return tuple(p for p in palabras if p not in _PALABRAS_VACIAS)
+
+
+# Palabras de cada variante sin repetir (muchas variantes solo cambian mayúsculas)
+_PALABRAS_VARIANTES = MappingProxyType({
+    logica: tuple(dict.fromkeys(_palabras(v) for v in variantes))
+    for logica, variantes in _VARIANTES.items()
+})
+
+
+def _es_abreviatura(corta: str, larga: str) -> bool:
+    # Misma inicial y las letras de la corta aparecen en orden en la larga
+    if len(corta) >= len(larga) or corta[0] != larga[0]:
+        return False
+    restantes = iter(larga)
+    return all(letra in restantes for letra in corta)
+
+
+@lru_cache(maxsize=16384)
+def _similitud(a: str, b: str) -> float:
+    if a == b:
+        return 1.0
+    if _es_abreviatura(a, b) or _es_abreviatura(b, a):
+        return 0.85
+    comparador = SequenceMatcher(None, a, b)
+    if comparador.real_quick_ratio() < 0.7 or comparador.quick_ratio() < 0.7:
+        return 0.0
+    ratio = comparador.ratio()
+    return ratio if ratio >= 0.7 else 0.0
+
+
+def _puntaje(palabras: Tuple[str, ...], variante: Tuple[str, ...]) -> float:
+    if not palabras or not variante:
+        return 0.0
+    total = (sum(max(_similitud(p, v) for v in variante) for p in palabras)
+             + sum(max(_similitud(v, p) for p in palabras) for v in variante))
+    return total / (len(palabras) + len(variante))
+
+
+@lru_cache(maxsize=4096)
+def _aproximadas(palabras: Tuple[str, ...]) -> Tuple[Tuple[str, float], ...]:
+    """Columnas estándar más parecidas a un nombre (empate = varias) si pasan el umbral."""
+    puntajes = {
+        logica: max((_puntaje(palabras, variante) for variante in variantes), default=0.0)
+        for logica, variantes in _PALABRAS_VARIANTES.items()
+    }
+    mejor = max(puntajes.values(), default=0.0)
+    if mejor < UMBRAL_APROXIMADO:
+        return ()
+    return tuple((logica, puntaje) for logica, puntaje in puntajes.items() if puntaje == mejor)
+
+
+@lru_cache(maxsize=256)
+def _normalized_columns(columns: tuple) -> Mapping:
+    # Si dos columnas normalizan igual, gana la última (como el dict original)
+    return MappingProxyType({ColumnMapper.normalize_name(col): col for col in columns})
+
+
+@lru_cache(maxsize=256)
+def _resolve_header(columns: tuple) -> ColumnSchema:
+    mejores = {}
+    for col in columns:
+        for logica, prioridad in _INDICE_VARIANTES.get(ColumnMapper.normalize_name(col), ()):
+            actual = mejores.get(logica)
+            # Gana la variante listada primero; con la misma, la última columna
+            if actual is None or prioridad <= actual[0]:
+                mejores[logica] = (prioridad, col)
+
+    # Columnas estándar sin variante exacta: se prueban las columnas que no
+    # son variante de ninguna. Cada columna solo cuenta para la estándar a la
+    # que más se parece, así el resultado no depende de las demás columnas
+    confianza = {}
+    if len(mejores) < len(_VARIANTES):
+        for col in columns:
+            if ColumnMapper.normalize_name(col) in _INDICE_VARIANTES:
+                continue
+            for logica, puntaje in _aproximadas(_palabras(col)):
+                if logica in mejores and logica not in confianza:
+                    continue
+                if puntaje >= confianza.get(logica, 0.0):
+                    mejores[logica] = (None, col)
+                    confianza[logica] = puntaje
+
+    confianza = {logica: min(puntaje, CONFIANZA_MAXIMA_APROXIMADA) for logica, puntaje in confianza.items()}
+    return ColumnSchema({logica: mejores[logica][1] if logica in mejores else None for logica in _VARIANTES},
+                        confianza)
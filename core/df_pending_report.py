@@ -1,12 +1,12 @@
-from fpdf import FPDF
 from datetime import datetime
 import pandas as pd 
 import os
 import tempfile
 
 from utils.date_utils import fecha_larga
+from core.fpdf_output import StreamingFPDF
 
-class PDF(FPDF):
+class PDF(StreamingFPDF):
     def header(self):
         # Configuración de colores y fuentes
         self.set_fill_color(0, 102, 204)  # Azul corporativo
@@ -121,7 +121,7 @@ class PDF(FPDF):
         self.cell(widths[-1], 8, str(len(datos)), 1, 1, 'C', True)
 
 
-def generate_pdf_report(data, base_file_path, fecha_inicio=None, fecha_fin=None, nombre_pdf=None, notas=None):
+def generate_pdf_report(data, base_file_path, fecha_inicio=None, fecha_fin=None, nombre_pdf=None, notas=None, destino=None):
     """
     Genera un archivo PDF a partir de un DataFrame con datos de servicios pendientes.
 
@@ -132,11 +132,13 @@ def generate_pdf_report(data, base_file_path, fecha_inicio=None, fecha_fin=None,
         fecha_fin (datetime): Fecha de fin del periodo analizado.
         nombre_pdf (str): Nombre personalizado para el PDF.
         notas (str): Notas adicionales para incluir en el PDF.
+        destino (file, opcional): Archivo abierto en binario donde escribir el PDF
+            (p. ej. new_pdf_spool()) en lugar de guardarlo en el directorio temporal.
 
     Returns:
         tuple: Una tupla que contiene:
             - bool: True si el PDF se generó y guardó con éxito, False en caso contrario.
-            - str or None: La ruta completa del archivo PDF generado si fue exitoso, None si falló.
+            - str or None: La ruta completa del archivo PDF generado (o destino) si fue exitoso, None si falló.
             - list: Una lista de diccionarios con mensajes de log ('level', 'text').
     """
     messages = []
@@ -177,6 +179,12 @@ def generate_pdf_report(data, base_file_path, fecha_inicio=None, fecha_fin=None,
                 nombre_pdf_final += '.pdf'
         else:
             nombre_pdf_final = f"Servicios_Pendientes_{datetime.now().strftime('%Y-%m-%d_%H-%M')}.pdf"
+
+        if destino is not None:
+            # Se escribe directo en el buffer de la respuesta, sin dejar archivos en disco
+            pdf.write_to(destino)
+            messages.append({'level': 'success', 'text': f"PDF generado: {nombre_pdf_final}"})
+            return True, destino, messages
         
         # Usar directorio temporal para servidores (como Render)
         # En producción, se usará /tmp o el directorio temporal del sistema
@@ -1,10 +1,19 @@
 import pandas as pd
 import numpy as np
-from utils.validation_utils import limpiar_valor_monetario
+from utils.validation_utils import limpiar_valores_monetarios
 from config.settings import EXCEL_COLUMNS, FILTER_CRITERIA
 from core.column_mapper import ColumnMapper
+from core.workbook_cache import get_sheets
 from unidecode import unidecode
 
+# Columnas lógicas (claves de ColumnMapper) que usa extraer_servicios. Una hoja
+# sin FECHA no aporta filas; las demás se buscan hoja por hoja. Las columnas
+# cuyo nombre contiene MATERIAL se conservan por la búsqueda parcial de materiales.
+COLUMNAS_REQUERIDAS = [EXCEL_COLUMNS['FECHA']]
+COLUMNAS_OPCIONALES = [EXCEL_COLUMNS['FORMA_PAGO'], EXCEL_COLUMNS['ESTADO_SERVICIO'], EXCEL_COLUMNS['DIRECCION'],
+                       EXCEL_COLUMNS['SERVICIO_REALIZADO'], 'VALOR_SERVICIO', 'DOMICILIO', 'IVA']
+COLUMNAS_CONTIENEN = ['MATERIAL']
+
 def extraer_servicios(excel_path, fecha_inicio, fecha_fin, log_callback=None):
     """
     Extrae los servicios del archivo Excel que cumplan con los criterios:
@@ -28,7 +37,10 @@ def extraer_servicios(excel_path, fecha_inicio, fecha_fin, log_callback=None):
     }
 
     try:
-        xls = pd.ExcelFile(excel_path)
+        # Solo se cargan las columnas declaradas y las filas dentro del rango
+        hojas = get_sheets(excel_path, columnas=COLUMNAS_REQUERIDAS + COLUMNAS_OPCIONALES,
+                           requeridas=COLUMNAS_REQUERIDAS, contiene=COLUMNAS_CONTIENEN,
+                           fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, normalizar=True)
     except Exception as e:
         log_callback(f"Error al abrir el archivo Excel: {str(e)}", 'error')
         return pd.DataFrame(), info
@@ -36,26 +48,24 @@ def extraer_servicios(excel_path, fecha_inicio, fecha_fin, log_callback=None):
     frames = []
     total_registros_en_rango = 0
 
-    # Obtener variantes de columnas
-    columnas_variantes = ColumnMapper.get_column_variants()
-
-    for hoja in xls.sheet_names:
+    for hoja, df in hojas.items():
         try:
             log_callback(f"\nAnalizando hoja: {hoja}")
-            df = xls.parse(hoja)
 
-            # Mapear columnas requeridas usando ColumnMapper
-            col_fecha = ColumnMapper.find_column(df, columnas_variantes[EXCEL_COLUMNS["FECHA"]])
-            col_forma_pago = ColumnMapper.find_column(df, columnas_variantes[EXCEL_COLUMNS["FORMA_PAGO"]])
-            col_estado_servicio = ColumnMapper.find_column(df, columnas_variantes[EXCEL_COLUMNS["ESTADO_SERVICIO"]])
+            # Mapear columnas usando ColumnMapper (una sola pasada por el encabezado)
+            esquema = ColumnMapper.resolve_all(df.columns)
+            col_fecha = esquema[EXCEL_COLUMNS["FECHA"]]
+            col_forma_pago = esquema[EXCEL_COLUMNS["FORMA_PAGO"]]
+            col_estado_servicio = esquema[EXCEL_COLUMNS["ESTADO_SERVICIO"]]
+            for aviso in esquema.warnings(COLUMNAS_REQUERIDAS + COLUMNAS_OPCIONALES):
+                log_callback(f"Hoja {hoja}: {aviso}", 'warning')
 
             if not col_fecha:
                 log_callback(f"Hoja {hoja} no tiene columna de Fecha. Saltando...")
                 continue
 
-            # 1. Filtrar filas con fecha no nula y convertir
+            # 1. Filtrar filas con fecha (ya viene como datetime64)
             df = df[df[col_fecha].notnull()]
-            df[col_fecha] = pd.to_datetime(df[col_fecha], errors='coerce', dayfirst=True)
             
             # 2. Filtrar por rango (Vectorizado)
             mask_rango = df[col_fecha].between(fecha_inicio, fecha_fin)
@@ -81,20 +91,13 @@ def extraer_servicios(excel_path, fecha_inicio, fecha_fin, log_callback=None):
                 log_callback(f"No se encontró columna para Estado del Servicio en hoja {hoja}. Saltando...")
                 continue
 
-            # 3. Filtrar por forma de pago = EFECTIVO (Vectorizado)
-            # Primero normalizamos la columna completa de una vez
-            df['FORMA_PAGO_CLEAN'] = df[col_forma_pago].astype(str).str.upper().str.strip()
-            # Luego filtramos
-            df = df[df['FORMA_PAGO_CLEAN'] == FILTER_CRITERIA["FORMA_PAGO_EFECTIVO"]]
+            # 3. Filtrar por forma de pago = EFECTIVO (la etiqueta ya es canónica)
+            df = df[df[col_forma_pago] == FILTER_CRITERIA["FORMA_PAGO_EFECTIVO"]]
             log_callback(f"Registros después de filtrar por forma de pago: {len(df)}")
 
-            # 4. Filtrar por estado del servicio vacío (Vectorizado)
-            # Normalizar estado
-            estado_series = df[col_estado_servicio].astype(str).str.strip()
+            # 4. Filtrar por estado del servicio vacío (los vacíos ya vienen como NaN)
             mascara_estado = (df[col_estado_servicio].isna()) | \
-                             (estado_series == 'nan') | \
-                             (estado_series == 'None') | \
-                             (estado_series == FILTER_CRITERIA["ESTADO_SERVICIO_VACIO"])
+                             (df[col_estado_servicio] == FILTER_CRITERIA["ESTADO_SERVICIO_VACIO"])
             
             registros_excluidos = df[~mascara_estado]
             if not registros_excluidos.empty:
@@ -104,11 +107,11 @@ def extraer_servicios(excel_path, fecha_inicio, fecha_fin, log_callback=None):
             log_callback(f"Registros después de filtrar por estado: {len(df)}")
 
             # Buscar columnas adicionales de forma robusta
-            col_direccion = ColumnMapper.find_column(df, columnas_variantes[EXCEL_COLUMNS['DIRECCION']])
-            col_servicio = ColumnMapper.find_column(df, columnas_variantes[EXCEL_COLUMNS['SERVICIO_REALIZADO']])
-            col_valor = ColumnMapper.find_column(df, columnas_variantes['VALOR_SERVICIO'])
-            col_domicilio = ColumnMapper.find_column(df, columnas_variantes['DOMICILIO'])
-            col_iva = ColumnMapper.find_column(df, columnas_variantes['IVA'])
+            col_direccion = esquema[EXCEL_COLUMNS['DIRECCION']]
+            col_servicio = esquema[EXCEL_COLUMNS['SERVICIO_REALIZADO']]
+            col_valor = esquema['VALOR_SERVICIO']
+            col_domicilio = esquema['DOMICILIO']
+            col_iva = esquema['IVA']
             
             # Columnas de materiales (lógica custom que requiere búsqueda manual parcial)
             col_materiales = None
@@ -129,38 +132,13 @@ def extraer_servicios(excel_path, fecha_inicio, fecha_fin, log_callback=None):
             df['DIRECCION_PARA_INFORME'] = df[col_direccion].fillna('').astype(str) if col_direccion else ''
             df['SERVICIO_PARA_INFORME'] = df[col_servicio].fillna('').astype(str) if col_servicio else ''
             
-            # Limpieza vectorizada de valores monetarios
-            def limpiar_vectorizado(series):
-                if series is None:
-                    return pd.Series([0.0] * len(df), index=df.index)
-                # Convertir a string, quitar $ y , y convertir a float de forma segura
-                clean_series = (series.astype(str)
-                        .str.replace('$', '', regex=False)
-                        .str.replace(',', '', regex=False)
-                        .str.strip()
-                        .replace({'nan': '0', 'None': '0', '': '0'}))
-                return pd.to_numeric(clean_series, errors='coerce').fillna(0.0)
-
             # Inicializar valores
             df['VALOR_COMBINADO'] = 0.0
             df['VALOR_ORIGINAL'] = 0.0
 
-            # Procesar valor servicio
-            valores_servicio = pd.Series(0.0, index=df.index)
-            if col_valor:
-                try:
-                    valores_servicio = limpiar_vectorizado(df[col_valor])
-                except:
-                    # Fallback a método lento si falla vectorización
-                    valores_servicio = df[col_valor].apply(limpiar_valor_monetario)
-
-            # Procesar domicilio
-            valores_domicilio = pd.Series(0.0, index=df.index)
-            if col_domicilio:
-                try:
-                    valores_domicilio = limpiar_vectorizado(df[col_domicilio])
-                except:
-                    valores_domicilio = df[col_domicilio].apply(limpiar_valor_monetario)
+            # Valor servicio y domicilio ya vienen como float64 (0 si vacío)
+            valores_servicio = df[col_valor] if col_valor else pd.Series(0.0, index=df.index)
+            valores_domicilio = df[col_domicilio] if col_domicilio else pd.Series(0.0, index=df.index)
 
             # Lógica vectorizada para valor combinado
             # 1. Usar valor servicio donde sea > 0
@@ -182,10 +160,7 @@ def extraer_servicios(excel_path, fecha_inicio, fecha_fin, log_callback=None):
                 df['MATERIALES'] = ''
 
             if col_valor_materiales:
-                try:
-                    df['VALOR MATERIALES'] = limpiar_vectorizado(df[col_valor_materiales])
-                except:
-                    df['VALOR MATERIALES'] = 0
+                df['VALOR MATERIALES'] = limpiar_valores_monetarios(df[col_valor_materiales])
             else:
                 df['VALOR MATERIALES'] = 0
 
@@ -193,10 +168,7 @@ def extraer_servicios(excel_path, fecha_inicio, fecha_fin, log_callback=None):
             df['SUBTOTAL'] = df['VALOR_COMBINADO'] * 0.5
             
             if col_iva:
-                try:
-                    df['IVA'] = limpiar_vectorizado(df[col_iva])
-                except:
-                    df['IVA'] = df[col_iva].apply(limpiar_valor_monetario)
+                df['IVA'] = df[col_iva]
             else:
                 df['IVA'] = 0.0
                 
@@ -0,0 +1,450 @@
+"""
+Lector de libros .xlsx por streaming con proyección de columnas.
+
+pd.ExcelFile convierte todas las celdas de todas las hojas a valores Python
+antes de armar los DataFrames. Este lector recorre las filas con openpyxl en
+modo read_only/data_only y solo convierte las columnas que el endpoint
+necesita (resueltas con las variantes de ColumnMapper). El encabezado de cada
+hoja se lee primero: con él se eligen las columnas y, si faltan columnas
+requeridas, el resto de la hoja no se recorre. Con un rango de fechas, las
+filas cuya FECHA es una fecha fuera del rango o está vacía se descartan
+durante la iteración.
+
+Las celdas de las demás columnas no se decodifican (textos, números, fechas):
+solo se mira si tienen contenido, para descartar las filas vacías del final
+igual que pandas. En hojas anchas eso es la mayor parte del costo de openpyxl.
+Para eso se usa el parser interno de openpyxl (_ParserProyectado), que solo
+se activa con las versiones probadas; con otra versión, o si le falta algún
+atributo, las filas se recorren con iter_rows() y se convierten todas.
+
+Las filas que quedan se pasan al mismo TextParser que usa pandas, así los
+tipos, los NaN y los nombres 'Unnamed: n' salen igual que con pd.read_excel.
+
+Con EXCEL_PARSE_WORKERS > 1 las hojas de un libro con varias hojas se leen en
+un pool de procesos; el resultado conserva el orden de las hojas. Los
+procesos se crean con forkserver (spawn donde no existe) y no con fork: el
+worker de la app ya tiene hilos (trabajos de PDF, imágenes) y un proceso
+copiado con fork puede heredar un lock tomado por otro hilo y quedarse
+bloqueado. Un archivo subido se copia una sola vez a disco y cada proceso
+recibe la ruta.
+"""
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import IO, Dict, Iterable, List, Optional, Sequence, Union
+
+import pandas as pd
+import openpyxl
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from openpyxl.utils import coordinate_to_tuple
+from pandas.io.parsers import TextParser
+
+from config.config import get_config_value
+from config.settings import EXCEL_COLUMNS
+from core.column_mapper import ColumnMapper
+
+try:
+    # Internos de openpyxl: solo se usan con las versiones de _VERSIONES_PROBADAS
+    from openpyxl.worksheet._reader import INLINE_STRING, VALUE_TAG, WorkSheetParser
+except ImportError:
+    INLINE_STRING = VALUE_TAG = None
+    WorkSheetParser = object
+
+
+# Versiones de openpyxl (mayor.menor) con las que se probó _ParserProyectado
+_VERSIONES_PROBADAS = ('3.1',)
+_PARSER_PROYECTADO = (WorkSheetParser is not object
+                      and '.'.join(openpyxl.__version__.split('.')[:2]) in _VERSIONES_PROBADAS)
+
+
+class _ParserProyectado(WorkSheetParser):
+    """
+    WorkSheetParser de openpyxl que solo convierte las celdas de las columnas
+    indicadas. De las demás retorna el texto crudo, suficiente para saber si
+    la celda tiene contenido.
+    """
+
+    # Columnas (base 1) a convertir; None convierte todas
+    columnas = None
+
+    def parse_cell(self, element):
+        if self.columnas is None:
+            return super().parse_cell(element)
+
+        coordinate = element.get('r')
+        if coordinate:
+            row, column = coordinate_to_tuple(coordinate)
+            self.col_counter = column
+        else:
+            self.col_counter += 1
+            row, column = self.row_counter, self.col_counter
+
+        if column in self.columnas:
+            if not coordinate:
+                # parse_cell vuelve a avanzar el contador
+                self.col_counter -= 1
+            return super().parse_cell(element)
+
+        data_type = element.get('t', 'n')
+        if data_type == 'inlineStr':
+            child = element.find(INLINE_STRING)
+            value = ''.join(child.itertext()) if child is not None else None
+        else:
+            value = element.findtext(VALUE_TAG, None) or None
+            if value is not None and data_type == 's':
+                value = self.shared_strings[int(value)]
+        return {'row': row, 'column': column, 'value': value, 'data_type': data_type}
+
+
+def _filas(parser):
+    """
+    Recorre las filas igual que ReadOnlyWorksheet.iter_rows() sin dimensiones:
+    cada fila es {columna: celda} y las filas que faltan en el XML salen vacías.
+    """
+    siguiente = 1
+    for idx, celdas in parser.parse():
+        while siguiente < idx:
+            siguiente += 1
+            yield {}
+        if siguiente <= idx:
+            siguiente += 1
+            if not celdas:
+                yield {}
+                continue
+            ultima = celdas[-1]['column']
+            yield {c['column']: c for c in celdas if c['column'] <= ultima}
+
+
+def _filas_publicas(hoja):
+    """
+    Mismo recorrido que _filas con ReadOnlyWorksheet.iter_rows(), para cuando
+    no se puede usar _ParserProyectado. Todas las celdas salen convertidas.
+    """
+    if hasattr(hoja, 'reset_dimensions'):
+        hoja.reset_dimensions()
+    for fila in hoja.iter_rows():
+        yield {c.column: {'value': c.value, 'data_type': c.data_type} for c in fila if c.value is not None}
+
+
+def _abrir_filas(hoja):
+    """
+    Filas de la hoja como {columna: celda}.
+
+    Returns:
+        tuple: (filas, parser o None si se usa iter_rows(), archivo a cerrar o None)
+    """
+    if _PARSER_PROYECTADO:
+        try:
+            libro = hoja.parent
+            src = hoja._get_source()
+        except AttributeError:
+            pass
+        else:
+            try:
+                parser = _ParserProyectado(src, hoja._shared_strings, data_only=libro.data_only,
+                                           epoch=libro.epoch, date_formats=libro._date_formats)
+            except (AttributeError, TypeError):
+                src.close()
+            else:
+                return _filas(parser), parser, src
+    return _filas_publicas(hoja), None, None
+
+
+def _convertir_celda(celda) -> object:
+    """Convierte una celda igual que el lector openpyxl de pandas."""
+    if celda is None or celda['value'] is None:
+        return ''
+    if celda['data_type'] == TYPE_ERROR:
+        return math.nan
+    if celda['data_type'] == TYPE_NUMERIC:
+        entero = int(celda['value'])
+        if entero == celda['value']:
+            return entero
+        return float(celda['value'])
+    return celda['value']
+
+
+def _convertir_fila(fila: Dict[int, dict]) -> List:
+    """Convierte una fila completa y quita las celdas vacías del final."""
+    convertida = [''] * (max(fila) if fila else 0)
+    for columna, celda in fila.items():
+        convertida[columna - 1] = _convertir_celda(celda)
+    while convertida and convertida[-1] == '':
+        convertida.pop()
+    return convertida
+
+
+def _nombres_columnas(encabezado: List) -> List[str]:
+    """Nombres de columna que pandas asigna a la fila de encabezado."""
+    if not encabezado:
+        return []
+    return list(TextParser([encabezado], header=0, skip_blank_lines=False).read().columns)
+
+
+def columnas_proyectadas(nombres: Sequence, columnas: Optional[Iterable[str]],
+                         contiene: Sequence[str] = ()) -> List[int]:
+    """
+    Posiciones de las columnas a conservar.
+
+    Se conserva toda columna cuyo nombre coincide con alguna variante de las
+    columnas lógicas pedidas, la que ColumnMapper resolvió por aproximación
+    para alguna de ellas, o cuyo nombre contiene alguno de los textos de
+    contiene. Así ColumnMapper.resolve_all sobre el resultado elige la misma
+    columna que sobre la hoja completa.
+
+    Args:
+        nombres: Nombres de columna de la hoja
+        columnas: Claves de ColumnMapper.get_column_variants(); None conserva todas
+        contiene: Textos que, si aparecen en el nombre, conservan la columna
+
+    Returns:
+        list: Posiciones en el orden original
+    """
+    if columnas is None:
+        return list(range(len(nombres)))
+
+    buscadas = set(columnas)
+    aproximadas = {real for col, (real, _) in ColumnMapper.resolve_all(nombres).fuzzy().items() if col in buscadas}
+    contiene = [texto.upper() for texto in contiene]
+    return [
+        i for i, nombre in enumerate(nombres)
+        if not buscadas.isdisjoint(ColumnMapper.logical_columns(nombre))
+        or nombre in aproximadas
+        or any(texto in str(nombre).upper() for texto in contiene)
+    ]
+
+
+def fecha_en_rango(valor, fecha_inicio: datetime, fecha_fin: datetime) -> bool:
+    """
+    Indica si una fila debe conservarse al filtrar por rango de fechas.
+
+    Las fechas vacías y las fechas fuera del rango se descartan. Los textos y
+    otros valores se conservan porque cada procesador los interpreta con sus
+    propias reglas (p. ej. dayfirst) después de leer.
+    """
+    if valor is None or valor == '' or (isinstance(valor, float) and math.isnan(valor)) or valor is pd.NaT:
+        return False
+    if isinstance(valor, datetime):
+        return fecha_inicio <= valor <= fecha_fin
+    return True
+
+
+def _columna_fecha(nombres: Sequence) -> Optional[int]:
+    col = ColumnMapper.resolve_all(nombres)[EXCEL_COLUMNS['FECHA']]
+    return None if col is None else list(nombres).index(col)
+
+
+def missing_columns(nombres: Sequence, requeridas: Iterable[str]) -> List[str]:
+    """
+    Columnas lógicas requeridas que ColumnMapper no encuentra entre los nombres.
+
+    Args:
+        nombres: Nombres de columna de la hoja (encabezado)
+        requeridas: Claves de ColumnMapper.get_column_variants()
+
+    Returns:
+        list: Claves sin columna en la hoja, en el orden pedido
+    """
+    return ColumnMapper.resolve_all(nombres).missing(requeridas)
+
+
+def _leer_hoja(hoja, columnas, requeridas, contiene, fecha_inicio, fecha_fin) -> pd.DataFrame:
+    filas, parser, src = _abrir_filas(hoja)
+    try:
+        primera = next(filas, None)
+        if primera is None:
+            return pd.DataFrame()
+        encabezado = _convertir_fila(primera)
+
+        # El encabezado decide qué columnas se cargan (usecols) y si vale la pena
+        # recorrer el resto de la hoja
+        nombres = _nombres_columnas(encabezado)
+        posiciones = columnas_proyectadas(nombres, columnas, contiene)
+        nombres_proyectados = [nombres[i] for i in posiciones]
+        if missing_columns(nombres, requeridas):
+            return pd.DataFrame(columns=nombres_proyectados)
+        pos_fecha = _columna_fecha(nombres) if fecha_inicio is not None and fecha_fin is not None else None
+
+        if columnas is not None and parser is not None:
+            parser.columnas = {i + 1 for i in posiciones}
+            if pos_fecha is not None:
+                parser.columnas.add(pos_fecha + 1)
+
+        datos = []
+        ultima_con_datos = -1
+        ancho = len(encabezado)
+        for fila in filas:
+            if pos_fecha is not None:
+                celda_fecha = fila.get(pos_fecha + 1)
+                if not fecha_en_rango(celda_fecha and celda_fecha['value'], fecha_inicio, fecha_fin):
+                    continue
+            if columnas is None:
+                convertida = _convertir_fila(fila)
+                ancho = max(ancho, len(convertida))
+                tiene_datos = bool(convertida)
+            else:
+                convertida = [_convertir_celda(fila.get(i + 1)) for i in posiciones]
+                tiene_datos = (any(v != '' for v in convertida)
+                               or any(c['value'] is not None and c['value'] != '' for c in fila.values()))
+            datos.append(convertida)
+            if tiene_datos:
+                ultima_con_datos = len(datos) - 1
+    finally:
+        if src is not None:
+            src.close()
+
+    # Igual que pandas: se descartan las filas vacías del final
+    datos = datos[:ultima_con_datos + 1]
+
+    if columnas is None:
+        # Todas las columnas: mismo armado que pandas, con las filas rellenadas al ancho máximo
+        filas_completas = [encabezado] + datos
+        filas_completas = [f + [''] * (ancho - len(f)) for f in filas_completas]
+        return TextParser(filas_completas, header=0, skip_blank_lines=False).read()
+
+    if not datos:
+        return pd.DataFrame(columns=nombres_proyectados)
+    return TextParser(datos, header=None, names=nombres_proyectados, skip_blank_lines=False).read()
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def get_parse_executor(workers: int) -> ProcessPoolExecutor:
+    """Retorna el pool de procesos compartido, recreándolo si cambia el tamaño."""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=_contexto_procesos())
+            _executor_workers = workers
+        return _executor
+
+
+def _contexto_procesos():
+    """forkserver si la plataforma lo tiene (Linux, macOS); si no, spawn."""
+    metodo = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(metodo)
+
+
+def _reset_parse_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = None
+
+
+def _leer_hojas(source: str, nombres: List[str], opciones: tuple) -> List[tuple]:
+    """Lee algunas hojas del libro. Se ejecuta en un proceso del pool."""
+    libro = load_workbook(source, read_only=True, data_only=True, keep_links=False)
+    try:
+        return [(nombre, _leer_hoja(libro[nombre], *opciones)) for nombre in nombres]
+    finally:
+        libro.close()
+
+
+def _leer_en_paralelo(source, nombres: List[str], opciones: tuple, workers: int) -> Dict[str, pd.DataFrame]:
+    copia = None
+    if not isinstance(source, str):
+        # Los procesos no comparten el archivo abierto: se copia una vez a disco
+        # y reciben la ruta en lugar del contenido
+        source.seek(0)
+        with tempfile.NamedTemporaryFile(suffix='.xlsx', prefix='excel_', delete=False) as f:
+            shutil.copyfileobj(source, f)
+        copia = source = f.name
+    try:
+        # Cada proceso abre el libro una sola vez y lee hojas alternadas
+        grupos = [nombres[i::workers] for i in range(min(workers, len(nombres)))]
+        executor = get_parse_executor(workers)
+        futuros = [executor.submit(_leer_hojas, source, grupo, opciones) for grupo in grupos]
+        leidas = dict(par for futuro in futuros for par in futuro.result())
+        return OrderedDict((nombre, leidas[nombre]) for nombre in nombres)
+    finally:
+        if copia is not None:
+            os.remove(copia)
+
+
+def read_workbook(source: Union[str, IO[bytes]], columnas: Optional[Iterable[str]] = None,
+                  requeridas: Sequence[str] = (), contiene: Sequence[str] = (),
+                  fecha_inicio: Optional[datetime] = None, fecha_fin: Optional[datetime] = None,
+                  workers: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Lee las hojas de un .xlsx convirtiendo solo las columnas y filas necesarias.
+
+    Primero se lee el encabezado de cada hoja. Si le falta alguna columna
+    requerida, la hoja se retorna sin filas y el resto no se recorre.
+
+    Args:
+        source: Ruta o archivo abierto en modo binario
+        columnas: Claves de ColumnMapper.get_column_variants() a conservar; None conserva todas
+        requeridas: Claves sin las cuales la hoja no aporta filas
+        contiene: Textos que conservan columnas adicionales por nombre (p. ej. 'MATERIAL')
+        fecha_inicio: Inicio del rango de FECHA (inclusive)
+        fecha_fin: Fin del rango de FECHA (inclusive)
+        workers: Procesos para leer hojas en paralelo; None usa EXCEL_PARSE_WORKERS.
+            Con 0 o 1, o si el libro tiene una sola hoja, se lee en serie
+
+    Returns:
+        dict: {nombre_hoja: DataFrame} en el orden del libro
+    """
+    if workers is None:
+        workers = int(get_config_value('EXCEL_PARSE_WORKERS', 0) or 0)
+    opciones = (None if columnas is None else list(columnas), tuple(requeridas), tuple(contiene),
+                fecha_inicio, fecha_fin)
+
+    if not isinstance(source, str):
+        source.seek(0)
+    libro = load_workbook(source, read_only=True, data_only=True, keep_links=False)
+    try:
+        nombres = list(libro.sheetnames)
+        if workers < 2 or len(nombres) < 2:
+            return OrderedDict((nombre, _leer_hoja(libro[nombre], *opciones)) for nombre in nombres)
+    finally:
+        libro.close()
+
+    try:
+        return _leer_en_paralelo(source, nombres, opciones, workers)
+    except BrokenProcessPool:
+        # Un proceso del pool murió: se descarta el pool y se lee en serie
+        _reset_parse_executor()
+        return read_workbook(source, opciones[0], requeridas, contiene, fecha_inicio, fecha_fin, workers=0)
+
+
+def project_sheets(hojas: Dict[str, pd.DataFrame], columnas: Optional[Iterable[str]] = None,
+                   requeridas: Sequence[str] = (), contiene: Sequence[str] = (),
+                   fecha_inicio: Optional[datetime] = None,
+                   fecha_fin: Optional[datetime] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Aplica la misma proyección, columnas requeridas y filtro de fechas que
+    read_workbook a hojas que ya están en memoria (libros en caché o snapshots).
+    """
+    resultado = OrderedDict()
+    for nombre, df in hojas.items():
+        nombres = list(df.columns)
+        posiciones = columnas_proyectadas(nombres, columnas, contiene)
+        if missing_columns(nombres, requeridas):
+            df = pd.DataFrame(columns=[nombres[i] for i in posiciones])
+        else:
+            # Igual que read_workbook, FECHA se resuelve con el encabezado completo
+            # y filtra aunque no esté entre las columnas pedidas
+            pos_fecha = (_columna_fecha(nombres)
+                         if fecha_inicio is not None and fecha_fin is not None else None)
+            if pos_fecha is not None:
+                serie = df.iloc[:, pos_fecha]
+                mascara = [fecha_en_rango(v, fecha_inicio, fecha_fin) for v in serie.astype(object)]
+                df = df[mascara]
+            df = df.iloc[:, posiciones].reset_index(drop=True)
+        resultado[nombre] = df
+    return resultado
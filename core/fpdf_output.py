@@ -0,0 +1,95 @@
+"""
+Salida de los PDF de FPDF (relación de servicios y pendientes).
+
+FPDF 1.7 arma el documento en self.buffer, un str al que agrega cada línea
+con +=. Como buffer es un atributo, Python no puede extender el str en su
+lugar y copia el documento completo en cada línea: cerrar un PDF de varios
+MB toma segundos y deja tantas copias temporales como líneas. BufferPDF
+junta las líneas en bloques y StreamingFPDF.write_to envía cada bloque al
+archivo de la respuesta (ver new_pdf_spool) a medida que FPDF cierra el
+documento, sin tenerlo entero en memoria.
+"""
+from fpdf import FPDF
+
+
+# Caracteres que se juntan antes de codificarlos y escribirlos
+PDF_CHUNK_SIZE = 256 * 1024
+
+
+class BufferPDF:
+    """
+    Reemplazo de FPDF.buffer: admite lo que FPDF hace con el str (+=, len()
+    y encode()) guardando el documento en bloques de hasta chunk_size, o
+    escribiéndolos en un archivo después de redirect().
+    """
+
+    __slots__ = ('chunk_size', '_bloques', '_lineas', '_pendiente', '_largo', '_destino')
+
+    def __init__(self, chunk_size: int = PDF_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._bloques = []
+        self._lineas = []
+        self._pendiente = 0
+        self._largo = 0
+        self._destino = None
+
+    def __iadd__(self, texto: str):
+        self._lineas.append(texto)
+        self._pendiente += len(texto)
+        self._largo += len(texto)
+        if self._pendiente >= self.chunk_size:
+            self._cerrar_bloque()
+        return self
+
+    def __len__(self) -> int:
+        # FPDF lo usa como posición de cada objeto en la tabla xref
+        return self._largo
+
+    def __str__(self) -> str:
+        return ''.join(self._bloques) + ''.join(self._lineas)
+
+    def _cerrar_bloque(self):
+        bloque = ''.join(self._lineas)
+        self._lineas = []
+        self._pendiente = 0
+        if self._destino is not None:
+            self._destino.write(bloque.encode('latin-1'))
+        elif bloque:
+            self._bloques.append(bloque)
+
+    def encode(self, encoding: str = 'latin-1') -> bytes:
+        """El documento completo en bytes, como str.encode (output 'F' y 'S')."""
+        return str(self).encode(encoding)
+
+    def redirect(self, destino):
+        """
+        Escribe en destino (un archivo abierto en binario) lo acumulado y,
+        desde ahí, cada bloque que se complete; ya no se guarda en memoria.
+        """
+        self._destino = destino
+        for bloque in self._bloques:
+            destino.write(bloque.encode('latin-1'))
+        self._bloques = []
+
+    def flush(self):
+        """Escribe en el destino las líneas del último bloque incompleto."""
+        if self._destino is not None and self._lineas:
+            self._cerrar_bloque()
+
+
+class StreamingFPDF(FPDF):
+    """FPDF con BufferPDF como buffer, que puede escribir el PDF directo en un archivo abierto."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buffer = BufferPDF()
+
+    def write_to(self, destino):
+        """
+        Cierra el documento escribiéndolo en destino por bloques. Después el
+        documento ya no está en memoria: no se puede volver a pedir con output().
+        """
+        self.buffer.redirect(destino)
+        if self.state < 3:
+            self.close()
+        self.buffer.flush()
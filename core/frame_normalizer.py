@@ -0,0 +1,174 @@
+"""
+Normalización de tipos de las hojas de servicios al momento de leerlas.
+
+Las columnas llegan del Excel como object y cada servicio repetía la misma
+limpieza (strip, upper, unidecode, limpieza de montos, to_datetime). Aquí se
+hace una sola vez por hoja:
+
+- ESTADO DEL SERVICIO, FORMA DE PAGO y X50%/X25%: category con etiquetas en
+  mayúsculas y sin tildes; los vacíos ('', 'nan', 'None') quedan como NaN.
+- PARA JG, PARA ABRECAR, IVA, VALOR SERVICIO y DOMICILIO: float64, con 0 para
+  vacíos o valores inválidos.
+- FECHA y FECHA DE RELACION: datetime64; los textos se leen con el día primero.
+
+Las columnas se buscan con ColumnMapper, así que sirve para cualquier
+encabezado. Normalizar una hoja ya normalizada no cambia nada.
+"""
+from datetime import date
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from config.settings import EXCEL_COLUMNS
+from core.column_mapper import ColumnMapper
+from utils.text_utils import transliterar
+from utils.validation_utils import limpiar_valores_monetarios
+
+
+COLUMNAS_CATEGORICAS = (EXCEL_COLUMNS['ESTADO_SERVICIO'], EXCEL_COLUMNS['FORMA_PAGO'], 'X50_PORCIENTO')
+COLUMNAS_MONETARIAS = ('PARA_JG', 'PARA_ABRECAR', 'IVA', 'VALOR_SERVICIO', 'DOMICILIO')
+COLUMNAS_FECHA = (EXCEL_COLUMNS['FECHA'], EXCEL_COLUMNS['FECHA_RELACION'])
+
+# Etiquetas que equivalen a una celda vacía
+_ETIQUETAS_VACIAS = ('', 'NAN', 'NONE')
+
+
+def canonical_labels(serie: pd.Series) -> pd.Series:
+    """
+    Convierte una columna de texto en category con etiquetas canónicas
+    (sin espacios alrededor, en mayúsculas y sin tildes).
+
+    La limpieza se hace sobre los valores distintos y se expande con los
+    códigos de pd.factorize, sin recorrer la columna como texto.
+
+    Args:
+        serie: Columna con los valores tal como vienen del Excel
+
+    Returns:
+        pd.Series: category con el mismo índice; NaN para los vacíos
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie
+    codigos, unicos = pd.factorize(serie)
+    etiquetas = transliterar(pd.Series(unicos, dtype=object).astype(str).str.strip().str.upper())
+    etiquetas = etiquetas.mask(etiquetas.isin(_ETIQUETAS_VACIAS))
+    codigos_etiqueta, categorias = pd.factorize(etiquetas, sort=True)
+    # Un valor distinto puede dar la misma etiqueta ('efectivo' y 'EFECTIVO ');
+    # el código -1 (nulo) toma el último elemento y sigue siendo -1
+    codigos = np.append(codigos_etiqueta, -1)[codigos]
+    return pd.Series(pd.Categorical.from_codes(codigos, categories=categorias), index=serie.index)
+
+
+def to_dates(serie: pd.Series) -> pd.Series:
+    """
+    Convierte una columna de fechas a datetime64.
+
+    Las celdas de fecha se conservan; el resto (textos como '15/01/2025') se
+    interpreta con el día primero y lo que no es fecha queda como NaT.
+
+    Args:
+        serie: Columna con fechas, textos o vacíos
+
+    Returns:
+        pd.Series: datetime64 con el mismo índice
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    es_fecha = np.fromiter((isinstance(valor, date) for valor in serie), dtype=bool, count=len(serie))
+    fechas = pd.to_datetime(serie.where(es_fecha), errors='coerce')
+    otros = serie.notna().to_numpy() & ~es_fecha
+    if otros.any():
+        fechas[otros] = pd.to_datetime(serie[otros].astype(str), dayfirst=True, format='mixed', errors='coerce')
+    return fechas
+
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Retorna la hoja con las columnas de estado, pago, montos y fechas ya
+    convertidas. Las demás columnas quedan igual.
+
+    Args:
+        df: Hoja leída del Excel
+
+    Returns:
+        pd.DataFrame: Nueva hoja con los mismos nombres de columna
+    """
+    esquema = ColumnMapper.resolve_all(df.columns)
+    df = df.copy(deep=False)
+    for logica, convertir in ((COLUMNAS_CATEGORICAS, canonical_labels),
+                              (COLUMNAS_MONETARIAS, limpiar_valores_monetarios),
+                              (COLUMNAS_FECHA, to_dates)):
+        for col in {esquema[clave] for clave in logica} - {None}:
+            df[col] = convertir(df[col])
+    return df
+
+
+def normalize_sheets(hojas: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Aplica normalize_frame a cada hoja conservando el orden."""
+    return type(hojas)((nombre, normalize_frame(df)) for nombre, df in hojas.items())
+
+
+def has_values(df: pd.DataFrame) -> bool:
+    """Indica si la hoja tiene al menos una celda con valor; concat_frames omite las demás."""
+    return not df.empty and bool(df.notna().to_numpy().any())
+
+
+def _alinear_columnas_vacias(frames: List[pd.DataFrame]) -> List[pd.DataFrame]:
+    """
+    Da a cada columna sin valores de una hoja el dtype que esa columna tiene
+    en las hojas donde sí tiene valores (object si son category distintas).
+    """
+    con_valores = [frame.notna().any().to_numpy() for frame in frames]
+    tipos = {}
+    for frame, llenas in zip(frames, con_valores):
+        for i in np.flatnonzero(llenas):
+            tipos.setdefault(frame.columns[i], []).append(frame.dtypes.iloc[i])
+
+    alineadas = []
+    for frame, llenas in zip(frames, con_valores):
+        cambios = {}
+        for i in np.flatnonzero(~llenas):
+            candidatos = tipos.get(frame.columns[i], [])
+            if not candidatos:
+                continue
+            if all(tipo == candidatos[0] for tipo in candidatos):
+                destino = candidatos[0]
+            elif all(isinstance(tipo, pd.CategoricalDtype) for tipo in candidatos):
+                destino = np.dtype(object)
+            else:
+                continue
+            if frame.dtypes.iloc[i] != destino:
+                cambios[i] = destino
+        if cambios:
+            frame = frame.copy()
+            for i, destino in cambios.items():
+                frame.isetitem(i, frame.iloc[:, i].astype(destino))
+        alineadas.append(frame)
+    return alineadas
+
+
+def concat_frames(frames: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatena hojas normalizadas conservando el dtype category.
+
+    pd.concat pasa a object las columnas category cuyas categorías difieren
+    entre hojas; aquí se vuelven a convertir sin repetir la limpieza. Las
+    hojas sin filas o con todas sus celdas vacías se omiten (ver has_values).
+    """
+    frames = list(frames)
+    # pd.concat advierte (FutureWarning) con hojas vacías o sin ningún valor, y
+    # con columnas vacías de otro dtype, porque cambiará cómo las usa para
+    # elegir los dtypes. Las hojas no aportan filas útiles y se omiten; las
+    # columnas toman antes el dtype que pd.concat elige hoy
+    con_valores = [frame for frame in frames if has_values(frame)]
+    if not con_valores:
+        return pd.DataFrame(columns=list(dict.fromkeys(col for frame in frames for col in frame.columns)))
+    frames = _alinear_columnas_vacias(con_valores)
+    df = pd.concat(frames, ignore_index=True)
+    for col in df.columns:
+        dtypes = [frame[col].dtype for frame in frames if col in frame.columns]
+        if df[col].dtype == object and all(isinstance(d, pd.CategoricalDtype) for d in dtypes):
+            df[col] = df[col].astype('category')
+    return df
+
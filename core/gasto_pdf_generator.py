@@ -1,58 +1,24 @@
 import io
 import os 
-import tempfile
 import locale
 import traceback
-import base64
 from pathlib import Path
 from datetime import datetime
 import logging
-from reportlab.lib import colors
 from reportlab.lib.pagesizes import landscape, letter, A4
 from reportlab.lib.units import inch
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import ( SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak,)
+from reportlab.platypus import ( SimpleDocTemplate, Table, Paragraph, Spacer, Image, PageBreak,)
 from reportlab.pdfgen import canvas
-from PIL import Image as PILImage
 from PIL import ExifTags    
+from core.image_pipeline import FORMATO_AUTO, PerfilImagen, describe_savings, prepare_images
+from core.pdf_templates import FONTE_PRINCIPAL_BOLD, FONTE_PRINCIPAL_REGULAR, FONTS_DIR, get_template
     
-# === IMPORTS NECESARIOS PARA FUENTES ===
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont, TTFError 
-# =======================================
-
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
-# === CONFIGURACIÓN DE RUTAS Y REGISTRO DE FUENTES ===
-
-# 1. Definir la base: la carpeta donde se encuentra este script (gasto_pdf_generator.py)
+# Fuentes y estilos se construyen una vez por proceso en core.pdf_templates
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-FONTS_DIR = os.path.join(SCRIPT_DIR, 'fonts') 
-
-ROBOTO_REGULAR_PATH = os.path.join(FONTS_DIR, 'RobotoCondensed-Regular.ttf')
-ROBOTO_BOLD_PATH = os.path.join(FONTS_DIR, 'RobotoCondensed-Bold.ttf')
-
-FONTE_PRINCIPAL_BOLD = "Helvetica-Bold" 
-FONTE_PRINCIPAL_REGULAR = "Helvetica"
-
-try:
-    # 2. Intentar registrar las fuentes. 
-    pdfmetrics.registerFont(TTFont('Roboto-Cond', ROBOTO_REGULAR_PATH))
-    pdfmetrics.registerFont(TTFont('Roboto-Cond-Bold', ROBOTO_BOLD_PATH))
-    
-    # 3. Si tiene éxito, actualizamos las variables de la fuente
-    FONTE_PRINCIPAL_BOLD = "Roboto-Cond-Bold"
-    FONTE_PRINCIPAL_REGULAR = "Roboto-Cond"
-    logger.info("Fuentes Roboto Condensed registradas exitosamente.")
-
-except (TTFError, FileNotFoundError) as e:
-    # 4. Fallback: Si falla, la aplicación NO se rompe y usa fuentes por defecto
-    logger.error(f"FALLO CRÍTICO DE FUENTE: No se pudo abrir el archivo de fuente en '{ROBOTO_REGULAR_PATH}'. {e}")
-    logger.error("Asegúrese de que los archivos TTF estén en la carpeta 'core/fonts/'.")
-    pass
-# =========================================================================
 
 
 try:
@@ -61,107 +27,35 @@ except:
     locale.setlocale(locale.LC_ALL, "en_US.UTF-8")
 
 
+# Imágenes de los comprobantes: se dibujan de IMG_ANCHO × IMG_ALTO, así que se
+# reducen a esa medida (a PDF_IMAGE_DPI) y las fotos pasan a JPEG
+IMG_ANCHO = 0.95 * inch  # reducido para imágenes más angostas
+IMG_ALTO = 1.6 * inch
+PERFIL_IMAGENES = PerfilImagen(formato=FORMATO_AUTO, ancho=IMG_ANCHO / inch, alto=IMG_ALTO / inch)
+
+
 def guardar_imagen_base64_temp(base64_data):
     """Decodifica una cadena Base64, corrige su orientación EXIF y la guarda en un archivo temporal."""
-    if not isinstance(base64_data, str) or len(base64_data) < 100:
-        return None 
-
-    try:
-        if "data:" in base64_data and "," in base64_data:
-            header, encoded_data = base64_data.split(",", 1)
-        else:
-            encoded_data = base64_data
-            header = ""
-             
-        data = base64.b64decode(encoded_data)
-        
-        if 'image/jpeg' in header:
-            extension = '.jpg'
-        elif 'image/png' in header:
-            extension = '.png'
-        else:
-            extension = '.png' 
-        
-        # Abrir la imagen con PIL
-        image = PILImage.open(io.BytesIO(data))
-        
-        # Corregir orientación basada en EXIF usando el método moderno
-        try:
-            # ImageOps.exif_transpose() maneja automáticamente todas las orientaciones EXIF
-            # y devuelve None si no hay datos EXIF o si la orientación ya es correcta
-            from PIL import ImageOps
-            corrected_image = ImageOps.exif_transpose(image)
-            
-            if corrected_image is not None:
-                image = corrected_image
-                logger.info("Orientación EXIF corregida automáticamente")
-            else:
-                logger.info("No se requirió corrección de orientación EXIF")
-                
-        except Exception as exif_error:
-            # Si hay error leyendo EXIF, continuar con la imagen original
-            logger.warning(f"No se pudo leer/aplicar orientación EXIF: {exif_error}")
-        
-        # Guardar la imagen corregida en un archivo temporal
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=extension)
-        temp_file.close()
-        
-        # Guardar con el formato apropiado
-        if extension == '.jpg':
-            image.save(temp_file.name, 'JPEG', quality=95)
-        else:
-            image.save(temp_file.name, 'PNG')
-            
-        logger.info(f"Imagen decodificada y orientación corregida: {temp_file.name}") 
-        return temp_file.name
-    except Exception as e:
-        logger.error(f"Error decodificando Base64: {e}")
+    # Pasa por prepare_images para usar la caché de imágenes preparadas
+    resultado = prepare_images([base64_data], PERFIL_IMAGENES)[0]
+    if not resultado.ok:
+        logger.error(f"Error decodificando Base64: {resultado.error}")
         return None
+    logger.info(f"Imagen decodificada y orientación corregida: {resultado.ruta}")
+    return resultado.ruta
 
 
 class PDFGastoSideBySide:
     def __init__(self, filename):
         self.filename = filename
         self.elements = []
-        self.styles = getSampleStyleSheet()
-        
-        # --- ESTILOS USANDO LAS VARIABLES DE FUENTE ---
-        self.estilo_titulo = ParagraphStyle(
-            "Titulo",
-            parent=self.styles["Heading1"],
-            alignment=1,
-            textColor=colors.HexColor("#1565C0"),
-            fontName=FONTE_PRINCIPAL_BOLD, 
-            fontSize=16,
-            spaceAfter=12,
-        )
-        self.estilo_subtitulo = ParagraphStyle(
-            "Subtitulo",
-            parent=self.styles["Heading2"],
-            alignment=1,
-            textColor=colors.HexColor("#0D47A1"),
-            fontName=FONTE_PRINCIPAL_BOLD, 
-            fontSize=14,
-            spaceAfter=10,
-            spaceBefore=8,
-        )
-        self.estilo_normal = ParagraphStyle(
-            "Normal",
-            parent=self.styles["BodyText"],
-            fontName=FONTE_PRINCIPAL_REGULAR, 
-            fontSize=10,
-            leading=14,
-        )
-        self.estilo_titulo_seccion = ParagraphStyle(
-            "TituloSeccion",
-            parent=self.styles["Heading3"],
-            alignment=1,
-            textColor=colors.HexColor("#0D47A1"),
-            fontName=FONTE_PRINCIPAL_BOLD, 
-            fontSize=11,
-            spaceAfter=6,
-        )
-        # ------------------------------------------------
+        # Estilos compartidos de solo lectura (ver core.pdf_templates)
+        self.plantilla = get_template('gastos')
+        self.styles = self.plantilla.styles
+        self.estilo_titulo = self.plantilla.titulo
+        self.estilo_subtitulo = self.plantilla.subtitulo
+        self.estilo_normal = self.plantilla.normal
+        self.estilo_titulo_seccion = self.plantilla.titulo_seccion
 
     def formatear_moneda(self, valor):
         try:
@@ -202,29 +96,12 @@ class PDFGastoSideBySide:
             Paragraph("<b>TOTAL CONSIGNADO</b>", self.estilo_normal),
             Paragraph(
                 f"<b>{self.formatear_moneda(total_consignaciones)}</b>",
-                ParagraphStyle("ValorTotal", parent=self.estilo_normal,
-                    textColor=colors.HexColor("#1565C0"), alignment=2, fontName=FONTE_PRINCIPAL_REGULAR), 
+                self.plantilla.total_consignado,
             ),
         ])
 
         tabla = Table(data, colWidths=[0.95*inch, 2*inch, 2.7*inch, 1.2*inch])
-        tabla.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#E3F2FD")),
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.HexColor("#0D47A1")),
-            ("FONTNAME", (0, 0), (-1, 0), FONTE_PRINCIPAL_BOLD), 
-            ("FONTNAME", (0, 1), (-1, -2), FONTE_PRINCIPAL_REGULAR), 
-            ("ALIGN", (-1, 1), (-1, -1), "RIGHT"),
-            ("ALIGN", (1, 1), (1, -1), "CENTER"),
-            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-            ("LINEABOVE", (0, -1), (-1, -1), 1.5, colors.HexColor("#1976D2")),
-            ("LINEBELOW", (0, -1), (-1, -1), 1.5, colors.HexColor("#1976D2")),
-            ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
-            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-            ("FONTSIZE", (0, 0), (-1, -1), 9),
-            ("ROWHEIGHT", (0, 0), (-1, -1), 20),
-            ("LEFTPADDING", (0,0), (-1,-1), 6),
-            ("RIGHTPADDING", (0,0), (-1,-1), 6),
-        ]))
+        tabla.setStyle(self.plantilla.tabla_consignaciones)
 
         self.elements.append(tabla)
         self.elements.append(Spacer(1, 8))
@@ -253,29 +130,12 @@ class PDFGastoSideBySide:
             Paragraph("<b>TOTAL GASTOS</b>", self.estilo_normal),
             Paragraph(
                 f"<b>{self.formatear_moneda(total_gastos)}</b>",
-                ParagraphStyle("ValorTotal", parent=self.estilo_normal,
-                    textColor=colors.HexColor("#C62828"), alignment=2, fontName=FONTE_PRINCIPAL_REGULAR), 
+                self.plantilla.total_gastos,
             ),
         ])
 
         tabla = Table(data, colWidths=[0.95*inch, 1*inch, 2.7*inch, 1.7*inch, 1.1*inch])
-        tabla.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#E3F2FD")),
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.HexColor("#0D47A1")),
-            ("FONTNAME", (0, 0), (-1, 0), FONTE_PRINCIPAL_BOLD), 
-            ("FONTNAME", (0, 1), (-1, -2), FONTE_PRINCIPAL_REGULAR), 
-            ("ALIGN", (3, 1), (3, -1), "CENTER"),
-            ("ALIGN", (0, 0), (1, -1), "LEFT"),
-            ("ALIGN", (-1, 0), (-1, -1), "RIGHT"),
-            ("LINEABOVE", (0, -1), (-1, -1), 1.5, colors.HexColor("#C62828")),
-            ("LINEBELOW", (0, -1), (-1, -1), 1.5, colors.HexColor("#C62828")),
-            ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
-            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-            ("FONTSIZE", (0, 0), (-1, -1), 9),
-            ("ROWHEIGHT", (0, 0), (-1, -1), 20),
-            ("LEFTPADDING", (0,0), (-1,-1), 6),
-            ("RIGHTPADDING", (0,0), (-1,-1), 6),
-        ]))
+        tabla.setStyle(self.plantilla.tabla_gastos)
 
         self.elements.append(tabla)
         self.elements.append(Spacer(1, 8))
@@ -322,35 +182,15 @@ class PDFGastoSideBySide:
             for nombre, datos in saldos_otros.items():
                 balance = datos['balance']
                 label = f"{nombre} (Excedente a favor)" if balance < 0 else f"{nombre} (Saldo a devolver)"
-                color = "#C62828" if balance < 0 else "#1565C0"
+                estilo = self.plantilla.saldo_a_favor if balance < 0 else self.plantilla.saldo_a_devolver
                 
                 data.append([
                     label,
-                    Paragraph(
-                        f"<b>{self.formatear_moneda(abs(balance))}</b>",
-                        ParagraphStyle("Saldo", parent=self.estilo_normal,
-                            textColor=colors.HexColor(color), alignment=2, fontName=FONTE_PRINCIPAL_REGULAR), 
-                    )
+                    Paragraph(f"<b>{self.formatear_moneda(abs(balance))}</b>", estilo)
                 ])
 
         tabla = Table(data, colWidths=[5.5*inch, 2.5*inch])
-        tabla.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#E3F2FD")),
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.HexColor("#0D47A1")),
-            ("FONTNAME", (0, 0), (-1, 0), FONTE_PRINCIPAL_BOLD), 
-            ("FONTNAME", (0, 1), (0, -1), FONTE_PRINCIPAL_REGULAR), 
-            ("ALIGN", (0, 0), (0, -1), "LEFT"),
-            ("ALIGN", (1, 0), (1, -1), "RIGHT"),
-            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-            ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
-            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#E8F5E9")),
-            ("FONTSIZE", (0, 0), (-1, -1), 9),
-            ("ROWHEIGHT", (0, 0), (-1, -1), 22),
-            ("LEFTPADDING", (0,0), (-1,-1), 8),
-            ("RIGHTPADDING", (0,0), (-1,-1), 8),
-            ("TOPPADDING", (0,0), (-1,-1), 6),
-            ("BOTTOMPADDING", (0,0), (-1,-1), 6),
-        ]))
+        tabla.setStyle(self.plantilla.tabla_balance)
 
         self.elements.append(tabla)
         self.elements.append(Spacer(1, 8))
@@ -375,8 +215,8 @@ class PDFGastoSideBySide:
         self.elements.append(Paragraph("ARCHIVOS ADJUNTOS", self.estilo_subtitulo))
         self.elements.append(Spacer(1, 8))
         
-        img_width = 0.95 * inch  # reducido para imágenes más angostas
-        img_height = 1.6 * inch
+        img_width = IMG_ANCHO
+        img_height = IMG_ALTO
         
         # ========== ROW 1: IZQUIERDA Y DERECHA ==========
         
@@ -433,14 +273,9 @@ class PDFGastoSideBySide:
                     if len(fila_actual) == 3:
                         # construir nested table para 3 imágenes SIN Spacer
                         nested = Table([fila_actual], colWidths=[image_col_w, image_col_w, image_col_w], hAlign='CENTER')
-                        nested.setStyle(TableStyle([
-                            ("ALIGN", (0,0), (-1,-1), "CENTER"), 
-                            ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
-                            ("LEFTPADDING", (0,0), (-1,-1), 3),
-                            ("RIGHTPADDING", (0,0), (-1,-1), 3),
-                        ]))
+                        nested.setStyle(self.plantilla.fila_imagenes)
                         wrapper = Table([[nested]], colWidths=[max_row_width], hAlign='CENTER')
-                        wrapper.setStyle(TableStyle([("ALIGN", (0,0), (-1,-1), "CENTER")]))
+                        wrapper.setStyle(self.plantilla.centrado)
                         filas_gastos_nested.append([wrapper])
                         fila_actual = []
 
@@ -451,25 +286,13 @@ class PDFGastoSideBySide:
                     else:  # k == 2
                         nested = Table([fila_actual], colWidths=[image_col_w, image_col_w], hAlign='CENTER')
 
-                    nested.setStyle(TableStyle([
-                        ("ALIGN", (0,0), (-1,-1), "CENTER"), 
-                        ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
-                        ("LEFTPADDING", (0,0), (-1,-1), 3),
-                        ("RIGHTPADDING", (0,0), (-1,-1), 3),
-                    ]))
+                    nested.setStyle(self.plantilla.fila_imagenes)
                     wrapper = Table([[nested]], colWidths=[max_row_width], hAlign='CENTER')
-                    wrapper.setStyle(TableStyle([("ALIGN", (0,0), (-1,-1), "CENTER")]))
+                    wrapper.setStyle(self.plantilla.centrado)
                     filas_gastos_nested.append([wrapper])
 
             tabla_gastos = Table(filas_gastos_nested, colWidths=[max_row_width], hAlign='CENTER')
-            tabla_gastos.setStyle(TableStyle([
-                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-                ("LEFTPADDING", (0,0), (-1,-1), 6),
-                ("RIGHTPADDING", (0,0), (-1,-1), 6),
-                ("TOPPADDING", (0,0), (-1,-1), 6),
-                ("BOTTOMPADDING", (0,0), (-1,-1), 6),
-            ]))
+            tabla_gastos.setStyle(self.plantilla.columna_imagenes)
 
             # Tabla derecha (Consignaciones) - mismo enfoque anidado que Gastos
             filas_consig_nested = []
@@ -482,9 +305,9 @@ class PDFGastoSideBySide:
                     fila_actual.append(img)
                     if len(fila_actual) == 3:
                         nested = Table([fila_actual], colWidths=[image_col_w, image_col_w, image_col_w], hAlign='CENTER')
-                        nested.setStyle(TableStyle([("ALIGN", (0,0), (-1,-1), "CENTER"), ("VALIGN", (0,0), (-1,-1), "MIDDLE"), ("LEFTPADDING", (0,0), (-1,-1), 3), ("RIGHTPADDING", (0,0), (-1,-1), 3)]))
+                        nested.setStyle(self.plantilla.fila_imagenes)
                         wrapper = Table([[nested]], colWidths=[max_row_width], hAlign='CENTER')
-                        wrapper.setStyle(TableStyle([("ALIGN", (0,0), (-1,-1), "CENTER")]))
+                        wrapper.setStyle(self.plantilla.centrado)
                         filas_consig_nested.append([wrapper])
                         fila_actual = []
 
@@ -495,20 +318,13 @@ class PDFGastoSideBySide:
                     else:  # k == 2
                         nested = Table([fila_actual], colWidths=[image_col_w, image_col_w], hAlign='CENTER')
 
-                    nested.setStyle(TableStyle([("ALIGN", (0,0), (-1,-1), "CENTER"), ("VALIGN", (0,0), (-1,-1), "MIDDLE"), ("LEFTPADDING", (0,0), (-1,-1), 3), ("RIGHTPADDING", (0,0), (-1,-1), 3)]))
+                    nested.setStyle(self.plantilla.fila_imagenes)
                     wrapper = Table([[nested]], colWidths=[max_row_width], hAlign='CENTER')
-                    wrapper.setStyle(TableStyle([("ALIGN", (0,0), (-1,-1), "CENTER")]))
+                    wrapper.setStyle(self.plantilla.centrado)
                     filas_consig_nested.append([wrapper])
 
             tabla_consig = Table(filas_consig_nested, colWidths=[max_row_width], hAlign='CENTER')
-            tabla_consig.setStyle(TableStyle([
-                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-                ("LEFTPADDING", (0,0), (-1,-1), 6),
-                ("RIGHTPADDING", (0,0), (-1,-1), 6),
-                ("TOPPADDING", (0,0), (-1,-1), 6),
-                ("BOTTOMPADDING", (0,0), (-1,-1), 6),
-            ]))
+            tabla_consig.setStyle(self.plantilla.columna_imagenes)
             
             # Crear una tabla que combine las dos secciones lado a lado
             combined_data = [[titulo_gastos, titulo_consignaciones],
@@ -517,10 +333,7 @@ class PDFGastoSideBySide:
             tabla_combinada = Table(combined_data,
                                   colWidths=[4*inch, 4*inch],
                                   hAlign='CENTER')
-            tabla_combinada.setStyle(TableStyle([
-                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                ("VALIGN", (0, 0), (-1, -1), "TOP"),
-            ]))
+            tabla_combinada.setStyle(self.plantilla.combinada)
             
             self.elements.append(tabla_combinada)
             
@@ -557,9 +370,9 @@ class PDFGastoSideBySide:
                     fila_actual.append(img)
                     if len(fila_actual) == 3:
                         nested = Table([fila_actual], colWidths=[image_col_w, image_col_w, image_col_w], hAlign='CENTER')
-                        nested.setStyle(TableStyle([("ALIGN", (0,0), (-1,-1), "CENTER"), ("VALIGN", (0,0), (-1,-1), "MIDDLE"), ("LEFTPADDING", (0,0), (-1,-1), 3), ("RIGHTPADDING", (0,0), (-1,-1), 3)]))
+                        nested.setStyle(self.plantilla.fila_imagenes)
                         wrapper = Table([[nested]], colWidths=[max_row_width], hAlign='CENTER')
-                        wrapper.setStyle(TableStyle([("ALIGN", (0,0), (-1,-1), "CENTER")]))
+                        wrapper.setStyle(self.plantilla.centrado)
                         filas_dev_nested.append([wrapper])
                         fila_actual = []
 
@@ -570,18 +383,13 @@ class PDFGastoSideBySide:
                     else:  # k == 2
                         nested = Table([fila_actual], colWidths=[image_col_w, image_col_w], hAlign='CENTER')
 
-                    nested.setStyle(TableStyle([("ALIGN", (0,0), (-1,-1), "CENTER"), ("VALIGN", (0,0), (-1,-1), "MIDDLE"), ("LEFTPADDING", (0,0), (-1,-1), 3), ("RIGHTPADDING", (0,0), (-1,-1), 3)]))
+                    nested.setStyle(self.plantilla.fila_imagenes)
                     wrapper = Table([[nested]], colWidths=[max_row_width], hAlign='CENTER')
-                    wrapper.setStyle(TableStyle([("ALIGN", (0,0), (-1,-1), "CENTER")]))
+                    wrapper.setStyle(self.plantilla.centrado)
                     filas_dev_nested.append([wrapper])
 
             tabla_devoluciones = Table(filas_dev_nested, colWidths=[max_row_width], hAlign='CENTER')
-            tabla_devoluciones.setStyle(TableStyle([
-                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-                ("LEFTPADDING", (0,0), (-1,-1), 4),
-                ("RIGHTPADDING", (0,0), (-1,-1), 4),
-            ]))
+            tabla_devoluciones.setStyle(self.plantilla.columna_devoluciones)
             self.elements.append(tabla_devoluciones)
 
     def generar_pdf(self, data):
@@ -618,18 +426,7 @@ class PDFGastoSideBySide:
             
             # Crear una tabla para las notas con borde
             notas_table = Table([[notas_paragraph]], colWidths=[7*inch])
-            notas_table.setStyle(TableStyle([
-                ("BACKGROUND", (0, 0), (-1, -1), colors.HexColor("#FFF9E6")),
-                ("TEXTCOLOR", (0, 0), (-1, -1), colors.HexColor("#424242")),
-                ("FONTNAME", (0, 0), (-1, -1), FONTE_PRINCIPAL_REGULAR),
-                ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-                ("VALIGN", (0, 0), (-1, -1), "TOP"),
-                ("GRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#90CAF9")),
-                ("LEFTPADDING", (0, 0), (-1, -1), 10),
-                ("RIGHTPADDING", (0, 0), (-1, -1), 10),
-                ("TOPPADDING", (0, 0), (-1, -1), 10),
-                ("BOTTOMPADDING", (0, 0), (-1, -1), 10),
-            ]))
+            notas_table.setStyle(self.plantilla.tabla_notas)
             
             self.elements.append(notas_table)
             self.elements.append(Spacer(1, 15))
@@ -642,19 +439,17 @@ class PDFGastoSideBySide:
     # MÉTODO _borrar_imagenes_temp ELIMINADO DE LA CLASE
     
 
-def generar_pdf_gasto(gasto_data_formateado, calculos, imagenes, nombre_pdf, notas=""):
+def generar_pdf_gasto(gasto_data_formateado, calculos, imagenes, nombre_pdf, notas="", perfil_imagenes=None,
+                      destino=None):
     """
     Función principal llamada desde routes_excel.py
-    Retorna (exito, pdf_bytes)
+    perfil_imagenes reemplaza a PERFIL_IMAGENES, p. ej. PERFIL_IMAGENES.con(dpi=300)
+    Con destino (un archivo abierto en binario, p. ej. new_pdf_spool()) el PDF
+    se escribe ahí y se retorna (exito, destino); sin destino retorna (exito, pdf_bytes)
     """
     rutas_temp_generadas = [] 
 
     try:
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-        tmp_path = tmp.name
-        tmp.close()
-        rutas_temp_generadas.append(tmp_path) 
-
         # --- Obtener Gastos y Consignaciones ---
         if isinstance(gasto_data_formateado, list):
             gastos = gasto_data_formateado
@@ -664,39 +459,31 @@ def generar_pdf_gasto(gasto_data_formateado, calculos, imagenes, nombre_pdf, not
             consignaciones = gasto_data_formateado.get("consignaciones", [])
         
         logger.info(f"Iniciando generar_pdf_gasto con: gastos={len(gastos)}, consignaciones={len(consignaciones)}")
-        logger.info(f"Imágenes recibidas: {imagenes}")
+        # Solo la cantidad: el texto de los base64 puede pesar varios MB
+        if isinstance(imagenes, dict):
+            logger.info(f"Imágenes recibidas: { {seccion: len(lista or []) for seccion, lista in imagenes.items()} }")
         logger.info(f"Notas recibidas: {notas}")
 
-        # --- Funciones de Manejo de Imágenes ---
-        def decodificar_y_guardar(lista_base64):
-            rutas = []
-            for b64_str in lista_base64:
-                ruta = guardar_imagen_base64_temp(b64_str)
-                if ruta:
-                    rutas.append(ruta)
-            return rutas
-
         imagenes_dict = {}
         if isinstance(imagenes, dict):
             imagenes_dict = imagenes
         
-        # Decodificar y guardar GASTOS
-        imagenes_gastos_b64 = imagenes_dict.get("imagenesGastos", [])
-        logger.info(f"Recibidas {len(imagenes_gastos_b64)} imágenes para Gastos")
-        imagenes_gastos = decodificar_y_guardar(imagenes_gastos_b64)
-        rutas_temp_generadas.extend(imagenes_gastos) # <--- AÑADIDO A LA LISTA DE BORRADO FINAL
-        
-        # Decodificar y guardar CONSIGNACIONES
-        imagenes_consignaciones_b64 = imagenes_dict.get("imagenesConsignaciones", [])
-        logger.info(f"Recibidas {len(imagenes_consignaciones_b64)} imágenes para Consignaciones")
-        imagenes_consignaciones = decodificar_y_guardar(imagenes_consignaciones_b64)
-        rutas_temp_generadas.extend(imagenes_consignaciones) # <--- AÑADIDO A LA LISTA DE BORRADO FINAL
-        
-        # Decodificar y guardar DEVOLUCIONES
-        imagenes_devoluciones_b64 = imagenes_dict.get("imagenesDevoluciones", [])
-        logger.info(f"Recibidas {len(imagenes_devoluciones_b64)} imágenes para Devoluciones")
-        imagenes_devoluciones = decodificar_y_guardar(imagenes_devoluciones_b64)
-        rutas_temp_generadas.extend(imagenes_devoluciones) # <--- AÑADIDO A LA LISTA DE BORRADO FINAL
+        # Decodificar y guardar GASTOS, CONSIGNACIONES y DEVOLUCIONES en un solo lote paralelo
+        secciones = ("imagenesGastos", "imagenesConsignaciones", "imagenesDevoluciones")
+        listas_b64 = [imagenes_dict.get(seccion, []) or [] for seccion in secciones]
+        for seccion, lista in zip(secciones, listas_b64):
+            logger.info(f"Recibidas {len(lista)} imágenes para {seccion}")
+        preparadas = prepare_images([b64 for lista in listas_b64 for b64 in lista], perfil_imagenes or PERFIL_IMAGENES)
+        logger.info(describe_savings(preparadas))
+        rutas_temp_generadas.extend(p.ruta for p in preparadas if p.ok) # <--- AÑADIDO A LA LISTA DE BORRADO FINAL
+
+        # Solo las imágenes que se pudieron preparar, cada una en su sección
+        rutas_por_seccion = []
+        inicio = 0
+        for lista in listas_b64:
+            rutas_por_seccion.append([p.ruta for p in preparadas[inicio:inicio + len(lista)] if p.ok])
+            inicio += len(lista)
+        imagenes_gastos, imagenes_consignaciones, imagenes_devoluciones = rutas_por_seccion
 
         data = {
             "gastos": gastos,
@@ -708,16 +495,13 @@ def generar_pdf_gasto(gasto_data_formateado, calculos, imagenes, nombre_pdf, not
             "calculos": calculos, # Pasar cálculos detallados
         }
 
-        # Generar PDF
-        pdf = PDFGastoSideBySide(tmp_path)
+        # Generar PDF directamente en el destino, sin pasar por un archivo temporal
+        salida = destino if destino is not None else io.BytesIO()
+        pdf = PDFGastoSideBySide(salida)
         pdf.generar_pdf(data)
 
-        # Leer PDF en memoria
-        with open(tmp_path, "rb") as f:
-            pdf_bytes = f.read()
-
         logger.info(f"PDF generado exitosamente: {len(imagenes_gastos) + len(imagenes_consignaciones) + len(imagenes_devoluciones)} imágenes")
-        return True, pdf_bytes
+        return True, destino if destino is not None else salida.getvalue()
 
     except Exception as e:
         error_trace = traceback.format_exc()
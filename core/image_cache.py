@@ -0,0 +1,166 @@
+"""
+Caché en disco de imágenes ya preparadas para los PDF.
+
+Al corregir una descripción el usuario vuelve a generar el mismo PDF de
+gastos varias veces, y cada vez llegan los mismos comprobantes en base64.
+Las imágenes preparadas se guardan en UPLOAD_FOLDER/imagenes/ con el
+nombre <clave><extensión>, donde la clave es un hash del base64 más el
+perfil con que se preparó (tamaño dibujado, DPI, formato), así un acierto
+evita decodificar, girar, reducir y volver a codificar la imagen.
+
+El tamaño total está limitado por IMAGE_CACHE_MAX_BYTES con expulsión LRU
+según la fecha de modificación de cada archivo, que se actualiza en cada
+acierto. Como el directorio es compartido, varios workers de gunicorn usan
+la misma caché.
+"""
+import os
+import re
+import shutil
+import tempfile
+import threading
+from typing import Optional
+
+from config.config import get_config_value
+
+
+IMAGES_SUBDIR = 'imagenes'
+
+# Extensiones que puede tener una imagen preparada
+_EXTENSIONES = ('.jpg', '.png')
+
+# Una clave es un hash hexadecimal
+_CLAVE_RE = re.compile(r'^[0-9a-f]{16,128}$')
+
+
+def get_image_cache_root() -> str:
+    """Directorio donde se guardan las imágenes preparadas."""
+    return os.path.join(get_config_value('UPLOAD_FOLDER'), IMAGES_SUBDIR)
+
+
+class ImageCache:
+    """
+    Caché LRU en disco de {clave: archivo de imagen} limitada por bytes.
+    Es segura para usar desde varios hilos y procesos: las escrituras son
+    atómicas y un archivo que otro proceso eliminó cuenta como fallo.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _buscar(self, clave: str) -> Optional[str]:
+        for extension in _EXTENSIONES:
+            ruta = os.path.join(self.root, clave + extension)
+            if os.path.isfile(ruta):
+                return ruta
+        return None
+
+    def get(self, clave: str) -> Optional[str]:
+        """
+        Copia la imagen guardada con esa clave a un temporal.
+
+        Returns:
+            str: Ruta del temporal, que quien llama debe eliminar, o None si
+            la clave no está en la caché
+        """
+        ruta = self._buscar(clave) if _CLAVE_RE.match(clave) else None
+        copia = None
+        if ruta is not None:
+            descriptor, copia = tempfile.mkstemp(suffix=os.path.splitext(ruta)[1])
+            os.close(descriptor)
+            try:
+                shutil.copyfile(ruta, copia)
+                # Marca la entrada como usada recientemente
+                os.utime(ruta)
+            except OSError:
+                # Otro proceso la expulsó entre la búsqueda y la copia
+                os.remove(copia)
+                copia = None
+        with self._lock:
+            if copia is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return copia
+
+    def put(self, clave: str, ruta: str) -> bool:
+        """
+        Guarda una copia de la imagen preparada. Retorna False si la imagen
+        por sí sola supera el presupuesto y no se guardó.
+        """
+        if not _CLAVE_RE.match(clave):
+            raise ValueError(f"Clave de imagen inválida: {clave}")
+        if os.path.getsize(ruta) > self.max_bytes:
+            return False
+        os.makedirs(self.root, exist_ok=True)
+        destino = os.path.join(self.root, clave + os.path.splitext(ruta)[1])
+        descriptor, temporal = tempfile.mkstemp(prefix='.img_', dir=self.root)
+        os.close(descriptor)
+        try:
+            shutil.copyfile(ruta, temporal)
+            os.replace(temporal, destino)
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+        self._recortar()
+        return True
+
+    def _recortar(self):
+        """Elimina las imágenes usadas hace más tiempo hasta volver al presupuesto."""
+        entradas = []
+        with os.scandir(self.root) as it:
+            for entrada in it:
+                if entrada.name.startswith('.') or not entrada.is_file():
+                    continue
+                try:
+                    estado = entrada.stat()
+                except OSError:
+                    continue
+                entradas.append((estado.st_mtime, estado.st_size, entrada.path))
+
+        total = sum(tamano for _, tamano, _ in entradas)
+        for _, tamano, ruta in sorted(entradas):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(ruta)
+            except OSError:
+                # Otro proceso pudo eliminarla primero
+                pass
+            total -= tamano
+
+    @property
+    def current_bytes(self) -> int:
+        if not os.path.isdir(self.root):
+            return 0
+        with os.scandir(self.root) as it:
+            return sum(e.stat().st_size for e in it if not e.name.startswith('.') and e.is_file())
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+_cache: Optional[ImageCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_image_cache() -> Optional[ImageCache]:
+    """
+    Retorna la caché compartida del proceso, recreándola si cambia el
+    directorio o el presupuesto. None si IMAGE_CACHE_MAX_BYTES es 0.
+    """
+    global _cache
+    max_bytes = int(get_config_value('IMAGE_CACHE_MAX_BYTES', 0))
+    if max_bytes <= 0:
+        return None
+    root = get_image_cache_root()
+    with _cache_lock:
+        if _cache is None or _cache.root != root or _cache.max_bytes != max_bytes:
+            _cache = ImageCache(root, max_bytes)
+        return _cache
@@ -0,0 +1,402 @@
+"""
+Preparación de las imágenes adjuntas a los PDF.
+
+Los comprobantes llegan en base64, casi siempre fotos de celular de 3 a 8 MB,
+o como el id de un adjunto subido antes a POST /api/attachments (ver
+core.attachments); las dos formas se pueden mezclar en la misma lista.
+Cada imagen se decodifica, se endereza según su orientación EXIF, se
+convierte al modo que necesita el generador y se guarda en un archivo
+temporal listo para insertar en el PDF.
+
+Cada generador declara en un PerfilImagen el tamaño al que dibuja las
+imágenes. Como una foto de 4000×3000 se imprime en unos pocos centímetros,
+se reduce a la resolución de impresión (PDF_IMAGE_DPI, 200 por defecto, al
+tamaño dibujado) y las fotos sin transparencia se guardan como JPEG; los
+JPEG se decodifican directamente a escala reducida (draft).
+
+Las imágenes ya preparadas se guardan en la caché de core.image_cache con
+una clave que combina el hash del base64 y el perfil, así al regenerar el
+mismo PDF los comprobantes repetidos no se vuelven a procesar.
+
+Pillow libera el GIL mientras decodifica, rota y codifica, así que las
+imágenes de un reporte se preparan en un pool de hilos (IMAGE_WORKERS)
+en lugar de una tras otra en el hilo de la petición. El resultado conserva
+el orden de entrada y el error de cada imagen queda en su propio resultado
+sin interrumpir las demás.
+"""
+import base64
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+from PIL import Image as PILImage
+from PIL import ImageOps
+
+from config.config import get_config_value
+from core.attachments import attachment_header, get_attachment_path, is_valid_attachment_id
+from core.image_cache import get_image_cache
+
+
+logger = logging.getLogger(__name__)
+
+# Formatos de salida
+FORMATO_ORIGEN = 'origen'  # JPEG si la cabecera data: dice image/jpeg, PNG en otro caso
+FORMATO_PNG = 'PNG'
+FORMATO_AUTO = 'auto'  # JPEG salvo que la imagen tenga transparencia, que queda en PNG
+
+# Orientaciones EXIF que giran la imagen 90° (intercambian ancho y alto)
+_ORIENTACIONES_GIRADAS = (5, 6, 7, 8)
+_EXIF_ORIENTACION = 0x0112
+
+# Los textos más cortos no pueden ser una imagen
+_MIN_LARGO_BASE64 = 100
+
+# Cambiar si cambia la forma de preparar las imágenes, para no usar las de la caché
+_VERSION_PREPARACION = 1
+
+
+class PerfilImagen:
+    """
+    Cómo prepara las imágenes un generador de PDF.
+
+    Attributes:
+        formato: FORMATO_ORIGEN, FORMATO_PNG o FORMATO_AUTO
+        fondo_blanco: Pasar a RGB pegando la transparencia sobre blanco
+            (FPDF no admite PNG con canal alfa)
+        orientar: Aplicar la orientación EXIF
+        ancho, alto: Tamaño en pulgadas al que se dibuja la imagen; sin
+            ellos no se reduce la resolución
+        dpi: Resolución de impresión; None usa PDF_IMAGE_DPI
+        calidad_jpeg: Calidad al guardar en JPEG; None usa PDF_IMAGE_JPEG_QUALITY
+    """
+
+    __slots__ = ('formato', 'fondo_blanco', 'orientar', 'ancho', 'alto', 'dpi', 'calidad_jpeg')
+
+    def __init__(self, formato: str = FORMATO_ORIGEN, fondo_blanco: bool = False, orientar: bool = True,
+                 ancho: Optional[float] = None, alto: Optional[float] = None, dpi: Optional[int] = None,
+                 calidad_jpeg: Optional[int] = None):
+        self.formato = formato
+        self.fondo_blanco = fondo_blanco
+        self.orientar = orientar
+        self.ancho = ancho
+        self.alto = alto
+        self.dpi = dpi
+        self.calidad_jpeg = calidad_jpeg
+
+    def con(self, **cambios) -> 'PerfilImagen':
+        """Copia del perfil con algunos valores cambiados, p. ej. perfil.con(dpi=300)."""
+        valores = {nombre: getattr(self, nombre) for nombre in self.__slots__}
+        valores.update(cambios)
+        return PerfilImagen(**valores)
+
+    def pixeles(self) -> Optional[tuple]:
+        """Ancho y alto mínimos en píxeles para imprimir a la resolución del perfil."""
+        if not self.ancho or not self.alto:
+            return None
+        dpi = self.dpi or int(get_config_value('PDF_IMAGE_DPI', 200))
+        return max(1, round(self.ancho * dpi)), max(1, round(self.alto * dpi))
+
+    def clave(self) -> str:
+        """Valores que determinan el resultado, para la clave de la caché."""
+        calidad = self.calidad_jpeg or int(get_config_value('PDF_IMAGE_JPEG_QUALITY', 85))
+        return (f'{_VERSION_PREPARACION}|{self.formato}|{int(self.fondo_blanco)}|{int(self.orientar)}|'
+                f'{self.pixeles()}|{calidad}')
+
+
+class ImagenPreparada:
+    """
+    Resultado de preparar una imagen: la ruta del temporal o el error, los
+    bytes de la imagen recibida y de la guardada, y si salió de la caché.
+    """
+
+    __slots__ = ('indice', 'ruta', 'error', 'bytes_origen', 'bytes_final', 'desde_cache')
+
+    def __init__(self, indice: int, ruta: Optional[str] = None, error: Optional[str] = None,
+                 bytes_origen: int = 0, bytes_final: int = 0, desde_cache: bool = False):
+        self.indice = indice
+        self.ruta = ruta
+        self.error = error
+        self.bytes_origen = bytes_origen
+        self.bytes_final = bytes_final
+        self.desde_cache = desde_cache
+
+    @property
+    def ok(self) -> bool:
+        return self.ruta is not None
+
+    def __repr__(self):
+        return f'ImagenPreparada({self.indice}, ruta={self.ruta!r}, error={self.error!r})'
+
+
+def decodificar_base64(imagen_b64: str):
+    """
+    Separa la cabecera data: y decodifica el contenido.
+
+    Returns:
+        tuple: (bytes, cabecera); la cabecera es '' si no venía
+
+    Raises:
+        ValueError: Si el valor no es un texto base64 de imagen
+    """
+    if not isinstance(imagen_b64, str) or len(imagen_b64) < _MIN_LARGO_BASE64:
+        raise ValueError('El valor no es una imagen en base64')
+    if imagen_b64.startswith('data:') and ',' in imagen_b64:
+        cabecera, datos = imagen_b64.split(',', 1)
+    else:
+        cabecera, datos = '', imagen_b64
+    return base64.b64decode(datos), cabecera
+
+
+def leer_imagen(imagen: str):
+    """
+    Contenido de una imagen recibida en base64 o como id de adjunto.
+
+    Returns:
+        tuple: (bytes, cabecera) como decodificar_base64
+
+    Raises:
+        ValueError: Si no es una imagen en base64 o el adjunto no existe
+    """
+    if is_valid_attachment_id(imagen):
+        ruta = get_attachment_path(imagen)
+        if ruta is None:
+            raise ValueError(f'El adjunto {imagen} no existe o expiró')
+        with open(ruta, 'rb') as f:
+            return f.read(), attachment_header(ruta)
+    return decodificar_base64(imagen)
+
+
+def image_cache_key(imagen: str, perfil: PerfilImagen) -> Optional[str]:
+    """
+    Clave de la imagen en la caché: hash del base64 (incluida la cabecera
+    data:, que decide el formato con FORMATO_ORIGEN) o del id del adjunto,
+    que ya es el hash de su contenido, y del perfil.
+
+    Returns:
+        str: Hash hexadecimal, o None si el valor no puede ser una imagen
+    """
+    if is_valid_attachment_id(imagen):
+        contenido = 'adjunto:' + imagen
+    elif isinstance(imagen, str) and len(imagen) >= _MIN_LARGO_BASE64:
+        contenido = imagen
+    else:
+        return None
+    hasher = hashlib.blake2b(perfil.clave().encode('utf-8'), digest_size=20)
+    hasher.update(contenido.encode('ascii', 'replace'))
+    return hasher.hexdigest()
+
+
+def _largo_decodificado(imagen: str) -> int:
+    """Bytes que ocupa la imagen recibida, sin decodificarla."""
+    if is_valid_attachment_id(imagen):
+        ruta = get_attachment_path(imagen)
+        return os.path.getsize(ruta) if ruta else 0
+    datos = imagen.split(',', 1)[1] if imagen.startswith('data:') and ',' in imagen else imagen
+    datos = datos.strip()
+    return len(datos) * 3 // 4 - datos[-2:].count('=')
+
+
+def preparar_imagen(imagen_b64: str, perfil: PerfilImagen) -> ImagenPreparada:
+    """
+    Decodifica, orienta, reduce y convierte una imagen y la guarda en un
+    temporal.
+
+    Args:
+        imagen_b64: Imagen en base64, con o sin cabecera data:, o id de adjunto
+        perfil: Cómo preparar la imagen
+
+    Returns:
+        ImagenPreparada: Con la ruta del temporal; quien llama debe eliminarlo
+
+    Raises:
+        ValueError, OSError: Si la imagen no se puede decodificar o guardar
+    """
+    datos, cabecera = leer_imagen(imagen_b64)
+    imagen = PILImage.open(io.BytesIO(datos))
+
+    pixeles = perfil.pixeles()
+    if pixeles is not None:
+        girada = perfil.orientar and imagen.getexif().get(_EXIF_ORIENTACION) in _ORIENTACIONES_GIRADAS
+        # Para JPEG decodifica directamente a 1/2, 1/4 u 1/8 sin bajar de lo necesario
+        imagen.draft(imagen.mode, pixeles[::-1] if girada else pixeles)
+
+    if perfil.orientar:
+        try:
+            # exif_transpose retorna una copia girada, o la misma imagen si no hay EXIF
+            imagen = ImageOps.exif_transpose(imagen)
+        except Exception as e:
+            logger.warning(f"No se pudo aplicar orientación EXIF: {e}")
+
+    if pixeles is not None:
+        imagen = _reducir(imagen, pixeles)
+
+    if perfil.fondo_blanco:
+        imagen = _a_rgb(imagen)
+
+    formato, extension, opciones = _formato_salida(imagen, perfil, cabecera)
+    if formato == 'JPEG' and imagen.mode not in ('RGB', 'L'):
+        imagen = _a_rgb(imagen)
+
+    descriptor, ruta = tempfile.mkstemp(suffix=extension)
+    try:
+        with os.fdopen(descriptor, 'wb') as f:
+            imagen.save(f, formato, **opciones)
+    except Exception:
+        os.remove(ruta)
+        raise
+    return ImagenPreparada(0, ruta=ruta, bytes_origen=len(datos), bytes_final=os.path.getsize(ruta))
+
+
+def _reducir(imagen, pixeles):
+    """
+    Reduce la imagen conservando la proporción hasta que un lado llegue a
+    lo necesario para imprimirla; nunca la agranda.
+    """
+    ancho, alto = imagen.size
+    escala = max(pixeles[0] / ancho, pixeles[1] / alto)
+    if escala >= 1:
+        return imagen
+    return imagen.resize((max(1, round(ancho * escala)), max(1, round(alto * escala))), PILImage.LANCZOS)
+
+
+def _formato_salida(imagen, perfil: PerfilImagen, cabecera: str):
+    """Formato de Pillow, extensión y opciones de guardado según el perfil."""
+    if perfil.formato == FORMATO_AUTO:
+        transparente = imagen.mode in ('RGBA', 'LA', 'PA') or 'transparency' in imagen.info
+        es_jpeg = not transparente
+    elif perfil.formato == FORMATO_ORIGEN:
+        es_jpeg = 'image/jpeg' in cabecera
+    else:
+        es_jpeg = False
+
+    if not es_jpeg:
+        return 'PNG', '.png', {'optimize': True} if perfil.pixeles() is not None else {}
+    if perfil.formato == FORMATO_ORIGEN and perfil.pixeles() is None:
+        return 'JPEG', '.jpg', {'quality': 95}
+    calidad = perfil.calidad_jpeg or int(get_config_value('PDF_IMAGE_JPEG_QUALITY', 85))
+    return 'JPEG', '.jpg', {'quality': calidad, 'optimize': True}
+
+
+def _a_rgb(imagen):
+    """Convierte a RGB; la transparencia queda sobre fondo blanco."""
+    if imagen.mode == 'P':
+        imagen = imagen.convert('RGBA')
+    if imagen.mode in ('RGBA', 'LA'):
+        fondo = PILImage.new('RGB', imagen.size, (255, 255, 255))
+        fondo.paste(imagen, mask=imagen.split()[-1])
+        return fondo
+    if imagen.mode != 'RGB':
+        return imagen.convert('RGB')
+    return imagen
+
+
+def prepare_images(imagenes: Sequence[str], perfil: PerfilImagen,
+                   workers: Optional[int] = None) -> List[ImagenPreparada]:
+    """
+    Prepara varias imágenes en paralelo.
+
+    Args:
+        imagenes: Imágenes en base64 o ids de adjuntos
+        perfil: Cómo preparar las imágenes
+        workers: Hilos a usar; por defecto IMAGE_WORKERS (0 o 1 = en serie)
+
+    Returns:
+        list: Un ImagenPreparada por imagen, en el mismo orden
+    """
+    imagenes = list(imagenes or [])
+    if workers is None:
+        workers = int(get_config_value('IMAGE_WORKERS', 0))
+    cache = get_image_cache()
+
+    if workers <= 1 or len(imagenes) <= 1:
+        return [_preparar(indice, imagen, perfil, cache) for indice, imagen in enumerate(imagenes)]
+    executor = get_image_executor(workers)
+    app = _app_actual()
+    futuros = [executor.submit(_preparar, indice, imagen, perfil, cache, app) for indice, imagen in enumerate(imagenes)]
+    return [futuro.result() for futuro in futuros]
+
+
+def _app_actual():
+    """App de Flask activa, para que los hilos del pool lean su configuración (UPLOAD_FOLDER)."""
+    from flask import current_app
+    try:
+        return current_app._get_current_object()
+    except RuntimeError:
+        return None
+
+
+def _preparar(indice: int, imagen_b64: str, perfil: PerfilImagen, cache=None, app=None) -> ImagenPreparada:
+    if app is not None:
+        with app.app_context():
+            return _preparar(indice, imagen_b64, perfil, cache)
+    try:
+        clave = image_cache_key(imagen_b64, perfil) if cache is not None else None
+        if clave is not None:
+            ruta = cache.get(clave)
+            if ruta is not None:
+                return ImagenPreparada(indice, ruta=ruta, bytes_origen=_largo_decodificado(imagen_b64),
+                                       bytes_final=os.path.getsize(ruta), desde_cache=True)
+
+        resultado = preparar_imagen(imagen_b64, perfil)
+        resultado.indice = indice
+        if clave is not None:
+            try:
+                cache.put(clave, resultado.ruta)
+            except OSError as e:
+                logger.warning(f"No se pudo guardar la imagen {indice + 1} en la caché: {e}")
+        return resultado
+    except Exception as e:
+        logger.error(f"Error preparando imagen {indice + 1}: {e}")
+        return ImagenPreparada(indice, error=str(e))
+
+
+def bytes_ahorrados(resultados: Sequence[ImagenPreparada]) -> tuple:
+    """
+    Bytes de las imágenes recibidas y de las preparadas.
+
+    Returns:
+        tuple: (bytes_origen, bytes_final) de las imágenes que se prepararon
+    """
+    preparadas = [r for r in resultados if r.ok]
+    return sum(r.bytes_origen for r in preparadas), sum(r.bytes_final for r in preparadas)
+
+
+def describe_savings(resultados: Sequence[ImagenPreparada]) -> str:
+    """Texto para el log con los bytes ahorrados al preparar las imágenes."""
+    origen, final = bytes_ahorrados(resultados)
+    porcentaje = (1 - final / origen) * 100 if origen else 0.0
+    en_cache = sum(1 for r in resultados if r.ok and r.desde_cache)
+    return (f"Imágenes preparadas: {origen / 1024:.0f} KB recibidos → {final / 1024:.0f} KB en el PDF "
+            f"({porcentaje:.0f}% menos, {en_cache} desde caché)")
+
+
+def remove_prepared(resultados: Sequence[ImagenPreparada]):
+    """Elimina los temporales de las imágenes preparadas."""
+    for resultado in resultados:
+        if resultado.ok:
+            try:
+                os.remove(resultado.ruta)
+            except OSError as e:
+                logger.warning(f"No se pudo eliminar {resultado.ruta}: {e}")
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def get_image_executor(workers: int) -> ThreadPoolExecutor:
+    """Retorna el pool de hilos compartido, recreándolo si cambia el tamaño."""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='imagenes')
+            _executor_workers = workers
+        return _executor
@@ -0,0 +1,258 @@
+"""
+Cola de trabajos en segundo plano para generar PDFs.
+
+Los endpoints de PDF con async=1 encolan la generación y responden de
+inmediato con un job_id, así el worker de gunicorn no queda bloqueado
+mientras se arma un PDF con muchas imágenes. Los trabajos corren en un pool
+de hilos del proceso (PDF_JOB_WORKERS) dentro del contexto de la app.
+
+El estado y el resultado de cada trabajo se guardan en
+UPLOAD_FOLDER/jobs/<job_id>.json y <job_id>.pdf, de modo que cualquier worker
+puede responder GET /api/jobs/<job_id> aunque el trabajo corra en otro. Los
+archivos se eliminan pasado JOB_RESULT_TTL_SECONDS desde su última
+actualización, salvo los trabajos pendientes o en proceso en cualquier worker,
+que se conservan hasta JOB_STALE_SECONDS (ver cleanup_expired_jobs).
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from config.config import get_config_value
+
+
+JOBS_SUBDIR = 'jobs'
+
+# Estados de un trabajo
+ESTADO_PENDIENTE = 'pendiente'
+ESTADO_PROCESANDO = 'procesando'
+ESTADO_COMPLETADO = 'completado'
+ESTADO_ERROR = 'error'
+
+# Un job_id es un uuid4 en hexadecimal
+_JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class JobError(Exception):
+    """
+    Error esperado de un trabajo (p. ej. sin datos en el rango). El
+    diccionario se entrega tal cual en el estado del trabajo, como lo haría
+    el endpoint síncrono, junto con el código HTTP.
+    """
+
+    def __init__(self, resultado: dict, status: int = 400):
+        super().__init__(resultado.get('error', 'Error en el trabajo'))
+        self.resultado = resultado
+        self.status = status
+
+
+def is_valid_job_id(job_id) -> bool:
+    """Valida que el id tenga el formato de un job_id."""
+    return isinstance(job_id, str) and bool(_JOB_ID_RE.match(job_id))
+
+
+def get_jobs_root() -> str:
+    """Directorio donde se guardan el estado y el resultado de los trabajos."""
+    return os.path.join(get_config_value('UPLOAD_FOLDER'), JOBS_SUBDIR)
+
+
+class JobQueue:
+    """
+    Pool de hilos con el estado de los trabajos en disco.
+
+    Cada tarea recibe los argumentos de submit y retorna
+    (contenido, nombre_descarga), donde contenido son los bytes del PDF, un
+    archivo abierto en binario (p. ej. new_pdf_spool(), que se copia por
+    bloques y se cierra) o la ruta a un archivo ya escrito (que pasa a ser
+    el resultado del trabajo).
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pdf_job')
+        # Trabajos de este proceso que aún no terminan
+        self._activos = set()
+        self._lock = threading.Lock()
+
+    def submit(self, tarea: Callable, *args, al_terminar: Optional[Callable] = None, **kwargs) -> str:
+        """
+        Encola una tarea y retorna su job_id.
+
+        Args:
+            tarea: Función que genera el PDF
+            al_terminar: Se llama al final pase lo que pase, p. ej. para
+                cerrar el archivo subido que usa la tarea
+        """
+        from flask import current_app
+        try:
+            app = current_app._get_current_object()
+        except RuntimeError:
+            app = None
+
+        cleanup_expired_jobs()
+        job_id = uuid.uuid4().hex
+        os.makedirs(get_jobs_root(), exist_ok=True)
+        _escribir_estado(job_id, {'job_id': job_id, 'status': ESTADO_PENDIENTE, 'creado': time.time()})
+        with self._lock:
+            self._activos.add(job_id)
+        self._executor.submit(self._ejecutar, app, job_id, tarea, args, kwargs, al_terminar)
+        return job_id
+
+    def _ejecutar(self, app, job_id, tarea, args, kwargs, al_terminar):
+        """Corre la tarea en un hilo del pool y guarda su resultado."""
+        try:
+            if app is not None:
+                with app.app_context():
+                    self._correr(job_id, tarea, args, kwargs)
+            else:
+                self._correr(job_id, tarea, args, kwargs)
+        finally:
+            with self._lock:
+                self._activos.discard(job_id)
+            if al_terminar is not None:
+                al_terminar()
+
+    @staticmethod
+    def _correr(job_id, tarea, args, kwargs):
+        # Dentro del contexto de la app, para leer el estado en su UPLOAD_FOLDER
+        estado = get_job(job_id) or {'job_id': job_id, 'creado': time.time()}
+        _escribir_estado(job_id, {**estado, 'status': ESTADO_PROCESANDO})
+        try:
+            contenido, nombre = tarea(*args, **kwargs)
+            destino = get_result_path(job_id)
+            if isinstance(contenido, (bytes, bytearray)):
+                _escribir_atomico(destino, bytes(contenido))
+            elif hasattr(contenido, 'read'):
+                with contenido:
+                    contenido.seek(0)
+                    _escribir_atomico(destino, contenido)
+            else:
+                shutil.move(contenido, destino)
+            _escribir_estado(job_id, {**estado, 'status': ESTADO_COMPLETADO, 'filename': nombre,
+                                      'terminado': time.time()})
+        except JobError as e:
+            _escribir_estado(job_id, {**estado, 'status': ESTADO_ERROR, 'error': str(e),
+                                      'resultado': e.resultado, 'http_status': e.status, 'terminado': time.time()})
+        except Exception as e:
+            print(f"ERROR en trabajo {job_id}: {traceback.format_exc()}")
+            _escribir_estado(job_id, {**estado, 'status': ESTADO_ERROR, 'error': str(e), 'http_status': 500,
+                                      'terminado': time.time()})
+
+    def is_active(self, job_id: str) -> bool:
+        with self._lock:
+            return job_id in self._activos
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Retorna la cola compartida del proceso, creándola la primera vez."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue(max(1, int(get_config_value('PDF_JOB_WORKERS'))))
+    return _queue
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    """
+    Estado de un trabajo.
+
+    Returns:
+        dict: Estado guardado o None si el id no es válido, no existe o expiró
+    """
+    if not is_valid_job_id(job_id):
+        return None
+    try:
+        with open(_ruta_estado(job_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def get_result_path(job_id: str) -> str:
+    """Ruta del PDF de un trabajo (exista o no)."""
+    return os.path.join(get_jobs_root(), f'{job_id}.pdf')
+
+
+def cleanup_expired_jobs(ttl_seconds: Optional[int] = None):
+    """
+    Elimina el estado y el resultado de los trabajos no actualizados en
+    ttl_seconds (por defecto JOB_RESULT_TTL_SECONDS).
+
+    Los trabajos cuyo estado guardado es pendiente o en proceso se conservan,
+    los esté corriendo este u otro worker, salvo que su estado lleve más de
+    JOB_STALE_SECONDS sin actualizarse (el worker que lo corría murió).
+    """
+    if ttl_seconds is None:
+        ttl_seconds = int(get_config_value('JOB_RESULT_TTL_SECONDS'))
+    root = get_jobs_root()
+    if not os.path.isdir(root):
+        return
+    ahora = time.time()
+    limite = ahora - ttl_seconds
+    limite_en_curso = ahora - int(get_config_value('JOB_STALE_SECONDS'))
+    en_curso = {}
+    for nombre in os.listdir(root):
+        job_id = nombre.split('.', 1)[0]
+        if job_id not in en_curso:
+            en_curso[job_id] = _en_curso(job_id, limite_en_curso)
+        if en_curso[job_id]:
+            continue
+        ruta = os.path.join(root, nombre)
+        try:
+            if os.path.isfile(ruta) and os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+        except OSError:
+            # Otro worker pudo eliminarlo primero
+            pass
+
+
+def _en_curso(job_id: str, limite: float) -> bool:
+    """Si el estado guardado del trabajo es pendiente o en proceso y se actualizó después de limite."""
+    estado = get_job(job_id)
+    if estado is None or estado.get('status') not in (ESTADO_PENDIENTE, ESTADO_PROCESANDO):
+        return False
+    try:
+        return os.path.getmtime(_ruta_estado(job_id)) >= limite
+    except OSError:
+        return False
+
+
+def _ruta_estado(job_id: str) -> str:
+    return os.path.join(get_jobs_root(), f'{job_id}.json')
+
+
+def _escribir_estado(job_id: str, estado: dict):
+    _escribir_atomico(_ruta_estado(job_id), json.dumps(estado, ensure_ascii=False).encode('utf-8'))
+
+
+def _escribir_atomico(destino: str, contenido):
+    """
+    Escribe en un temporal y lo renombra, así un lector nunca ve el archivo a medias.
+    contenido son bytes o un archivo abierto en binario, que se copia por bloques.
+    """
+    descriptor, temporal = tempfile.mkstemp(prefix='.job_', dir=os.path.dirname(destino))
+    try:
+        with os.fdopen(descriptor, 'wb') as f:
+            if isinstance(contenido, (bytes, bytearray)):
+                f.write(contenido)
+            else:
+                shutil.copyfileobj(contenido, f)
+        os.replace(temporal, destino)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
@@ -1,13 +1,22 @@
-import os
 import datetime
-from fpdf import FPDF
-import pandas as pd
+from core.fpdf_output import StreamingFPDF
 from utils.date_utils import  fecha_larga
-import base64
-import io
+from core.image_pipeline import FORMATO_AUTO, PerfilImagen, describe_savings, prepare_images, remove_prepared
+from core.service_table import COLUMNAS, TablaServicios
+
+# Soportes de pago: se dibujan de IMG_ANCHO_MM × IMG_ALTO_MM, así que se reducen
+# a esa medida (a PDF_IMAGE_DPI) y se guardan en RGB, como JPEG o PNG sin
+# transparencia, porque FPDF no admite PNG con canal alfa
+IMG_ANCHO_MM = 80
+IMG_ALTO_MM = 105
+PERFIL_IMAGENES = PerfilImagen(formato=FORMATO_AUTO, fondo_blanco=True,
+                               ancho=IMG_ANCHO_MM / 25.4, alto=IMG_ALTO_MM / 25.4)
+
+# Tono ligeramente más oscuro que el encabezado de la tabla
+COLOR_TOTALES_BG = (180, 200, 210)
 
 # === CLASE PARA PDF (ORIGINAL RESTAURADO) ===
-class PDF(FPDF):
+class PDF(StreamingFPDF):
     def header(self):
         # Configurar la fuente y colores del encabezado
         self.set_font("Helvetica", 'B', 16)
@@ -32,297 +41,27 @@ class PDF(FPDF):
         self.set_font("Helvetica", '', 8)
         self.set_text_color(0, 0, 0)
 
-    def tabla_servicios(self, df, notas=None, fecha_inicio_analisis=None, fecha_fin_analisis=None, imagenes=None):
-        # Ajuste de anchos de columna
-        ancho_fecha = 22
-        ancho_direccion = 50
-        ancho_servicio = 45
-        ancho_materiales = 30
-        ancho_valor_materiales = 25
-        ancho_valor = 25
-        ancho_subtotal = 25
-        ancho_iva = 20
-        ancho_total = 28
-
-        # Altura base por línea (para multi_cell)
-        altura_linea = 6
-
-        # Colores para la tabla
-        color_encabezado_bg = (200, 220, 230) # Gris azulado suave
-        color_fila_impar_bg = (230, 230, 230) # Gris muy claro
-        color_fila_par_bg = (255, 255, 255) # Blanco
-        color_borde = (100, 100, 100) # Gris oscuro
-        color_texto = (0, 0, 0) # Negro
-        color_totales_bg = (180, 200, 210) # Tono ligeramente más oscuro que el encabezado
-
-        # Configurar estilos
-        self.set_fill_color(*color_fila_par_bg)
-        self.set_text_color(*color_texto)
-        self.set_draw_color(*color_borde)
-        self.set_line_width(0.2)
-
-        # Encabezado de la tabla
-        self.set_font("Helvetica", 'B', 9)
-        self.set_fill_color(*color_encabezado_bg)
-
-        # Dibujar encabezados
-        y_header_inicial = self.get_y()
-
-        # Usamos cell para encabezados de una línea y multi_cell para los que necesitan salto
-        self.cell(ancho_fecha, altura_linea * 2, "Fecha", 1, 0, 'C', True)
-        self.cell(ancho_direccion, altura_linea * 2, "Dirección", 1, 0, 'C', True)
-        self.cell(ancho_servicio, altura_linea * 2, "Servicio", 1, 0, 'C', True)
-        self.cell(ancho_materiales, altura_linea * 2, "Materiales", 1, 0, 'C', True)
-        self.cell(ancho_valor_materiales, altura_linea * 2, "Valor Mat.", 1, 0, 'C', True)
-        self.cell(ancho_valor, altura_linea * 2, "Valor Servicio", 1, 0, 'C', True)
-
-        # Encabezado Subtotal ABRECAR con salto de línea forzado
-        x_subtotal_header = self.get_x()
-        self.multi_cell(ancho_subtotal, altura_linea, "Subtotal\nABRECAR", 1, 'C', True)
-        # Volver a la posición Y inicial del encabezado para la siguiente celda
-        self.set_xy(x_subtotal_header + ancho_subtotal, y_header_inicial)
-
-        # Celdas de encabezado restantes
-        self.cell(ancho_iva, altura_linea * 2, "IVA", 1, 0, 'C', True)
-        self.cell(ancho_total, altura_linea * 2, "Total\nABRECAR", 1, 1, 'C', True) # ln=1 para ir a la siguiente línea después del encabezado
-
-        self.set_font("Helvetica", '', 8)
-        fill = False
-        subtotal_sum = 0
-        total_sum = 0
-
-        # Filas de datos
-        for index, row in df.iterrows():
-            # Alternar color de fondo
-            bg_color = color_fila_impar_bg if fill else color_fila_par_bg
-            self.set_fill_color(*bg_color)
-
-            # Preparar datos
-            fecha_str = row['FECHA'].strftime("%d/%m/%Y") if pd.notnull(row['FECHA']) else "-"
-            direccion = str(row['DIRECCION_PARA_INFORME']).replace('\n', ' ').replace('\r', ' ').strip()
-            servicio = str(row['SERVICIO_PARA_INFORME']).replace('\n', ' ').replace('\r', ' ').strip()
-            materiales = str(row['MATERIALES']).replace('\n', ' ').replace('\r', ' ').strip()
-            if materiales.lower() == 'nan' or materiales == '':
-                materiales = "-"
-
-            # Procesar valores monetarios
-            valor_materiales = row['VALOR MATERIALES'] if 'VALOR MATERIALES' in row and pd.notnull(row['VALOR MATERIALES']) else 0
-            try:
-                valor_materiales = float(str(valor_materiales).replace('$', '').replace(',', '').strip())
-            except:
-                valor_materiales = 0
-            valor_materiales_str = f"$ {valor_materiales:,.0f}".replace(',', '.') if valor_materiales > 0 else "-"
-
-            valor_servicio_original = row['VALOR_ORIGINAL'] if 'VALOR_ORIGINAL' in row else 0
-            try:
-                valor_servicio_original = float(str(valor_servicio_original).replace('$', '').replace(',', '').strip())
-            except:
-                valor_servicio_original = 0
-
-            valor_servicio_neto = max(0, valor_servicio_original - valor_materiales)
-            valor_original_str = f"$ {valor_servicio_neto:,.0f}".replace(',', '.') if valor_servicio_neto > 0 else "-"
-
-            subtotal = valor_servicio_neto * 0.5
-            subtotal_sum += subtotal
-            subtotal_str = f"$ {subtotal:,.0f}".replace(',', '.')
-
-            # Procesar valor de IVA de forma robusta
-            iva = 0.0
-            if 'IVA' in df.columns and pd.notnull(row['IVA']): # Se quita .any() aquí
-                try:
-                    iva = float(str(row['IVA']).replace('$', '').replace(',', '').strip())
-                except ValueError:
-                    iva = 0.0
-            iva_str = f"$ {iva:,.0f}".replace(',', '.') if iva > 0 else "-"
-
-            total = subtotal + iva
-            total_sum += total
-            total_str = f"$ {total:,.0f}".replace(',', '.')
-
-            # --- Cálculo de altura de fila basado en contenido ---
-            self.set_font("Helvetica", '', 8) # Asegurar la fuente y tamaño correctos para el cálculo
-
-            # Altura base mínima por línea
-            altura_base_linea = altura_linea
-
-            # Pre-calcular la altura necesaria para cada celda que podría ser multi-línea
-            offset_ancho_calculo = 1 # Un pequeño offset para el cálculo en el cálculo de lineas
-
-            # Calcular las líneas para cada columna multi-línea
-            lineas_direccion = self.multi_cell(ancho_direccion - offset_ancho_calculo, altura_base_linea, direccion, border=0, align='C', split_only=True)
-            lineas_servicio = self.multi_cell(ancho_servicio - offset_ancho_calculo, altura_base_linea, servicio, border=0, align='C', split_only=True)
-            lineas_materiales = self.multi_cell(ancho_materiales - offset_ancho_calculo, altura_base_linea, materiales, border=0, align='C', split_only=True)
-
-            # Calcular la altura máxima requerida por el contenido multi-línea
-            altura_multicell_max = max(len(lineas_direccion), len(lineas_servicio), len(lineas_materiales)) * altura_base_linea
-
-            # La altura final de la fila es la máxima entre la altura base y la altura calculada por multi_cell
-            altura_fila = max(altura_base_linea, altura_multicell_max)
-
-            # Asegurar que la altura mínima sea al menos altura_base_linea si hay contenido en la fila
-            if altura_fila < altura_base_linea and any(texto.strip() for texto in [direccion, servicio, materiales, fecha_str, valor_materiales_str, valor_original_str, subtotal_str, iva_str, total_str]):
-                 altura_fila = altura_base_linea
-            # Si no hay contenido relevante que fuerce multi_cell, asegurar altura base
-            elif altura_fila == altura_base_linea and not any(texto.strip() for texto in [direccion, servicio, materiales]):
-                 altura_fila = altura_base_linea
-
-
-            # --- Salto de página si es necesario (usando la altura_fila calculada) ---
-            if self.get_y() + altura_fila > self.h - 15: # 15 es un margen inferior, ajustado para pie de página
-                self.add_page()
-                # Redibujar encabezado en nueva página
-                self.set_font("Helvetica", 'B', 9)
-                self.set_fill_color(*color_encabezado_bg)
-                y_header_inicial = self.get_y() # Actualizar la posición Y del encabezado en la nueva página
-
-                # Dibujar encabezados (misma lógica que al inicio)
-                self.cell(ancho_fecha, altura_linea * 2, "Fecha", 1, 0, 'C', True)
-                self.cell(ancho_direccion, altura_linea * 2, "Dirección", 1, 0, 'C', True)
-                self.cell(ancho_servicio, altura_linea * 2, "Servicio", 1, 0, 'C', True)
-                self.cell(ancho_materiales, altura_linea * 2, "Materiales", 1, 0, 'C', True)
-                self.cell(ancho_valor_materiales, altura_linea * 2, "Valor Mat.", 1, 0, 'C', True)
-                self.cell(ancho_valor, altura_linea * 2, "Valor Servicio", 1, 0, 'C', True)
-
-                # Encabezado Subtotal ABRECAR
-                x_subtotal_header = self.get_x()
-                self.multi_cell(ancho_subtotal, altura_linea, "Subtotal\nABRECAR", 1, 'C', True)
-                self.set_xy(x_subtotal_header + ancho_subtotal, y_header_inicial) # Volver a la posición para la siguiente celda
-
-                self.cell(ancho_iva, altura_linea * 2, "IVA", 1, 0, 'C', True)
-                self.cell(ancho_total, altura_linea * 2, "Total\nABRECAR", 1, 1, 'C', True)
-
-                self.set_font("Helvetica", '', 8)
-                # Usar el color de fondo de la fila actual para la nueva página
-                self.set_fill_color(*bg_color)
-                # El borde superior de la primera fila en la nueva página se dibujará con el borde de la celda
-
-
-            # --- Dibujar fila: Contenido y Bordes ---
-            x_pos_inicial = self.get_x()
-            y_pos_inicial = self.get_y()
-
-            # Configurar color de relleno para las celdas
-            self.set_fill_color(*bg_color)
-            self.set_text_color(*color_texto) # Asegurar color de texto normal
-
-            # Lista de datos de la fila en el orden de las columnas
-            datos_fila_ordenados = [
-                fecha_str,
-                direccion,
-                servicio,
-                materiales,
-                valor_materiales_str,
-                valor_original_str,
-                subtotal_str,
-                iva_str,
-                total_str
-            ]
-            anchos_columnas_ordenados = [
-                ancho_fecha, ancho_direccion, ancho_servicio, ancho_materiales,
-                ancho_valor_materiales, ancho_valor, ancho_subtotal, ancho_iva, ancho_total
-            ]
-            # Identificar qué columnas usan multi_cell para el contenido (requieren ajuste de texto)
-            usar_multicell_contenido = [
-                False, # Fecha
-                True,  # Dirección
-                True,  # Servicio
-                True,  # Materiales
-                False, # Valor Mat.
-                False, # Valor Servicio
-                False, # Subtotal ABRECAR
-                False, # IVA
-                False  # Total ABRECAR
-            ]
-
-            # Verificar que todas las listas tengan la misma longitud
-            if not (len(datos_fila_ordenados) == len(anchos_columnas_ordenados) == len(usar_multicell_contenido)):
-                # Esto no debería ocurrir si las listas están definidas correctamente, pero es una seguridad
-                raise ValueError("Las listas de datos, anchos y configuración de multi_cell deben tener la misma longitud")
-
-            current_x = x_pos_inicial
-
-            # Dibujar el contenido de cada celda con centrado vertical
-            for i in range(len(datos_fila_ordenados)):
-                texto = datos_fila_ordenados[i]
-                ancho_columna = anchos_columnas_ordenados[i]
-                usar_multicell = usar_multicell_contenido[i]
-
-                # Calcular la altura real del contenido de esta celda
-                content_height = altura_base_linea # Altura por defecto para celdas simples
-                if usar_multicell:
-                    # Recalcular líneas para esta celda específica para obtener su altura real.
-                    # Usamos el ancho original de la columna para el cálculo de contenido y el offset.
-                    # Añadimos un pequeño factor de corrección si es necesario.
-                    try:
-                        lines = self.multi_cell(ancho_columna - offset_ancho_calculo, altura_base_linea, texto, border=0, align='C', split_only=True)
-                        content_height = len(lines) * altura_base_linea
-                        # Asegurar que si hay texto, la altura sea al menos la base
-                        if content_height < altura_base_linea and texto.strip():
-                             content_height = altura_base_linea
-                        # Añadir un pequeño ajuste si el cálculo es 0 pero hay texto
-                        if content_height == 0 and texto.strip():
-                             content_height = altura_base_linea
-
-                    except Exception as e:
-                        # En caso de error en el cálculo de multi_cell, usar altura base
-                        print(f"Error calculando líneas para multi_cell: {e} Texto: {texto}")
-                        content_height = altura_base_linea
-
-                # Calcular el offset vertical para centrar el contenido
-                # Si la altura de la fila es mayor que la altura del contenido, calculamos el espacio sobrante
-                y_offset_vertical = y_pos_inicial
-                if altura_fila > content_height:
-                     y_offset_vertical = y_pos_inicial + (altura_fila - content_height) / 2
-
-                # Establecer la posición para dibujar el contenido
-                self.set_xy(current_x, y_offset_vertical)
-
-                # Dibujar el contenido de la celda (sin borde ni avance de línea)
-                if usar_multicell:
-                    # Al dibujar, usamos el ancho exacto de la columna
-                    self.multi_cell(ancho_columna, altura_base_linea, texto, border=0, align='C', fill=True)
-                else:
-                    self.cell(ancho_columna, altura_base_linea, texto, border=0, ln=0, align='C', fill=True)
-
-                # Mover la posición X para la siguiente celda de contenido
-                current_x += ancho_columna
-
-            # Después de dibujar todo el contenido de la fila, dibujar los bordes
-            self.set_xy(x_pos_inicial, y_pos_inicial) 
-
-            for i in range(len(anchos_columnas_ordenados)):
-                ancho_columna = anchos_columnas_ordenados[i]
-                # Dibujamos celdas vacías con la altura de fila completa y borde
-                self.cell(ancho_columna, altura_fila, '', border=1, ln=0, fill=False) # fill=False para no dibujar el fondo de nuevo
-
-            # Mover a la siguiente línea (siguiente fila) después de dibujar los bordes y bordes
-            self.set_y(y_pos_inicial + altura_fila)
-
-            # Alternar el estado de relleno para la próxima fila
-            fill = not fill
+    def tabla_servicios(self, df, notas=None, fecha_inicio_analisis=None, fecha_fin_analisis=None, imagenes=None, perfil_imagenes=None):
+        # Encabezado y filas por bloques (ver core/service_table.py)
+        totales = TablaServicios(self).dibujar(df)
 
         # Fila de totales
         self.ln(2)
         self.set_font("Helvetica", 'B', 10)
-        self.set_fill_color(*color_totales_bg)
+        self.set_fill_color(*COLOR_TOTALES_BG)
         # Ajustar la celda de TOTALES para que ocupe el ancho correcto antes de los valores
-        ancho_celda_totales_texto = ancho_fecha + ancho_direccion + ancho_servicio + ancho_materiales + ancho_valor_materiales
+        anchos = {columna.clave: columna.ancho for columna in COLUMNAS}
+        ancho_celda_totales_texto = sum(columna.ancho for columna in COLUMNAS[:5])
         self.cell(ancho_celda_totales_texto, 10, "TOTALES", 1, 0, 'R', True)
 
-        # Asegurarse de que la columna IVA exista antes de intentar acceder a ella y verificar nulos
-        iva_sum = df['IVA'].sum() if 'IVA' in df.columns and not df['IVA'].empty else 0 
-
-        # Recalcular el valor total neto sumando los valores netos calculados por fila
-        valor_total_neto_sum = df.apply(lambda row: max(0, (row['VALOR_ORIGINAL'] if 'VALOR_ORIGINAL' in row and pd.notnull(row['VALOR_ORIGINAL']) else 0) - (row['VALOR MATERIALES'] if 'VALOR MATERIALES' in row and pd.notnull(row['VALOR MATERIALES']) else 0)), axis=1).sum()
-      
-        self.cell(ancho_valor, 10, f"$ {valor_total_neto_sum:,.0f}".replace(',', '.'), 1, 0, 'R', True) # Usar el nuevo total neto sumado
-        self.cell(ancho_subtotal, 10, f"$ {subtotal_sum:,.0f}".replace(',', '.'), 1, 0, 'R', True)
-        self.cell(ancho_iva, 10, f"$ {iva_sum:,.0f}".replace(',', '.'), 1, 0, 'R', True)
-        self.cell(ancho_total, 10, f"$ {total_sum:,.0f}".replace(',', '.'), 1, 1, 'R', True)
+        self.cell(anchos['valor_servicio'], 10, f"$ {totales.valor_neto:,.0f}".replace(',', '.'), 1, 0, 'R', True)
+        self.cell(anchos['subtotal'], 10, f"$ {totales.subtotal:,.0f}".replace(',', '.'), 1, 0, 'R', True)
+        self.cell(anchos['iva'], 10, f"$ {totales.iva:,.0f}".replace(',', '.'), 1, 0, 'R', True)
+        self.cell(anchos['total'], 10, f"$ {totales.total:,.0f}".replace(',', '.'), 1, 1, 'R', True)
 
         self.ln(5)
         self.set_font("Helvetica", '', 10)
-        self.cell(0, 6, f"Total de servicios registrados: {len(df)}", 0, 1)
+        self.cell(0, 6, f"Total de servicios registrados: {totales.filas}", 0, 1)
         if fecha_inicio_analisis and fecha_fin_analisis:
             self.cell(
                 0, 6,
@@ -353,8 +92,8 @@ class PDF(FPDF):
                 self.set_text_color(0, 0, 0)
 
             # CONFIGURACIÓN PROFESIONAL FIJA
-            img_width = 80   # Ancho fijo
-            img_height = 105  # Alto fijo  
+            img_width = IMG_ANCHO_MM   # Ancho fijo
+            img_height = IMG_ALTO_MM  # Alto fijo  
             margin_x = 15    # Margen horizontal entre imágenes
             margin_y = 15    # Margen vertical entre filas
             imagenes_por_fila = 2  # Máximo 2 por fila para que se vean bien
@@ -383,72 +122,16 @@ class PDF(FPDF):
             self.cell(0, 8, "SOPORTE DE PAGO DE LOS SERVICIOS", ln=True, align="L")
             self.ln(3)
 
-            import tempfile, os, base64
-            from PIL import Image
-            import io
-
-            # 🚀 FUNCIÓN PARA CONVERTIR CUALQUIER IMAGEN A PNG VÁLIDO
-            def convertir_a_png_valido(img_b64):
-                """Convierte cualquier imagen base64 a PNG válido para FPDF"""
-                try:
-                    # Limpiar base64
-                    if "," in img_b64:
-                        header, img_data = img_b64.split(",", 1)
-                        print(f"🔍 Header detectado: {header}")
-                    else:
-                        img_data = img_b64
-                    
-                    # Decodificar bytes
-                    img_bytes = base64.b64decode(img_data)
-                    
-                    # Detectar formato real por los primeros bytes
-                    if img_bytes.startswith(b'\xff\xd8\xff'):
-                        print("📱 Formato detectado: JPEG")
-                    elif img_bytes.startswith(b'\x89PNG'):
-                        print("📱 Formato detectado: PNG")
-                    elif img_bytes.startswith(b'RIFF') and b'WEBP' in img_bytes[:20]:
-                        print("📱 Formato detectado: WebP")
-                    else:
-                        print("❓ Formato desconocido, intentando procesar...")
-                    
-                    # Abrir con PIL (detecta automáticamente el formato)
-                    img = Image.open(io.BytesIO(img_bytes))
-                    print(f"✅ PIL detectó: {img.format}, Modo: {img.mode}, Tamaño: {img.size}")
-                    
-                    # Convertir a RGB si tiene canal alpha o es modo palette
-                    if img.mode in ('RGBA', 'LA', 'P'):
-                        print("🔄 Convirtiendo imagen con transparencia a RGB...")
-                        # Crear fondo blanco
-                        rgb_img = Image.new('RGB', img.size, (255, 255, 255)) # type: ignore
-                        
-                        if img.mode == 'P':
-                            img = img.convert('RGBA')
-                        
-                        # Pegar sobre fondo blanco manejando transparencia
-                        if img.mode in ('RGBA', 'LA'):
-                            rgb_img.paste(img, mask=img.split()[-1])
-                        else:
-                            rgb_img.paste(img)
-                        
-                        img = rgb_img
-                    elif img.mode != 'RGB':
-                        print(f"🔄 Convirtiendo de {img.mode} a RGB...")
-                        img = img.convert('RGB')
-                    
-                    # Guardar como PNG válido
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
-                        img.save(temp_file, 'PNG', quality=95)
-                        print(f"✅ Imagen convertida a PNG válido: {temp_file.name}")
-                        return temp_file.name
-                        
-                except Exception as e:
-                    print(f"❌ Error al convertir imagen: {e}")
-                    return None
+            # 🚀 DECODIFICAR, ORIENTAR Y CONVERTIR TODAS LAS IMÁGENES EN PARALELO (PNG válido para FPDF)
+            preparadas = prepare_images(imagenes, perfil_imagenes or PERFIL_IMAGENES)
+            print(f"🗜️ {describe_savings(preparadas)}")
+            for preparada in preparadas:
+                if not preparada.ok:
+                    print(f"❌ Error al convertir imagen {preparada.indice + 1}: {preparada.error}")
 
             # Procesar TODAS las imágenes
             fila_actual = 0
             y_inicial_fila = self.get_y()
-            archivos_temporales = []  # Lista para limpiar al final
 
             for idx, img_b64 in enumerate(imagenes):
                 try:
@@ -483,14 +166,12 @@ class PDF(FPDF):
 
                     print(f"📍 Imagen {idx + 1}: Fila {fila + 1}, Columna {columna + 1} → Pos ({x_pos}, {y_pos})")
 
-                    # 🚀 CONVERTIR IMAGEN A PNG VÁLIDO
-                    tmp_path = convertir_a_png_valido(img_b64)
+                    # 🚀 IMAGEN YA CONVERTIDA A PNG VÁLIDO
+                    tmp_path = preparadas[idx].ruta
                     
                     if not tmp_path:
                         print(f"❌ No se pudo convertir la imagen {idx + 1}")
                         continue
-                    
-                    archivos_temporales.append(tmp_path)  # Agregar a lista de limpieza
 
                     # Insertar imagen
                     self.image(tmp_path, x=x_pos, y=y_pos, w=img_width, h=img_height)
@@ -519,11 +200,7 @@ class PDF(FPDF):
                     continue
 
             # 🧹 LIMPIAR TODOS LOS ARCHIVOS TEMPORALES AL FINAL
-            for tmp_file in archivos_temporales:
-                try:
-                    os.remove(tmp_file)
-                except Exception as e:
-                    print(f"⚠️ No se pudo eliminar {tmp_file}: {e}")
+            remove_prepared(preparadas)
 
             # Restablecer configuración y agregar espacio final
             self.set_text_color(0, 0, 0)
@@ -541,9 +218,12 @@ class PDF(FPDF):
 
         
 
-def generar_pdf(df_servicios, ruta_pdf, notas="", fecha_inicio_analisis=None, fecha_fin_analisis=None, imagenes=None):
+def generar_pdf(df_servicios, ruta_pdf, notas="", fecha_inicio_analisis=None, fecha_fin_analisis=None, imagenes=None, perfil_imagenes=None,
+                destino=None):
     """
-    Genera un PDF con los datos de servicios procesados
+    Genera un PDF con los datos de servicios procesados.
+    Con destino (un archivo abierto en binario, p. ej. new_pdf_spool()) el PDF
+    se escribe ahí por bloques y el tercer valor es destino en lugar de los bytes.
     """
     if df_servicios.empty:
         return False, "No hay datos para generar el informe"
@@ -566,7 +246,12 @@ def generar_pdf(df_servicios, ruta_pdf, notas="", fecha_inicio_analisis=None, fe
         pdf.add_page()
 
         # Agregar tabla de servicios
-        pdf.tabla_servicios(df_servicios, notas, fecha_inicio_analisis, fecha_fin_analisis, imagenes=imagenes)
+        pdf.tabla_servicios(df_servicios, notas, fecha_inicio_analisis, fecha_fin_analisis, imagenes=imagenes, perfil_imagenes=perfil_imagenes)
+
+        if destino is not None:
+            # Se escribe por bloques, sin armar el documento completo en memoria
+            pdf.write_to(destino)
+            return True, "PDF generado exitosamente", destino
 
         # Generar el PDF en memoria como una cadena de bytes
         pdf_bytes = pdf.output(dest='S').encode('latin-1')
@@ -577,7 +262,8 @@ def generar_pdf(df_servicios, ruta_pdf, notas="", fecha_inicio_analisis=None, fe
         return False, f"Error al generar el PDF: {str(e)}", None
 
 
-def generar_pdf_modular(df, nombre_pdf, notas, fecha_inicio_analisis=None, fecha_fin_analisis=None, log_callback=None, imagenes=None):
+def generar_pdf_modular(df, nombre_pdf, notas, fecha_inicio_analisis=None, fecha_fin_analisis=None, log_callback=None, imagenes=None,
+                        destino=None):
     try:
         import tempfile
         
@@ -586,7 +272,8 @@ def generar_pdf_modular(df, nombre_pdf, notas, fecha_inicio_analisis=None, fecha
         # La ruta_pdf ya no es necesaria para guardar el archivo.
         
         # Llama a la función real que crea el PDF
-        exito, mensaje, pdf_bytes = generar_pdf(df, None, notas, fecha_inicio_analisis, fecha_fin_analisis, imagenes=imagenes)
+        exito, mensaje, pdf_bytes = generar_pdf(df, None, notas, fecha_inicio_analisis, fecha_fin_analisis, imagenes=imagenes,
+                                                destino=destino)
 
         if log_callback:
             if exito:
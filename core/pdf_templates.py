@@ -0,0 +1,238 @@
+"""
+Plantillas de los PDF construidas una sola vez por proceso.
+
+Las fuentes, los ParagraphStyle y los TableStyle de un reporte no dependen
+de los datos, así que en lugar de armarlos en cada PDF (getSampleStyleSheet,
+los estilos de título y cada TableStyle de las tablas) se construyen la
+primera vez que se piden, o al arrancar la app con warm_templates, y se
+comparten entre peticiones e hilos.
+
+Las plantillas son de solo lectura: ReportLab solo lee los estilos al
+dibujar. Quien necesite una variante debe crear un estilo nuevo con
+parent=, nunca modificar el compartido.
+
+Los generadores FPDF (relación de servicios y pendientes) usan las fuentes
+base de PDF y dibujan el encabezado y el pie con unas pocas instrucciones
+por página, así que no tienen nada que preconstruir.
+"""
+import logging
+import os
+import threading
+from typing import Callable, Dict
+
+from reportlab.lib import colors
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFError, TTFont
+from reportlab.platypus import TableStyle
+
+
+logger = logging.getLogger(__name__)
+
+
+# === REGISTRO DE FUENTES (una vez por proceso) ===
+
+FONTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts')
+ROBOTO_REGULAR_PATH = os.path.join(FONTS_DIR, 'RobotoCondensed-Regular.ttf')
+ROBOTO_BOLD_PATH = os.path.join(FONTS_DIR, 'RobotoCondensed-Bold.ttf')
+
+FONTE_PRINCIPAL_BOLD = "Helvetica-Bold"
+FONTE_PRINCIPAL_REGULAR = "Helvetica"
+
+try:
+    pdfmetrics.registerFont(TTFont('Roboto-Cond', ROBOTO_REGULAR_PATH))
+    pdfmetrics.registerFont(TTFont('Roboto-Cond-Bold', ROBOTO_BOLD_PATH))
+    FONTE_PRINCIPAL_BOLD = "Roboto-Cond-Bold"
+    FONTE_PRINCIPAL_REGULAR = "Roboto-Cond"
+    logger.info("Fuentes Roboto Condensed registradas exitosamente.")
+except (TTFError, FileNotFoundError) as e:
+    # Si falla, la aplicación NO se rompe y usa las fuentes por defecto
+    logger.error(f"FALLO CRÍTICO DE FUENTE: No se pudo abrir el archivo de fuente en '{ROBOTO_REGULAR_PATH}'. {e}")
+    logger.error("Asegúrese de que los archivos TTF estén en la carpeta 'core/fonts/'.")
+
+
+# Colores del reporte de gastos
+AZUL = colors.HexColor("#1565C0")
+AZUL_OSCURO = colors.HexColor("#0D47A1")
+AZUL_CLARO = colors.HexColor("#E3F2FD")
+AZUL_LINEA = colors.HexColor("#1976D2")
+ROJO = colors.HexColor("#C62828")
+VERDE_CLARO = colors.HexColor("#E8F5E9")
+
+
+class PlantillaGastos:
+    """
+    Estilos del PDF de gastos (core.gasto_pdf_generator).
+
+    Attributes:
+        styles: Hoja de estilos de ejemplo de ReportLab, base de los demás
+        titulo, subtitulo, normal, titulo_seccion: Estilos de párrafo
+        total_consignado, total_gastos: Estilo del valor total de cada tabla
+        saldo_a_favor, saldo_a_devolver: Estilo de los saldos por aportante
+        tabla_consignaciones, tabla_gastos, tabla_balance, tabla_notas: TableStyle de cada tabla
+        fila_imagenes: Fila anidada de hasta 3 imágenes
+        centrado: Tabla contenedora que centra su contenido
+        columna_imagenes, columna_devoluciones: Tablas de filas de imágenes
+        combinada: Gastos y consignaciones lado a lado
+    """
+
+    def __init__(self, fuente_regular: str = None, fuente_bold: str = None):
+        regular = fuente_regular or FONTE_PRINCIPAL_REGULAR
+        bold = fuente_bold or FONTE_PRINCIPAL_BOLD
+        self.styles = getSampleStyleSheet()
+
+        self.titulo = ParagraphStyle(
+            "Titulo", parent=self.styles["Heading1"], alignment=1, textColor=AZUL,
+            fontName=bold, fontSize=16, spaceAfter=12,
+        )
+        self.subtitulo = ParagraphStyle(
+            "Subtitulo", parent=self.styles["Heading2"], alignment=1, textColor=AZUL_OSCURO,
+            fontName=bold, fontSize=14, spaceAfter=10, spaceBefore=8,
+        )
+        self.normal = ParagraphStyle(
+            "Normal", parent=self.styles["BodyText"], fontName=regular, fontSize=10, leading=14,
+        )
+        self.titulo_seccion = ParagraphStyle(
+            "TituloSeccion", parent=self.styles["Heading3"], alignment=1, textColor=AZUL_OSCURO,
+            fontName=bold, fontSize=11, spaceAfter=6,
+        )
+        self.total_consignado = ParagraphStyle(
+            "ValorTotal", parent=self.normal, textColor=AZUL, alignment=2, fontName=regular,
+        )
+        self.total_gastos = ParagraphStyle(
+            "ValorTotal", parent=self.normal, textColor=ROJO, alignment=2, fontName=regular,
+        )
+        self.saldo_a_favor = ParagraphStyle(
+            "Saldo", parent=self.normal, textColor=ROJO, alignment=2, fontName=regular,
+        )
+        self.saldo_a_devolver = ParagraphStyle(
+            "Saldo", parent=self.normal, textColor=AZUL, alignment=2, fontName=regular,
+        )
+
+        self.tabla_consignaciones = TableStyle([
+            ("BACKGROUND", (0, 0), (-1, 0), AZUL_CLARO),
+            ("TEXTCOLOR", (0, 0), (-1, 0), AZUL_OSCURO),
+            ("FONTNAME", (0, 0), (-1, 0), bold),
+            ("FONTNAME", (0, 1), (-1, -2), regular),
+            ("ALIGN", (-1, 1), (-1, -1), "RIGHT"),
+            ("ALIGN", (1, 1), (1, -1), "CENTER"),
+            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+            ("LINEABOVE", (0, -1), (-1, -1), 1.5, AZUL_LINEA),
+            ("LINEBELOW", (0, -1), (-1, -1), 1.5, AZUL_LINEA),
+            ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("FONTSIZE", (0, 0), (-1, -1), 9),
+            ("ROWHEIGHT", (0, 0), (-1, -1), 20),
+            ("LEFTPADDING", (0, 0), (-1, -1), 6),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 6),
+        ])
+        self.tabla_gastos = TableStyle([
+            ("BACKGROUND", (0, 0), (-1, 0), AZUL_CLARO),
+            ("TEXTCOLOR", (0, 0), (-1, 0), AZUL_OSCURO),
+            ("FONTNAME", (0, 0), (-1, 0), bold),
+            ("FONTNAME", (0, 1), (-1, -2), regular),
+            ("ALIGN", (3, 1), (3, -1), "CENTER"),
+            ("ALIGN", (0, 0), (1, -1), "LEFT"),
+            ("ALIGN", (-1, 0), (-1, -1), "RIGHT"),
+            ("LINEABOVE", (0, -1), (-1, -1), 1.5, ROJO),
+            ("LINEBELOW", (0, -1), (-1, -1), 1.5, ROJO),
+            ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("FONTSIZE", (0, 0), (-1, -1), 9),
+            ("ROWHEIGHT", (0, 0), (-1, -1), 20),
+            ("LEFTPADDING", (0, 0), (-1, -1), 6),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 6),
+        ])
+        self.tabla_balance = TableStyle([
+            ("BACKGROUND", (0, 0), (-1, 0), AZUL_CLARO),
+            ("TEXTCOLOR", (0, 0), (-1, 0), AZUL_OSCURO),
+            ("FONTNAME", (0, 0), (-1, 0), bold),
+            ("FONTNAME", (0, 1), (0, -1), regular),
+            ("ALIGN", (0, 0), (0, -1), "LEFT"),
+            ("ALIGN", (1, 0), (1, -1), "RIGHT"),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+            ("BACKGROUND", (0, 0), (-1, 0), VERDE_CLARO),
+            ("FONTSIZE", (0, 0), (-1, -1), 9),
+            ("ROWHEIGHT", (0, 0), (-1, -1), 22),
+            ("LEFTPADDING", (0, 0), (-1, -1), 8),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 8),
+            ("TOPPADDING", (0, 0), (-1, -1), 6),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+        ])
+        self.tabla_notas = TableStyle([
+            ("BACKGROUND", (0, 0), (-1, -1), colors.HexColor("#FFF9E6")),
+            ("TEXTCOLOR", (0, 0), (-1, -1), colors.HexColor("#424242")),
+            ("FONTNAME", (0, 0), (-1, -1), regular),
+            ("ALIGN", (0, 0), (-1, -1), "LEFT"),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#90CAF9")),
+            ("LEFTPADDING", (0, 0), (-1, -1), 10),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 10),
+            ("TOPPADDING", (0, 0), (-1, -1), 10),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 10),
+        ])
+
+        self.fila_imagenes = TableStyle([
+            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("LEFTPADDING", (0, 0), (-1, -1), 3),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 3),
+        ])
+        self.centrado = TableStyle([("ALIGN", (0, 0), (-1, -1), "CENTER")])
+        self.columna_imagenes = TableStyle([
+            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("LEFTPADDING", (0, 0), (-1, -1), 6),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 6),
+            ("TOPPADDING", (0, 0), (-1, -1), 6),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+        ])
+        self.columna_devoluciones = TableStyle([
+            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("LEFTPADDING", (0, 0), (-1, -1), 4),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 4),
+        ])
+        self.combinada = TableStyle([
+            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ])
+
+
+# Plantillas conocidas: nombre -> función que la construye
+_CONSTRUCTORES: Dict[str, Callable[[], object]] = {
+    'gastos': PlantillaGastos,
+}
+_plantillas: Dict[str, object] = {}
+_plantillas_lock = threading.Lock()
+
+
+def register_template(nombre: str, constructor: Callable[[], object]):
+    """Agrega una plantilla al registro; se construye la primera vez que se pide."""
+    with _plantillas_lock:
+        _CONSTRUCTORES[nombre] = constructor
+        _plantillas.pop(nombre, None)
+
+
+def get_template(nombre: str):
+    """
+    Retorna la plantilla compartida, construyéndola la primera vez.
+
+    Raises:
+        KeyError: Si no hay una plantilla con ese nombre
+    """
+    plantilla = _plantillas.get(nombre)
+    if plantilla is None:
+        with _plantillas_lock:
+            plantilla = _plantillas.get(nombre)
+            if plantilla is None:
+                plantilla = _CONSTRUCTORES[nombre]()
+                _plantillas[nombre] = plantilla
+    return plantilla
+
+
+def warm_templates():
+    """Construye todas las plantillas; se llama al arrancar la app."""
+    for nombre in list(_CONSTRUCTORES):
+        get_template(nombre)
@@ -4,8 +4,15 @@ import os
 from datetime import datetime
 from config.settings import EXCEL_COLUMNS
 from utils.date_utils import parse_fecha_espanol
-from unidecode import unidecode
 from core.column_mapper import ColumnMapper
+from core.workbook_cache import get_sheets
+
+# Columnas lógicas (claves de ColumnMapper) que usa process_excel_file; una
+# hoja a la que le falte cualquiera se ignora sin leer sus filas
+COLUMNAS_REQUERIDAS = [EXCEL_COLUMNS['FECHA'], EXCEL_COLUMNS['DIRECCION'], EXCEL_COLUMNS['NOMBRE_CLIENTE'],
+                       EXCEL_COLUMNS['SERVICIO_REALIZADO'], EXCEL_COLUMNS['ESTADO_SERVICIO'],
+                       EXCEL_COLUMNS['FORMA_PAGO']]
+COLUMNAS_OPCIONALES = []
 
 def process_excel_file(file_path, fecha_inicio=None, fecha_fin=None):
     """
@@ -23,45 +30,45 @@ def process_excel_file(file_path, fecha_inicio=None, fecha_fin=None):
     }
 
     try:
-        if not file_path or not os.path.exists(file_path):
-            messages.append({'level': 'error', 'text': f"El archivo no existe o no es accesible: {os.path.basename(file_path) if file_path else 'None'}"})
+        # Puede ser una ruta o el archivo subido ya abierto (SpooledUpload)
+        es_ruta = isinstance(file_path, str)
+        nombre_archivo = os.path.basename(file_path) if es_ruta else getattr(file_path, 'filename', None)
+        if not file_path or (es_ruta and not os.path.exists(file_path)):
+            messages.append({'level': 'error', 'text': f"El archivo no existe o no es accesible: {nombre_archivo if file_path else 'None'}"})
             return None, messages, info
 
-        messages.append({'level': 'info', 'text': f"Leyendo archivo Excel: {os.path.basename(file_path)}"})
+        messages.append({'level': 'info', 'text': f"Leyendo archivo Excel: {nombre_archivo}"})
 
-        xls = pd.ExcelFile(file_path, engine='openpyxl')
-        hojas = xls.sheet_names
         resultados = []
 
-        # Obtener variantes de columnas desde el ColumnMapper
-        columnas_variantes = ColumnMapper.get_column_variants()
-        
-        # Mapeo de columnas requeridas para este procesador específico
-        columnas_requeridas_map = {
-            EXCEL_COLUMNS['FECHA']: columnas_variantes[EXCEL_COLUMNS['FECHA']],
-            EXCEL_COLUMNS['DIRECCION']: columnas_variantes[EXCEL_COLUMNS['DIRECCION']],
-            EXCEL_COLUMNS['NOMBRE_CLIENTE']: columnas_variantes[EXCEL_COLUMNS['NOMBRE_CLIENTE']],
-            EXCEL_COLUMNS['SERVICIO_REALIZADO']: columnas_variantes[EXCEL_COLUMNS['SERVICIO_REALIZADO']],
-            EXCEL_COLUMNS['ESTADO_SERVICIO']: columnas_variantes[EXCEL_COLUMNS['ESTADO_SERVICIO']]
-        }
+        # Columnas requeridas que se renombran a su nombre estándar; FORMA DE PAGO se valida aparte
+        columnas_estandar = [col for col in COLUMNAS_REQUERIDAS if col != EXCEL_COLUMNS['FORMA_PAGO']]
+
+        # Solo se leen las columnas que usa este procesador y las filas del rango
+        hojas = get_sheets(file_path, columnas=COLUMNAS_REQUERIDAS + COLUMNAS_OPCIONALES,
+                           requeridas=COLUMNAS_REQUERIDAS,
+                           fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, normalizar=True)
 
         total_pendientes = 0
         total_registros_en_rango = 0
+        # Columnas resueltas por aproximación; no explican por sí solas un resultado vacío
+        avisos_columnas = []
 
         # Procesar cada hoja
-        for hoja in hojas:
+        for hoja, df in hojas.items():
             try:
                 messages.append({'level': 'info', 'text': f"Procesando hoja: {hoja}"})
 
-                # Leer datos
-                df = pd.read_excel(xls, sheet_name=hoja, dtype={'FECHA': str})
-
                 # Buscar columnas requeridas usando ColumnMapper
                 columnas_encontradas = {}
                 columnas_faltantes = []
                 
-                for col_estandar, variantes in columnas_requeridas_map.items():
-                    col_real = ColumnMapper.find_column(df, variantes)
+                esquema = ColumnMapper.resolve_all(df.columns)
+                for aviso in esquema.warnings(COLUMNAS_REQUERIDAS + COLUMNAS_OPCIONALES):
+                    avisos_columnas.append(f"Hoja {hoja}: {aviso}")
+                    messages.append({'level': 'warning', 'text': avisos_columnas[-1]})
+                for col_estandar in columnas_estandar:
+                    col_real = esquema[col_estandar]
                     if col_real:
                         columnas_encontradas[col_estandar] = col_real
                     else:
@@ -76,34 +83,14 @@ def process_excel_file(file_path, fecha_inicio=None, fecha_fin=None):
                 df_renombrado = df.rename(columns=columnas_encontradas)
 
                 # FILTRO ESTRICTO: Buscar FORMA DE PAGO
-                # El mapeador devuelve una lista, para find_column necesitamos pasársela
-                # Usamos las variantes definidas en ColumnMapper o unas específicas si hace falta
-                variantes_pago = columnas_variantes.get('FORMA DE PAGO', ['FORMA DE PAGO', 'FORMA_PAGO']) # Fallback
-                col_forma_pago_real = ColumnMapper.find_column(df, variantes_pago)
+                col_forma_pago_real = esquema[EXCEL_COLUMNS['FORMA_PAGO']]
                 
-                if col_forma_pago_real:
-                    # Vectorización: Normalizar FORMA DE PAGO
-                    # Usamos el nombre real encontrados en el df original (antes de renombrar) 
-                    # OJO: Al renombrar, ya no existe con el nombre viejo en df_renombrado si estaba en columnas_encontradas
-                    # Pero FORMA DE PAGO no estaba en columnas_requeridas_map para ser renombrada a un estándar global
-                    # así que probablemente siga con su nombre original o lo agregamos al map.
-                    # Para simplificar, usamos el nombre real sobre el df original O lo agregamos al renombrado.
-                    # Vamos a trabajar con df_renombrado. La columna de pago NO fue renombrada.
-                    
-                    df_renombrado['FORMA_PAGO_NORM'] = df_renombrado[col_forma_pago_real].astype(str).str.strip().str.upper().apply(unidecode)
-                else:
+                if not col_forma_pago_real:
                     messages.append({'level': 'error', 'text': f"Hoja {hoja}: No se encontró columna 'FORMA DE PAGO'. Hoja ignorada."})
                     continue
 
-                # 1. Convertir fechas
-                df_renombrado[EXCEL_COLUMNS['FECHA']] = pd.to_datetime(
-                    df_renombrado[EXCEL_COLUMNS['FECHA']],
-                    dayfirst=True,
-                    format='mixed',
-                    errors='coerce'
-                )
-
-                # 2. Filtrar por rango
+                # 1. Filtrar por rango (FECHA ya viene como datetime64, con los
+                # textos leídos con el día primero)
                 df_en_rango = df_renombrado.copy()
                 if fecha_inicio is not None and fecha_fin is not None:
                     # Vectorización del filtro de fechas
@@ -120,12 +107,10 @@ def process_excel_file(file_path, fecha_inicio=None, fecha_fin=None):
                     messages.append({'level': 'warning', 'text': f"Hoja {hoja}: No hay datos en el rango de fechas."})
                     continue
 
-                # 3. Filtrar pendientes
+                # 2. Filtrar pendientes
                 col_estado = EXCEL_COLUMNS['ESTADO_SERVICIO']
-                # Vectorización: Normalizar estado
-                df_en_rango[col_estado] = df_en_rango[col_estado].astype(str).str.strip().str.lower().apply(unidecode)
-                
-                estados_pendientes = {'pendiente cobrar', 'pendiente', 'pendiente de cobro', 'no pagado', 'sin pagar'}
+                # El estado ya viene en mayúsculas y sin tildes
+                estados_pendientes = {'PENDIENTE COBRAR', 'PENDIENTE', 'PENDIENTE DE COBRO', 'NO PAGADO', 'SIN PAGAR'}
                 # isIn es vectorizado y rápido
                 mask_pendientes = df_en_rango[col_estado].isin(estados_pendientes)
                 pendientes = df_en_rango[mask_pendientes].copy()
@@ -179,7 +164,7 @@ def process_excel_file(file_path, fecha_inicio=None, fecha_fin=None):
         messages.append({'level': 'info', 'text': f"Resumen: {total_registros_en_rango} en rango, {total_pendientes} pendientes totales"})
 
         if not resultados:
-            if messages and not any(m['level'] == 'warning' for m in messages):
+            if messages and not any(m['level'] == 'warning' and m['text'] not in avisos_columnas for m in messages):
                  messages.append({'level': 'warning', 'text': "No se encontraron servicios pendientes."})
             return None, messages, info
 
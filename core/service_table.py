@@ -0,0 +1,344 @@
+"""
+Tabla de servicios del PDF de relación, dibujada por bloques.
+
+Antes cada fila recorría df.iterrows(), limpiaba sus textos, volvía a
+formatear los montos y partía tres veces cada texto con multi_cell
+(split_only) para calcular la altura y otras tres para centrarlo: una
+relación de un año con miles de servicios tardaba decenas de segundos.
+
+TablaServicios toma las filas en bloques de PDF_TABLE_BLOCK_ROWS. De cada
+bloque formatea todas las celdas con operaciones de pandas
+(formatear_servicios), parte cada dirección, servicio y material distinto
+una sola vez y calcula la altura de todas las filas; luego dibuja el bloque
+página por página. Cada fila se escribe de una vez con las mismas
+instrucciones que generaría cell() celda por celda, así el PDF sale igual. Solo un bloque está formateado a la vez,
+así que se puede dibujar una relación de cualquier tamaño pasando un
+iterable de DataFrames.
+"""
+from collections import namedtuple
+from typing import Iterable, Iterator, Union
+
+import numpy as np
+import pandas as pd
+
+from config.config import get_config_value
+from utils.validation_utils import limpiar_valores_monetarios
+
+
+ColumnaTabla = namedtuple('ColumnaTabla', ['clave', 'titulo', 'ancho', 'multilinea'])
+
+COLUMNAS = (
+    ColumnaTabla('fecha', 'Fecha', 22, False),
+    ColumnaTabla('direccion', 'Dirección', 50, True),
+    ColumnaTabla('servicio', 'Servicio', 45, True),
+    ColumnaTabla('materiales', 'Materiales', 30, True),
+    ColumnaTabla('valor_materiales', 'Valor Mat.', 25, False),
+    ColumnaTabla('valor_servicio', 'Valor Servicio', 25, False),
+    ColumnaTabla('subtotal', 'Subtotal\nABRECAR', 25, False),
+    ColumnaTabla('iva', 'IVA', 20, False),
+    ColumnaTabla('total', 'Total\nABRECAR', 28, False),
+)
+
+# Altura base por línea (para multi_cell)
+ALTURA_LINEA = 6
+# Al calcular las líneas de un texto se descuenta este margen del ancho de la columna
+OFFSET_ANCHO_CALCULO = 1
+# Espacio que se deja al pie de cada página, igual al margen del salto automático
+MARGEN_INFERIOR = 15
+
+COLOR_ENCABEZADO_BG = (200, 220, 230)  # Gris azulado suave
+COLOR_FILA_IMPAR_BG = (230, 230, 230)  # Gris muy claro
+COLOR_FILA_PAR_BG = (255, 255, 255)  # Blanco
+COLOR_BORDE = (100, 100, 100)  # Gris oscuro
+COLOR_TEXTO = (0, 0, 0)  # Negro
+
+
+def formato_pesos(valores: np.ndarray, guion_si_cero: bool = True) -> list:
+    """'$ 1.234' por cada monto; '-' si no es positivo y guion_si_cero."""
+    return ["-" if guion_si_cero and valor <= 0 else f"$ {valor:,.0f}".replace(',', '.')
+            for valor in valores.tolist()]
+
+
+def _texto_celda(serie: pd.Series) -> pd.Series:
+    """Texto de una celda en una sola línea, como str(valor) sin saltos ni espacios en los extremos."""
+    return serie.astype(str).str.replace('\n', ' ', regex=False).str.replace('\r', ' ', regex=False).str.strip()
+
+
+def formatear_servicios(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Textos de las celdas y montos de cada fila de la tabla, calculados por
+    columna en lugar de fila por fila.
+
+    Returns:
+        pd.DataFrame: Una columna de texto por cada columna de COLUMNAS, más
+        subtotal_monto y total_monto como números
+    """
+    ceros = pd.Series(0.0, index=df.index)
+    materiales_monto = limpiar_valores_monetarios(df['VALOR MATERIALES']) if 'VALOR MATERIALES' in df.columns else ceros
+    original_monto = limpiar_valores_monetarios(df['VALOR_ORIGINAL']) if 'VALOR_ORIGINAL' in df.columns else ceros
+    iva_monto = limpiar_valores_monetarios(df['IVA']) if 'IVA' in df.columns else ceros
+
+    materiales_monto = materiales_monto.to_numpy(dtype=float)
+    valor_neto = np.maximum(0, original_monto.to_numpy(dtype=float) - materiales_monto)
+    subtotal = valor_neto * 0.5
+    iva_monto = iva_monto.to_numpy(dtype=float)
+    total = subtotal + iva_monto
+
+    fechas = df['FECHA']
+    if not pd.api.types.is_datetime64_any_dtype(fechas):
+        fechas = pd.to_datetime(fechas, errors='coerce')
+
+    materiales = _texto_celda(df['MATERIALES'])
+    materiales = materiales.mask((materiales.str.lower() == 'nan') | (materiales == ''), '-')
+
+    return pd.DataFrame({
+        'fecha': fechas.dt.strftime('%d/%m/%Y').fillna('-'),
+        'direccion': _texto_celda(df['DIRECCION_PARA_INFORME']),
+        'servicio': _texto_celda(df['SERVICIO_PARA_INFORME']),
+        'materiales': materiales,
+        'valor_materiales': formato_pesos(materiales_monto),
+        'valor_servicio': formato_pesos(valor_neto),
+        'subtotal': formato_pesos(subtotal, guion_si_cero=False),
+        'iva': formato_pesos(iva_monto),
+        'total': formato_pesos(total, guion_si_cero=False),
+        'subtotal_monto': subtotal,
+        'total_monto': total,
+    }, index=df.index)
+
+
+def iter_bloques(datos: Union[pd.DataFrame, Iterable[pd.DataFrame]], filas: int) -> Iterator[pd.DataFrame]:
+    """Bloques de hasta filas filas de un DataFrame; un iterable de DataFrames se recorre tal cual."""
+    if isinstance(datos, pd.DataFrame):
+        for inicio in range(0, len(datos), max(1, filas)):
+            yield datos.iloc[inicio:inicio + filas]
+    else:
+        yield from datos
+
+
+class TotalesTabla:
+    """Sumas de las filas dibujadas, para la fila de TOTALES."""
+
+    def __init__(self):
+        self.filas = 0
+        self.valor_neto = 0
+        self.subtotal = 0
+        self.iva = 0
+        self.total = 0
+
+    def agregar(self, df: pd.DataFrame, celdas: pd.DataFrame):
+        self.filas += len(df)
+        # Igual que la tabla anterior: IVA sin limpiar y las demás sumas en orden, fila por fila
+        self.iva += df['IVA'].sum() if 'IVA' in df.columns and not df['IVA'].empty else 0
+        self.valor_neto += _valor_neto_crudo(df).sum()
+        self.subtotal = sum(celdas['subtotal_monto'].tolist(), self.subtotal)
+        self.total = sum(celdas['total_monto'].tolist(), self.total)
+
+
+def _valor_neto_crudo(df: pd.DataFrame) -> pd.Series:
+    """VALOR_ORIGINAL - VALOR MATERIALES sin limpiar (nulos como 0), nunca negativo."""
+    ceros = pd.Series(0, index=df.index)
+    original = df['VALOR_ORIGINAL'].fillna(0) if 'VALOR_ORIGINAL' in df.columns else ceros
+    materiales = df['VALOR MATERIALES'].fillna(0) if 'VALOR MATERIALES' in df.columns else ceros
+    return (original - materiales).clip(lower=0)
+
+
+class TablaServicios:
+    """
+    Dibuja la tabla de servicios en un PDF de FPDF a partir de la posición
+    actual, con el encabezado repetido en cada página.
+    """
+
+    def __init__(self, pdf, filas_por_bloque: int = None):
+        self.pdf = pdf
+        if filas_por_bloque is None:
+            filas_por_bloque = int(get_config_value('PDF_TABLE_BLOCK_ROWS', 2000))
+        self.filas_por_bloque = filas_por_bloque
+        self._anchos_texto = {}
+
+    def dibujar(self, datos: Union[pd.DataFrame, Iterable[pd.DataFrame]]) -> TotalesTabla:
+        """
+        Dibuja el encabezado y todas las filas.
+
+        Args:
+            datos: DataFrame de servicios o iterable de DataFrames (p. ej.
+                leídos por partes) con las mismas columnas
+
+        Returns:
+            TotalesTabla: Sumas para la fila de totales
+        """
+        pdf = self.pdf
+        pdf.set_fill_color(*COLOR_FILA_PAR_BG)
+        pdf.set_text_color(*COLOR_TEXTO)
+        pdf.set_draw_color(*COLOR_BORDE)
+        pdf.set_line_width(0.2)
+        self.encabezado()
+
+        totales = TotalesTabla()
+        fill = False
+        for df in iter_bloques(datos, self.filas_por_bloque):
+            if df.empty:
+                continue
+            celdas = formatear_servicios(df)
+            fill = self._dibujar_bloque(celdas, fill)
+            totales.agregar(df, celdas)
+        return totales
+
+    def encabezado(self):
+        """Fila de títulos de las columnas."""
+        pdf = self.pdf
+        pdf.set_font("Helvetica", 'B', 9)
+        pdf.set_fill_color(*COLOR_ENCABEZADO_BG)
+        y_inicial = pdf.get_y()
+        for columna in COLUMNAS:
+            if columna.clave == 'subtotal':
+                # Título de dos líneas: se vuelve a la altura inicial para la siguiente celda
+                x = pdf.get_x()
+                pdf.multi_cell(columna.ancho, ALTURA_LINEA, columna.titulo, 1, 'C', True)
+                pdf.set_xy(x + columna.ancho, y_inicial)
+            else:
+                ultima = columna is COLUMNAS[-1]
+                pdf.cell(columna.ancho, ALTURA_LINEA * 2, columna.titulo, 1, 1 if ultima else 0, 'C', True)
+        pdf.set_font("Helvetica", '', 8)
+
+    def _lineas(self, textos: pd.Series, ancho: float) -> list:
+        """Líneas en que multi_cell parte cada texto, calculadas una vez por texto distinto."""
+        pdf = self.pdf
+        partidos = {texto: pdf.multi_cell(ancho, ALTURA_LINEA, texto, border=0, align='C', split_only=True)
+                    for texto in pd.unique(textos)}
+        return [partidos[texto] for texto in textos.tolist()]
+
+    def _dibujar_bloque(self, celdas: pd.DataFrame, fill: bool) -> bool:
+        """Dibuja las filas ya formateadas de un bloque; retorna el estado de relleno de la siguiente fila."""
+        pdf = self.pdf
+        pdf.set_font("Helvetica", '', 8)
+
+        anchos = [columna.ancho for columna in COLUMNAS]
+        textos = [celdas[columna.clave].tolist() for columna in COLUMNAS]
+        # Por columna multilínea: las líneas al dibujar y cuántas ocupa el texto al calcular la altura
+        lineas = {}
+        alturas_contenido = {}
+        for i, columna in enumerate(COLUMNAS):
+            if columna.multilinea:
+                lineas[i] = self._lineas(celdas[columna.clave], columna.ancho)
+                cantidades = [len(partes) for partes in
+                              self._lineas(celdas[columna.clave], columna.ancho - OFFSET_ANCHO_CALCULO)]
+                alturas_contenido[i] = np.array(cantidades) * ALTURA_LINEA
+        alturas = np.maximum(ALTURA_LINEA, np.max(list(alturas_contenido.values()), axis=0)).tolist()
+
+        # Filas de una página a la vez; la que no cabe abre la página siguiente
+        fila = 0
+        while fila < len(alturas):
+            fin = self._fin_de_pagina(alturas, fila)
+            for i in range(fila, fin):
+                fill = self._dibujar_fila(i, alturas[i], fill, anchos, textos, lineas, alturas_contenido)
+            if fin < len(alturas):
+                pdf.set_fill_color(*(COLOR_FILA_IMPAR_BG if fill else COLOR_FILA_PAR_BG))
+                pdf.add_page()
+                self.encabezado()
+                fill = self._dibujar_fila(fin, alturas[fin], fill, anchos, textos, lineas, alturas_contenido)
+                fin += 1
+            fila = fin
+        return fill
+
+    def _fin_de_pagina(self, alturas: list, inicio: int) -> int:
+        """Índice de la primera fila desde inicio que ya no cabe en la página actual."""
+        y = self.pdf.get_y()
+        limite = self.pdf.h - MARGEN_INFERIOR
+        fin = inicio
+        while fin < len(alturas) and not y + alturas[fin] > limite:
+            y = y + alturas[fin]
+            fin += 1
+        return fin
+
+    def _dibujar_fila(self, i, altura_fila, fill, anchos, textos, lineas, alturas_contenido) -> bool:
+        """Dibuja la fila i en la posición actual; retorna el estado de relleno de la siguiente."""
+        pdf = self.pdf
+        bg_color = COLOR_FILA_IMPAR_BG if fill else COLOR_FILA_PAR_BG
+        pdf.set_fill_color(*bg_color)
+        x_inicial = pdf.get_x()
+        y_inicial = pdf.get_y()
+        pdf.set_fill_color(*bg_color)
+        pdf.set_text_color(*COLOR_TEXTO)
+
+        if y_inicial + altura_fila > pdf.page_break_trigger:
+            # Fila más alta que la página: FPDF reparte sus celdas con el salto automático
+            self._dibujar_fila_con_cell(i, altura_fila, anchos, textos, lineas, alturas_contenido)
+            return not fill
+
+        # Las mismas instrucciones que escribiría cell() para cada celda, en un solo _out
+        k = pdf.k
+        alto_pagina = pdf.h
+        ajuste_texto = .5 * ALTURA_LINEA + .3 * pdf.font_size
+        color_texto = ('q ' + pdf.text_color + ' ', ' Q') if pdf.color_flag else ('', '')
+        ancho_texto = self._ancho_texto
+        salida = []
+
+        x = x_inicial
+        for columna, ancho in enumerate(anchos):
+            if columna in lineas:
+                partes = lineas[columna][i]
+                altura_contenido = alturas_contenido[columna][i]
+            else:
+                partes = (textos[columna][i],)
+                altura_contenido = ALTURA_LINEA
+            y = y_inicial
+            if altura_fila > altura_contenido:
+                y = y_inicial + (altura_fila - altura_contenido) / 2
+            for texto in partes:
+                celda = '%.2f %.2f %.2f %.2f re f ' % (x * k, (alto_pagina - y) * k, ancho * k, -ALTURA_LINEA * k)
+                if texto != '':
+                    dx = (ancho - ancho_texto(texto)) / 2.0
+                    celda += '%sBT %.2f %.2f Td (%s) Tj ET%s' % (
+                        color_texto[0], (x + dx) * k, (alto_pagina - (y + ajuste_texto)) * k,
+                        pdf._escape(texto), color_texto[1])
+                salida.append(celda)
+                # Cada línea de una celda multilínea va debajo de la anterior (ln=2)
+                y += ALTURA_LINEA
+            x += ancho
+
+        # Bordes con la altura completa de la fila
+        x = x_inicial
+        for ancho in anchos:
+            salida.append('%.2f %.2f %.2f %.2f re S ' % (x * k, (alto_pagina - y_inicial) * k, ancho * k,
+                                                           -altura_fila * k))
+            x += ancho
+
+        pdf._out('\n'.join(salida))
+        pdf.lasth = altura_fila
+        pdf.set_y(y_inicial + altura_fila)
+        return not fill
+
+    def _ancho_texto(self, texto: str) -> float:
+        """get_string_width en la fuente de la tabla, una vez por texto distinto."""
+        ancho = self._anchos_texto.get(texto)
+        if ancho is None:
+            ancho = self._anchos_texto[texto] = self.pdf.get_string_width(texto)
+        return ancho
+
+    def _dibujar_fila_con_cell(self, i, altura_fila, anchos, textos, lineas, alturas_contenido):
+        pdf = self.pdf
+        x_inicial = pdf.get_x()
+        y_inicial = pdf.get_y()
+
+        # Contenido de cada celda centrado verticalmente
+        x = x_inicial
+        for columna, ancho in enumerate(anchos):
+            altura_contenido = alturas_contenido[columna][i] if columna in lineas else ALTURA_LINEA
+            y = y_inicial
+            if altura_fila > altura_contenido:
+                y = y_inicial + (altura_fila - altura_contenido) / 2
+            pdf.set_xy(x, y)
+            if columna in lineas:
+                # Lo mismo que multi_cell(ancho, ALTURA_LINEA, texto, 0, 'C', True) con las líneas ya partidas
+                for linea in lineas[columna][i]:
+                    pdf.cell(ancho, ALTURA_LINEA, linea, 0, 2, 'C', True)
+                pdf.x = pdf.l_margin
+            else:
+                pdf.cell(ancho, ALTURA_LINEA, textos[columna][i], border=0, ln=0, align='C', fill=True)
+            x += ancho
+
+        # Bordes con la altura completa de la fila
+        pdf.set_xy(x_inicial, y_inicial)
+        for ancho in anchos:
+            pdf.cell(ancho, altura_fila, '', border=1, ln=0, fill=False)
+        pdf.set_y(y_inicial + altura_fila)
@@ -0,0 +1,232 @@
+"""
+Caché en memoria de libros Excel ya parseados.
+
+Las hojas se guardan indexadas por el hash SHA-256 del contenido del archivo,
+así varios endpoints que reciben el mismo Excel seguido no vuelven a
+parsearlo con openpyxl. El tamaño total está limitado por un presupuesto en
+bytes con expulsión LRU.
+
+También acepta el directorio de un snapshot columnar (ver
+core.workbook_snapshots); en ese caso las hojas se leen del snapshot y la
+clave de la caché es el workbook_id.
+
+Cuando quien llama pide solo algunas columnas o un rango de fechas, el .xlsx
+se lee con core.excel_reader y la entrada de la caché queda indexada por el
+hash más la proyección pedida.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import IO, Dict, Hashable, Iterable, Optional, Sequence, Union
+
+import pandas as pd
+
+from config.config import get_config_value
+from core.excel_reader import project_sheets, read_workbook
+from core.frame_normalizer import normalize_sheets
+from core.workbook_snapshots import is_snapshot, load_snapshot
+from utils.temp_file_manager import get_upload_digest
+
+
+class WorkbookCache:
+    """
+    Caché LRU de {hash: {nombre_hoja: DataFrame}} limitada por bytes.
+    Es segura para usar desde varios hilos del servidor.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Dict[str, pd.DataFrame]]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def current_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    @staticmethod
+    def estimate_size(hojas: Dict[str, pd.DataFrame]) -> int:
+        """Estima la memoria ocupada por las hojas de un libro."""
+        return int(sum(df.memory_usage(index=True, deep=True).sum() for df in hojas.values()))
+
+    def get(self, digest: Hashable) -> Optional[Dict[str, pd.DataFrame]]:
+        with self._lock:
+            hojas = self._entries.get(digest)
+            if hojas is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return hojas
+
+    def put(self, digest: Hashable, hojas: Dict[str, pd.DataFrame]) -> bool:
+        """
+        Guarda las hojas de un libro. Retorna False si el libro por sí solo
+        supera el presupuesto y no se guardó.
+        """
+        size = self.estimate_size(hojas)
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                return True
+            self._entries[digest] = hojas
+            self._sizes[digest] = size
+            while self.current_bytes > self.max_bytes:
+                antiguo, _ = self._entries.popitem(last=False)
+                self._sizes.pop(antiguo, None)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __contains__(self, digest: Hashable) -> bool:
+        return digest in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cache: Optional[WorkbookCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_workbook_cache() -> WorkbookCache:
+    """Retorna la caché compartida del proceso, creándola la primera vez."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = WorkbookCache(int(get_config_value('WORKBOOK_CACHE_MAX_BYTES')))
+    return _cache
+
+
+def hash_file(source: Union[str, IO[bytes]], chunk_size: int = 1024 * 1024) -> str:
+    """Calcula el hash SHA-256 de un archivo (ruta u objeto abierto) leyéndolo por bloques."""
+    hasher = hashlib.sha256()
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                hasher.update(chunk)
+    else:
+        source.seek(0)
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            hasher.update(chunk)
+        source.seek(0)
+    return hasher.hexdigest()
+
+
+def _parse_workbook(source: Union[str, IO[bytes]]) -> Dict[str, pd.DataFrame]:
+    """Parsea todas las hojas del libro en el orden en que aparecen."""
+    if is_snapshot(source):
+        return load_snapshot(source)
+    # Mismo resultado que pd.ExcelFile, con las hojas en paralelo si está configurado
+    return read_workbook(source)
+
+
+def workbook_digest(file_path: Union[str, IO[bytes]]) -> str:
+    """
+    Clave del libro en la caché: el hash calculado al copiar la subida en
+    temporary_excel_file, el del archivo si no viene de ahí, o el nombre
+    del directorio si es un snapshot.
+    """
+    if is_snapshot(file_path):
+        return os.path.basename(os.path.normpath(file_path))
+    return get_upload_digest(file_path) or hash_file(file_path)
+
+
+def get_sheets(file_path: Union[str, IO[bytes]], columnas: Optional[Iterable[str]] = None,
+               requeridas: Sequence[str] = (), contiene: Sequence[str] = (), fecha_inicio: Optional[datetime] = None,
+               fecha_fin: Optional[datetime] = None, normalizar: bool = False) -> Dict[str, pd.DataFrame]:
+    """
+    Retorna las hojas parseadas de un libro Excel, usando la caché cuando el
+    mismo contenido ya fue leído antes.
+
+    El hash se toma del cálculo hecho al copiar la subida en
+    temporary_excel_file; si el archivo no viene de ahí se calcula leyéndolo.
+    Para un snapshot el hash es el nombre de su directorio. Cada llamada
+    recibe copias, así que quien llama puede modificar los DataFrames sin
+    afectar la caché.
+
+    Con columnas o un rango de fechas solo se materializan esas columnas y
+    las filas dentro del rango (ver core.excel_reader). Las hojas a las que
+    les falta alguna columna requerida se retornan sin filas. Si el libro completo
+    ya está en memoria o es un snapshot, la proyección se hace sobre él en
+    lugar de volver a leer el archivo.
+
+    Con normalizar las hojas pasan por core.frame_normalizer (estados como
+    category, montos float64, fechas datetime64) y se guardan ya normalizadas.
+
+    Args:
+        file_path: Ruta al archivo Excel, archivo abierto en modo binario
+            (p. ej. el SpooledUpload de temporary_excel_file) o directorio de
+            un snapshot
+        columnas: Claves de ColumnMapper.get_column_variants() a conservar;
+            None conserva todas
+        requeridas: Claves sin las cuales la hoja no aporta filas
+        contiene: Textos que conservan columnas adicionales por nombre
+        fecha_inicio: Inicio del rango de FECHA (inclusive)
+        fecha_fin: Fin del rango de FECHA (inclusive)
+        normalizar: Retornar las hojas con los tipos normalizados
+
+    Returns:
+        dict: {nombre_hoja: DataFrame} en el orden del libro
+    """
+    digest = workbook_digest(file_path)
+    cache = get_workbook_cache()
+
+    proyectar = columnas is not None or bool(requeridas) or (fecha_inicio is not None and fecha_fin is not None)
+    if proyectar:
+        if columnas is not None:
+            columnas = tuple(sorted(set(columnas)))
+        requeridas = tuple(sorted(set(requeridas)))
+        clave = (digest, columnas, requeridas, tuple(contiene), fecha_inicio, fecha_fin)
+    else:
+        clave = digest
+
+    if normalizar:
+        hojas = cache.get((clave, 'normalizadas'))
+        if hojas is None:
+            # La proyección sin normalizar no se guarda: solo ocuparía memoria
+            hojas = normalize_sheets(_load_sheets(file_path, digest, clave, not proyectar, columnas,
+                                                  requeridas, contiene, fecha_inicio, fecha_fin))
+            cache.put((clave, 'normalizadas'), hojas)
+    else:
+        hojas = _load_sheets(file_path, digest, clave, True, columnas, requeridas, contiene, fecha_inicio, fecha_fin)
+
+    return OrderedDict((nombre, df.copy()) for nombre, df in hojas.items())
+
+
+def _load_sheets(file_path, digest, clave, guardar, columnas, requeridas, contiene, fecha_inicio, fecha_fin):
+    """Hojas sin normalizar desde la caché o el archivo; con guardar quedan en la caché bajo clave."""
+    cache = get_workbook_cache()
+    hojas = cache.get(clave)
+    if hojas is not None:
+        return hojas
+
+    if clave == digest:
+        # Libro completo: se guarda siempre porque las proyecciones salen de él
+        hojas = _parse_workbook(file_path)
+        cache.put(digest, hojas)
+        return hojas
+
+    completas = cache.get(digest)
+    if completas is None and is_snapshot(file_path):
+        completas = _parse_workbook(file_path)
+        cache.put(digest, completas)
+    if completas is not None:
+        hojas = project_sheets(completas, columnas, requeridas, contiene, fecha_inicio, fecha_fin)
+    else:
+        hojas = read_workbook(file_path, columnas, requeridas, contiene, fecha_inicio, fecha_fin)
+    if guardar:
+        cache.put(clave, hojas)
+    return hojas
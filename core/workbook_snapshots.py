@@ -0,0 +1,303 @@
+"""
+Snapshots columnares en disco de libros Excel ya parseados.
+
+Un libro subido a POST /api/workbooks se parsea una sola vez y sus hojas se
+guardan como archivos Arrow IPC sin comprimir en
+UPLOAD_FOLDER/workbooks/<sha256>/. Las peticiones siguientes envían el
+workbook_id y las hojas se leen con memory-map en lugar de volver a parsear
+el .xlsx con openpyxl. Cada uso renueva la fecha del directorio y
+cleanup_expired_snapshots elimina los que no se usaron en
+WORKBOOK_SNAPSHOT_TTL_SECONDS.
+
+Las columnas object de Excel suelen mezclar tipos (fechas, números y texto en
+la misma columna), algo que Arrow no admite. Esas columnas se guardan como
+texto más una columna con el tipo original de cada celda, y al leerlas se
+reconstruyen los mismos valores Python que entrega pandas.
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+import time as time_module
+from collections import OrderedDict
+from datetime import date, datetime, time
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from config.config import get_config_value
+
+
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+WORKBOOKS_SUBDIR = 'workbooks'
+
+# Un workbook_id es el SHA-256 hexadecimal del contenido del archivo
+_WORKBOOK_ID_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# Tipos de celda en columnas object
+TIPO_NULO = 0
+TIPO_TEXTO = 1
+TIPO_ENTERO = 2
+TIPO_DECIMAL = 3
+TIPO_FECHA_HORA = 4
+TIPO_FECHA = 5
+TIPO_HORA = 6
+TIPO_BOOLEANO = 7
+
+
+def is_valid_workbook_id(workbook_id) -> bool:
+    """Valida que el id tenga el formato de un hash SHA-256."""
+    return isinstance(workbook_id, str) and bool(_WORKBOOK_ID_RE.match(workbook_id))
+
+
+def get_snapshots_root() -> str:
+    """Directorio donde se guardan todos los snapshots."""
+    return os.path.join(get_config_value('UPLOAD_FOLDER'), WORKBOOKS_SUBDIR)
+
+
+def get_snapshot_dir(workbook_id: str) -> Optional[str]:
+    """
+    Retorna el directorio del snapshot de un libro si existe.
+
+    Args:
+        workbook_id: Hash SHA-256 retornado por POST /api/workbooks
+
+    Returns:
+        str: Ruta al directorio o None si el id no es válido o no existe
+    """
+    if not is_valid_workbook_id(workbook_id):
+        return None
+    snapshot_dir = os.path.join(get_snapshots_root(), workbook_id)
+    if not is_snapshot(snapshot_dir):
+        return None
+    return snapshot_dir if _renovar(snapshot_dir) else None
+
+
+def _renovar(snapshot_dir: str) -> bool:
+    """Renueva el TTL del snapshot; False si se eliminó mientras tanto."""
+    try:
+        os.utime(snapshot_dir)
+        return True
+    except OSError:
+        return False
+
+
+def is_snapshot(path) -> bool:
+    """Indica si la ruta es un directorio de snapshot completo."""
+    return isinstance(path, str) and os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+def _tipo_celda(valor) -> int:
+    if valor is None or (isinstance(valor, float) and np.isnan(valor)) or valor is pd.NaT:
+        return TIPO_NULO
+    if isinstance(valor, str):
+        return TIPO_TEXTO
+    if isinstance(valor, (bool, np.bool_)):
+        return TIPO_BOOLEANO
+    if isinstance(valor, (int, np.integer)):
+        return TIPO_ENTERO
+    if isinstance(valor, (float, np.floating)):
+        return TIPO_DECIMAL
+    if isinstance(valor, datetime):
+        return TIPO_FECHA_HORA
+    if isinstance(valor, date):
+        return TIPO_FECHA
+    if isinstance(valor, time):
+        return TIPO_HORA
+    return TIPO_TEXTO
+
+
+def _texto_celda(valor, tipo: int) -> Optional[str]:
+    if tipo == TIPO_NULO:
+        return None
+    if tipo == TIPO_DECIMAL:
+        return repr(float(valor))
+    if tipo in (TIPO_FECHA_HORA, TIPO_FECHA, TIPO_HORA):
+        return valor.isoformat()
+    if tipo == TIPO_BOOLEANO:
+        return '1' if valor else ''
+    return str(valor)
+
+
+_DECODIFICADORES = {
+    TIPO_TEXTO: str,
+    TIPO_ENTERO: int,
+    TIPO_DECIMAL: float,
+    TIPO_FECHA_HORA: datetime.fromisoformat,
+    TIPO_FECHA: date.fromisoformat,
+    TIPO_HORA: time.fromisoformat,
+    TIPO_BOOLEANO: bool,
+}
+
+
+def _codificar_object(serie: pd.Series):
+    """Convierte una columna object en (textos, tipos) para Arrow."""
+    tipos = np.fromiter((_tipo_celda(v) for v in serie), dtype=np.int8, count=len(serie))
+    textos = [_texto_celda(v, t) for v, t in zip(serie, tipos)]
+    return pa.array(textos, type=pa.string()), pa.array(tipos, type=pa.int8())
+
+
+def _decodificar_object(textos: pa.Array, tipos: pa.Array) -> np.ndarray:
+    """Reconstruye los valores Python de una columna object."""
+    valores = textos.to_numpy(zero_copy_only=False).astype(object)
+    tipos = tipos.to_numpy()
+    valores[tipos == TIPO_NULO] = np.nan
+    for tipo in np.unique(tipos):
+        if tipo in (TIPO_NULO, TIPO_TEXTO):
+            continue
+        decodificar = _DECODIFICADORES[int(tipo)]
+        posiciones = np.flatnonzero(tipos == tipo)
+        valores[posiciones] = [decodificar(v) for v in valores[posiciones]]
+    return valores
+
+
+def _codificar_nombre(nombre):
+    tipo = _tipo_celda(nombre)
+    return [int(tipo), _texto_celda(nombre, tipo)]
+
+
+def _decodificar_nombre(codificado):
+    tipo, texto = codificado
+    if tipo == TIPO_NULO:
+        return np.nan
+    if tipo == TIPO_TEXTO:
+        return texto
+    return _DECODIFICADORES[tipo](texto)
+
+
+def _hoja_a_tabla(df: pd.DataFrame):
+    """Convierte una hoja en una tabla Arrow con columnas posicionales."""
+    arrays, nombres, columnas = [], [], []
+    for i in range(df.shape[1]):
+        serie = df.iloc[:, i]
+        if serie.dtype == object:
+            textos, tipos = _codificar_object(serie)
+            arrays.extend([textos, tipos])
+            nombres.extend([f'c{i}', f't{i}'])
+            codificacion = 'object'
+        else:
+            arrays.append(pa.array(serie.to_numpy(), from_pandas=True))
+            nombres.append(f'c{i}')
+            codificacion = 'nativa'
+        columnas.append({'nombre': _codificar_nombre(df.columns[i]), 'codificacion': codificacion})
+    return pa.table(arrays, names=nombres), columnas
+
+
+def _tabla_a_hoja(tabla: pa.Table, columnas, filas: int) -> pd.DataFrame:
+    datos = {}
+    for i, columna in enumerate(columnas):
+        if columna['codificacion'] == 'object':
+            datos[i] = _decodificar_object(tabla.column(f'c{i}').combine_chunks(),
+                                           tabla.column(f't{i}').combine_chunks())
+        else:
+            datos[i] = tabla.column(f'c{i}').to_pandas()
+    df = pd.DataFrame(datos, index=pd.RangeIndex(filas))
+    df.columns = [_decodificar_nombre(c['nombre']) for c in columnas]
+    return df
+
+
+def create_snapshot(workbook_id: str, hojas: Dict[str, pd.DataFrame]) -> str:
+    """
+    Guarda las hojas de un libro como snapshot columnar.
+
+    Si el snapshot ya existe no se vuelve a escribir. La escritura se hace en
+    un directorio temporal que luego se renombra, así un lector nunca ve un
+    snapshot a medias.
+
+    Args:
+        workbook_id: Hash SHA-256 del contenido del archivo
+        hojas: {nombre_hoja: DataFrame} en el orden del libro
+
+    Returns:
+        str: Ruta al directorio del snapshot
+    """
+    if not is_valid_workbook_id(workbook_id):
+        raise ValueError(f"workbook_id inválido: {workbook_id}")
+
+    root = get_snapshots_root()
+    destino = os.path.join(root, workbook_id)
+    if is_snapshot(destino) and _renovar(destino):
+        return destino
+
+    os.makedirs(root, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(prefix=f'.{workbook_id[:12]}_', dir=root)
+    try:
+        manifest = {'version': SNAPSHOT_FORMAT_VERSION, 'hojas': []}
+        for n, (nombre, df) in enumerate(hojas.items()):
+            archivo = f'hoja_{n}.arrow'
+            tabla, columnas = _hoja_a_tabla(df)
+            with pa.OSFile(os.path.join(temp_dir, archivo), 'wb') as sink:
+                with pa.ipc.new_file(sink, tabla.schema) as writer:
+                    writer.write_table(tabla)
+            manifest['hojas'].append({
+                'nombre': nombre,
+                'archivo': archivo,
+                'filas': len(df),
+                'columnas': columnas,
+            })
+        with open(os.path.join(temp_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+        try:
+            os.replace(temp_dir, destino)
+        except OSError:
+            # Otra petición escribió el mismo snapshot primero
+            if not is_snapshot(destino):
+                raise
+    finally:
+        if os.path.isdir(temp_dir):
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    return destino
+
+
+def load_snapshot(snapshot_dir: str) -> Dict[str, pd.DataFrame]:
+    """
+    Lee todas las hojas de un snapshot usando memory-map.
+
+    Args:
+        snapshot_dir: Directorio retornado por create_snapshot
+
+    Returns:
+        dict: {nombre_hoja: DataFrame} en el orden del libro
+    """
+    with open(os.path.join(snapshot_dir, MANIFEST_NAME), encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    hojas = OrderedDict()
+    for hoja in manifest['hojas']:
+        with pa.memory_map(os.path.join(snapshot_dir, hoja['archivo']), 'r') as source:
+            tabla = pa.ipc.open_file(source).read_all()
+            hojas[hoja['nombre']] = _tabla_a_hoja(tabla, hoja['columnas'], hoja['filas'])
+    return hojas
+
+
+def cleanup_expired_snapshots(ttl_seconds: Optional[int] = None):
+    """
+    Elimina los snapshots (con su cubo de análisis) no creados ni usados en
+    ttl_seconds (por defecto WORKBOOK_SNAPSHOT_TTL_SECONDS), y los
+    directorios temporales que dejó una escritura interrumpida.
+    """
+    if ttl_seconds is None:
+        ttl_seconds = int(get_config_value('WORKBOOK_SNAPSHOT_TTL_SECONDS'))
+    root = get_snapshots_root()
+    if not os.path.isdir(root):
+        return
+    limite = time_module.time() - ttl_seconds
+    for nombre in os.listdir(root):
+        ruta = os.path.join(root, nombre)
+        try:
+            if not os.path.isdir(ruta) or os.path.getmtime(ruta) >= limite:
+                continue
+            if is_valid_workbook_id(nombre):
+                # Se renombra antes de borrar para que get_snapshot_dir no lo vea a medias
+                borrar = tempfile.mkdtemp(prefix='.borrar_', dir=root)
+                os.replace(ruta, os.path.join(borrar, nombre))
+                ruta = borrar
+            shutil.rmtree(ruta, ignore_errors=True)
+        except OSError:
+            # Otro worker pudo eliminarlo o renovarlo primero
+            pass
@@ -1,41 +1,55 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from unidecode import unidecode
+from core import analytics_cube
+from core.analytics_cube import get_cube, read_analysis_frame
 from core.column_mapper import ColumnMapper
 from config.settings import EXCEL_COLUMNS
-from utils.validation_utils import limpiar_valor_monetario
+from utils.date_labels import etiquetas_mes, fecha_larga_es, fechas_largas
 class AnalyticsService:
+    # Estados y formas de pago que el resumen distingue (ver core.analytics_cube)
+    ESTADOS_RESUMEN = analytics_cube.ESTADOS_RESUMEN
+    ESTADO_OTRO = analytics_cube.ESTADO_OTRO
+    FORMAS_PAGO_RESUMEN = analytics_cube.FORMAS_PAGO_RESUMEN
+    FORMA_PAGO_OTRA = analytics_cube.FORMA_PAGO_OTRA
+
+    # Columnas (claves de ColumnMapper) de cada análisis, para validar y
+    # reportar advertencias. Se leen todas las de COLUMNAS_ANALISIS; las
+    # requeridas se validan sobre todas las hojas juntas, así que una hoja
+    # sin alguna de ellas igual aporta sus filas
+    COLUMNAS_REQUERIDAS_GENERAL = ['ESTADO DEL SERVICIO', 'X50_PORCIENTO', EXCEL_COLUMNS['FECHA'], 'PARA_JG']
+    COLUMNAS_OPCIONALES_GENERAL = ['PARA_ABRECAR', 'IVA', EXCEL_COLUMNS['FORMA_PAGO'], EXCEL_COLUMNS['TORRE_APTO'],
+                                   EXCEL_COLUMNS['DIRECCION'], EXCEL_COLUMNS['FECHA_RELACION'],
+                                   EXCEL_COLUMNS['SERVICIO_REALIZADO']]
+    COLUMNAS_REQUERIDAS_PENDIENTES_EFECTIVO = ['ESTADO DEL SERVICIO', 'X50_PORCIENTO', EXCEL_COLUMNS['FECHA'],
+                                               'PARA_JG', EXCEL_COLUMNS['FORMA_PAGO']]
+    COLUMNAS_OPCIONALES_PENDIENTES_EFECTIVO = ['PARA_ABRECAR', 'IVA', EXCEL_COLUMNS['SERVICIO_REALIZADO'],
+                                               EXCEL_COLUMNS['DIRECCION']]
+    COLUMNAS_REQUERIDAS_PENDIENTES_COBRAR = ['ESTADO DEL SERVICIO', EXCEL_COLUMNS['FECHA'],
+                                             EXCEL_COLUMNS['SERVICIO_REALIZADO']]
+    COLUMNAS_OPCIONALES_PENDIENTES_COBRAR = [EXCEL_COLUMNS['DIRECCION']]
+
     @staticmethod
-    def _clean_money_vectorized(series):
-        """Limpia columnas monetarias de forma vectorizada."""
-        clean_series = (series.astype(str)
-                .str.replace('$', '', regex=False)
-                .str.replace(',', '', regex=False)
-                .str.strip()
-                .replace({'nan': '0', 'None': '0', '': '0'}))
-        return pd.to_numeric(clean_series, errors='coerce').fillna(0.0)
+    def _sum_by_month(tabla):
+        """Suma las filas de la tabla agregada que pertenecen al mismo mes."""
+        return tabla.groupby('MES', sort=False, observed=True)[['cantidad', 'jg', 'abrecar', 'iva']].sum()
+
     @staticmethod
     def _read_excel_robust(file_path):
-        """Lee todas las hojas de un Excel y las concatena."""
-        dfs = []
+        """
+        Lee todas las hojas de un Excel (las columnas de COLUMNAS_ANALISIS,
+        con los tipos ya normalizados por core.frame_normalizer) y las
+        concatena. Los tres análisis piden la misma proyección, así que el
+        libro se parsea una sola vez.
+        """
         try:
-            with pd.ExcelFile(file_path, engine='openpyxl') as xls:
-                for hoja in xls.sheet_names:
-                    df_hoja = pd.read_excel(xls, sheet_name=hoja)
-                    # Normalizar nombres de columnas
-                    df_hoja.columns = [str(col).strip() for col in df_hoja.columns]
-                    dfs.append(df_hoja)
+            df_concat = read_analysis_frame(file_path)
         except Exception as e:
              print(f"ERROR LECTURA EXCEL: {e}")
              raise e
-             
-        if not dfs:
-            raise ValueError('No se encontraron hojas en el archivo Excel.')
-        
-        df_concat = pd.concat(dfs, ignore_index=True)
         print(f"DEBUG: Excel leído. Columnas encontradas: {list(df_concat.columns)}")
         return df_concat
+
     @classmethod
     def get_general_analytics(cls, file_path):
         df = cls._read_excel_robust(file_path)
@@ -43,52 +57,56 @@ class AnalyticsService:
         columnas_variantes = ColumnMapper.get_column_variants()
         
         print("DEBUG: Variantes de TORRE/APTO:", columnas_variantes.get('TORRE/APTO'))
-        # Buscar columnas robustamente usando ColumnMapper
-        col_estado = ColumnMapper.find_column(df, columnas_variantes['ESTADO DEL SERVICIO'])
-        col_xporc = ColumnMapper.find_column(df, columnas_variantes['X50_PORCIENTO'])
-        col_fecha = ColumnMapper.find_column(df, columnas_variantes[EXCEL_COLUMNS['FECHA']])
-        col_para_jg = ColumnMapper.find_column(df, columnas_variantes['PARA_JG'])
-        col_para_abrecar = ColumnMapper.find_column(df, columnas_variantes['PARA_ABRECAR'])
-        col_iva = ColumnMapper.find_column(df, columnas_variantes['IVA'])
-        col_forma_pago = ColumnMapper.find_column(df, columnas_variantes[EXCEL_COLUMNS['FORMA_PAGO']])
+        # Buscar columnas robustamente usando ColumnMapper (una sola pasada por el encabezado)
+        esquema = ColumnMapper.resolve_all(df.columns)
+        col_estado = esquema['ESTADO DEL SERVICIO']
+        col_xporc = esquema['X50_PORCIENTO']
+        col_fecha = esquema[EXCEL_COLUMNS['FECHA']]
+        col_para_jg = esquema['PARA_JG']
+        col_para_abrecar = esquema['PARA_ABRECAR']
+        col_iva = esquema['IVA']
+        col_forma_pago = esquema[EXCEL_COLUMNS['FORMA_PAGO']]
         if not col_estado or not col_xporc or not col_fecha or not col_para_jg:
             raise ValueError(f'No se encontraron columnas requeridas. Estado: {col_estado}, X50%/X25%: {col_xporc}, Fecha: {col_fecha}, PARA JG: {col_para_jg}')
-        # Limpiar valores (Vectorizado)
-        df[col_estado] = df[col_estado].astype(str).str.strip().str.upper().apply(unidecode)
-        df[col_xporc] = df[col_xporc].astype(str).str.strip()
-        df[col_fecha] = pd.to_datetime(df[col_fecha], errors='coerce')
-        
-        try:
-            df[col_para_jg] = cls._clean_money_vectorized(df[col_para_jg])
-        except:
-            df[col_para_jg] = df[col_para_jg].apply(limpiar_valor_monetario)
-        
-        # Limpiar columna PARA ABRECAR si existe
-        if col_para_abrecar:
-            try:
-                df[col_para_abrecar] = cls._clean_money_vectorized(df[col_para_abrecar])
-            except:
-                df[col_para_abrecar] = df[col_para_abrecar].apply(limpiar_valor_monetario)
-        
-        # Limpiar columna IVA si existe
-        if col_iva:
-            try:
-                df[col_iva] = cls._clean_money_vectorized(df[col_iva])
-            except:
-                df[col_iva] = df[col_iva].apply(limpiar_valor_monetario)
-        if col_forma_pago:
-            df[col_forma_pago] = df[col_forma_pago].astype(str).str.strip().str.upper().apply(unidecode)
-        # Convertir formato de mes de "2025-01" a "Enero 2025"
-        meses_espanol = {
-            1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril',
-            5: 'Mayo', 6: 'Junio', 7: 'Julio', 8: 'Agosto',
-            9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
-        }
-        df['MES'] = df[col_fecha].apply(lambda x: f"{meses_espanol[x.month]} {x.year}" if pd.notna(x) else None)
+        # Estado y forma de pago ya vienen como category canónico, los montos
+        # como float64 y las fechas como datetime64 (ver _read_excel_robust)
+        cubo = get_cube(file_path, df)
+        
+        # Calcular resumen por mes según condiciones solicitadas.
+        # Todo sale del corte (MES, FORMA_PAGO, ESTADO) del cubo; las sumas
+        # quedan en 0 (entero) cuando el grupo está vacío, igual que antes.
+        tabla = cubo.totals(['MES', 'FORMA_PAGO', 'ESTADO'])
+        # Etiqueta "Enero 2025" como categórico ordenado cronológicamente
+        tabla['MES'] = etiquetas_mes(tabla['MES'])
+        tabla_meses = tabla[tabla['MES'].notna()]
+        meses = list(tabla_meses['MES'].drop_duplicates().sort_values())
+        
+        efectivo = tabla_meses[tabla_meses['FORMA_PAGO'] == 'EFECTIVO']
+        es_relacionado = efectivo['ESTADO'] == 'YA RELACIONADO'
+        # EFECTIVO RELACIONADO: Solo ESTADO YA RELACIONADO
+        por_mes_relacionado = efectivo[es_relacionado].set_index('MES')
+        # EFECTIVO PENDIENTE: Estado vacío o diferente a YA RELACIONADO
+        por_mes_pendiente = cls._sum_by_month(efectivo[~es_relacionado])
+        # EFECTIVO TOTAL (relacionado + pendiente)
+        por_mes_efectivo = cls._sum_by_month(efectivo)
+        # TRANSFERENCIA: Solo ESTADO YA RELACIONADO
+        transferencias = tabla_meses[(tabla_meses['FORMA_PAGO'] == 'TRANSFERENCIA') &
+                                     (tabla_meses['ESTADO'] == 'YA RELACIONADO')]
+        por_mes_transferencia = transferencias.set_index('MES')
+        # Conteo de cada estado por mes
+        conteo_estados = tabla_meses.pivot_table(index='MES', columns='ESTADO', values='cantidad',
+                                                 aggfunc='sum', fill_value=0, observed=False)
+        
+        def valores_mes(por_mes, mes):
+            """Retorna (cantidad, suma_jg, suma_abrecar, suma_iva) del mes; sumas en 0 si está vacío."""
+            if mes not in por_mes.index or por_mes.at[mes, 'cantidad'] == 0:
+                return 0, 0, 0, 0
+            fila = por_mes.loc[mes]
+            return int(fila['cantidad']), fila['jg'], fila['abrecar'], fila['iva']
         
-        # Calcular resumen por mes según condiciones solicitadas
         resumen = {}
-        meses = set(df['MES'][df['MES'].notna()].unique())
+        estados_especiales_por_mes = {}
+        pendientes_por_mes = {}
         
         # Calcular totales globales de efectivo pendiente (para KPIs)
         total_efectivo_pendiente_relacionar = 0
@@ -96,71 +114,25 @@ class AnalyticsService:
         cantidad_efectivo_pendiente = 0
         
         for mes in meses:
-            grupo_mes = df[df['MES'] == mes]
+            efectivo_relacionado_cantidad, efectivo_relacionado_total_jg, abrecar_relacionado, iva_relacionado = valores_mes(por_mes_relacionado, mes)
+            efectivo_pendiente_cantidad, jg_pendiente, abrecar_pendiente, _ = valores_mes(por_mes_pendiente, mes)
+            _, efectivo_total_jg_mes, _, _ = valores_mes(por_mes_efectivo, mes)
+            transferencia_cantidad, transferencia_total, _, _ = valores_mes(por_mes_transferencia, mes)
             
-            # EFECTIVO RELACIONADO: Solo ESTADO YA RELACIONADO
-            mask_efectivo_relacionado = (
-                (grupo_mes[col_forma_pago] == 'EFECTIVO') &
-                (grupo_mes[col_estado] == 'YA RELACIONADO')
-            )
-            efectivo_relacionado = grupo_mes[mask_efectivo_relacionado]
-            efectivo_relacionado_total_jg = efectivo_relacionado[col_para_jg].sum() if not efectivo_relacionado.empty else 0
             # Total efectivo relacionado: Priorizar PARA JG basado en registros del usuario
             efectivo_relacionado_total = efectivo_relacionado_total_jg
-            
             # Guardar el valor de Abrecar por separado para deudas
-            efectivo_relacionado_total_abrecar = 0
-            if col_para_abrecar and not efectivo_relacionado.empty:
-                efectivo_relacionado_total_abrecar = efectivo_relacionado[col_para_abrecar].sum() if col_para_abrecar in efectivo_relacionado.columns else 0
-
-            # Calcular IVA si existe la columna
-            efectivo_relacionado_iva = 0
-            if col_iva and not efectivo_relacionado.empty:
-                efectivo_relacionado_iva = efectivo_relacionado[col_iva].sum() if col_iva in efectivo_relacionado.columns else 0
-
-            efectivo_relacionado_cantidad = len(efectivo_relacionado)
-            
-            # EFECTIVO PENDIENTE: Estado vacío o diferente a YA RELACIONADO
-            estado_upper = grupo_mes[col_estado].astype(str).str.strip().str.upper().replace('NAN', '')
-            mask_efectivo_pendiente = (
-                (grupo_mes[col_forma_pago] == 'EFECTIVO') &
-                (grupo_mes[col_fecha].notna()) &
-                (estado_upper != 'YA RELACIONADO')
-            )
-            efectivo_pendiente = grupo_mes[mask_efectivo_pendiente]
+            efectivo_relacionado_total_abrecar = abrecar_relacionado if col_para_abrecar else 0
+            efectivo_relacionado_iva = iva_relacionado if col_iva else 0
             
             # Total efectivo pendiente: Usar PARA ABRECAR para incluir IVA (Coincidir con alerta de deuda)
-            if col_para_abrecar and not efectivo_pendiente.empty:
-                efectivo_pendiente_total = efectivo_pendiente[col_para_abrecar].sum()
-            else:
-                efectivo_pendiente_total = efectivo_pendiente[col_para_jg].sum() if not efectivo_pendiente.empty else 0
-                
-            efectivo_pendiente_cantidad = len(efectivo_pendiente)
-            
+            efectivo_pendiente_total = abrecar_pendiente if col_para_abrecar else jg_pendiente
             # Deuda a Abrecar de efectivo pendiente
-            deuda_abrecar_mes = 0
-            if col_para_abrecar and not efectivo_pendiente.empty:
-                deuda_abrecar_mes = efectivo_pendiente[col_para_abrecar].sum() if col_para_abrecar in efectivo_pendiente.columns else 0
-            
-            # EFECTIVO TOTAL (relacionado + pendiente) - Basado en JG para el total del usuario
-            mask_efectivo_todo = (
-                (grupo_mes[col_forma_pago] == 'EFECTIVO') &
-                (grupo_mes[col_fecha].notna())
-            )
-            efectivo_total_jg_mes = grupo_mes[mask_efectivo_todo][col_para_jg].sum() if not grupo_mes[mask_efectivo_todo].empty else 0
+            deuda_abrecar_mes = abrecar_pendiente if col_para_abrecar else 0
             
             # Efectivo total (híbrido para coherencia interna si es necesario, pero devolveremos el de JG por separado)
             efectivo_total = efectivo_relacionado_total + efectivo_pendiente_total
             
-            # TRANSFERENCIA: Solo ESTADO YA RELACIONADO
-            mask_transfer = (
-                (grupo_mes[col_forma_pago] == 'TRANSFERENCIA') &
-                (grupo_mes[col_estado] == 'YA RELACIONADO')
-            )
-            transferencia = grupo_mes[mask_transfer]
-            transferencia_total = transferencia[col_para_jg].sum() if not transferencia.empty else 0
-            transferencia_cantidad = len(transferencia)
-            
             # Totales generales (Usar el total JG para que coincida con registros del usuario)
             total_general = efectivo_total_jg_mes + transferencia_total
             cantidad_general = efectivo_relacionado_cantidad + efectivo_pendiente_cantidad + transferencia_cantidad
@@ -187,48 +159,22 @@ class AnalyticsService:
             total_efectivo_pendiente_relacionar += efectivo_pendiente_total
             total_deuda_abrecar_pendiente += deuda_abrecar_mes
             cantidad_efectivo_pendiente += efectivo_pendiente_cantidad
-        
-        # Calcular estados especiales por mes
-        estados_especiales_por_mes = {}
-        for mes in meses:
-            grupo_mes = df[df['MES'] == mes]
             
+            # Estados especiales por mes
+            conteo_mes = conteo_estados.loc[mes]
             estados_especiales_por_mes[mes] = {
-                'no_pagaron_domicilio': len(grupo_mes[grupo_mes[col_estado] == 'NO PAGARON DOMICILIO']),
-                'garantia': len(grupo_mes[grupo_mes[col_estado] == 'GARANTIA']),
-                'cancelado': len(grupo_mes[grupo_mes[col_estado] == 'CANCELADO']),
-                'no_se_cobra_domicilio': len(grupo_mes[grupo_mes[col_estado] == 'NO SE COBRA DOMICILIO']),
-                'cotizacion': len(grupo_mes[grupo_mes[col_estado] == 'COTIZACION'])
+                'no_pagaron_domicilio': int(conteo_mes['NO PAGARON DOMICILIO']),
+                'garantia': int(conteo_mes['GARANTIA']),
+                'cancelado': int(conteo_mes['CANCELADO']),
+                'no_se_cobra_domicilio': int(conteo_mes['NO SE COBRA DOMICILIO']),
+                'cotizacion': int(conteo_mes['COTIZACION'])
             }
-        
-        # Calcular totales de servicios pendientes por mes
-        pendientes_por_mes = {}
-        
-        for mes in meses:
-            grupo_mes = df[df['MES'] == mes]
             
             # Servicios pendientes por relacionar (efectivo sin estado YA RELACIONADO)
-            mask_efectivo_pendiente = (
-                (grupo_mes[col_forma_pago] == 'EFECTIVO') &
-                (grupo_mes[col_fecha].notna()) &
-                (
-                    (grupo_mes[col_estado] != 'YA RELACIONADO') |
-                    (grupo_mes[col_estado].isna()) |
-                    (grupo_mes[col_estado].astype(str).str.strip() == '')
-                )
-            )
-            total_pendientes_relacionar = len(grupo_mes[mask_efectivo_pendiente])
-            
-            # Servicios pendientes por cobrar (estado PENDIENTE COBRAR)
-            mask_pendiente_cobrar = (
-                (grupo_mes[col_fecha].notna()) &
-                (grupo_mes[col_estado] == 'PENDIENTE COBRAR')
-            )
-            total_pendientes_cobrar = len(grupo_mes[mask_pendiente_cobrar])
-            
+            # y pendientes por cobrar (estado PENDIENTE COBRAR)
             pendientes_por_mes[mes] = {
-                'total_pendientes_relacionar': total_pendientes_relacionar,
-                'total_pendientes_cobrar': total_pendientes_cobrar
+                'total_pendientes_relacionar': efectivo_pendiente_cantidad,
+                'total_pendientes_cobrar': int(conteo_mes['PENDIENTE COBRAR'])
             }
         
         # Calcular totales globales de pendientes
@@ -242,40 +188,20 @@ class AnalyticsService:
         total_no_se_cobra_domicilio = sum(estados_especiales_por_mes[mes]['no_se_cobra_domicilio'] for mes in estados_especiales_por_mes)
         total_cotizacion = sum(estados_especiales_por_mes[mes]['cotizacion'] for mes in estados_especiales_por_mes)
         
-        # Calcular totales por estado para el gráfico circular
+        # Calcular totales por estado para el gráfico circular (incluye filas sin fecha)
+        conteo_total = tabla.groupby('ESTADO', observed=False)['cantidad'].sum()
         estados_grafico = {}
         
         # Total de servicios (todos los que tienen fecha)
-        total_servicios = len(df[df[col_fecha].notna()])
+        total_servicios = int(tabla_meses['cantidad'].sum())
         estados_grafico['TOTAL_SERVICIOS'] = total_servicios
-        
-        # YA RELACIONADO
-        ya_relacionado = df[df[col_estado] == 'YA RELACIONADO']
-        estados_grafico['YA_RELACIONADO'] = len(ya_relacionado)
-        
-        # PENDIENTE COBRAR
-        pendiente_cobrar = df[df[col_estado] == 'PENDIENTE COBRAR']
-        estados_grafico['PENDIENTE_COBRAR'] = len(pendiente_cobrar)
-        
-        # COTIZACION
-        cotizacion = df[df[col_estado] == 'COTIZACION']
-        estados_grafico['COTIZACION'] = len(cotizacion)
-        
-        # NO PAGARON DOMICILIO
-        no_pagaron_domicilio = df[df[col_estado] == 'NO PAGARON DOMICILIO']
-        estados_grafico['NO_PAGARON_DOMICILIO'] = len(no_pagaron_domicilio)
-        
-        # GARANTIA
-        garantia = df[df[col_estado] == 'GARANTIA']
-        estados_grafico['GARANTIA'] = len(garantia)
-        
-        # NO SE COBRA DOMICILIO
-        no_se_cobra_domicilio = df[df[col_estado] == 'NO SE COBRA DOMICILIO']
-        estados_grafico['NO_SE_COBRA_DOMICILIO'] = len(no_se_cobra_domicilio)
-        
-        # CANCELADO
-        cancelado = df[df[col_estado] == 'CANCELADO']
-        estados_grafico['CANCELADO'] = len(cancelado)
+        estados_grafico['YA_RELACIONADO'] = int(conteo_total['YA RELACIONADO'])
+        estados_grafico['PENDIENTE_COBRAR'] = int(conteo_total['PENDIENTE COBRAR'])
+        estados_grafico['COTIZACION'] = int(conteo_total['COTIZACION'])
+        estados_grafico['NO_PAGARON_DOMICILIO'] = int(conteo_total['NO PAGARON DOMICILIO'])
+        estados_grafico['GARANTIA'] = int(conteo_total['GARANTIA'])
+        estados_grafico['NO_SE_COBRA_DOMICILIO'] = int(conteo_total['NO SE COBRA DOMICILIO'])
+        estados_grafico['CANCELADO'] = int(conteo_total['CANCELADO'])
         
         # Calcular Servicios Facturables (Reales/Exitosos)
         # Excluir: GARANTIA, CANCELADO, COTIZACION, NO PAGARON DOMICILIO, NO SE COBRA DOMICILIO
@@ -288,29 +214,22 @@ class AnalyticsService:
         )
         estados_grafico['SERVICIOS_FACTURABLES'] = total_servicios - non_billable_count
         
-        # OTROS
-        estados_conocidos = ['YA RELACIONADO', 'PENDIENTE COBRAR', 'COTIZACION', 
-                           'NO PAGARON DOMICILIO', 'GARANTIA', 'NO SE COBRA DOMICILIO', 'CANCELADO']
-        otros = df[~df[col_estado].isin(estados_conocidos) & df[col_estado].notna()]
-        estados_grafico['OTROS'] = len(otros)
+        # OTROS: cualquier estado fuera de los conocidos
+        estados_grafico['OTROS'] = int(conteo_total[cls.ESTADO_OTRO])
         
         # --- Lógica de Categorización de Clientes (Fase 1: TORRE/APTO) ---
         target_cols = columnas_variantes.get('TORRE/APTO', ['TORRE/APTO', 'TORRE', 'APTO'])
-        col_torre_apto = ColumnMapper.find_column(df, target_cols)
-        
-        # Filtrar solo filas con fecha válida para coincidir con el conteo general
-        df_clients = df[df[col_fecha].notna()].copy()
+        col_torre_apto = esquema[EXCEL_COLUMNS['TORRE_APTO']]
         
         print(f"DEBUG: Buscando columnas TORRE/APTO con variantes: {target_cols}")
         print(f"DEBUG: Columna encontrada: {col_torre_apto}")
         
         # Si no encuentra TORRE/APTO específico, intentar usar Dirección como fallback (opcional, pero el usuario dijo TORRE/APTO)
         if not col_torre_apto:
-             col_torre_apto = ColumnMapper.find_column(df_clients, columnas_variantes.get('DIRECCION', []))
+             col_torre_apto = esquema[EXCEL_COLUMNS['DIRECCION']]
              print(f"DEBUG: Fallback a DIRECCION: {col_torre_apto}")
         clientes_por_tipo = []
         if col_torre_apto:
-            print(f"DEBUG: Muestra valores TORRE/APTO: {df_clients[col_torre_apto].unique()[:15]}")
             # Diccionario para acumular
             categorias = {
                 'ADMINISTRACIÓN': {'cantidad': 0, 'valor': 0},
@@ -322,50 +241,16 @@ class AnalyticsService:
                 'APTO': {'cantidad': 0, 'valor': 0}, 
                 'OTROS': {'cantidad': 0, 'valor': 0}
             }
-            # Iterar sobre el DF (vectorizar sería mejor, pero la lógica de string es compleja)
-            # Usaremos apply para clasificación
-            def clasificar_cliente(valor):
-                s = str(valor).strip().upper()
-                if not s or s == 'NAN': return 'OTROS'
-                
-                # Palabras clave fuertes para ADMINISTRACION
-                if any(x in s for x in ['ADMINISTRACION', 'ADMON', 'CONJUNTO', 'EDIFICIO', 'TORRE', 'P.H.', 'PROPIEDAD', 'AGRUPACION']):
-                     # Excepción: Si dice "TORRE x APTO y", probablemente es APTO, no la administración de la torre.
-                     # Pero "TORRE" solo suele ser la administración.
-                     # Si tiene "APTO" o "CASA" explícito, dejar que caiga en reglas posteriores? 
-                     # No, si dice "CONJUNTO XYZ CASA 1", es CASA.
-                     # Vamos a priorizar CASA/APTO/LOCAL si aparecen explícitamente.
-                     if not any(x in s for x in ['APTO', 'CASA', 'LOCAL', 'CONSULTORIO', 'OFICINA', 'BODEGA']):
-                         return 'ADMINISTRACIÓN'
-                if any(x in s for x in ['EMPRESA', 'SAS', 'LTDA', 'PARROQUIA', 'COLEGIO', 'IGLESIA']):
-                    return 'EMPRESA'
-                # Incluir errores tipográficos comunes como CONSULTIRIO
-                if any(x in s for x in ['LOCAL', 'TIENDA', 'C.C', 'BAR', 'BODEGA', 'CONSULTORIO', 'CONSULTIRIO', 'OFICINA', 'RESTAURANTE']):
-                    return 'LOCAL'
-                    
-                if any(x in s for x in ['CASA', 'URBANIZACION', 'VIVIENDA']):
-                    return 'CASA'
-                
-                # Chequear si es solo números (APTO)
-                # O si contiene palabras clave de apto (Bloque, Int, Ap)
-                import re
-                if re.search(r'\d', s): # Si tiene números
-                     return 'APTO'
-                
-                return 'OTROS'
-            df_clients['TIPO_CLIENTE_TEMP'] = df_clients[col_torre_apto].apply(clasificar_cliente)
-            # Agrupar y sumar
-            # Necesitamos sumar el valor. Usaremos col_para_jg por defecto o col_xporc si representa valor?
-            # get_general_analytics calcula efectivo_total usando col_para_jg. Usaremos esa.
-            
-            # Asegurar que col_para_jg es numérica (ya se hizo arriba)
-            grupo_clientes = df_clients.groupby('TIPO_CLIENTE_TEMP')[col_para_jg].agg(['count', 'sum']).reset_index()
+            # El cubo ya trae el tipo de cliente (ClientClassifier sobre la
+            # misma columna). Solo filas con fecha válida, para coincidir con
+            # el conteo general; el valor es la suma de PARA JG
+            grupo_clientes = cubo.slice(MES=pd.Series.notna).totals('TIPO_CLIENTE')
             
             for _, row in grupo_clientes.iterrows():
-                cat = row['TIPO_CLIENTE_TEMP']
+                cat = row['TIPO_CLIENTE']
                 if cat in categorias:
-                    categorias[cat]['cantidad'] = int(row['count'])
-                    categorias[cat]['valor'] = float(row['sum'])
+                    categorias[cat]['cantidad'] = int(row['cantidad'])
+                    categorias[cat]['valor'] = float(row['jg'])
             
             # Convertir a lista para el frontend
             for cat, data in categorias.items():
@@ -381,7 +266,7 @@ class AnalyticsService:
             
             print(f"DEBUG: Resultados Clientes: {clientes_por_tipo}")
         # --- Análisis de Tiempos de Relación (Nueva lógica) ---
-        col_fecha_relacion = ColumnMapper.find_column(df, columnas_variantes[EXCEL_COLUMNS['FECHA_RELACION']])
+        col_fecha_relacion = esquema[EXCEL_COLUMNS['FECHA_RELACION']]
         
         tiempos_relacion = {
             'promedio_dias': 0,
@@ -391,9 +276,6 @@ class AnalyticsService:
             'total_analizados': 0
         }
         if col_fecha_relacion and col_fecha and col_estado:
-            # Asegurar datetime
-            df[col_fecha_relacion] = pd.to_datetime(df[col_fecha_relacion], errors='coerce')
-            
             # Filtrar YA RELACIONADO y fechas válidas (servicio y relación)
             mask_relacionados = (
                 (df[col_estado] == 'YA RELACIONADO') & 
@@ -426,10 +308,6 @@ class AnalyticsService:
         recaudacion_por_mes = {}
         
         if col_fecha_relacion and col_para_jg and col_estado:
-            # Asegurar que la columna de fecha de relación sea datetime
-            if col_fecha_relacion not in df.columns or df[col_fecha_relacion].dtype != 'datetime64[ns]':
-                df[col_fecha_relacion] = pd.to_datetime(df[col_fecha_relacion], errors='coerce')
-            
             # Filtrar solo servicios YA RELACIONADOS (pagados) con fecha de relación válida y valor PARA JG válido
             mask_recaudacion = (
                 (df[col_estado] == 'YA RELACIONADO') &  # Solo servicios realmente pagados
@@ -442,69 +320,39 @@ class AnalyticsService:
             
             if not df_recaudacion.empty:
                 # Crear columna de mes en formato "Enero 2025" basado en fecha de relación
-                df_recaudacion['MES_RELACION'] = df_recaudacion[col_fecha_relacion].apply(
-                    lambda x: f"{meses_espanol[x.month]} {x.year}" if pd.notna(x) else None
-                )
+                df_recaudacion['MES_RELACION'] = etiquetas_mes(df_recaudacion[col_fecha_relacion])
                 
                 # Agrupar por mes y sumar PARA JG
                 # count() cuenta el número de filas (servicios) por mes
                 # sum() suma los valores de PARA JG por mes
-                grupo_recaudacion = df_recaudacion.groupby('MES_RELACION')[col_para_jg].agg(['sum', 'count']).reset_index()
+                # El categórico ya viene en orden cronológico
+                grupo_recaudacion = df_recaudacion.groupby('MES_RELACION', observed=True)[col_para_jg].agg(['sum', 'count']).reset_index()
                 
                 for _, row in grupo_recaudacion.iterrows():
                     mes = row['MES_RELACION']
-                    if mes:  # Solo si el mes no es None
-                        recaudacion_por_mes[mes] = {
-                            'total_recaudado': float(row['sum']),
-                            'cantidad_servicios': int(row['count'])
-                        }
-                
-                # Ordenar los meses cronológicamente (opcional, pero útil para el frontend)
-                # Función para convertir "Enero 2025" a (año, mes) para ordenamiento
-                def obtener_fecha_orden(mes_str):
-                    if not mes_str:
-                        return (0, 0)
-                    try:
-                        partes = mes_str.split()
-                        if len(partes) == 2:
-                            mes_nombre = partes[0]
-                            año = int(partes[1])
-                            # Buscar el número del mes en el diccionario meses_espanol
-                            mes_num = next((k for k, v in meses_espanol.items() if v == mes_nombre), 0)
-                            return (año, mes_num)
-                    except:
-                        pass
-                    return (0, 0)
-                
-                meses_ordenados = sorted(
-                    recaudacion_por_mes.keys(),
-                    key=obtener_fecha_orden
-                )
-                recaudacion_por_mes_ordenada = {mes: recaudacion_por_mes[mes] for mes in meses_ordenados}
-                recaudacion_por_mes = recaudacion_por_mes_ordenada
+                    recaudacion_por_mes[mes] = {
+                        'total_recaudado': float(row['sum']),
+                        'cantidad_servicios': int(row['count'])
+                    }
         # --- Lógica de Servicios por Tipo (Fase 2 - Mantenida como fallback o complementaria) ---
-        col_servicio = ColumnMapper.find_column(df, columnas_variantes[EXCEL_COLUMNS['SERVICIO_REALIZADO']])
+        col_servicio = esquema[EXCEL_COLUMNS['SERVICIO_REALIZADO']]
         
         # KPI placeholder para servicios si no se usa
         servicios_por_tipo = [] 
         kpis_servicios = {} 
         
         if col_servicio:
-             # Normalizar nombres de servicios
-            df['SERVICIO_NORM'] = df[col_servicio].astype(str).str.strip().str.upper()
-            # Remover NAN, NONE
-            df_servicios = df[~df['SERVICIO_NORM'].isin(['NAN', 'NONE', ''])].copy()
+            # El cubo agrupa por el nombre del servicio en mayúsculas y sin
+            # espacios alrededor; los vacíos ('nan', 'None', '') quedan fuera
+            grupo_servicios = cubo.slice(SERVICIO=pd.Series.notna).totals('SERVICIO')
             
-            if not df_servicios.empty:
-                # Agrupar por servicio
-                grupo_servicios = df_servicios.groupby('SERVICIO_NORM')[col_para_jg].agg(['count', 'sum']).reset_index()
-                
+            if not grupo_servicios.empty:
                 servicios_lista = []
                 for _, row in grupo_servicios.iterrows():
                     servicios_lista.append({
-                        'tipo': row['SERVICIO_NORM'],
-                        'cantidad': int(row['count']),
-                        'valor': float(row['sum'])
+                        'tipo': row['SERVICIO'],
+                        'cantidad': int(row['cantidad']),
+                        'valor': float(row['jg'])
                     })
                 
                 # Ordenar por cantidad descendente
@@ -535,10 +383,11 @@ class AnalyticsService:
                 }
         else:
             # Fallback si no se encuentra columna de servicio: Calcular promedio global con todos los datos válidos
-            df_valido = df[df[col_fecha].notna()]
-            if not df_valido.empty:
-                total_valor = df_valido[col_para_jg].sum()
-                total_cantidad = len(df_valido)
+            con_fecha = cubo.slice(MES=pd.Series.notna)
+            if len(con_fecha):
+                total = con_fecha.totals()
+                total_valor = total.at[0, 'jg']
+                total_cantidad = int(total.at[0, 'cantidad'])
                 valor_promedio = total_valor / total_cantidad if total_cantidad > 0 else 0
                 kpis_servicios = {
                     'mas_comun': None,
@@ -569,105 +418,67 @@ class AnalyticsService:
             },
             'servicios_por_tipo': servicios_por_tipo, # Mantenemos si existe
             'kpis_servicios': kpis_servicios,
+            'advertencias_columnas': esquema.warnings(cls.COLUMNAS_REQUERIDAS_GENERAL + cls.COLUMNAS_OPCIONALES_GENERAL),
             'success': True
         }
     @staticmethod
     def _format_date_es(date_obj):
         """Formatea una fecha como '16 de enero de 2026'."""
-        if pd.isna(date_obj):
-            return 'N/A'
-        meses = {
-            1: 'enero', 2: 'febrero', 3: 'marzo', 4: 'abril',
-            5: 'mayo', 6: 'junio', 7: 'julio', 8: 'agosto',
-            9: 'septiembre', 10: 'octubre', 11: 'noviembre', 12: 'diciembre'
-        }
-        return f"{date_obj.day} de {meses[date_obj.month]} de {date_obj.year}"
+        return fecha_larga_es(date_obj)
 
     @classmethod
     def get_pending_cash_analytics(cls, file_path):
         df = cls._read_excel_robust(file_path)
-        # ... logic continues ...
-        columnas_variantes = ColumnMapper.get_column_variants()
-        col_estado = ColumnMapper.find_column(df, columnas_variantes['ESTADO DEL SERVICIO'])
-        col_xporc = ColumnMapper.find_column(df, columnas_variantes['X50_PORCIENTO'])
-        col_fecha = ColumnMapper.find_column(df, columnas_variantes[EXCEL_COLUMNS['FECHA']])
-        col_para_jg = ColumnMapper.find_column(df, columnas_variantes['PARA_JG'])
-        col_para_abrecar = ColumnMapper.find_column(df, columnas_variantes['PARA_ABRECAR'])
-        col_iva = ColumnMapper.find_column(df, columnas_variantes['IVA'])
-        col_forma_pago = ColumnMapper.find_column(df, columnas_variantes[EXCEL_COLUMNS['FORMA_PAGO']])
-        col_servicio = ColumnMapper.find_column(df, columnas_variantes[EXCEL_COLUMNS['SERVICIO_REALIZADO']])
-        col_direccion = ColumnMapper.find_column(df, columnas_variantes.get('DIRECCION', ['DIRECCION', 'DIRECCIÓN', 'UBICACION', 'LUGAR']))
+        cubo = get_cube(file_path, df)
+        esquema = ColumnMapper.resolve_all(df.columns)
+        advertencias_columnas = esquema.warnings(cls.COLUMNAS_REQUERIDAS_PENDIENTES_EFECTIVO
+                                                 + cls.COLUMNAS_OPCIONALES_PENDIENTES_EFECTIVO)
+        col_estado = esquema['ESTADO DEL SERVICIO']
+        col_xporc = esquema['X50_PORCIENTO']
+        col_fecha = esquema[EXCEL_COLUMNS['FECHA']]
+        col_para_jg = esquema['PARA_JG']
+        col_para_abrecar = esquema['PARA_ABRECAR']
+        col_iva = esquema['IVA']
+        col_forma_pago = esquema[EXCEL_COLUMNS['FORMA_PAGO']]
+        col_servicio = esquema[EXCEL_COLUMNS['SERVICIO_REALIZADO']]
+        col_direccion = esquema['DIRECCION']
         
         if not col_estado or not col_xporc or not col_fecha or not col_para_jg or not col_forma_pago:
             raise ValueError(f'No se encontraron columnas requeridas. Estado: {col_estado}, X50%/X25%: {col_xporc}, Fecha: {col_fecha}, PARA JG: {col_para_jg}, Forma Pago: {col_forma_pago}')
-        # Limpiar valores
-        df[col_estado] = df[col_estado].astype(str).str.strip().str.upper().apply(unidecode)
-        df[col_xporc] = df[col_xporc].astype(str).str.strip()
-        df[col_fecha] = pd.to_datetime(df[col_fecha], errors='coerce')
+        # Estado, forma de pago, montos y fechas ya vienen normalizados
         if col_direccion:
             df[col_direccion] = df[col_direccion].astype(str).str.strip()
-        
-        try:
-            df[col_para_jg] = cls._clean_money_vectorized(df[col_para_jg])
-        except:
-            df[col_para_jg] = df[col_para_jg].apply(limpiar_valor_monetario)
-        if col_para_abrecar:
-            try:
-                df[col_para_abrecar] = cls._clean_money_vectorized(df[col_para_abrecar])
-            except:
-                df[col_para_abrecar] = df[col_para_abrecar].apply(limpiar_valor_monetario)
-        
-        if col_iva:
-            try:
-                df[col_iva] = cls._clean_money_vectorized(df[col_iva])
-            except:
-                df[col_iva] = df[col_iva].apply(limpiar_valor_monetario)
-        df[col_forma_pago] = df[col_forma_pago].astype(str).str.strip().str.upper().apply(unidecode)
         # Filtrar
         mask_efectivo = df[col_forma_pago] == 'EFECTIVO'
         mask_fecha = df[col_fecha].notna()
-        
-        estados_upper = df[col_estado].str.upper()
-        mask_estado = (estados_upper != 'YA RELACIONADO')
+        mask_estado = df[col_estado] != 'YA RELACIONADO'
         
         df_filtrado = df[mask_efectivo & mask_fecha & mask_estado].copy()
         if df_filtrado.empty:
             return {
                 'resumen': {},
                 'detalle': [],
+                'advertencias_columnas': advertencias_columnas,
                 'success': True,
                 'filter_empty': True,
             }
         # Calcular días sin relacionar
         fecha_actual = datetime.now()
         df_filtrado['dias_sin_relacionar'] = (fecha_actual - df_filtrado[col_fecha]).dt.days
-        # Agregar columna de mes (usar YYYY-MM para consistencia si se desea, pero el original usaba Period converted to string which is 'YYYY-MM')
-        # Check original: df_filtrado['MES'] = pd.Series(df_filtrado[col_fecha].dt.to_period('M').astype(str), index=df_filtrado.index)
         df_filtrado['MES'] = df_filtrado[col_fecha].dt.to_period('M').astype(str)
-        # Resumen por mes
+        # Resumen por mes desde el cubo: mismo filtro (efectivo, con fecha y
+        # sin YA RELACIONADO); solo los servicios antiguos salen de las filas
+        pendientes = cubo.slice(FORMA_PAGO='EFECTIVO', MES=pd.Series.notna,
+                                ESTADO=lambda estado: estado != 'YA RELACIONADO').totals('MES')
+        antiguos_por_mes = df_filtrado.loc[df_filtrado['dias_sin_relacionar'] > 30, 'MES'].value_counts()
         resumen = {}
-        meses = set(df_filtrado['MES'][df_filtrado['MES'].notna()].unique())
-        for mes in meses:
-            grupo_mes = df_filtrado[df_filtrado['MES'] == mes]
-            if col_para_abrecar:
-                total_valor = grupo_mes[col_para_abrecar].sum()
-            else:
-                total_valor = grupo_mes[col_para_jg].sum()
-            dias_sin_relacionar = grupo_mes['dias_sin_relacionar'].max() if not grupo_mes.empty else 0
-            
-            # Calcular fecha más antigua de servicios pendientes en este mes
-            # Solo consideramos los que están realmente pendientes (no YA RELACIONADO)
-            # Aunque grupo_mes ya está filtrado por status? 
-            # get_general_analytics filtró df antes (df_filtrado). Sí.
-            
-            if not grupo_mes.empty:
-                 fecha_mas_antigua = grupo_mes[col_fecha].min()
-                 fecha_mas_antigua_str = cls._format_date_es(fecha_mas_antigua)
-            else:
-                 fecha_mas_antigua_str = '9999-12-31'
-            servicios_antiguos = grupo_mes[grupo_mes['dias_sin_relacionar'] > 30]
-            num_antiguos = len(servicios_antiguos)
-            total_pendientes_mes = len(grupo_mes)
+        for _, fila in pendientes.iterrows():
+            mes = fila['MES'].strftime('%Y-%m')
+            total_valor = fila['abrecar'] if col_para_abrecar else fila['jg']
+            dias_sin_relacionar = (fecha_actual - fila['fecha_min']).days
+            fecha_mas_antigua_str = cls._format_date_es(fila['fecha_min'])
+            num_antiguos = int(antiguos_por_mes.get(mes, 0))
+            total_pendientes_mes = int(fila['cantidad'])
             tiene_pendientes = total_pendientes_mes > 0
             tiene_antiguos = num_antiguos > 0
             if tiene_antiguos:
@@ -686,64 +497,66 @@ class AnalyticsService:
                 'fecha_mas_antigua': fecha_mas_antigua_str,
                 'advertencia': advertencia
             }
-        # Detalle
-        detalle = []
-        for _, row in df_filtrado.iterrows():
-            estado = row[col_estado]
-            if pd.isna(estado) or str(estado).strip().upper() in ['NAN', 'NONE', '']:
-                estado_display = 'Sin Relacionar'
-            else:
-                estado_display = str(estado).strip()
-            
-            servicio_realizado = row[col_servicio] if col_servicio and pd.notna(row[col_servicio]) else 'No especificado'
-            if pd.isna(servicio_realizado) or str(servicio_realizado).strip() == '':
-                servicio_realizado = 'No especificado'
-            else:
-                servicio_realizado = str(servicio_realizado).strip()
-            
-            valor_abrecar = row[col_para_abrecar] if col_para_abrecar and pd.notna(row[col_para_abrecar]) else 0
-            valor_iva = row[col_iva] if col_iva and pd.notna(row[col_iva]) else 0
-            valor_subtotal = valor_abrecar - valor_iva if valor_abrecar > 0 else 0
-            
-            if not col_para_abrecar:
-                valor_abrecar = row[col_para_jg] if pd.notna(row[col_para_jg]) else 0
-                valor_subtotal = valor_abrecar
-            
-            
-            direccion = row[col_direccion] if col_direccion and pd.notna(row[col_direccion]) else 'N/A'
-            if pd.isna(direccion) or str(direccion).strip() in ['nan', 'None', '']:
-                direccion = 'N/A'
-
-            detalle.append({
-                'fecha': cls._format_date_es(row[col_fecha]),
-                'direccion': direccion,
-                'estado': estado_display,
-                'servicio_realizado': servicio_realizado,
-                'subtotal': valor_subtotal,
-                'iva': valor_iva,
-                'total_abrecar': valor_abrecar,
-                'dias_sin_relacionar': row['dias_sin_relacionar'],
-                'es_antiguo': row['dias_sin_relacionar'] > 30
-            })
-        detalle.sort(key=lambda x: x['dias_sin_relacionar'], reverse=True)
+        # Detalle (por columnas; los valores conservan los mismos tipos que
+        # el armado fila por fila, p. ej. subtotal 0 entero si no hay valor)
+        estado = df_filtrado[col_estado].astype(str).str.strip()
+        estado_display = estado.where(~estado.str.upper().isin(['NAN', 'NONE', '']), 'Sin Relacionar')
+        
+        if col_servicio:
+            servicio = df_filtrado[col_servicio]
+            servicio_texto = servicio.astype(str).str.strip()
+            servicio_realizado = servicio_texto.where(servicio.notna() & (servicio_texto != ''), 'No especificado')
+        else:
+            servicio_realizado = 'No especificado'
+        
+        if col_para_abrecar:
+            valor_abrecar = df_filtrado[col_para_abrecar].fillna(0)
+            valor_iva = df_filtrado[col_iva].fillna(0) if col_iva else pd.Series(0, index=df_filtrado.index)
+            valor_subtotal = (valor_abrecar - valor_iva).astype(object)
+            valor_subtotal[~(valor_abrecar > 0)] = 0
+        else:
+            valor_abrecar = df_filtrado[col_para_jg].fillna(0)
+            valor_iva = df_filtrado[col_iva].fillna(0) if col_iva else pd.Series(0, index=df_filtrado.index)
+            valor_subtotal = valor_abrecar
+        
+        if col_direccion:
+            direccion = df_filtrado[col_direccion]
+            direccion = direccion.where(direccion.notna() & ~direccion.astype(str).str.strip().isin(['nan', 'None', '']), 'N/A')
+        else:
+            direccion = 'N/A'
+        
+        detalle_df = pd.DataFrame({
+            'fecha': fechas_largas(df_filtrado[col_fecha]),
+            'direccion': direccion,
+            'estado': estado_display,
+            'servicio_realizado': servicio_realizado,
+            'subtotal': valor_subtotal,
+            'iva': valor_iva,
+            'total_abrecar': valor_abrecar,
+            'dias_sin_relacionar': df_filtrado['dias_sin_relacionar'],
+            'es_antiguo': df_filtrado['dias_sin_relacionar'] > 30
+        }, index=df_filtrado.index)
+        detalle = detalle_df.sort_values('dias_sin_relacionar', ascending=False, kind='stable').to_dict('records')
         return {
             'resumen': resumen,
             'detalle': detalle,
+            'advertencias_columnas': advertencias_columnas,
             'success': True
         }
     @classmethod
     def get_pending_charges_analytics(cls, file_path):
         df = cls._read_excel_robust(file_path)
-        columnas_variantes = ColumnMapper.get_column_variants()
-        col_estado = ColumnMapper.find_column(df, columnas_variantes['ESTADO DEL SERVICIO'])
-        col_fecha = ColumnMapper.find_column(df, columnas_variantes[EXCEL_COLUMNS['FECHA']])
-        col_servicio = ColumnMapper.find_column(df, columnas_variantes[EXCEL_COLUMNS['SERVICIO_REALIZADO']])
-        col_direccion = ColumnMapper.find_column(df, columnas_variantes.get('DIRECCION', ['DIRECCION', 'DIRECCIÓN', 'UBICACION', 'LUGAR']))
+        cubo = get_cube(file_path, df)
+        esquema = ColumnMapper.resolve_all(df.columns)
+        advertencias_columnas = esquema.warnings(cls.COLUMNAS_REQUERIDAS_PENDIENTES_COBRAR
+                                                 + cls.COLUMNAS_OPCIONALES_PENDIENTES_COBRAR)
+        col_estado = esquema['ESTADO DEL SERVICIO']
+        col_fecha = esquema[EXCEL_COLUMNS['FECHA']]
+        col_servicio = esquema[EXCEL_COLUMNS['SERVICIO_REALIZADO']]
+        col_direccion = esquema['DIRECCION']
 
         if not col_estado or not col_fecha or not col_servicio:
             raise ValueError(f'No se encontraron columnas requeridas. Estado: {col_estado}, Fecha: {col_fecha}, Servicio: {col_servicio}')
-        df[col_estado] = df[col_estado].astype(str).str.strip().str.upper().apply(unidecode)
-        df[col_fecha] = pd.to_datetime(df[col_fecha], errors='coerce')
         df[col_servicio] = df[col_servicio].astype(str).str.strip()
         if col_direccion:
             df[col_direccion] = df[col_direccion].astype(str).str.strip()
@@ -754,6 +567,7 @@ class AnalyticsService:
             return {
                 'resumen': {},
                 'detalle': [],
+                'advertencias_columnas': advertencias_columnas,
                 'success': True,
                 'filter_empty': True,
             }
@@ -761,30 +575,29 @@ class AnalyticsService:
         df_filtrado['dias_de_retraso'] = (fecha_actual - df_filtrado[col_fecha]).dt.days
         df_filtrado['fecha_fmt'] = df_filtrado[col_fecha].dt.strftime('%Y-%m-%d')
         df_filtrado['MES'] = df_filtrado[col_fecha].dt.to_period('M').astype(str)
+        # Resumen por mes desde el cubo; los servicios con retraso salen de las filas
+        pendientes = cubo.slice(ESTADO='PENDIENTE COBRAR', MES=pd.Series.notna).totals('MES')
+        retrasos_por_mes = df_filtrado.loc[df_filtrado['dias_de_retraso'] > 30, 'MES'].value_counts()
         resumen = {}
-        meses = set(df_filtrado['MES'].unique())
-        for mes in meses:
-            grupo_mes = df_filtrado[df_filtrado['MES'] == mes]
-            total_servicios = len(grupo_mes)
-            servicios_retraso = len(grupo_mes[grupo_mes['dias_de_retraso'] > 30])
-            max_dias_retraso = int(grupo_mes['dias_de_retraso'].max()) if not grupo_mes.empty else 0
-            fecha_mas_antigua = cls._format_date_es(grupo_mes[col_fecha].min()) if not grupo_mes.empty else 'N/A'
+        for _, fila in pendientes.iterrows():
+            mes = fila['MES'].strftime('%Y-%m')
             resumen[mes] = {
-                'total_servicios': total_servicios,
-                'servicios_retraso': servicios_retraso,
-                'max_dias_retraso': max_dias_retraso,
-                'fecha_mas_antigua': fecha_mas_antigua
+                'total_servicios': int(fila['cantidad']),
+                'servicios_retraso': int(retrasos_por_mes.get(mes, 0)),
+                'max_dias_retraso': (fecha_actual - fila['fecha_min']).days,
+                'fecha_mas_antigua': cls._format_date_es(fila['fecha_min'])
             }
-        detalle = df_filtrado.apply(lambda row: {
-            'fecha': cls._format_date_es(row[col_fecha]),
-            'direccion': row[col_direccion] if col_direccion and pd.notna(row[col_direccion]) else 'N/A',
-            'estado': row[col_estado],
-            'servicio_realizado': row[col_servicio],
-            'dias_de_retraso': int(row['dias_de_retraso']),
-            'mensaje': 'PONER AL DÍA COBROS DE ESTE SERVICIO' if row['dias_de_retraso'] > 30 else ''
-        }, axis=1).tolist()
+        detalle = pd.DataFrame({
+            'fecha': fechas_largas(df_filtrado[col_fecha]),
+            'direccion': df_filtrado[col_direccion].fillna('N/A') if col_direccion else 'N/A',
+            'estado': df_filtrado[col_estado],
+            'servicio_realizado': df_filtrado[col_servicio],
+            'dias_de_retraso': df_filtrado['dias_de_retraso'].astype(int),
+            'mensaje': np.where(df_filtrado['dias_de_retraso'] > 30, 'PONER AL DÍA COBROS DE ESTE SERVICIO', '')
+        }, index=df_filtrado.index).to_dict('records')
         return {
             'resumen': resumen,
             'detalle': detalle,
+            'advertencias_columnas': advertencias_columnas,
             'success': True
         }
\ No newline at end of file
@@ -6,6 +6,19 @@ from core import pending_excel_processor, excel_processor, df_pending_report, pd
 import io
 import traceback
 
+
+def _registros_json(df):
+    """
+    Filas del DataFrame como dicts para jsonify, con None en lugar de NaN.
+    replace no cambia los NaN dentro de columnas category (FORMA DE PAGO,
+    ESTADO), que saldrían como NaN, un token que no es JSON válido.
+    """
+    categorias = df.select_dtypes('category').columns
+    if len(categorias):
+        df = df.astype({col: object for col in categorias})
+    return df.replace({np.nan: None}).to_dict(orient='records')
+
+
 class ReportService:
     @staticmethod
     def validate_initial_file(file, filename, fecha_inicio_str, fecha_fin_str, notes):
@@ -114,8 +127,7 @@ class ReportService:
             }, 400
 
         # CASO 3: Hay datos válidos
-        df = df.replace({np.nan: None})
-        data = df.to_dict(orient='records')
+        data = _registros_json(df)
         return True, {
             'data': data, 
             'messages': messages,
@@ -153,8 +165,7 @@ class ReportService:
             }, 400
 
         # CASO 3: Hay datos válidos
-        df = df.replace({np.nan: None})
-        data = df.to_dict(orient='records')
+        data = _registros_json(df)
         return True, {
             'data': data, 
             'empty_range': False,
@@ -162,13 +173,12 @@ class ReportService:
         }, 200
 
     @staticmethod
-    def generate_pending_services_pdf(temp_path, fecha_inicio, fecha_fin, nombre_pdf, notas):
+    def generate_pending_services_pdf(temp_path, fecha_inicio, fecha_fin, nombre_pdf, notas, destino=None):
         """
         Genera el PDF de servicios pendientes.
         Retorna tupla (success, result/error, status_code/pdf_bytes).
-        If success is True, result is filename and 3rd element is pdf path or bytes?
-        Actually, the original returns send_file(path).
-        Let's return (True, pdf_path, messages) on success.
+        Sin destino retorna (True, pdf_path, 200). Con destino (archivo abierto en
+        binario) el PDF se escribe ahí y retorna (True, {'filename'}, destino).
         """
         # Procesar el archivo Excel
         df, messages, info = pending_excel_processor.process_excel_file(
@@ -200,20 +210,25 @@ class ReportService:
             nombre_pdf_final = f"Servicios_Pendientes_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.pdf"
         
         exito, ruta_pdf, logs_pdf = df_pending_report.generate_pdf_report(
-            df, temp_path, fecha_inicio, fecha_fin, nombre_pdf_final, notas
+            df, temp_path, fecha_inicio, fecha_fin, nombre_pdf_final, notas, destino=destino
         )
         messages.extend(logs_pdf)
         
-        if not exito or not ruta_pdf:
+        if not exito or ruta_pdf is None:
             return False, {'error': 'No se pudo generar el PDF', 'logs': messages}, 500
 
+        if destino is not None:
+            return True, {'filename': nombre_pdf_final}, destino
+
         return True, ruta_pdf, 200
 
     @staticmethod
-    def generate_cash_services_pdf(temp_path, fecha_inicio, fecha_fin, notas, nombre_pdf, imagenes, log_callback):
+    def generate_cash_services_pdf(temp_path, fecha_inicio, fecha_fin, notas, nombre_pdf, imagenes, log_callback, destino=None):
         """
         Genera el PDF de relación de servicios.
         Retorna tupla (success, result/error_dict, pdf_bytes).
+        Con destino (archivo abierto en binario) el PDF se escribe ahí y el
+        tercer valor es destino en lugar de los bytes.
         """
         # Procesar para obtener relación
         df, info = excel_processor.extraer_servicios(
@@ -242,7 +257,8 @@ class ReportService:
             nombre_pdf_final = f"Relacion_Servicios_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.pdf"
         
         result = pdf_generator.generar_pdf_modular(
-            df, nombre_pdf_final, notas, fecha_inicio, fecha_fin, log_callback, imagenes=imagenes
+            df, nombre_pdf_final, notas, fecha_inicio, fecha_fin, log_callback, imagenes=imagenes,
+            destino=destino
         )
         
         # Manejar tupla de retorno del generador
@@ -263,10 +279,12 @@ class ReportService:
         return True, {'filename': nombre_pdf_final}, pdf_bytes
 
     @staticmethod
-    def generate_expenses_pdf(data):
+    def generate_expenses_pdf(data, destino=None):
         """
         Genera el PDF de reporte de gastos.
         Retorna (success, result_dict, pdf_bytes).
+        Con destino (archivo abierto en binario) el PDF se escribe ahí y el
+        tercer valor es destino en lugar de los bytes.
         """
         try:
             # 1. Recuperar listas
@@ -421,10 +439,11 @@ class ReportService:
                 calculos=calculos,
                 imagenes=imagenes_safe,
                 nombre_pdf=nombre_pdf,
-                notas=notas  # Pasar las notas al generador
+                notas=notas,  # Pasar las notas al generador
+                destino=destino
             )
             
-            if exito and pdf_bytes:
+            if exito and pdf_bytes is not None:
                 return True, {'filename': f'{nombre_pdf}.pdf'}, pdf_bytes
             else:
                 return False, {'error': 'Error al generar PDF'}, 500
@@ -0,0 +1,21 @@
+from core.workbook_cache import get_sheets
+from core.workbook_snapshots import create_snapshot
+from utils.temp_file_manager import get_upload_digest
+
+
+class WorkbookService:
+    @staticmethod
+    def register_workbook(temp_path, filename):
+        """
+        Parsea un libro subido y lo guarda como snapshot columnar.
+        Retorna un dict con el workbook_id y un resumen de las hojas.
+        """
+        hojas = get_sheets(temp_path)
+        workbook_id = get_upload_digest(temp_path)
+        create_snapshot(workbook_id, hojas)
+
+        return {
+            'workbook_id': workbook_id,
+            'filename': filename,
+            'hojas': [{'nombre': nombre, 'filas': len(df)} for nombre, df in hojas.items()],
+        }
@@ -1,26 +1,54 @@
-import pytest
+import datetime
 import os
 import sys
+import types
+
+import pytest
 
 # Agregar el directorio raíz al path para importar módulos correctamente
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app import create_app
-from config.config import TestingConfig
+from config.config import Config, TestingConfig
+from core import pdf_generator
+
+
+def pytest_collection_modifyitems(config, items):
+    """Los benchmarks de tiempo dependen de la máquina; solo corren con RUN_BENCHMARKS=1"""
+    if os.environ.get('RUN_BENCHMARKS') == '1':
+        return
+    omitir = pytest.mark.skip(reason='benchmark de tiempo: correr con RUN_BENCHMARKS=1')
+    for item in items:
+        if item.get_closest_marker('benchmark') is not None:
+            item.add_marker(omitir)
 
 @pytest.fixture
-def app():
-    """Fixture para crear la aplicación Flask en modo testing."""
+def app(tmp_path, monkeypatch):
+    """Fixture para crear la aplicación Flask en modo testing, con UPLOAD_FOLDER en un directorio temporal."""
+    monkeypatch.setattr(Config, 'UPLOAD_FOLDER', str(tmp_path))
     app = create_app()
     app.config.from_object(TestingConfig)
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
     return app
 
 @pytest.fixture
 def client(app):
     """Fixture para el cliente de pruebas."""
-    return app.test_client()
+    with app.test_client() as client:
+        yield client
 
 @pytest.fixture
 def runner(app):
     """Fixture para el runner de comandos CLI."""
     return app.test_cli_runner()
+
+@pytest.fixture
+def fecha_fija(monkeypatch):
+    """Fecha de generación fija en los PDF de FPDF, para compararlos byte a byte"""
+    class FechaFija(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2025, 1, 1, 12, 0, 0)
+
+    monkeypatch.setattr(pdf_generator, 'datetime', types.SimpleNamespace(datetime=FechaFija))
+    monkeypatch.setattr('fpdf.fpdf.datetime', FechaFija)
@@ -0,0 +1,38 @@
+"""
+Datos sintéticos compartidos por varios módulos de tests.
+"""
+import base64
+import io
+
+import numpy as np
+from PIL import Image
+
+
+def imagen_b64(tamano=(60, 40), modo='RGB', formato='JPEG', orientacion=None, color=None, foto=False):
+    """Imagen sintética en base64 con cabecera data:; con foto tiene ruido como una foto real"""
+    if foto:
+        ruido = np.random.default_rng(0).integers(0, 256, size=(tamano[1], tamano[0], 3), dtype=np.uint8)
+        imagen = Image.fromarray(ruido, 'RGB')
+    else:
+        imagen = Image.new(modo, tamano, color or ((200, 30, 30, 128) if modo == 'RGBA' else 'red'))
+    buffer = io.BytesIO()
+    opciones = {}
+    if orientacion is not None:
+        exif = imagen.getexif()
+        exif[0x0112] = orientacion
+        opciones['exif'] = exif
+    imagen.save(buffer, formato, **opciones)
+    mime = 'image/jpeg' if formato == 'JPEG' else 'image/png'
+    return f'data:{mime};base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def datos_gastos(filas=200):
+    """Reporte de gastos sintético"""
+    gastos = [{'fecha': f'2025-01-{i % 28 + 1:02d}', 'categoria': 'Materiales', 'descripcion': f'Compra tubo PVC {i}',
+               'monto': 1000 * i, 'pagadoPor': 'ABRECAR'} for i in range(filas)]
+    consignaciones = [{'fecha': '2025-01-01', 'entregadoPor': 'OTROS: JG', 'descripcion': 'Anticipo', 'monto': 500000}]
+    return {'gastos': gastos, 'consignaciones': consignaciones}
+
+
+CALCULOS = {'detallado': True, 'saldosOtros': {'JG': {'balance': -500}, 'Pedro': {'balance': 700}}, 'balanceJG': -300,
+            'totalConsignado': 500000, 'totalGastos': 19900000, 'vueltasAFavorDeAbrecar': 0}
@@ -0,0 +1,194 @@
+"""
+Tests para el cubo de agregados de los análisis.
+Valida que los cortes del cubo den lo mismo que agrupar las filas, que se
+arme una sola vez por libro y que se guarde junto al snapshot.
+"""
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from config.config import Config
+from core import analytics_cube
+from core.analytics_cube import CUBO_ARCHIVO, AnalyticsCube, build_incremental, get_cube
+from core.frame_normalizer import normalize_frame
+from core.workbook_cache import get_sheets, get_workbook_cache
+from core.workbook_snapshots import create_snapshot
+from services.analytics_service import AnalyticsService
+
+
+@pytest.fixture(autouse=True)
+def cache_limpia(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'UPLOAD_FOLDER', str(tmp_path))
+    get_workbook_cache().clear()
+    yield
+    get_workbook_cache().clear()
+
+
+@pytest.fixture
+def servicios():
+    """Servicios de dos meses con estados, formas de pago y clientes variados"""
+    return pd.DataFrame({
+        'FECHA': [datetime(2025, 1, 5), datetime(2025, 1, 20), datetime(2025, 2, 3), datetime(2025, 2, 10),
+                  None, datetime(2025, 2, 11)],
+        'ESTADO DEL SERVICIO': ['YA RELACIONADO', 'PENDIENTE COBRAR', None, 'YA RELACIONADO', 'GARANTIA', 'raro'],
+        'FORMA DE PAGO': ['EFECTIVO', 'EFECTIVO', 'EFECTIVO', 'TRANSFERENCIA', None, 'Efectivo'],
+        'X50%/X25%': ['X50%'] * 6,
+        'PARA JG': [50000, 30000.5, 20000, 70000, 10000, 5000],
+        'PARA ABRECAR': [55000, 33000, 20000, 70000, 10000, 5000],
+        'TORRE/APTO': ['EDIFICIO CENTRAL', 'APTO 301', 'LOCAL 2', 'EDIFICIO CENTRAL', None, 'CASA 4'],
+        'SERVICIO REALIZADO': ['Instalación', ' instalación ', 'Cambio de guarda', None, 'Revisión', 'nan'],
+    }, dtype=object)
+
+
+@pytest.fixture
+def excel_servicios(tmp_path, servicios):
+    ruta = tmp_path / 'servicios.xlsx'
+    servicios.to_excel(ruta, index=False, engine='openpyxl')
+    return str(ruta)
+
+
+class TestAnalyticsCube:
+    """Tests de build, slice y totals"""
+
+    def test_totales_iguales_a_las_filas(self, servicios):
+        """Test que sumar el cubo por mes da lo mismo que agrupar las filas"""
+        df = normalize_frame(servicios)
+        cubo = AnalyticsCube.build(df)
+
+        assert len(cubo) <= len(df)
+        assert cubo.totals().at[0, 'cantidad'] == len(df)
+        por_mes = cubo.slice(MES=pd.Series.notna).totals('MES').set_index('MES')
+        esperado = df.groupby(df['FECHA'].dt.to_period('M').dt.to_timestamp())['PARA JG'].agg(['size', 'sum'])
+        assert por_mes['cantidad'].tolist() == esperado['size'].tolist()
+        assert por_mes['jg'].tolist() == esperado['sum'].tolist()
+        assert por_mes['fecha_min'].tolist() == [pd.Timestamp(2025, 1, 5), pd.Timestamp(2025, 2, 3)]
+
+    def test_dimensiones(self, servicios):
+        """Test que estados, formas de pago, clientes y servicios quedan agrupados"""
+        cubo = AnalyticsCube.build(normalize_frame(servicios))
+
+        efectivo = cubo.slice(FORMA_PAGO='EFECTIVO').totals('ESTADO').set_index('ESTADO')['cantidad']
+        assert efectivo.to_dict() == {'YA RELACIONADO': 1, 'PENDIENTE COBRAR': 1, 'OTRO': 2}
+        assert cubo.slice(FORMA_PAGO='OTRA').totals().at[0, 'cantidad'] == 1
+        clientes = cubo.totals('TIPO_CLIENTE').set_index('TIPO_CLIENTE')['cantidad']
+        assert clientes['ADMINISTRACIÓN'] == 2
+        servicios_tipo = cubo.slice(SERVICIO=pd.Series.notna).totals('SERVICIO').set_index('SERVICIO')
+        assert servicios_tipo['cantidad'].to_dict() == {'CAMBIO DE GUARDA': 1, 'INSTALACIÓN': 2, 'REVISIÓN': 1}
+        assert servicios_tipo.at['INSTALACIÓN', 'jg'] == 80000.5
+
+    def test_slice_con_lista_y_funcion(self, servicios):
+        """Test que los filtros aceptan listas de valores y funciones"""
+        cubo = AnalyticsCube.build(normalize_frame(servicios))
+
+        corte = cubo.slice(ESTADO=['YA RELACIONADO', 'GARANTIA'], MES=pd.Series.isna)
+        assert corte.totals().at[0, 'cantidad'] == 1
+        assert corte.totals().at[0, 'jg'] == 10000
+
+
+class TestGetCube:
+    """Tests de get_cube"""
+
+    def test_se_arma_una_vez_para_los_tres_analisis(self, excel_servicios, monkeypatch):
+        """Test que los tres endpoints del dashboard comparten el mismo cubo"""
+        armados = []
+        original = AnalyticsCube.build_blocks.__func__
+        monkeypatch.setattr(AnalyticsCube, 'build_blocks',
+                            classmethod(lambda cls, df, bloques: armados.append(1) or original(cls, df, bloques)))
+
+        general = AnalyticsService.get_general_analytics(excel_servicios)
+        efectivo = AnalyticsService.get_pending_cash_analytics(excel_servicios)
+        cobrar = AnalyticsService.get_pending_charges_analytics(excel_servicios)
+
+        assert len(armados) == 1
+        assert general['resumen']['Enero 2025']['efectivo_relacionado_jg'] == 50000.0
+        assert efectivo['resumen']['2025-02']['total_servicios'] == 2
+        assert efectivo['resumen']['2025-02']['total_valor'] == 25000.0
+        assert cobrar['resumen']['2025-01']['total_servicios'] == 1
+
+    def test_se_guarda_en_el_snapshot(self, tmp_path, excel_servicios, monkeypatch):
+        """Test que el cubo de un snapshot se lee del disco tras vaciar la caché"""
+        snapshot = create_snapshot('b' * 64, get_sheets(excel_servicios))
+        cubo = get_cube(snapshot)
+        assert os.path.isfile(os.path.join(snapshot, CUBO_ARCHIVO))
+
+        get_workbook_cache().clear()
+        monkeypatch.setattr(analytics_cube, 'read_analysis_frame', lambda ruta: pytest.fail('volvió a leer el libro'))
+        leido = get_cube(snapshot)
+
+        pd.testing.assert_frame_equal(leido.tabla, cubo.tabla)
+        assert leido.columnas == cubo.columnas
+        assert leido.esquema['PARA_JG'] == 'PARA JG'
+
+
+def escribir_libro(ruta, hojas):
+    """Escribe {nombre: DataFrame} como un libro con varias hojas"""
+    with pd.ExcelWriter(ruta, engine='openpyxl') as writer:
+        for nombre, df in hojas.items():
+            df.to_excel(writer, sheet_name=nombre, index=False)
+    return str(ruta)
+
+
+class TestBuildIncremental:
+    """Tests del armado del cubo por bloques"""
+
+    @pytest.fixture
+    def filas_armadas(self, monkeypatch):
+        """Filas que pasan por build_blocks en cada llamada"""
+        filas = []
+        original = AnalyticsCube.build_blocks.__func__
+        monkeypatch.setattr(AnalyticsCube, 'build_blocks',
+                            classmethod(lambda cls, df, bloques: filas.append(len(df)) or original(cls, df, bloques)))
+        monkeypatch.setattr(Config, 'ANALYTICS_BLOCK_ROWS', 2)
+        return filas
+
+    def test_igual_al_cubo_completo(self, servicios):
+        """Test que unir los cubos de los bloques da lo mismo que armarlo de una vez"""
+        df = normalize_frame(servicios)
+        df.attrs['filas_por_hoja'] = [4, 2]
+        completo = AnalyticsCube.build(df)
+        por_bloques = build_incremental(df, filas_bloque=3)
+
+        dimensiones = list(AnalyticsCube.DIMENSIONES)
+        pd.testing.assert_frame_equal(por_bloques.totals(dimensiones), completo.totals(dimensiones))
+        assert len(por_bloques) == len(completo)
+        assert por_bloques.tabla.dtypes.equals(completo.tabla.dtypes)
+        assert por_bloques.columnas == completo.columnas
+        # La segunda vez todos los bloques salen de la caché
+        pd.testing.assert_frame_equal(build_incremental(df, filas_bloque=3).tabla, por_bloques.tabla)
+
+    def test_filas_agregadas_solo_arman_los_bloques_nuevos(self, tmp_path, servicios, filas_armadas):
+        """Test que al volver a subir el libro con filas al final solo se agregan esas filas"""
+        enero, febrero = servicios.iloc[:4], servicios.iloc[4:]
+        original = escribir_libro(tmp_path / 'v1.xlsx', {'ENERO': enero, 'FEBRERO': febrero.iloc[:1]})
+        get_cube(original)
+        assert filas_armadas == [5]
+
+        nuevo = escribir_libro(tmp_path / 'v2.xlsx', {'ENERO': enero, 'FEBRERO': febrero})
+        cubo = get_cube(nuevo)
+
+        # ENERO no cambió; de FEBRERO solo se rehace su único bloque, que ahora tiene dos filas
+        assert filas_armadas == [5, 2]
+        completo = AnalyticsCube.build(normalize_frame(servicios))
+        assert cubo.totals().at[0, 'cantidad'] == completo.totals().at[0, 'cantidad'] == 6
+        assert cubo.totals().at[0, 'jg'] == completo.totals().at[0, 'jg']
+
+    def test_edicion_en_fila_antigua_rehace_su_bloque(self, tmp_path, servicios, filas_armadas):
+        """Test que editar una fila antigua solo vuelve a agregar el bloque que la contiene"""
+        get_cube(escribir_libro(tmp_path / 'v1.xlsx', {'SERVICIOS': servicios}))
+        editado = servicios.copy()
+        editado.at[2, 'PARA JG'] = 99000
+        cubo = get_cube(escribir_libro(tmp_path / 'v2.xlsx', {'SERVICIOS': editado}))
+
+        assert filas_armadas == [6, 2]
+        assert cubo.totals().at[0, 'jg'] == servicios['PARA JG'].sum() - 20000 + 99000
+
+    def test_sin_bloques(self, servicios, filas_armadas, monkeypatch):
+        """Test que con ANALYTICS_BLOCK_ROWS en 0 se arma el cubo completo"""
+        monkeypatch.setattr(Config, 'ANALYTICS_BLOCK_ROWS', 0)
+        df = normalize_frame(servicios)
+        cubo = build_incremental(df)
+
+        assert filas_armadas == []
+        pd.testing.assert_frame_equal(cubo.tabla, AnalyticsCube.build(df).tabla)
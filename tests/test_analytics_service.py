@@ -101,7 +101,19 @@ class TestAnalyticsService:
             assert 'fecha' in servicio
             assert 'estado' in servicio
             assert 'dias_sin_relacionar' in servicio
-    
+
+    def test_get_pending_cash_analytics_detalle_ordenado(self, sample_excel_data):
+        """Test que el detalle viene del más antiguo al más reciente con tipos nativos"""
+        result = AnalyticsService.get_pending_cash_analytics(sample_excel_data)
+
+        dias = [servicio['dias_sin_relacionar'] for servicio in result['detalle']]
+        assert dias == sorted(dias, reverse=True)
+        for servicio in result['detalle']:
+            assert type(servicio['dias_sin_relacionar']) is int
+            assert type(servicio['es_antiguo']) is bool
+            # Sin PARA ABRECAR el subtotal es el valor de PARA JG
+            assert servicio['subtotal'] == servicio['total_abrecar']
+
     def test_get_pending_charges_analytics_success(self, sample_excel_data):
         """Test que get_pending_charges_analytics funciona"""
         result = AnalyticsService.get_pending_charges_analytics(sample_excel_data)
@@ -144,3 +156,22 @@ class TestAnalyticsServiceEdgeCases:
         # Debería lanzar error por falta de columnas requeridas
         with pytest.raises(ValueError):
             AnalyticsService.get_general_analytics(str(excel_path))
+
+    def test_fechas_texto_con_dia_primero(self, tmp_path):
+        """Test que las fechas escritas como texto se leen con el día primero"""
+        df = pd.DataFrame({
+            'FECHA': ['05/01/2025', '20/01/2025', '03/02/2025'],
+            'ESTADO DEL SERVICIO': ['ya relacionado', 'YA RELACIONADO ', 'COTIZACIÓN'],
+            'FORMA DE PAGO': ['efectivo', 'EFECTIVO', 'Efectivo'],
+            'X50%/X25%': ['X50%'] * 3,
+            'PARA JG': ['$ 10,000', 20000, None],
+        })
+        excel_path = tmp_path / "fechas_texto.xlsx"
+        df.to_excel(excel_path, index=False, engine='openpyxl')
+
+        result = AnalyticsService.get_general_analytics(str(excel_path))
+
+        assert list(result['resumen']) == ['Enero 2025', 'Febrero 2025']
+        assert result['resumen']['Enero 2025']['efectivo_relacionado_cantidad'] == 2
+        assert result['resumen']['Enero 2025']['efectivo_total_jg'] == 30000.0
+        assert result['estados_grafico']['COTIZACION'] == 1
@@ -0,0 +1,130 @@
+"""
+Tests para los adjuntos subidos a /api/attachments.
+Valida la deduplicación por hash, el rechazo de archivos que no son
+imágenes, el uso de los ids en los endpoints de PDF y la expiración por TTL.
+"""
+import io
+import json
+import os
+import time
+
+import pandas as pd
+from PIL import Image
+
+from core.attachments import get_attachment_path
+from core.image_pipeline import FORMATO_AUTO, PerfilImagen, image_cache_key, prepare_images, remove_prepared
+from utils.temp_file_manager import cleanup_temp_directory
+
+
+def imagen_bytes(tamano=(60, 40), formato='JPEG', color='red'):
+    """Imagen sintética en binario"""
+    buffer = io.BytesIO()
+    Image.new('RGB', tamano, color).save(buffer, formato)
+    return buffer.getvalue()
+
+
+def subir(client, *archivos):
+    """Sube los archivos (nombre, bytes) a /api/attachments"""
+    data = {'files': [(io.BytesIO(contenido), nombre) for nombre, contenido in archivos]}
+    return client.post('/api/attachments', data=data, content_type='multipart/form-data')
+
+
+class TestSubida:
+    """Tests de POST /api/attachments"""
+
+    def test_subida_con_duplicados(self, client, app):
+        """Test que la misma imagen subida dos veces retorna el mismo id y se guarda una vez"""
+        foto = imagen_bytes()
+        response = subir(client, ('a.jpg', foto), ('b.png', imagen_bytes(formato='PNG')), ('c.jpg', foto))
+
+        assert response.status_code == 201
+        adjuntos = response.get_json()['attachments']
+        assert [a['duplicate'] for a in adjuntos] == [False, False, True]
+        assert adjuntos[0]['id'] == adjuntos[2]['id'] != adjuntos[1]['id']
+        assert adjuntos[0]['size'] == len(foto)
+        with app.app_context():
+            assert get_attachment_path(adjuntos[0]['id']).endswith('.jpg')
+            assert get_attachment_path(adjuntos[1]['id']).endswith('.png')
+            assert len(os.listdir(os.path.dirname(get_attachment_path(adjuntos[0]['id'])))) == 2
+
+    def test_archivo_que_no_es_imagen(self, client):
+        """Test que un archivo que no es imagen se rechaza sin afectar a los demás"""
+        response = subir(client, ('a.jpg', imagen_bytes()), ('notas.txt', b'no soy una imagen'))
+
+        assert response.status_code == 400
+        datos = response.get_json()
+        assert len(datos['attachments']) == 1
+        assert datos['invalid'][0]['filename'] == 'notas.txt'
+
+    def test_sin_archivos(self, client):
+        """Test que una petición sin archivos retorna 400"""
+        assert client.post('/api/attachments', data={}, content_type='multipart/form-data').status_code == 400
+
+    def test_expiracion(self, client, app):
+        """Test que los adjuntos sin usar expiran y usarlos renueva el TTL"""
+        ids = [a['id'] for a in subir(client, ('a.jpg', imagen_bytes()),
+                                       ('b.jpg', imagen_bytes(color='blue'))).get_json()['attachments']]
+        with app.app_context():
+            viejo = time.time() - 2 * app.config['ATTACHMENT_TTL_SECONDS']
+            for attachment_id in ids:
+                os.utime(get_attachment_path(attachment_id), (viejo, viejo))
+        # Usar el primero en un PDF renueva su TTL
+        assert client.post('/api/gastos/generar-pdf',
+                           json={'gastos': [], 'imagenesGastos': [ids[0]]}).status_code != 400
+
+        with app.app_context():
+            cleanup_temp_directory()
+            assert get_attachment_path(ids[0]) is not None
+            assert get_attachment_path(ids[1]) is None
+
+
+class TestUsoEnPDF:
+    """Tests de los ids de adjuntos en los endpoints de PDF"""
+
+    def test_pdf_gastos_con_ids(self, client):
+        """Test que el PDF de gastos acepta ids mezclados con base64"""
+        import base64
+        attachment_id = subir(client, ('a.jpg', imagen_bytes())).get_json()['attachments'][0]['id']
+        b64 = 'data:image/png;base64,' + base64.b64encode(imagen_bytes(formato='PNG', color='green')).decode()
+
+        response = client.post('/api/gastos/generar-pdf', json={
+            'gastos': [{'fecha': '2025-01-01', 'descripcion': 'Tubo', 'valor': 10000}],
+            'imagenesGastos': [attachment_id],
+            'imagenesConsignaciones': [b64],
+        })
+
+        assert response.status_code == 200
+        assert response.data.count(b'/Subtype /Image') == 2
+
+    def test_ids_inexistentes(self, client):
+        """Test que un id desconocido o expirado retorna 400 en los dos endpoints"""
+        desconocido = 'f' * 64
+        response = client.post('/api/gastos/generar-pdf', json={'gastos': [], 'imagenesGastos': [desconocido]})
+        assert response.status_code == 400
+        assert response.get_json()['attachments'] == [desconocido]
+
+        excel = io.BytesIO()
+        pd.DataFrame({'FECHA': ['2025-01-01'], 'PARA JG': [50000]}).to_excel(excel, index=False, engine='openpyxl')
+        excel.seek(0)
+        response = client.post('/api/pdf_relacion_servicios',
+                               data={'file': (excel, 'test.xlsx'), 'imagenes': json.dumps([desconocido])},
+                               content_type='multipart/form-data')
+        assert response.status_code == 400
+        assert response.get_json()['attachments'] == [desconocido]
+
+    def test_pipeline_con_ids(self, client, app):
+        """Test que el pipeline prepara un adjunto igual que su base64 y lo cachea por id"""
+        attachment_id = subir(client, ('a.jpg', imagen_bytes((800, 600)))).get_json()['attachments'][0]['id']
+        perfil = PerfilImagen(formato=FORMATO_AUTO, ancho=1, alto=1)
+        with app.app_context():
+            primera = prepare_images([attachment_id], perfil)
+            segunda = prepare_images([attachment_id], perfil)
+            try:
+                assert primera[0].ok and not primera[0].desde_cache
+                assert segunda[0].desde_cache
+                assert primera[0].bytes_origen == os.path.getsize(get_attachment_path(attachment_id))
+                with Image.open(segunda[0].ruta) as imagen:
+                    assert imagen.size == (267, 200)
+            finally:
+                remove_prepared(primera + segunda)
+            assert image_cache_key(attachment_id, perfil) is not None
@@ -0,0 +1,86 @@
+"""
+Tests para ClientClassifier.
+Valida que la versión vectorizada clasifique igual que la regla fila por fila
+y mide la mejora de rendimiento (con RUN_BENCHMARKS=1).
+"""
+import re
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from core.client_classifier import ClientClassifier
+
+
+def clasificar_cliente_legacy(valor):
+    """Implementación fila por fila anterior, usada como referencia"""
+    s = str(valor).strip().upper()
+    if not s or s == 'NAN': return 'OTROS'
+    if any(x in s for x in ['ADMINISTRACION', 'ADMON', 'CONJUNTO', 'EDIFICIO', 'TORRE', 'P.H.', 'PROPIEDAD', 'AGRUPACION']):
+        if not any(x in s for x in ['APTO', 'CASA', 'LOCAL', 'CONSULTORIO', 'OFICINA', 'BODEGA']):
+            return 'ADMINISTRACIÓN'
+    if any(x in s for x in ['EMPRESA', 'SAS', 'LTDA', 'PARROQUIA', 'COLEGIO', 'IGLESIA']):
+        return 'EMPRESA'
+    if any(x in s for x in ['LOCAL', 'TIENDA', 'C.C', 'BAR', 'BODEGA', 'CONSULTORIO', 'CONSULTIRIO', 'OFICINA', 'RESTAURANTE']):
+        return 'LOCAL'
+    if any(x in s for x in ['CASA', 'URBANIZACION', 'VIVIENDA']):
+        return 'CASA'
+    if re.search(r'\d', s):
+        return 'APTO'
+    return 'OTROS'
+
+
+VALORES = [
+    'TORRE 5 APTO 301', 'Torre 2', 'CONJUNTO LOS PINOS', 'conjunto los pinos casa 4', 'Edificio Central',
+    'P.H. El Bosque', 'PH El Bosque', 'Empresa XYZ SAS', 'Ferretería Ltda', 'Parroquia San José',
+    'Local 3', 'C.C Unicentro', 'CC Unicentro', 'Bar la 70', 'Consultirio 201', 'Oficina 502',
+    'Casa 12', 'Urbanización Las Flores', '301', '  1502  ', 'Bloque 4 int 2', 'xyz', '', '   ',
+    None, np.nan, 301, 12.5, 'Administración', 'ADMON TORRE 3 OFICINA', 'Restaurante', 'Vivienda',
+]
+
+
+class TestClientClassifier:
+    """Tests para ClientClassifier.classify"""
+
+    def test_coincide_con_regla_fila_por_fila(self):
+        """Test que cada valor se clasifica igual que la implementación anterior"""
+        serie = pd.Series(VALORES, dtype=object)
+
+        resultado = ClientClassifier.classify(serie)
+
+        assert resultado.tolist() == [clasificar_cliente_legacy(v) for v in VALORES]
+
+    def test_conserva_indice(self):
+        """Test que el resultado se alinea con el índice original"""
+        serie = pd.Series(['Casa 1', 'Local 2'], index=[10, 20])
+
+        resultado = ClientClassifier.classify(serie)
+
+        assert resultado.to_dict() == {10: 'CASA', 20: 'LOCAL'}
+
+    def test_serie_vacia(self):
+        """Test que una serie vacía retorna una serie vacía"""
+        assert ClientClassifier.classify(pd.Series([], dtype=object)).empty
+
+
+class TestClientClassifierRendimiento:
+    """Benchmark sobre una columna sintética de 100k filas"""
+
+    @pytest.mark.benchmark
+    def test_benchmark_100k_filas(self):
+        """Test que la versión vectorizada es más rápida que el apply fila por fila"""
+        rng = np.random.default_rng(0)
+        unicos = VALORES + [f'TORRE {i} APTO {i * 3}' for i in range(500)] + [f'Local {i}' for i in range(500)]
+        serie = pd.Series(rng.choice(np.array(unicos, dtype=object), size=100_000))
+
+        inicio = time.perf_counter()
+        esperado = serie.apply(clasificar_cliente_legacy)
+        tiempo_legacy = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        resultado = ClientClassifier.classify(serie)
+        tiempo_vectorizado = time.perf_counter() - inicio
+
+        print(f"\nclasificar_cliente 100k filas: apply {tiempo_legacy:.3f}s, "
+              f"vectorizado {tiempo_vectorizado:.3f}s ({tiempo_legacy / tiempo_vectorizado:.1f}x)")
+        assert resultado.tolist() == esperado.tolist()
+        assert tiempo_vectorizado < tiempo_legacy
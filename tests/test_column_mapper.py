@@ -0,0 +1,128 @@
+"""
+Tests para ColumnMapper.
+Valida que resolve_all elija las mismas columnas que find_column, que resuelva
+encabezados inesperados por aproximación y que los resultados en caché sean
+inmutables.
+"""
+import time
+
+import pandas as pd
+import pytest
+
+from config.settings import EXCEL_COLUMNS
+from core.column_mapper import ColumnMapper, ColumnSchema
+
+
+ENCABEZADOS = [
+    ['FECHA', 'DIRECCION', 'FORMA DE PAGO', 'ESTADO DEL SERVICIO', 'PARA JG', 'X50%/X25%'],
+    ['Fecha Servicio', 'Dirección', 'forma_pago', 'Estado', 'J.G.', 'PARA ABRECAR', 'IVA 19%'],
+    # Varias variantes de la misma columna: gana la listada primero
+    ['UBICACION', 'DIRECCION', 'SERVICIO', 'SERVICIO REALIZADO', 'TORRE', 'APTO'],
+    # Nombres que normalizan igual: gana la última columna
+    ['PARA JG', 'para_jg', 'Para  JG', 'IVA', 'iva'],
+    ['Unnamed: 0', None, 3, 'NOTAS', 'VALOR'],
+    [],
+]
+
+
+class TestColumnMapper:
+    """Tests de resolución de encabezados"""
+
+    @pytest.mark.parametrize('columnas', ENCABEZADOS)
+    def test_resolve_all_igual_que_find_column(self, columnas):
+        """Test que resolve_all da la misma columna que find_column para cada clave"""
+        df = pd.DataFrame(columns=columnas)
+        esquema = ColumnMapper.resolve_all(df.columns)
+
+        for logica, variantes in ColumnMapper.get_column_variants().items():
+            encontrada = ColumnMapper.find_column(df, variantes)
+            if encontrada is not None or esquema.confidence[logica] == 0.0:
+                assert esquema[logica] == encontrada, logica
+
+    def test_encabezado_inesperado_por_aproximacion(self):
+        """Test que abreviaturas y errores de tipeo se resuelven con su confianza"""
+        esquema = ColumnMapper.resolve_all(
+            ['F. SERVICIO', 'VR SERVICIO', 'FROMA DE PAGO', 'EST. SERVICIO', 'NOTAS', 'Unnamed: 5'])
+
+        assert esquema[EXCEL_COLUMNS['FECHA']] == 'F. SERVICIO'
+        assert esquema['VALOR_SERVICIO'] == 'VR SERVICIO'
+        assert esquema[EXCEL_COLUMNS['FORMA_PAGO']] == 'FROMA DE PAGO'
+        assert esquema[EXCEL_COLUMNS['ESTADO_SERVICIO']] == 'EST. SERVICIO'
+        assert esquema['PARA_JG'] is None
+        assert 0.8 <= esquema.confidence[EXCEL_COLUMNS['FECHA']] < 1.0
+        assert esquema.confidence['PARA_JG'] == 0.0
+        assert set(esquema.fuzzy()) == {EXCEL_COLUMNS['FECHA'], 'VALOR_SERVICIO',
+                                        EXCEL_COLUMNS['FORMA_PAGO'], EXCEL_COLUMNS['ESTADO_SERVICIO']}
+        assert esquema.warnings([EXCEL_COLUMNS['FECHA']]) == [
+            f"Se usó 'F. SERVICIO' como '{EXCEL_COLUMNS['FECHA']}' "
+            f"(confianza {esquema.confidence[EXCEL_COLUMNS['FECHA']]:.0%})"]
+
+    def test_aproximada_con_las_mismas_palabras_no_llega_a_1(self):
+        """Test que una coincidencia aproximada no se reporta con confianza 100%"""
+        esquema = ColumnMapper.resolve_all(['FECHA RELACIÓN SERVICIO'])
+        logica = EXCEL_COLUMNS['FECHA_RELACION']
+
+        assert esquema.fuzzy()[logica][0] == 'FECHA RELACIÓN SERVICIO'
+        assert 0.8 <= esquema.confidence[logica] < 1.0
+        assert '100%' not in esquema.warnings()[0]
+
+    def test_coincidencia_exacta_tiene_prioridad(self):
+        """Test que una variante exacta gana aunque otra columna se parezca más"""
+        esquema = ColumnMapper.resolve_all(['FECHA DE SERVICIO', 'F. SERVICIO', 'COLUMNA 1', 'TOTAL SERVICIO'])
+
+        assert esquema[EXCEL_COLUMNS['FECHA']] == 'FECHA DE SERVICIO'
+        assert esquema.confidence[EXCEL_COLUMNS['FECHA']] == 1.0
+        assert esquema['VALOR_SERVICIO'] is None
+        assert esquema.warnings() == []
+
+    def test_esquema_en_cache_por_encabezado(self):
+        """Test que un mismo encabezado reutiliza el mismo esquema"""
+        primero = ColumnMapper.resolve_all(pd.Index(['FECHA', 'PARA JG']))
+        segundo = ColumnMapper.resolve_all(['FECHA', 'PARA JG'])
+
+        assert primero is segundo
+        assert isinstance(primero, ColumnSchema)
+        assert primero[EXCEL_COLUMNS['FECHA']] == 'FECHA'
+        assert primero.missing([EXCEL_COLUMNS['FECHA'], 'PARA_ABRECAR']) == ['PARA_ABRECAR']
+
+    def test_esquema_y_variantes_inmutables(self):
+        """Test que el esquema en caché y las variantes no se pueden modificar"""
+        esquema = ColumnMapper.resolve_all(['FECHA'])
+        with pytest.raises(TypeError):
+            esquema['FECHA'] = 'OTRA'
+        with pytest.raises(TypeError):
+            ColumnMapper.get_column_variants()['FECHA'] = ('OTRA',)
+        with pytest.raises(AttributeError):
+            ColumnMapper.get_column_variants()['FECHA'].append('OTRA')
+
+    def test_logical_columns(self):
+        """Test que una variante puede pertenecer a varias columnas estándar"""
+        assert ColumnMapper.logical_columns('Dirección') == (
+            EXCEL_COLUMNS['DIRECCION'], EXCEL_COLUMNS['TORRE_APTO'])
+        assert ColumnMapper.logical_columns('NOTAS') == ()
+
+    @pytest.mark.benchmark
+    def test_resolve_all_mas_rapido_que_find_column(self):
+        """Test que resolver una hoja repetida es más rápido que buscar clave por clave"""
+        columnas = ENCABEZADOS[0] + [f'COLUMNA {i}' for i in range(30)]
+        df = pd.DataFrame(columns=columnas)
+        variantes = ColumnMapper.get_column_variants()
+        # La primera resolución de un encabezado queda en caché
+        ColumnMapper.resolve_all(df.columns)
+
+        inicio = time.perf_counter()
+        for _ in range(200):
+            for logica in variantes:
+                ColumnMapper.find_column(df, variantes[logica])
+        tiempo_find = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        for _ in range(200):
+            esquema = ColumnMapper.resolve_all(df.columns)
+            for logica in variantes:
+                esquema[logica]
+        tiempo_resolve = time.perf_counter() - inicio
+
+        print(f"\n200 hojas x {len(variantes)} columnas: find_column {tiempo_find:.4f}s, "
+              f"resolve_all {tiempo_resolve:.4f}s ({tiempo_find / tiempo_resolve:.1f}x)")
+        assert tiempo_resolve < tiempo_find
@@ -0,0 +1,36 @@
+"""
+Tests para las etiquetas de fechas en español.
+"""
+import pandas as pd
+from utils.date_labels import etiquetas_mes, fechas_largas, fecha_larga_es
+from utils.date_utils import fecha_larga
+
+
+class TestDateLabels:
+    """Tests para etiquetas_mes y fechas_largas"""
+
+    def test_etiquetas_mes_ordenadas_cronologicamente(self):
+        """Test que 'Diciembre 2024' queda antes que 'Abril 2025' al ordenar"""
+        fechas = pd.Series(pd.to_datetime(['2025-04-10', None, '2024-12-31', '2025-04-01']))
+
+        etiquetas = etiquetas_mes(fechas)
+
+        assert etiquetas.tolist()[0] == 'Abril 2025'
+        assert pd.isna(etiquetas.iloc[1])
+        assert list(etiquetas.cat.categories) == ['Diciembre 2024', 'Abril 2025']
+        assert etiquetas.dropna().sort_values().tolist() == ['Diciembre 2024', 'Abril 2025', 'Abril 2025']
+
+    def test_fechas_largas_igual_que_escalar(self):
+        """Test que la versión por columnas coincide con el formato por fila"""
+        fechas = pd.Series(pd.to_datetime(['2026-01-16 00:00', None, '2025-09-03 15:30', '2026-01-16 00:00']), index=[3, 1, 2, 0])
+
+        assert fechas_largas(fechas).tolist() == [fecha_larga_es(f) for f in fechas]
+        assert fechas_largas(fechas).tolist()[0] == '16 de enero de 2026'
+        assert fechas_largas(fechas, capitalizar=True, vacio='').tolist() == [fecha_larga(f) for f in fechas]
+        assert list(fechas_largas(fechas).index) == [3, 1, 2, 0]
+
+    def test_series_vacias(self):
+        """Test que series vacías o sin fechas válidas no fallan"""
+        assert fechas_largas(pd.Series([], dtype='datetime64[ns]')).empty
+        assert fechas_largas(pd.Series([pd.NaT])).tolist() == ['N/A']
+        assert etiquetas_mes(pd.Series([pd.NaT])).isna().all()
@@ -4,6 +4,7 @@ Valida el flujo completo de requests HTTP.
 """
 import pytest
 import io
+import json
 from app import create_app
 
 
@@ -159,6 +160,52 @@ class TestPendientesCobrarEndpoint:
             assert servicio['estado'] == 'PENDIENTE COBRAR'
 
 
+@pytest.fixture
+def excel_con_vacios():
+    """
+    Excel con dos hojas cuyo encabezado de FORMA DE PAGO difiere en un
+    espacio, como el libro real: al unirlas quedan NaN en columnas category
+    """
+    import pandas as pd
+
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        for hoja, forma_de_pago in [('Enero', 'FORMA DE PAGO '), ('Febrero', 'FORMA DE PAGO')]:
+            pd.DataFrame({
+                'FECHA': pd.date_range(f'2025-0{1 if hoja == "Enero" else 2}-01', periods=4, freq='D'),
+                'ESTADO DEL SERVICIO': ['', '', '', 'PENDIENTE COBRAR'],
+                forma_de_pago: ['EFECTIVO'] * 4,
+                'DIRECCION': ['Calle 123'] * 4,
+                'NOMBRE CLIENTE': ['Ana'] * 4,
+                'SERVICIO REALIZADO': ['Instalación'] * 4,
+                'VALOR SERVICIO': [100000] * 4,
+                'PARA JG': [50000] * 4,
+            }).to_excel(writer, sheet_name=hoja, index=False)
+    output.seek(0)
+    return output
+
+
+def json_estricto(response):
+    """Parsea la respuesta rechazando NaN e Infinity, como response.json() del navegador"""
+    def rechazar(token):
+        raise ValueError(f'Token no válido en JSON: {token}')
+    return json.loads(response.get_data(as_text=True), parse_constant=rechazar)
+
+
+class TestRespuestasJSON:
+    """Tests de que las filas de los reportes son JSON válido"""
+
+    @pytest.mark.parametrize('endpoint', ['/api/relacion_servicios', '/api/procesar_excel'])
+    def test_sin_nan_en_las_filas(self, client, excel_con_vacios, endpoint):
+        """Test que los vacíos de columnas category salen como null y no como NaN"""
+        response = client.post(endpoint, data={'file': (excel_con_vacios, 'test.xlsx'),
+                                               'fecha_inicio': '2025-01-01', 'fecha_fin': '2025-12-31'},
+                               content_type='multipart/form-data')
+
+        assert response.status_code == 200
+        assert json_estricto(response)['data']
+
+
 class TestCORSHeaders:
     """Tests para verificar headers CORS"""
     
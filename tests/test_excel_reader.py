@@ -0,0 +1,322 @@
+"""
+Tests para el lector de Excel por streaming.
+Valida que entregue los mismos DataFrames que pandas, que proyecte columnas y
+filtre fechas durante la lectura, y compara el pico de memoria de ambos lectores.
+"""
+import os
+import time
+import tracemalloc
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+from openpyxl.comments import Comment
+
+from core.excel_reader import project_sheets, read_workbook
+
+
+def leer_con_pandas(ruta):
+    """Lectura de referencia: todas las hojas con pd.ExcelFile"""
+    with pd.ExcelFile(ruta, engine='openpyxl') as xls:
+        return OrderedDict((hoja, xls.parse(hoja)) for hoja in xls.sheet_names)
+
+
+@pytest.fixture
+def libro_mixto(tmp_path):
+    """Libro con dos hojas, fechas como texto, vacíos y columnas sin encabezado"""
+    ruta = tmp_path / 'mixto.xlsx'
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'Enero'
+    ws.append(['FECHA', 'DIRECCION', 'FORMA DE PAGO', 'ESTADO DEL SERVICIO', 'PARA JG', None, 'NOTAS'])
+    ws.append([datetime(2025, 1, 5), 'Calle 1', 'EFECTIVO', None, 50000, None, 'x'])
+    ws.append([datetime(2025, 2, 10), 'Calle 2', 'TRANSFERENCIA', 'YA RELACIONADO', 60000.5, 'suelto', None])
+    ws.append(['15/01/2025', 'Calle 3', 'EFECTIVO', None, '70.000', None, None])
+    ws.append([None, 'Sin fecha', 'EFECTIVO', None, 1, None, None])
+    ws.append([datetime(2025, 1, 31), 'Calle 4', 'efectivo ', 'PENDIENTE COBRAR', None, None, None, 'extra'])
+    ws.append([])
+    otra = wb.create_sheet('Febrero')
+    otra.append(['Fecha Servicio', 'PARA JG', 'PARA JG'])
+    otra.append([datetime(2025, 2, 1), 10, 20])
+    wb.save(ruta)
+    return str(ruta)
+
+
+class TestExcelReader:
+    """Tests de equivalencia con pandas"""
+
+    def test_sin_proyeccion_igual_que_pandas(self, libro_mixto):
+        """Test que sin columnas ni rango se obtiene lo mismo que pd.ExcelFile"""
+        esperado = leer_con_pandas(libro_mixto)
+        resultado = read_workbook(libro_mixto)
+
+        assert list(resultado) == list(esperado)
+        for hoja in esperado:
+            pd.testing.assert_frame_equal(resultado[hoja], esperado[hoja])
+
+    def test_proyeccion_solo_columnas_pedidas(self, libro_mixto):
+        """Test que solo se materializan las columnas resueltas por ColumnMapper"""
+        resultado = read_workbook(libro_mixto, columnas=['FECHA', 'PARA_JG'])
+
+        assert list(resultado['Enero'].columns) == ['FECHA', 'PARA JG']
+        # El duplicado 'PARA JG.1' que genera pandas no es una variante de PARA_JG
+        assert list(resultado['Febrero'].columns) == ['Fecha Servicio', 'PARA JG']
+
+        esperado = project_sheets(leer_con_pandas(libro_mixto), columnas=['FECHA', 'PARA_JG'])
+        for hoja in esperado:
+            pd.testing.assert_frame_equal(resultado[hoja], esperado[hoja])
+
+    def test_rango_descarta_filas_durante_la_lectura(self, libro_mixto):
+        """Test que se omiten fechas vacías o fuera del rango y se conservan los textos"""
+        resultado = read_workbook(libro_mixto, columnas=['FECHA', 'DIRECCION'],
+                                  fecha_inicio=datetime(2025, 1, 1), fecha_fin=datetime(2025, 1, 31))
+
+        assert resultado['Enero']['DIRECCION'].tolist() == ['Calle 1', 'Calle 3', 'Calle 4']
+        assert resultado['Febrero'].empty
+
+        esperado = project_sheets(leer_con_pandas(libro_mixto), columnas=['FECHA', 'DIRECCION'],
+                                  fecha_inicio=datetime(2025, 1, 1), fecha_fin=datetime(2025, 1, 31))
+        pd.testing.assert_frame_equal(resultado['Enero'], esperado['Enero'])
+
+    def test_rango_sin_fecha_entre_las_columnas(self, libro_mixto):
+        """Test que el rango filtra igual en memoria aunque FECHA no se haya pedido"""
+        rango = dict(fecha_inicio=datetime(2025, 1, 1), fecha_fin=datetime(2025, 1, 31))
+        resultado = read_workbook(libro_mixto, columnas=['DIRECCION'], **rango)
+        esperado = project_sheets(leer_con_pandas(libro_mixto), columnas=['DIRECCION'], **rango)
+
+        assert resultado['Enero']['DIRECCION'].tolist() == ['Calle 1', 'Calle 3', 'Calle 4']
+        for hoja in esperado:
+            pd.testing.assert_frame_equal(resultado[hoja], esperado[hoja])
+
+    def test_hoja_sin_columnas_requeridas_no_se_recorre(self, libro_mixto):
+        """Test que una hoja sin las columnas requeridas se retorna solo con su encabezado"""
+        resultado = read_workbook(libro_mixto, columnas=['FECHA', 'DIRECCION', 'PARA_JG'],
+                                  requeridas=['FECHA', 'DIRECCION'])
+
+        assert len(resultado['Enero']) == 5
+        assert resultado['Febrero'].empty
+        assert list(resultado['Febrero'].columns) == ['Fecha Servicio', 'PARA JG']
+
+        esperado = project_sheets(leer_con_pandas(libro_mixto), columnas=['FECHA', 'DIRECCION', 'PARA_JG'],
+                                  requeridas=['FECHA', 'DIRECCION'])
+        assert esperado['Febrero'].empty
+        pd.testing.assert_frame_equal(resultado['Enero'], esperado['Enero'])
+
+    def test_encabezado_aproximado_se_proyecta_y_filtra(self, tmp_path):
+        """Test que una columna resuelta por aproximación se lee y sirve para el rango"""
+        ruta = tmp_path / 'abreviado.xlsx'
+        wb = Workbook()
+        wb.active.append(['F. SERVICIO', 'VR SERVICIO', 'NOTAS'])
+        wb.active.append([datetime(2025, 1, 5), 1000, 'x'])
+        wb.active.append([datetime(2025, 3, 5), 2000, 'y'])
+        wb.save(ruta)
+
+        resultado = read_workbook(str(ruta), columnas=['FECHA', 'VALOR_SERVICIO'], requeridas=['FECHA'],
+                                  fecha_inicio=datetime(2025, 1, 1), fecha_fin=datetime(2025, 1, 31))
+
+        assert list(resultado['Sheet'].columns) == ['F. SERVICIO', 'VR SERVICIO']
+        assert resultado['Sheet']['VR SERVICIO'].tolist() == [1000]
+
+    def test_acepta_archivo_abierto(self, libro_mixto):
+        """Test que también lee desde un archivo binario abierto"""
+        with open(libro_mixto, 'rb') as f:
+            f.read(10)
+            resultado = read_workbook(f, columnas=['FORMA DE PAGO'], contiene=['NOTA'])
+
+        assert list(resultado['Enero'].columns) == ['FORMA DE PAGO', 'NOTAS']
+        assert len(resultado['Enero']) == 5
+
+
+class TestExcelReaderSinParserInterno:
+    """Tests del recorrido con iter_rows() cuando no se usan los internos de openpyxl"""
+
+    CASOS = [
+        dict(),
+        dict(columnas=['FECHA', 'PARA_JG']),
+        dict(columnas=['FECHA', 'DIRECCION'], requeridas=['FECHA'], contiene=['MATERIAL'],
+             fecha_inicio=datetime(2025, 1, 1), fecha_fin=datetime(2025, 1, 31)),
+    ]
+
+    @pytest.mark.parametrize('forzar', ['version', 'firma'])
+    def test_iter_rows_igual_que_el_parser(self, libro_mixto, monkeypatch, forzar):
+        """Test que con otra versión de openpyxl, o si cambió su parser interno, se leen los mismos datos"""
+        import core.excel_reader as excel_reader
+
+        def otra_firma(self, *args, **kwargs):
+            raise TypeError('argumento inesperado')
+
+        esperados = [read_workbook(libro_mixto, **caso) for caso in self.CASOS]
+
+        usados = []
+        original = excel_reader._filas_publicas
+        monkeypatch.setattr(excel_reader, '_filas_publicas', lambda hoja: usados.append(hoja) or original(hoja))
+        if forzar == 'version':
+            monkeypatch.setattr(excel_reader, '_PARSER_PROYECTADO', False)
+        else:
+            monkeypatch.setattr(excel_reader._ParserProyectado, '__init__', otra_firma)
+
+        for caso, esperado in zip(self.CASOS, esperados):
+            resultado = read_workbook(libro_mixto, **caso)
+            assert list(resultado) == list(esperado)
+            for hoja in esperado:
+                pd.testing.assert_frame_equal(resultado[hoja], esperado[hoja])
+        assert usados
+
+
+class TestExcelReaderRendimiento:
+    """Lectura de una hoja ancha con comentarios"""
+
+    @pytest.fixture
+    def hoja_ancha(self, tmp_path):
+        """Hoja de 2000 filas x 40 columnas con comentarios en una columna no pedida"""
+        ruta = tmp_path / 'ancha.xlsx'
+        wb = Workbook()
+        ws = wb.active
+        ws.append(['FECHA', 'FORMA DE PAGO', 'ESTADO DEL SERVICIO', 'PARA JG']
+                  + [f'COLUMNA {i}' for i in range(36)])
+        for fila in range(2000):
+            ws.append([datetime(2025, 1, fila % 28 + 1), 'EFECTIVO', None, 1000 * fila]
+                      + [f'dato {fila} {i}' for i in range(36)])
+        for fila in range(2, 2002, 20):
+            ws.cell(row=fila, column=10).comment = Comment('revisar', 'admin')
+        wb.save(ruta)
+        return str(ruta)
+
+    def test_hoja_ancha_con_comentarios(self, hoja_ancha):
+        """Test que proyectar 4 de 40 columnas da lo mismo que leer la hoja completa"""
+        resultado = read_workbook(hoja_ancha, columnas=['FECHA', 'FORMA DE PAGO', 'ESTADO DEL SERVICIO', 'PARA_JG'])
+        esperado = leer_con_pandas(hoja_ancha)
+
+        pd.testing.assert_frame_equal(resultado['Sheet'], esperado['Sheet'].iloc[:, :4])
+
+    @pytest.mark.benchmark
+    def test_proyeccion_mas_rapida_que_pandas(self, hoja_ancha):
+        """Test que proyectar 4 de 40 columnas es más rápido que leer la hoja completa"""
+        inicio = time.perf_counter()
+        leer_con_pandas(hoja_ancha)
+        tiempo_pandas = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        read_workbook(hoja_ancha, columnas=['FECHA', 'FORMA DE PAGO', 'ESTADO DEL SERVICIO', 'PARA_JG'])
+        tiempo_proyectado = time.perf_counter() - inicio
+
+        print(f"\nHoja de 2000 filas x 40 columnas: pd.ExcelFile {tiempo_pandas:.3f}s, "
+              f"proyectado {tiempo_proyectado:.3f}s ({tiempo_pandas / tiempo_proyectado:.1f}x)")
+        assert tiempo_proyectado < tiempo_pandas
+
+
+class TestExcelReaderMemoria:
+    """Benchmark de memoria sobre un libro sintético de varias hojas"""
+
+    def test_pico_de_memoria_proyectado(self, tmp_path):
+        """Test que leer solo las columnas de analytics usa menos memoria que pd.ExcelFile"""
+        ruta = tmp_path / 'grande.xlsx'
+        rng = np.random.default_rng(0)
+        columnas_extra = [f'COLUMNA {i}' for i in range(26)]
+        wb = Workbook(write_only=True)
+        for mes in range(3):
+            ws = wb.create_sheet(f'Hoja {mes}')
+            ws.append(['FECHA', 'FORMA DE PAGO', 'ESTADO DEL SERVICIO', 'PARA JG'] + columnas_extra)
+            for dia in range(500):
+                ws.append([datetime(2025, mes + 1, dia % 28 + 1), 'EFECTIVO', 'PENDIENTE COBRAR',
+                           int(rng.integers(1, 100)) * 1000]
+                          + [f'texto {dia} {i}' for i in range(len(columnas_extra))])
+        wb.save(ruta)
+
+        tracemalloc.start()
+        esperado = leer_con_pandas(str(ruta))
+        pico_pandas = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del esperado
+
+        tracemalloc.start()
+        resultado = read_workbook(str(ruta), columnas=['FECHA', 'FORMA DE PAGO', 'ESTADO DEL SERVICIO', 'PARA_JG'])
+        pico_streaming = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print(f"\nPico de memoria 3 hojas x 500 filas x 30 columnas: pd.ExcelFile "
+              f"{pico_pandas / 2**20:.1f} MiB, streaming proyectado {pico_streaming / 2**20:.1f} MiB "
+              f"({pico_pandas / pico_streaming:.1f}x)")
+        assert sum(len(df) for df in resultado.values()) == 1500
+        assert pico_streaming < pico_pandas / 2
+
+
+class TestExcelReaderParalelo:
+    """Tests del modo con pool de procesos"""
+
+    @pytest.fixture
+    def libro_mensual(self, tmp_path):
+        """Libro con una hoja por mes"""
+        ruta = tmp_path / 'mensual.xlsx'
+        wb = Workbook(write_only=True)
+        for mes in range(1, 5):
+            ws = wb.create_sheet(f'Mes {mes}')
+            ws.append(['FECHA', 'FORMA DE PAGO', 'PARA JG', 'NOTAS'])
+            for dia in range(1, 29):
+                ws.append([datetime(2025, mes, dia), 'EFECTIVO' if dia % 2 else 'TRANSFERENCIA',
+                           dia * 1000, None if dia % 3 else 'revisar'])
+        wb.save(ruta)
+        return str(ruta)
+
+    def test_paralelo_igual_que_en_serie(self, libro_mensual):
+        """Test que el pool entrega las mismas hojas y en el mismo orden"""
+        opciones = dict(columnas=['FECHA', 'PARA_JG'], fecha_inicio=datetime(2025, 2, 10),
+                        fecha_fin=datetime(2025, 3, 20))
+        en_serie = read_workbook(libro_mensual, workers=0, **opciones)
+        with open(libro_mensual, 'rb') as f:
+            en_paralelo = read_workbook(f, workers=2, **opciones)
+
+        assert list(en_paralelo) == ['Mes 1', 'Mes 2', 'Mes 3', 'Mes 4']
+        for hoja in en_serie:
+            pd.testing.assert_frame_equal(en_paralelo[hoja], en_serie[hoja])
+        assert len(en_paralelo['Mes 2']) == 19
+        assert en_paralelo['Mes 1'].empty
+
+    def test_procesos_reciben_la_ruta_sin_fork(self, libro_mensual, monkeypatch):
+        """Test que el pool no usa fork y que un archivo abierto se pasa como una sola copia en disco"""
+        import core.excel_reader as excel_reader
+        from concurrent.futures import ThreadPoolExecutor
+
+        assert excel_reader._contexto_procesos().get_start_method() != 'fork'
+
+        rutas = []
+
+        class Registro(ThreadPoolExecutor):
+            def submit(self, fn, source, *args):
+                rutas.append(source)
+                assert os.path.isfile(source)
+                return super().submit(fn, source, *args)
+
+        with Registro(max_workers=2) as executor:
+            monkeypatch.setattr(excel_reader, 'get_parse_executor', lambda workers: executor)
+            with open(libro_mensual, 'rb') as f:
+                hojas = read_workbook(f, workers=2, columnas=['FECHA', 'PARA_JG'])
+
+        assert len(hojas) == 4
+        assert len(rutas) == 2 and len(set(rutas)) == 1 and rutas[0] != libro_mensual
+        assert not os.path.exists(rutas[0])
+
+    def test_una_hoja_se_lee_en_serie(self, libro_mixto, monkeypatch):
+        """Test que un libro de una sola hoja no usa el pool"""
+        import core.excel_reader as excel_reader
+
+        def sin_pool(workers):
+            raise AssertionError('no debería crear el pool')
+
+        monkeypatch.setattr(excel_reader, 'get_parse_executor', sin_pool)
+        ruta = libro_mixto.replace('mixto.xlsx', 'una_hoja.xlsx')
+        wb = Workbook()
+        wb.active.append(['FECHA', 'PARA JG'])
+        wb.active.append([datetime(2025, 1, 1), 5])
+        wb.save(ruta)
+
+        hojas = read_workbook(ruta, workers=4)
+        assert len(hojas['Sheet']) == 1
+
+    def test_workers_por_defecto_en_serie(self):
+        """Test que por defecto el modo paralelo está desactivado"""
+        from config.config import Config
+        assert Config.EXCEL_PARSE_WORKERS == 0
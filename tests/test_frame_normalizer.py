@@ -0,0 +1,156 @@
+"""
+Tests para la normalización de tipos al leer las hojas.
+Valida las etiquetas canónicas, los montos, las fechas con el día primero,
+que normalizar dos veces no cambie nada y que la caché guarde la hoja normalizada.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import warnings
+
+import pytest
+
+from core import frame_normalizer
+from core.frame_normalizer import canonical_labels, concat_frames, normalize_frame, to_dates
+from core.workbook_cache import get_sheets, get_workbook_cache
+
+
+@pytest.fixture
+def hoja_servicios():
+    """Hoja como llega del Excel: todo object, con vacíos y textos sucios"""
+    return pd.DataFrame({
+        'FECHA': [datetime(2025, 1, 5), '15/01/2025', '05/02/2025', None, 'sin fecha'],
+        'ESTADO DEL SERVICIO': ['YA RELACIONADO', ' pendiente cobrar ', 'COTIZACIÓN', None, ''],
+        'FORMA DE PAGO': ['efectivo ', 'EFECTIVO', 'Transferencia', 'None', np.nan],
+        'X50%/X25%': ['X50%', 'x25%', None, 'X50%', 'X50%'],
+        'PARA JG': [50000, '$ 1,000', '30.000', None, 'abc'],
+        'DIRECCION': ['Calle 1', None, 'Calle 3', 'Calle 4', 'Calle 5'],
+    }, dtype=object)
+
+
+class TestFrameNormalizer:
+    """Tests de normalize_frame"""
+
+    def test_tipos_normalizados(self, hoja_servicios):
+        """Test que cada grupo de columnas queda con su dtype compacto"""
+        df = normalize_frame(hoja_servicios)
+
+        assert isinstance(df['ESTADO DEL SERVICIO'].dtype, pd.CategoricalDtype)
+        assert isinstance(df['FORMA DE PAGO'].dtype, pd.CategoricalDtype)
+        assert isinstance(df['X50%/X25%'].dtype, pd.CategoricalDtype)
+        assert df['PARA JG'].dtype == np.float64
+        assert pd.api.types.is_datetime64_any_dtype(df['FECHA'])
+        # Las columnas que no se normalizan quedan igual
+        assert df['DIRECCION'].dtype == object
+        # La hoja original no se modifica
+        assert hoja_servicios['PARA JG'].dtype == object
+
+    def test_etiquetas_canonicas(self, hoja_servicios):
+        """Test que estados y formas de pago quedan en mayúsculas, sin tildes y con NaN para vacíos"""
+        df = normalize_frame(hoja_servicios)
+
+        assert df['ESTADO DEL SERVICIO'].tolist()[:3] == ['YA RELACIONADO', 'PENDIENTE COBRAR', 'COTIZACION']
+        assert df['ESTADO DEL SERVICIO'].isna().tolist() == [False, False, False, True, True]
+        assert df['FORMA DE PAGO'].tolist()[:3] == ['EFECTIVO', 'EFECTIVO', 'TRANSFERENCIA']
+        assert df['FORMA DE PAGO'].isna().sum() == 2
+        assert df['X50%/X25%'].tolist()[1] == 'X25%'
+
+    def test_montos_y_fechas(self, hoja_servicios):
+        """Test que los montos se leen con punto de miles y los textos de fecha van con el día primero"""
+        df = normalize_frame(hoja_servicios)
+
+        assert df['PARA JG'].tolist() == [50000.0, 1000.0, 30000.0, 0.0, 0.0]
+        assert df['FECHA'].tolist()[:3] == [pd.Timestamp(2025, 1, 5), pd.Timestamp(2025, 1, 15),
+                                            pd.Timestamp(2025, 2, 5)]
+        assert df['FECHA'].isna().tolist()[3:] == [True, True]
+
+    def test_idempotente(self, hoja_servicios):
+        """Test que normalizar una hoja ya normalizada no cambia nada"""
+        una_vez = normalize_frame(hoja_servicios)
+        pd.testing.assert_frame_equal(normalize_frame(una_vez), una_vez)
+        assert canonical_labels(una_vez['ESTADO DEL SERVICIO']) is una_vez['ESTADO DEL SERVICIO']
+        assert to_dates(una_vez['FECHA']) is una_vez['FECHA']
+
+    def test_concat_conserva_category(self, hoja_servicios):
+        """Test que al juntar hojas con categorías distintas el resultado sigue siendo category"""
+        primera = normalize_frame(hoja_servicios.iloc[:2])
+        segunda = normalize_frame(hoja_servicios.iloc[2:])
+
+        df = concat_frames([primera, segunda])
+        assert isinstance(df['ESTADO DEL SERVICIO'].dtype, pd.CategoricalDtype)
+        assert df['ESTADO DEL SERVICIO'].tolist()[:3] == ['YA RELACIONADO', 'PENDIENTE COBRAR', 'COTIZACION']
+
+    def test_concat_omite_hojas_vacias_sin_advertencia(self, hoja_servicios):
+        """Test que las hojas sin filas o sin valores no llegan a pd.concat (FutureWarning)"""
+        llena = normalize_frame(hoja_servicios)
+        sin_filas = llena.iloc[0:0]
+        sin_valores = pd.DataFrame({col: [np.nan] * 2 for col in llena.columns}, dtype=object)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', FutureWarning)
+            df = concat_frames([sin_filas, llena, sin_valores])
+            vacia = concat_frames([sin_filas, sin_valores])
+
+        pd.testing.assert_frame_equal(df, concat_frames([llena]))
+        assert vacia.empty and list(vacia.columns) == list(llena.columns)
+
+    def test_concat_columnas_vacias_de_otro_dtype(self, hoja_servicios):
+        """Test que una columna sin valores en una hoja toma el dtype de las demás, sin advertencia"""
+        primera = normalize_frame(hoja_servicios.iloc[:2])
+        segunda = normalize_frame(hoja_servicios.iloc[2:])
+        segunda['DIRECCION'] = np.nan
+        segunda['FECHA'] = np.nan
+        segunda['FORMA DE PAGO'] = pd.Series(np.nan, index=segunda.index, dtype='category')
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', FutureWarning)
+            df = concat_frames([primera, segunda])
+
+        assert df['DIRECCION'].dtype == object
+        assert pd.api.types.is_datetime64_any_dtype(df['FECHA'])
+        assert isinstance(df['FORMA DE PAGO'].dtype, pd.CategoricalDtype)
+        assert df['DIRECCION'].iloc[2:].isna().all()
+        assert len(df) == 5
+
+    def test_memoria_menor_que_object(self):
+        """Test que la hoja normalizada ocupa menos memoria que la original"""
+        n = 5000
+        df = pd.DataFrame({
+            'ESTADO DEL SERVICIO': np.resize(['YA RELACIONADO', 'PENDIENTE COBRAR', None], n),
+            'FORMA DE PAGO': np.resize(['EFECTIVO', 'TRANSFERENCIA'], n),
+            'PARA JG': np.resize(['50000', '$ 1,000'], n),
+        }, dtype=object)
+
+        original = df.memory_usage(deep=True).sum()
+        normalizada = normalize_frame(df).memory_usage(deep=True).sum()
+        assert normalizada < original / 4
+
+
+class TestGetSheetsNormalizadas:
+    """Tests de get_sheets(normalizar=True)"""
+
+    @pytest.fixture(autouse=True)
+    def cache_limpia(self):
+        get_workbook_cache().clear()
+        yield
+        get_workbook_cache().clear()
+
+    def test_normaliza_una_sola_vez(self, tmp_path, hoja_servicios, monkeypatch):
+        """Test que la hoja normalizada queda en caché y cada llamada recibe una copia"""
+        ruta = tmp_path / 'servicios.xlsx'
+        hoja_servicios.to_excel(ruta, index=False, engine='openpyxl')
+
+        llamadas = []
+        original = frame_normalizer.normalize_frame
+        monkeypatch.setattr(frame_normalizer, 'normalize_frame', lambda df: llamadas.append(1) or original(df))
+
+        primera = get_sheets(str(ruta), columnas=['PARA_JG', 'ESTADO DEL SERVICIO'], normalizar=True)
+        primera['Sheet1']['PARA JG'] = -1.0
+        segunda = get_sheets(str(ruta), columnas=['PARA_JG', 'ESTADO DEL SERVICIO'], normalizar=True)
+
+        assert len(llamadas) == 1
+        assert segunda['Sheet1']['PARA JG'].tolist() == [50000.0, 1000.0, 30000.0, 0.0, 0.0]
+        assert list(segunda['Sheet1'].columns) == ['ESTADO DEL SERVICIO', 'PARA JG']
+        # Sin normalizar se sigue recibiendo la hoja tal como viene del Excel
+        assert get_sheets(str(ruta))['Sheet1']['PARA JG'].dtype == object
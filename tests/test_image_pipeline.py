@@ -0,0 +1,309 @@
+"""
+Tests para la preparación de imágenes adjuntas a los PDF.
+Valida el orden de los resultados en paralelo, los errores por imagen, la
+orientación EXIF, la conversión para FPDF, la reducción a la resolución de
+impresión, la caché de imágenes preparadas y que los dos generadores de PDF
+usen el pipeline y limpien sus temporales.
+"""
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from PIL import Image
+
+from config.config import Config
+from core import gasto_pdf_generator, image_pipeline, pdf_generator
+from core.image_cache import ImageCache, get_image_cache
+from core.image_pipeline import (FORMATO_AUTO, FORMATO_ORIGEN, FORMATO_PNG, PerfilImagen, describe_savings,
+                                 prepare_images, preparar_imagen, remove_prepared)
+from tests.helpers import imagen_b64
+
+
+@pytest.fixture(autouse=True)
+def carpeta_temporal(tmp_path, monkeypatch):
+    """Cada prueba usa su propia caché de imágenes"""
+    monkeypatch.setattr(Config, 'UPLOAD_FOLDER', str(tmp_path))
+    return tmp_path
+
+
+def contar_preparaciones(monkeypatch):
+    """Rutas de las imágenes que se prepararon sin pasar por la caché"""
+    rutas = []
+    original = image_pipeline.preparar_imagen
+
+    def preparar(b64, perfil):
+        resultado = original(b64, perfil)
+        rutas.append(resultado.ruta)
+        return resultado
+
+    monkeypatch.setattr(image_pipeline, 'preparar_imagen', preparar)
+    return rutas
+
+
+class TestPrepareImages:
+    """Tests de prepare_images"""
+
+    def test_orden_y_errores_en_paralelo(self):
+        """Test que el resultado conserva el orden y cada error queda en su imagen"""
+        imagenes = [imagen_b64((10 + i, 20)) for i in range(6)]
+        imagenes[2] = 'data:image/png;base64,' + 'A' * 200
+        imagenes[4] = None
+
+        resultados = prepare_images(imagenes, PerfilImagen(), workers=3)
+        try:
+            assert [r.indice for r in resultados] == list(range(6))
+            assert [r.ok for r in resultados] == [True, True, False, True, False, True]
+            assert resultados[2].error and resultados[4].error
+            for i in (0, 1, 3, 5):
+                with Image.open(resultados[i].ruta) as imagen:
+                    assert imagen.size == (10 + i, 20)
+        finally:
+            remove_prepared(resultados)
+        assert not any(os.path.exists(r.ruta) for r in resultados if r.ok)
+
+    def test_en_serie_igual_que_en_paralelo(self):
+        """Test que con un solo hilo el resultado es el mismo"""
+        imagenes = [imagen_b64((10 + i, 20)) for i in range(3)]
+        serie = prepare_images(imagenes, PerfilImagen(), workers=0)
+        paralelo = prepare_images(imagenes, PerfilImagen(), workers=3)
+        try:
+            for a, b in zip(serie, paralelo):
+                with open(a.ruta, 'rb') as fa, open(b.ruta, 'rb') as fb:
+                    assert fa.read() == fb.read()
+        finally:
+            remove_prepared(serie + paralelo)
+
+    def test_orientacion_exif(self):
+        """Test que una foto con orientación EXIF 6 queda girada"""
+        ruta = preparar_imagen(imagen_b64((60, 40), orientacion=6), PerfilImagen()).ruta
+        try:
+            with Image.open(ruta) as imagen:
+                assert imagen.size == (40, 60)
+        finally:
+            os.remove(ruta)
+
+    def test_formatos(self):
+        """Test que el perfil decide el formato de salida y la transparencia"""
+        jpeg = preparar_imagen(imagen_b64(), PerfilImagen(formato=FORMATO_ORIGEN)).ruta
+        png = preparar_imagen(imagen_b64(modo='RGBA', formato='PNG'), PerfilImagen(formato=FORMATO_ORIGEN)).ruta
+        para_fpdf = preparar_imagen(imagen_b64(modo='RGBA', formato='PNG'),
+                                    PerfilImagen(formato=FORMATO_PNG, fondo_blanco=True)).ruta
+        try:
+            assert jpeg.endswith('.jpg') and png.endswith('.png') and para_fpdf.endswith('.png')
+            with Image.open(png) as imagen:
+                assert imagen.mode == 'RGBA'
+            with Image.open(para_fpdf) as imagen:
+                assert imagen.mode == 'RGB'
+                # Color semitransparente sobre fondo blanco
+                assert imagen.getpixel((0, 0))[1] > 100
+        finally:
+            for ruta in (jpeg, png, para_fpdf):
+                os.remove(ruta)
+
+
+class TestResolucion:
+    """Tests de la reducción a la resolución de impresión"""
+
+    def test_foto_reducida_a_jpeg(self):
+        """Test que una foto grande queda con los píxeles justos para el tamaño impreso"""
+        perfil = PerfilImagen(formato=FORMATO_AUTO, ancho=1, alto=1, dpi=200)
+        resultado = preparar_imagen(imagen_b64((2000, 1500), formato='PNG', foto=True), perfil)
+        try:
+            with Image.open(resultado.ruta) as imagen:
+                assert imagen.format == 'JPEG'
+                # Se conserva la proporción y ningún lado queda por debajo de 200 px
+                assert imagen.size == (267, 200)
+            assert resultado.bytes_final * 20 < resultado.bytes_origen
+        finally:
+            os.remove(resultado.ruta)
+
+    def test_foto_girada_con_draft(self):
+        """Test que la decodificación reducida tiene en cuenta la orientación EXIF"""
+        perfil = PerfilImagen(formato=FORMATO_AUTO, ancho=1, alto=1.5, dpi=200)
+        resultado = preparar_imagen(imagen_b64((2000, 1500), orientacion=6, foto=True), perfil)
+        try:
+            with Image.open(resultado.ruta) as imagen:
+                assert imagen.size == (225, 300)
+        finally:
+            os.remove(resultado.ruta)
+
+    def test_no_agranda_ni_cambia_la_transparencia(self):
+        """Test que una imagen pequeña no se agranda y que un PNG con transparencia sigue en PNG"""
+        perfil = PerfilImagen(formato=FORMATO_AUTO, ancho=1, alto=1, dpi=200)
+        pequena = preparar_imagen(imagen_b64((60, 40)), perfil)
+        transparente = preparar_imagen(imagen_b64((600, 400), modo='RGBA', formato='PNG'), perfil)
+        para_fpdf = preparar_imagen(imagen_b64((600, 400), modo='RGBA', formato='PNG'), perfil.con(fondo_blanco=True))
+        try:
+            with Image.open(pequena.ruta) as imagen:
+                assert imagen.size == (60, 40)
+            with Image.open(transparente.ruta) as imagen:
+                assert (imagen.format, imagen.mode, imagen.size) == ('PNG', 'RGBA', (300, 200))
+            with Image.open(para_fpdf.ruta) as imagen:
+                assert (imagen.format, imagen.mode) == ('JPEG', 'RGB')
+        finally:
+            remove_prepared([pequena, transparente, para_fpdf])
+
+    def test_dpi_configurable(self, monkeypatch):
+        """Test que el DPI sale del perfil o de PDF_IMAGE_DPI"""
+        monkeypatch.setattr(Config, 'PDF_IMAGE_DPI', 100)
+        perfil = PerfilImagen(ancho=0.95, alto=1.6)
+
+        assert perfil.pixeles() == (95, 160)
+        assert perfil.con(dpi=300).pixeles() == (285, 480)
+        assert PerfilImagen().pixeles() is None
+
+    def test_resumen_de_bytes(self):
+        """Test que el resumen informa los bytes recibidos y los que quedan en el PDF"""
+        resultados = prepare_images([imagen_b64((800, 600), foto=True), 'no es imagen'],
+                                    PerfilImagen(formato=FORMATO_AUTO, ancho=1, alto=1))
+        try:
+            texto = describe_savings(resultados)
+            assert 'KB recibidos' in texto and '% menos' in texto
+        finally:
+            remove_prepared(resultados)
+
+
+class TestImageCache:
+    """Tests de la caché de imágenes preparadas"""
+
+    def test_acierto_evita_preparar(self, monkeypatch):
+        """Test que la misma imagen con el mismo perfil sale de la caché en un temporal propio"""
+        preparadas = contar_preparaciones(monkeypatch)
+        perfil = PerfilImagen(formato=FORMATO_AUTO, ancho=1, alto=1)
+        imagenes = [imagen_b64((800, 600), foto=True), imagen_b64((50, 50))]
+
+        primera = prepare_images(imagenes, perfil)
+        segunda = prepare_images(imagenes, perfil)
+        try:
+            assert len(preparadas) == 2
+            assert [r.desde_cache for r in segunda] == [True, True]
+            assert {r.ruta for r in primera}.isdisjoint(r.ruta for r in segunda)
+            for a, b in zip(primera, segunda):
+                with open(a.ruta, 'rb') as fa, open(b.ruta, 'rb') as fb:
+                    assert fa.read() == fb.read()
+                assert a.bytes_origen == b.bytes_origen
+            assert 'desde caché' in describe_savings(segunda)
+        finally:
+            remove_prepared(primera + segunda)
+        # Los temporales eran copias: la caché sigue sirviendo la imagen
+        tercera = prepare_images(imagenes[:1], perfil)
+        remove_prepared(tercera)
+        assert tercera[0].desde_cache and len(preparadas) == 2
+
+    def test_perfil_distinto_no_acierta(self, monkeypatch):
+        """Test que la clave incluye el tamaño de destino"""
+        preparadas = contar_preparaciones(monkeypatch)
+        perfil = PerfilImagen(formato=FORMATO_AUTO, ancho=1, alto=1)
+        imagen = imagen_b64((800, 600), foto=True)
+
+        resultados = prepare_images([imagen], perfil) + prepare_images([imagen], perfil.con(dpi=100))
+        remove_prepared(resultados)
+        assert len(preparadas) == 2
+        assert image_pipeline.image_cache_key(imagen, perfil) != image_pipeline.image_cache_key(imagen, perfil.con(dpi=100))
+        assert image_pipeline.image_cache_key('no es imagen', perfil) is None
+
+    def test_expulsion_lru(self, tmp_path):
+        """Test que al pasar el presupuesto se eliminan las imágenes usadas hace más tiempo"""
+        origen = tmp_path / 'origen.jpg'
+        origen.write_bytes(b'x' * 100)
+        cache = ImageCache(str(tmp_path / 'cache'), max_bytes=300)
+        for n, clave in enumerate(('a' * 16, 'b' * 16, 'c' * 16)):
+            cache.put(clave, str(origen))
+            antiguo = time.time() - 100 + n
+            os.utime(tmp_path / 'cache' / f'{clave}.jpg', (antiguo, antiguo))
+
+        copia = cache.get('a' * 16)
+        os.remove(copia)
+        cache.put('d' * 16, str(origen))
+
+        assert cache.current_bytes == 300
+        assert not (tmp_path / 'cache' / f'{"b" * 16}.jpg').exists()
+        assert cache.get('b' * 16) is None
+        assert (cache.hits, cache.misses) == (1, 1)
+        # Una imagen más grande que todo el presupuesto no se guarda
+        origen.write_bytes(b'x' * 400)
+        assert cache.put('e' * 16, str(origen)) is False
+
+    def test_desactivada(self, monkeypatch):
+        """Test que con IMAGE_CACHE_MAX_BYTES=0 no hay caché"""
+        preparadas = contar_preparaciones(monkeypatch)
+        monkeypatch.setattr(Config, 'IMAGE_CACHE_MAX_BYTES', 0)
+        assert get_image_cache() is None
+
+        resultados = prepare_images([imagen_b64()] * 2, PerfilImagen(), workers=0)
+        remove_prepared(resultados)
+        assert len(preparadas) == 2
+
+
+class TestGeneradores:
+    """Tests de los dos generadores de PDF con imágenes"""
+
+    @pytest.fixture
+    def temporales(self, monkeypatch):
+        """Rutas creadas por el pipeline durante la prueba"""
+        return contar_preparaciones(monkeypatch)
+
+    def test_pdf_gastos(self, temporales):
+        """Test que el PDF de gastos incluye las imágenes válidas de cada sección y borra los temporales"""
+        imagenes = {
+            'imagenesGastos': [imagen_b64(), 'no es imagen'],
+            'imagenesConsignaciones': [imagen_b64(formato='PNG')],
+            'imagenesDevoluciones': [imagen_b64(orientacion=6)],
+        }
+        gastos = [{'fecha': '2025-01-01', 'descripcion': 'Tubo', 'valor': 10000}]
+
+        exito, pdf_bytes = gasto_pdf_generator.generar_pdf_gasto({'gastos': gastos, 'consignaciones': []}, None,
+                                                                 imagenes, 'gastos')
+
+        assert exito
+        assert pdf_bytes.startswith(b'%PDF')
+        assert pdf_bytes.count(b'/Subtype /Image') == 3
+        assert len(temporales) == 3
+        assert not any(os.path.exists(ruta) for ruta in temporales)
+
+    def test_pdf_relacion_servicios(self, temporales):
+        """Test que el PDF de relación inserta las imágenes en orden y borra los temporales"""
+        df = pd.DataFrame({
+            'FECHA': [datetime(2025, 1, 5)],
+            'DIRECCION_PARA_INFORME': ['CALLE 1'],
+            'SERVICIO_PARA_INFORME': ['INSTALACIÓN'],
+            'MATERIALES': ['TUBO'],
+            'VALOR MATERIALES': [1000],
+            'VALOR_ORIGINAL': [50000],
+        })
+
+        exito, _, pdf_bytes = pdf_generator.generar_pdf(df, None, imagenes=[imagen_b64(), 'no es imagen',
+                                                                            imagen_b64(modo='RGBA', formato='PNG')])
+
+        assert exito
+        assert pdf_bytes.count(b'/Subtype /Image') == 2
+        assert len(temporales) == 2
+        assert not any(os.path.exists(ruta) for ruta in temporales)
+
+    def test_pdf_gastos_mas_liviano(self):
+        """Test que el PDF de gastos con fotos grandes pesa mucho menos que con las fotos originales"""
+        imagenes = {'imagenesGastos': [imagen_b64((1600, 1200), foto=True)] * 2}
+        gastos = [{'fecha': '2025-01-01', 'descripcion': 'Tubo', 'valor': 10000}]
+
+        _, reducido = gasto_pdf_generator.generar_pdf_gasto(gastos, None, imagenes, 'gastos')
+        _, original = gasto_pdf_generator.generar_pdf_gasto(gastos, None, imagenes, 'gastos',
+                                                            perfil_imagenes=PerfilImagen(formato=FORMATO_ORIGEN))
+
+        print(f"\nPDF de gastos con 2 fotos: original {len(original) / 1024:.0f} KB, "
+              f"reducido {len(reducido) / 1024:.0f} KB")
+        assert len(reducido) * 10 < len(original)
+
+    def test_regenerar_pdf_gastos_usa_la_cache(self, temporales):
+        """Test que al regenerar el mismo PDF de gastos los comprobantes no se vuelven a preparar"""
+        imagenes = {'imagenesGastos': [imagen_b64((800, 600), foto=True)],
+                    'imagenesConsignaciones': [imagen_b64(formato='PNG')]}
+        gastos = [{'fecha': '2025-01-01', 'descripcion': 'Tubo', 'valor': 10000}]
+
+        _, primero = gasto_pdf_generator.generar_pdf_gasto(gastos, None, imagenes, 'gastos')
+        gastos[0]['descripcion'] = 'Tubo PVC'
+        _, segundo = gasto_pdf_generator.generar_pdf_gasto(gastos, None, imagenes, 'gastos')
+
+        assert len(temporales) == 2
+        assert segundo.count(b'/Subtype /Image') == primero.count(b'/Subtype /Image') == 2
@@ -0,0 +1,216 @@
+"""
+Tests para la cola de trabajos de PDF en segundo plano.
+Valida el ciclo pendiente → completado/error, los endpoints /api/jobs, el
+modo async=1 de los endpoints de PDF y la limpieza por TTL.
+"""
+import io
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from core import job_queue
+from core.job_queue import cleanup_expired_jobs, get_job, get_job_queue, get_result_path
+from services.report_service import ReportService
+from utils.temp_file_manager import SpooledPDF, cleanup_temp_directory
+
+
+@pytest.fixture
+def excel_servicios():
+    """Excel mínimo en memoria para los endpoints que validan la subida"""
+    output = io.BytesIO()
+    pd.DataFrame({'FECHA': ['2025-01-01'], 'PARA JG': [50000]}).to_excel(output, index=False, engine='openpyxl')
+    output.seek(0)
+    return output
+
+
+def esperar(client, job_id, limite=10):
+    """Consulta el estado del trabajo hasta que termine"""
+    inicio = time.time()
+    while time.time() - inicio < limite:
+        estado = client.get(f'/api/jobs/{job_id}').get_json()
+        if estado['status'] in ('completado', 'error'):
+            return estado
+        time.sleep(0.02)
+    pytest.fail('El trabajo no terminó a tiempo')
+
+
+class TestJobQueue:
+    """Tests de JobQueue fuera de los endpoints"""
+
+    def test_resultado_en_bytes_y_en_archivo(self, app, tmp_path):
+        """Test que la tarea puede retornar los bytes o la ruta del PDF"""
+        ruta = tmp_path / 'generado.pdf'
+        ruta.write_bytes(b'%PDF-archivo')
+        cerrados = []
+        with app.app_context():
+            cola = get_job_queue()
+            en_bytes = cola.submit(lambda: (b'%PDF-bytes', 'a.pdf'), al_terminar=lambda: cerrados.append(1))
+            en_archivo = cola.submit(lambda ruta: (ruta, 'b.pdf'), str(ruta))
+            while cola.is_active(en_bytes) or cola.is_active(en_archivo):
+                time.sleep(0.01)
+
+            assert get_job(en_bytes)['status'] == 'completado'
+            assert get_job(en_archivo)['filename'] == 'b.pdf'
+            with open(get_result_path(en_bytes), 'rb') as f:
+                assert f.read() == b'%PDF-bytes'
+            # El archivo generado pasa a ser el resultado del trabajo
+            assert not ruta.exists()
+            assert cerrados == [1]
+
+    def test_resultado_en_spool(self, app):
+        """Test que la tarea puede retornar el spool del PDF, que se copia y se cierra"""
+        spool = SpooledPDF(16)
+        spool.write(b'%PDF-' + b'x' * 100)
+        with app.app_context():
+            cola = get_job_queue()
+            job_id = cola.submit(lambda: (spool, 'c.pdf'))
+            while cola.is_active(job_id):
+                time.sleep(0.01)
+
+            assert get_job(job_id)['status'] == 'completado'
+            with open(get_result_path(job_id), 'rb') as f:
+                assert f.read() == b'%PDF-' + b'x' * 100
+        assert spool.closed
+
+    def test_ids_invalidos(self, app):
+        """Test que un id con otro formato no se busca en disco"""
+        with app.app_context():
+            assert get_job('../workbooks') is None
+            assert get_job('f' * 32) is None
+
+    def test_limpieza_por_ttl(self, app):
+        """Test que cleanup_temp_directory elimina los trabajos vencidos"""
+        with app.app_context():
+            cola = get_job_queue()
+            job_id = cola.submit(lambda: (b'%PDF', 'a.pdf'))
+            while cola.is_active(job_id):
+                time.sleep(0.01)
+            reciente = cola.submit(lambda: (b'%PDF', 'b.pdf'))
+            while cola.is_active(reciente):
+                time.sleep(0.01)
+            viejo = time.time() - 2 * app.config['JOB_RESULT_TTL_SECONDS']
+            for ruta in (get_result_path(job_id), get_result_path(job_id)[:-4] + '.json'):
+                os.utime(ruta, (viejo, viejo))
+
+            cleanup_temp_directory()
+            assert get_job(job_id) is None
+            assert not os.path.exists(get_result_path(job_id))
+            assert get_job(reciente)['status'] == 'completado'
+
+            cleanup_expired_jobs(ttl_seconds=-1)
+            assert get_job(reciente) is None
+
+    def test_limpieza_conserva_trabajos_de_otros_workers(self, app):
+        """Test que un trabajo en proceso en otro worker se conserva hasta JOB_STALE_SECONDS"""
+        with app.app_context():
+            os.makedirs(job_queue.get_jobs_root(), exist_ok=True)
+            job_id = 'a' * 32
+            job_queue._escribir_estado(job_id, {'job_id': job_id, 'status': 'procesando'})
+            ruta = job_queue._ruta_estado(job_id)
+
+            cleanup_expired_jobs(ttl_seconds=-1)
+            assert get_job(job_id)['status'] == 'procesando'
+
+            viejo = time.time() - 2 * app.config['JOB_STALE_SECONDS']
+            os.utime(ruta, (viejo, viejo))
+            cleanup_expired_jobs(ttl_seconds=-1)
+            assert get_job(job_id) is None
+
+    def test_estado_se_lee_en_el_contexto_de_la_app(self, app, monkeypatch):
+        """Test que el hilo del pool busca el estado dentro del contexto de la app"""
+        from flask import has_app_context
+        contextos = []
+        get_job_original = job_queue.get_job
+
+        def get_job_registrado(job_id):
+            contextos.append(has_app_context())
+            return get_job_original(job_id)
+
+        monkeypatch.setattr(job_queue, 'get_job', get_job_registrado)
+        with app.app_context():
+            cola = get_job_queue()
+            job_id = cola.submit(lambda: (b'%PDF', 'a.pdf'))
+            while cola.is_active(job_id):
+                time.sleep(0.01)
+
+            assert get_job_original(job_id)['status'] == 'completado'
+        assert contextos == [True]
+
+
+class TestJobsEndpoints:
+    """Tests de /api/jobs y del modo async=1"""
+
+    def test_gastos_async(self, client, monkeypatch):
+        """Test que el PDF de gastos se genera en segundo plano y se descarga después"""
+        monkeypatch.setattr(ReportService, 'generate_expenses_pdf',
+                            staticmethod(lambda data, destino=None: (True, {'filename': 'gastos.pdf'}, b'%PDF-gastos')))
+
+        response = client.post('/api/gastos/generar-pdf?async=1', json={'gastos': [1]})
+        assert response.status_code == 202
+        datos = response.get_json()
+        assert datos['status'] == 'pendiente'
+
+        estado = esperar(client, datos['job_id'])
+        assert estado['status'] == 'completado'
+        assert estado['filename'] == 'gastos.pdf'
+        resultado = client.get(datos['result_url'])
+        assert resultado.status_code == 200
+        assert resultado.data == b'%PDF-gastos'
+        assert 'gastos.pdf' in resultado.headers['Content-Disposition']
+
+    def test_error_del_trabajo(self, client, monkeypatch):
+        """Test que el error esperado del servicio queda en el estado con su código"""
+        monkeypatch.setattr(ReportService, 'generate_expenses_pdf',
+                            staticmethod(lambda data, destino=None: (False, {'error': 'No se proporcionaron gastos'}, 400)))
+
+        job_id = client.post('/api/gastos/generar-pdf', json={'async': 1}).get_json()['job_id']
+        estado = esperar(client, job_id)
+
+        assert estado['status'] == 'error'
+        assert estado['error'] == 'No se proporcionaron gastos'
+        assert client.get(f'/api/jobs/{job_id}/result').status_code == 400
+
+    def test_pdf_pendientes_async_lee_la_subida(self, client, excel_servicios, monkeypatch):
+        """Test que la tarea recibe una copia del Excel que sigue abierta después de la petición"""
+        leidos = []
+
+        def generar(temp_path, fecha_inicio, fecha_fin, nombre_pdf, notas, destino=None):
+            leidos.append(len(temp_path.read()))
+            return False, {'error': 'Sin datos', 'empty_range': True}, 400
+
+        monkeypatch.setattr(ReportService, 'generate_pending_services_pdf', staticmethod(generar))
+        response = client.post('/api/pdf_pendientes', data={'file': (excel_servicios, 'test.xlsx'), 'async': '1'},
+                               content_type='multipart/form-data')
+        assert response.status_code == 202
+
+        estado = esperar(client, response.get_json()['job_id'])
+        assert estado['status'] == 'error'
+        assert estado['empty_range'] is True
+        assert leidos and leidos[0] > 0
+
+    def test_trabajo_inexistente(self, client):
+        """Test que un id desconocido retorna 404"""
+        assert client.get('/api/jobs/' + 'a' * 32).status_code == 404
+        assert client.get('/api/jobs/no-es-un-id/result').status_code == 404
+
+    def test_resultado_no_listo(self, client):
+        """Test que pedir el resultado de un trabajo sin terminar retorna 409"""
+        with client.application.app_context():
+            job_id = job_queue.uuid.uuid4().hex
+            os.makedirs(job_queue.get_jobs_root(), exist_ok=True)
+            job_queue._escribir_estado(job_id, {'job_id': job_id, 'status': 'procesando'})
+
+        response = client.get(f'/api/jobs/{job_id}/result')
+        assert response.status_code == 409
+        assert response.get_json()['status'] == 'procesando'
+
+    def test_sin_async_sigue_siendo_sincrono(self, client, monkeypatch):
+        """Test que sin async=1 el endpoint responde el PDF directamente"""
+        monkeypatch.setattr(ReportService, 'generate_expenses_pdf',
+                            staticmethod(lambda data, destino=None: (True, {'filename': 'gastos.pdf'}, b'%PDF-gastos')))
+
+        response = client.post('/api/gastos/generar-pdf', json={'gastos': [1]})
+        assert response.status_code == 200
+        assert response.data == b'%PDF-gastos'
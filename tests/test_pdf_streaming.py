@@ -0,0 +1,241 @@
+"""
+Tests para la salida de los PDF hacia la respuesta HTTP.
+Valida que los generadores escriben en el buffer recibido el mismo PDF que
+retornan en bytes, que los endpoints envían el spool por bloques y lo
+cierran, que /pdf_pendientes ya no deja archivos en el directorio temporal
+y el tiempo y el pico de memoria de entregar un PDF grande.
+"""
+import datetime
+import io
+import os
+import time
+import tracemalloc
+
+import pandas as pd
+import pytest
+from fpdf import FPDF
+from reportlab import rl_config
+
+from core import gasto_pdf_generator, pdf_generator
+from core.fpdf_output import BufferPDF, StreamingFPDF
+from utils.temp_file_manager import SpooledPDF, new_pdf_spool
+from tests.helpers import CALCULOS, datos_gastos, imagen_b64
+
+
+@pytest.fixture
+def excel_servicios():
+    """Excel con servicios en efectivo sin relacionar y pendientes por cobrar"""
+    data = {
+        'FECHA': pd.date_range('2025-01-01', periods=20, freq='D'),
+        'FORMA DE PAGO': ['EFECTIVO'] * 15 + ['TRANSFERENCIA'] * 5,
+        'ESTADO DEL SERVICIO': [''] * 10 + ['PENDIENTE COBRAR'] * 10,
+        'DIRECCION': ['Calle 123'] * 20,
+        'NOMBRE CLIENTE': ['Ana'] * 20,
+        'SERVICIO REALIZADO': ['Instalación'] * 20,
+        'VALOR SERVICIO': [100000] * 20,
+        'DOMICILIO': [10000] * 20,
+        'IVA': [19000] * 20
+    }
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        pd.DataFrame(data).to_excel(writer, sheet_name='Enero', index=False)
+    output.seek(0)
+    return output
+
+
+@pytest.fixture
+def spools(monkeypatch):
+    """Spools creados por los endpoints durante la prueba"""
+    creados = []
+
+    def crear():
+        spool = new_pdf_spool()
+        creados.append(spool)
+        return spool
+
+    from api.routes import expenses, reports
+    monkeypatch.setattr(expenses, 'new_pdf_spool', crear)
+    monkeypatch.setattr(reports, 'new_pdf_spool', crear)
+    return creados
+
+
+RANGO = {'fecha_inicio': '2025-01-01', 'fecha_fin': '2025-12-31'}
+
+
+def df_relacion(filas=3):
+    return pd.DataFrame({
+        'FECHA': [datetime.datetime(2025, 1, 5)] * filas,
+        'DIRECCION_PARA_INFORME': ['CALLE 1'] * filas,
+        'SERVICIO_PARA_INFORME': ['INSTALACIÓN'] * filas,
+        'MATERIALES': ['TUBO'] * filas,
+        'VALOR MATERIALES': [1000] * filas,
+        'VALOR_ORIGINAL': [50000] * filas,
+    })
+
+
+class TestGeneradores:
+    """Tests de los generadores escribiendo en un buffer"""
+
+    def test_relacion_igual_en_bytes_y_en_spool(self, app, fecha_fija):
+        """Test que el PDF de relación escrito en el spool es el mismo que en bytes"""
+        imagenes = [imagen_b64(), imagen_b64(modo='RGBA', formato='PNG')]
+        with app.app_context():
+            _, _, pdf_bytes = pdf_generator.generar_pdf(df_relacion(), None, 'nota', imagenes=imagenes)
+            spool = SpooledPDF(1024)
+            exito, _, destino = pdf_generator.generar_pdf(df_relacion(), None, 'nota', imagenes=imagenes, destino=spool)
+
+        assert exito and destino is spool
+        assert spool._rolled
+        spool.seek(0)
+        assert spool.read() == pdf_bytes
+
+    def test_gastos_igual_en_bytes_y_en_spool(self, app, monkeypatch):
+        """Test que el PDF de gastos escrito en el spool es el mismo que en bytes"""
+        monkeypatch.setattr(rl_config, 'invariant', 1)
+        with app.app_context():
+            _, pdf_bytes = gasto_pdf_generator.generar_pdf_gasto(datos_gastos(20), CALCULOS, {}, 'gastos')
+            spool = new_pdf_spool()
+            exito, destino = gasto_pdf_generator.generar_pdf_gasto(datos_gastos(20), CALCULOS, {}, 'gastos',
+                                                                  destino=spool)
+
+        assert exito and destino is spool
+        spool.seek(0)
+        assert spool.read() == pdf_bytes
+
+    def test_buffer_por_bloques(self):
+        """Test que BufferPDF se comporta como el str de FPDF y escribe lo mismo por bloques"""
+        lineas = [''.join(chr((i + j) % 256) for j in range(i % 50)) + '\n' for i in range(2000)]
+        texto = ''.join(lineas)
+
+        en_memoria = BufferPDF(chunk_size=333)
+        redirigido = BufferPDF(chunk_size=333)
+        destino = io.BytesIO()
+        for i, linea in enumerate(lineas):
+            en_memoria += linea
+            redirigido += linea
+            if i == 500:
+                redirigido.redirect(destino)
+        redirigido.flush()
+
+        assert len(en_memoria) == len(redirigido) == len(texto)
+        assert str(en_memoria) == texto
+        assert en_memoria.encode('latin-1') == destino.getvalue() == texto.encode('latin-1')
+
+
+class TestEndpoints:
+    """Tests de los endpoints que envían el PDF"""
+
+    def test_relacion_enviada_desde_el_spool(self, client, excel_servicios, spools):
+        """Test que /pdf_relacion_servicios envía el spool con su tamaño y lo cierra"""
+        response = client.post('/api/pdf_relacion_servicios', data={'file': (excel_servicios, 'test.xlsx'), **RANGO},
+                               content_type='multipart/form-data')
+
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == 'application/pdf'
+        assert response.data.startswith(b'%PDF')
+        assert response.content_length == len(response.data)
+        response.close()
+        assert len(spools) == 1 and spools[0].closed
+
+    def test_pendientes_no_deja_archivos(self, client, excel_servicios, spools, tmp_path, monkeypatch):
+        """Test que /pdf_pendientes ya no guarda el PDF en el directorio temporal"""
+        salida = tmp_path / 'salida'
+        salida.mkdir()
+        monkeypatch.setenv('PDF_OUTPUT_DIR', str(salida))
+
+        response = client.post('/api/pdf_pendientes',
+                               data={'file': (excel_servicios, 'test.xlsx'), 'nombre_pdf': 'pendientes', **RANGO},
+                               content_type='multipart/form-data')
+
+        assert response.status_code == 200
+        assert response.data.startswith(b'%PDF')
+        assert 'pendientes.pdf' in response.headers['Content-Disposition']
+        response.close()
+        assert spools[0].closed
+        assert os.listdir(salida) == []
+
+    def test_gastos_error_cierra_el_spool(self, client, spools):
+        """Test que si el PDF de gastos falla el spool se cierra"""
+        response = client.post('/api/gastos/generar-pdf', json={'gastos': []})
+
+        assert response.status_code == 500
+        assert len(spools) == 1 and spools[0].closed
+
+    def test_pdf_grande_pasa_a_disco(self, app, client, spools):
+        """Test que un PDF mayor que PDF_SPOOL_MAX_BYTES se escribe en disco"""
+        app.config['PDF_SPOOL_MAX_BYTES'] = 1024
+        response = client.post('/api/gastos/generar-pdf', json={**datos_gastos(20), 'nombrePDF': 'gastos'})
+
+        assert response.status_code == 200
+        assert spools[0]._rolled
+        assert response.data.startswith(b'%PDF')
+        response.close()
+
+
+class TestBenchmark:
+    """Tiempo y pico de memoria al entregar un PDF grande de FPDF"""
+
+    @staticmethod
+    def documento(clase):
+        pdf = clase()
+        pdf.set_compression(False)
+        for _ in range(300):
+            pdf.add_page()
+            pdf.set_font('Helvetica', '', 8)
+            for linea in range(60):
+                pdf.cell(0, 4, f'Servicio {linea} CALLE 123 INSTALACIÓN TUBO $ 50.000', 0, 1)
+        return pdf
+
+    @staticmethod
+    def enviar(respuesta):
+        """Consume la respuesta por bloques como lo haría el servidor"""
+        for _ in iter(lambda: respuesta.read(64 * 1024), b''):
+            pass
+
+    def en_bytes(self, pdf):
+        # Antes: output(dest='S').encode() y BytesIO en la respuesta
+        pdf_bytes = pdf.output(dest='S').encode('latin-1')
+        self.enviar(io.BytesIO(pdf_bytes))
+        return len(pdf_bytes)
+
+    def en_spool(self, app, pdf):
+        with app.app_context(), new_pdf_spool() as spool:
+            pdf.write_to(spool)
+            tamano = spool.tell()
+            spool.seek(0)
+            self.enviar(spool)
+        return tamano
+
+    def test_pico_de_memoria_por_pdf(self, app):
+        """Test que StreamingFPDF cierra el PDF sin copiar el buffer por línea ni duplicarlo en memoria"""
+        def medir(entregar, pdf):
+            tracemalloc.start()
+            tamano = entregar(pdf)
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return pico, tamano
+
+        pico_antes, tamano = medir(self.en_bytes, self.documento(FPDF))
+        pico_ahora, tamano_ahora = medir(lambda pdf: self.en_spool(app, pdf), self.documento(StreamingFPDF))
+
+        mb = 1024 * 1024
+        print(f"\nCerrar y entregar un PDF de {tamano / mb:.1f} MB: pico str + bytes {pico_antes / mb:.2f} MB, "
+              f"bloques + spool {pico_ahora / mb:.2f} MB")
+        assert tamano_ahora == tamano
+        assert pico_ahora * 1.5 < pico_antes
+
+    @pytest.mark.benchmark
+    def test_tiempo_por_pdf(self, app):
+        """Test que cerrar y entregar el PDF por bloques no es más lento que en bytes"""
+        def medir(entregar, pdf):
+            inicio = time.perf_counter()
+            entregar(pdf)
+            return time.perf_counter() - inicio
+
+        antes = medir(self.en_bytes, self.documento(FPDF))
+        ahora = medir(lambda pdf: self.en_spool(app, pdf), self.documento(StreamingFPDF))
+
+        print(f"\nCerrar y entregar un PDF grande: str + bytes {antes * 1000:.0f} ms, "
+              f"bloques + spool {ahora * 1000:.0f} ms")
+        assert ahora < antes
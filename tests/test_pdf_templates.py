@@ -0,0 +1,110 @@
+"""
+Tests para las plantillas de PDF compartidas.
+Valida que cada plantilla se construye una sola vez aunque la pidan varios
+hilos, que generar un PDF no modifica los estilos compartidos, que el PDF
+sale igual que con estilos nuevos y el tiempo por PDF de un reporte de
+gastos de 200 filas (con RUN_BENCHMARKS=1).
+"""
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from reportlab import rl_config
+
+from core import gasto_pdf_generator, pdf_templates
+from core.pdf_templates import PlantillaGastos, get_template, register_template, warm_templates
+from tests.helpers import CALCULOS, datos_gastos
+
+
+class TestRegistro:
+    """Tests del registro de plantillas"""
+
+    def test_una_construccion_entre_hilos(self, monkeypatch):
+        """Test que varios hilos reciben la misma plantilla construida una vez"""
+        monkeypatch.setattr(pdf_templates, '_CONSTRUCTORES', dict(pdf_templates._CONSTRUCTORES))
+        monkeypatch.setattr(pdf_templates, '_plantillas', {})
+        construidas = []
+
+        def construir():
+            construidas.append(1)
+            time.sleep(0.01)
+            return object()
+
+        register_template('prueba', construir)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            plantillas = list(executor.map(lambda _: get_template('prueba'), range(16)))
+
+        assert construidas == [1]
+        assert all(p is plantillas[0] for p in plantillas)
+        warm_templates()
+        assert isinstance(get_template('gastos'), PlantillaGastos)
+        with pytest.raises(KeyError):
+            get_template('no_existe')
+
+    def test_generar_no_modifica_los_estilos(self):
+        """Test que los PDF comparten la plantilla y no la modifican"""
+        plantilla = get_template('gastos')
+        antes = {nombre: dict(vars(estilo)) for nombre, estilo in vars(plantilla).items() if hasattr(estilo, 'fontName')}
+        comandos = list(plantilla.tabla_gastos.getCommands())
+
+        exito, _ = gasto_pdf_generator.generar_pdf_gasto(datos_gastos(5), CALCULOS, {}, 'gastos', notas='nota')
+
+        assert exito
+        assert gasto_pdf_generator.PDFGastoSideBySide('x.pdf').plantilla is plantilla
+        assert {nombre: dict(vars(estilo)) for nombre, estilo in vars(plantilla).items()
+                if hasattr(estilo, 'fontName')} == antes
+        assert list(plantilla.tabla_gastos.getCommands()) == comandos
+
+
+class TestBenchmark:
+    """PDF de gastos con la plantilla compartida y con estilos nuevos en cada PDF"""
+
+    @pytest.fixture
+    def pdf_determinista(self, monkeypatch):
+        """PDF sin fechas ni ids aleatorios y sin comprimir, para compararlo byte a byte"""
+        monkeypatch.setattr(rl_config, 'invariant', 1)
+        monkeypatch.setattr(rl_config, 'pageCompression', 0)
+
+    @staticmethod
+    def estilos_por_pdf(monkeypatch):
+        """Como antes: los estilos se construyen en cada PDF"""
+        monkeypatch.setattr(gasto_pdf_generator, 'get_template', lambda nombre: PlantillaGastos())
+
+    @staticmethod
+    def generar(datos):
+        exito, pdf = gasto_pdf_generator.generar_pdf_gasto(datos, CALCULOS, {}, 'gastos', notas='nota')
+        assert exito
+        return re.sub(rb'/(Creation|Mod)Date \(.*?\)', b'', pdf)
+
+    def test_pdf_igual_con_plantilla_compartida(self, monkeypatch, pdf_determinista):
+        """Test que con la plantilla compartida el PDF sale igual que con estilos nuevos"""
+        datos = datos_gastos(200)
+        compartida = self.generar(datos)
+        self.estilos_por_pdf(monkeypatch)
+        assert compartida == self.generar(datos)
+
+    @pytest.mark.benchmark
+    def test_tiempo_por_pdf(self, monkeypatch, pdf_determinista):
+        """Test que la plantilla compartida ahorra la preparación de estilos en cada PDF"""
+        datos = datos_gastos(200)
+
+        def medir(veces):
+            inicio = time.perf_counter()
+            for _ in range(veces):
+                self.generar(datos)
+            por_pdf = (time.perf_counter() - inicio) / veces
+            inicio = time.perf_counter()
+            for _ in range(200):
+                gasto_pdf_generator.PDFGastoSideBySide('x.pdf')
+            return por_pdf, (time.perf_counter() - inicio) / 200
+
+        self.generar(datos)
+        compartida, preparacion_compartida = medir(5)
+        self.estilos_por_pdf(monkeypatch)
+        por_pdf, preparacion_por_pdf = medir(5)
+
+        print(f"\nPDF de gastos de 200 filas: estilos por PDF {por_pdf * 1000:.1f} ms, "
+              f"plantilla compartida {compartida * 1000:.1f} ms; preparación de estilos "
+              f"{preparacion_por_pdf * 1000:.3f} ms → {preparacion_compartida * 1000:.4f} ms")
+        assert preparacion_compartida * 10 < preparacion_por_pdf
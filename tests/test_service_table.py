@@ -0,0 +1,167 @@
+"""
+Tests para la tabla de servicios de la relación dibujada por bloques.
+Valida el formato de las celdas, que el PDF sale igual sin importar el
+tamaño de los bloques o si las filas llegan como iterable de DataFrames,
+los totales y el tiempo de una relación de 10.000 servicios.
+"""
+import datetime
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core import pdf_generator, service_table
+from core.service_table import TablaServicios, formatear_servicios, iter_bloques
+
+
+def df_servicios(filas):
+    """Relación con textos de distintos largos, saltos de línea y montos faltantes"""
+    rng = np.random.default_rng(7)
+    palabras = np.array(['INSTALACIÓN', 'REPARACIÓN', 'TUBERÍA', 'COCINA', 'BAÑO', 'CALENTADOR', 'FUGA', 'GAS'])
+    largos = rng.integers(1, 25, filas)
+    df = pd.DataFrame({
+        'FECHA': pd.date_range('2025-01-01', periods=filas, freq='h'),
+        'DIRECCION_PARA_INFORME': [f'CALLE {i % 97} # {i % 13}-{i % 50}' for i in range(filas)],
+        'SERVICIO_PARA_INFORME': [' '.join(rng.choice(palabras, n)) for n in largos],
+        'MATERIALES': ['TUBO PVC' if i % 3 else '' for i in range(filas)],
+        'VALOR MATERIALES': rng.integers(0, 40, filas) * 1000,
+        'VALOR_ORIGINAL': rng.integers(10, 90, filas) * 1000,
+        'IVA': rng.integers(0, 10, filas) * 500,
+    })
+    df.loc[df.index[::11], 'VALOR_ORIGINAL'] = np.nan
+    df.loc[df.index[::17], 'DIRECCION_PARA_INFORME'] = ' calle\ncon salto\r '
+    return df
+
+
+def generar(df, **kwargs):
+    exito, _, pdf_bytes = pdf_generator.generar_pdf(df, None, 'notas', datetime.datetime(2025, 1, 1),
+                                                    datetime.datetime(2025, 12, 31), **kwargs)
+    assert exito
+    return pdf_bytes
+
+
+class TestFormato:
+    """Tests de formatear_servicios"""
+
+    def test_celdas(self):
+        """Test que los textos y montos de las celdas salen como en la tabla anterior"""
+        df = pd.DataFrame({
+            'FECHA': [pd.Timestamp('2025-03-04'), pd.NaT, pd.Timestamp('2025-12-31')],
+            'DIRECCION_PARA_INFORME': [' CALLE 1\nSUR ', 'CRA 2', 'AV 3'],
+            'SERVICIO_PARA_INFORME': ['INSTALACIÓN', 'FUGA', 'GAS'],
+            'MATERIALES': ['TUBO', np.nan, ''],
+            'VALOR MATERIALES': [1000, None, 0],
+            'VALOR_ORIGINAL': [51000, 20000, None],
+            'IVA': [9500, 0, 0],
+        })
+
+        celdas = formatear_servicios(df)
+
+        assert celdas['fecha'].tolist() == ['04/03/2025', '-', '31/12/2025']
+        assert celdas['direccion'].tolist() == ['CALLE 1 SUR', 'CRA 2', 'AV 3']
+        assert celdas['materiales'].tolist() == ['TUBO', '-', '-']
+        assert celdas['valor_materiales'].tolist() == ['$ 1.000', '-', '-']
+        assert celdas['valor_servicio'].tolist() == ['$ 50.000', '$ 20.000', '-']
+        assert celdas['subtotal'].tolist() == ['$ 25.000', '$ 10.000', '$ 0']
+        assert celdas['iva'].tolist() == ['$ 9.500', '-', '-']
+        assert celdas['total'].tolist() == ['$ 34.500', '$ 10.000', '$ 0']
+
+    def test_bloques(self):
+        """Test que iter_bloques parte un DataFrame y deja pasar un iterable"""
+        df = df_servicios(10)
+        assert [len(b) for b in iter_bloques(df, 4)] == [4, 4, 2]
+        partes = [df.iloc[:3], df.iloc[3:]]
+        assert list(iter_bloques(iter(partes), 4)) == partes
+
+
+class TestTabla:
+    """Tests del PDF de relación dibujado por bloques"""
+
+    @pytest.mark.parametrize('filas_por_bloque', [1, 7, 10000])
+    def test_mismo_pdf_con_cualquier_bloque(self, app, fecha_fija, filas_por_bloque):
+        """Test que el tamaño de los bloques no cambia el PDF"""
+        df = df_servicios(150)
+        with app.app_context():
+            esperado = generar(df)
+            app.config['PDF_TABLE_BLOCK_ROWS'] = filas_por_bloque
+            assert generar(df) == esperado
+
+    def test_bloques_acotados(self, app, monkeypatch):
+        """Test que nunca se formatean más filas que PDF_TABLE_BLOCK_ROWS a la vez"""
+        formateadas = []
+
+        def formatear(df):
+            formateadas.append(len(df))
+            return formatear_servicios(df)
+
+        monkeypatch.setattr(service_table, 'formatear_servicios', formatear)
+        with app.app_context():
+            app.config['PDF_TABLE_BLOCK_ROWS'] = 40
+            generar(df_servicios(150))
+
+        assert formateadas == [40, 40, 40, 30]
+
+    def test_iterable_de_dataframes(self, fecha_fija):
+        """Test que la tabla se puede dibujar desde un iterable de DataFrames"""
+        df = df_servicios(120)
+
+        def dibujar(datos):
+            pdf = pdf_generator.PDF()
+            pdf.set_compression(False)
+            pdf.add_page()
+            totales = TablaServicios(pdf, filas_por_bloque=50).dibujar(datos)
+            return pdf.output(dest='S').encode('latin-1'), totales
+
+        completo, totales = dibujar(df)
+        por_partes, totales_partes = dibujar(df.iloc[i:i + 33] for i in range(0, len(df), 33))
+
+        assert por_partes == completo
+        assert vars(totales_partes) == vars(totales)
+
+    def test_totales(self):
+        """Test que los totales suman todas las filas de todos los bloques"""
+        df = df_servicios(100)
+        pdf = pdf_generator.PDF()
+        pdf.add_page()
+
+        totales = TablaServicios(pdf, filas_por_bloque=30).dibujar(df)
+        celdas = formatear_servicios(df)
+
+        assert totales.filas == 100
+        assert totales.iva == df['IVA'].sum()
+        assert totales.valor_neto == (df['VALOR_ORIGINAL'].fillna(0) - df['VALOR MATERIALES']).clip(lower=0).sum()
+        assert totales.subtotal == pytest.approx(celdas['subtotal_monto'].sum())
+        assert totales.total == pytest.approx(celdas['total_monto'].sum())
+
+    def test_fila_mas_alta_que_la_pagina(self):
+        """Test que una fila que no cabe en una página se reparte en varias"""
+        df = df_servicios(3)
+        df.loc[df.index[1], 'SERVICIO_PARA_INFORME'] = 'PALABRA LARGA ' * 400
+        pdf = pdf_generator.PDF()
+        pdf.add_page()
+
+        TablaServicios(pdf).dibujar(df)
+
+        assert pdf.page > 2
+
+
+class TestBenchmark:
+    """Tiempo de dibujar la relación de servicios"""
+
+    @pytest.mark.benchmark
+    def test_relacion_de_10000_servicios(self, app):
+        """Test que la tabla crece linealmente con las filas"""
+        def medir(filas):
+            df = df_servicios(filas)
+            inicio = time.perf_counter()
+            pdf_bytes = generar(df)
+            return time.perf_counter() - inicio, len(pdf_bytes)
+
+        with app.app_context():
+            corto, _ = medir(2500)
+            largo, tamano = medir(10000)
+
+        print(f"\nRelación de 10.000 servicios: {largo:.2f} s ({tamano / 1024 / 1024:.1f} MB); "
+              f"2.500 servicios: {corto:.2f} s")
+        assert largo < corto * 6
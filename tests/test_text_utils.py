@@ -0,0 +1,79 @@
+"""
+Tests para las transformaciones de texto por columnas.
+Valida que transliterar y canonical_labels den lo mismo que el apply de
+unidecode fila por fila y mide la mejora de rendimiento (con RUN_BENCHMARKS=1).
+"""
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from unidecode import unidecode
+
+from core.frame_normalizer import canonical_labels
+from utils.text_utils import transliterar
+
+
+VALORES = ['YA RELACIONADO', ' ya relacionado', 'PENDIENTE COBRAR', 'COTIZACIÓN', 'GARANTÍA', 'Ñandú',
+           'efectivo ', 'Transferencia', '', 'None', 'nan', None, np.nan, 50000]
+
+
+def etiquetas_legacy(serie):
+    """Limpieza anterior con apply(unidecode) sobre cada fila, usada como referencia"""
+    presentes = serie[serie.notna()]
+    etiquetas = presentes.astype(str).str.strip().str.upper().apply(unidecode)
+    etiquetas = etiquetas.mask(etiquetas.isin(['', 'NAN', 'NONE']))
+    return etiquetas.reindex(serie.index).astype('category')
+
+
+class TestTransliterar:
+    """Tests de transliterar"""
+
+    def test_igual_a_apply(self):
+        """Test que da lo mismo que apply(unidecode) conservando índice y nulos"""
+        serie = pd.Series(['COTIZACIÓN', 'Ñandú', None, 'COTIZACIÓN', 'plano'], index=[10, 3, 7, 1, 0])
+
+        resultado = transliterar(serie)
+        assert resultado.index.tolist() == [10, 3, 7, 1, 0]
+        assert resultado.tolist()[:2] == ['COTIZACION', 'Nandu']
+        assert pd.isna(resultado[7])
+        assert resultado.drop(7).tolist() == serie.drop(7).apply(unidecode).tolist()
+
+    def test_serie_vacia(self):
+        """Test que una serie vacía o solo con nulos no falla"""
+        assert transliterar(pd.Series([], dtype=object)).empty
+        assert transliterar(pd.Series([None, np.nan], dtype=object)).isna().all()
+
+
+class TestCanonicalLabels:
+    """Tests de canonical_labels contra la limpieza fila por fila"""
+
+    def test_igual_a_limpieza_anterior(self):
+        """Test que las etiquetas y el orden de las categorías no cambian"""
+        serie = pd.Series(np.resize(np.array(VALORES, dtype=object), 200), index=range(400, 200, -1))
+        pd.testing.assert_series_equal(canonical_labels(serie), etiquetas_legacy(serie))
+
+    def test_solo_vacios(self):
+        """Test que una columna sin etiquetas queda toda en NaN"""
+        resultado = canonical_labels(pd.Series(['', None, 'nan'], dtype=object))
+        assert isinstance(resultado.dtype, pd.CategoricalDtype)
+        assert resultado.isna().all()
+
+    @pytest.mark.benchmark
+    def test_benchmark_200k_filas(self):
+        """Test que limpiar los valores distintos es más rápido que el apply fila por fila"""
+        rng = np.random.default_rng(0)
+        serie = pd.Series(rng.choice(np.array(VALORES, dtype=object), size=200_000))
+
+        inicio = time.perf_counter()
+        esperado = etiquetas_legacy(serie)
+        tiempo_legacy = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        resultado = canonical_labels(serie)
+        tiempo_unicos = time.perf_counter() - inicio
+
+        print(f"\ncanonical_labels 200k filas: apply {tiempo_legacy:.3f}s, "
+              f"valores distintos {tiempo_unicos:.3f}s ({tiempo_legacy / tiempo_unicos:.1f}x)")
+        pd.testing.assert_series_equal(resultado, esperado)
+        assert tiempo_unicos < tiempo_legacy
@@ -0,0 +1,138 @@
+"""
+Tests para la limpieza de valores monetarios.
+Valida los formatos colombiano y anglosajón, que las celdas numéricas pasen
+sin convertirse a texto y mide el rendimiento sobre una columna grande (con RUN_BENCHMARKS=1).
+"""
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import validation_utils
+from utils.validation_utils import limpiar_valor_monetario, limpiar_valores_monetarios
+
+
+MATRIZ = [
+    # Formato colombiano: punto de miles, coma decimal
+    ('$ 1.234.567', 1234567.0),
+    ('30.000', 30000.0),
+    ('1.500,50', 1500.5),
+    ('0,75', 0.75),
+    # Formato anglosajón: coma de miles, punto decimal
+    ('1,234,567.50', 1234567.5),
+    ('$100,000', 100000.0),
+    ('1,000', 1000.0),
+    ('1234.50', 1234.5),
+    # Textos de números que Excel guardó como float
+    ('50000.0', 50000.0),
+    # Símbolos, espacios y signo
+    (' $\xa045.000 COP ', 45000.0),
+    ('-$ 2.000', -2000.0),
+    ('$ -2.000', -2000.0),
+    ('-1.500,50', -1500.5),
+    ('+5', 5.0),
+    ('+$ 2.000', 2000.0),
+    ('$ +1.500,50', 1500.5),
+    # El '-' o '+' solo es signo al inicio
+    ('5000-', 0.0),
+    ('12-34', 0.0),
+    ('--5', 0.0),
+    ('+-5', 0.0),
+    ('5+', 0.0),
+    # Notación científica, como float()
+    ('1e3', 1000.0),
+    ('1.5E+06', 1500000.0),
+    ('-2e-1', -0.2),
+    ('+1e3', 1000.0),
+    # Vacíos e inválidos
+    ('', 0.0),
+    ('nan', 0.0),
+    ('None', 0.0),
+    ('N/A', 0.0),
+    ('$', 0.0),
+    (None, 0.0),
+    (np.nan, 0.0),
+    (datetime(2025, 1, 1), 0.0),
+    # Celdas numéricas
+    (50000, 50000.0),
+    (2.5, 2.5),
+]
+
+
+def limpiar_legacy(valor):
+    """Limpieza anterior fila por fila, usada como referencia del benchmark"""
+    try:
+        return float(str(valor).replace('$', '').replace(',', '').strip())
+    except ValueError:
+        return 0.0
+
+
+class TestLimpiarValoresMonetarios:
+    """Tests de la matriz de formatos"""
+
+    @pytest.mark.parametrize('valor,esperado', MATRIZ)
+    def test_valor(self, valor, esperado):
+        """Test de cada formato por separado y con la función escalar"""
+        assert limpiar_valores_monetarios(pd.Series([valor], dtype=object)).tolist() == [esperado]
+        assert limpiar_valor_monetario(valor) == esperado
+
+    def test_columna_mixta(self):
+        """Test que una columna con todos los formatos mezclados da lo mismo que cada valor suelto"""
+        valores, esperados = zip(*MATRIZ)
+        serie = pd.Series(valores, dtype=object, index=range(100, 100 + len(valores)))
+
+        resultado = limpiar_valores_monetarios(serie)
+        assert resultado.dtype == np.float64
+        assert resultado.index.equals(serie.index)
+        assert resultado.tolist() == list(esperados)
+
+    def test_numericas_sin_pasar_por_texto(self, monkeypatch):
+        """Test que las celdas numéricas no pasan por el parseo de textos"""
+        textos = []
+        original = validation_utils._texto_a_numero
+        monkeypatch.setattr(validation_utils, '_texto_a_numero', lambda serie: textos.append(len(serie)) or original(serie))
+
+        assert limpiar_valores_monetarios(pd.Series([1, 2, None], dtype='float64')).tolist() == [1.0, 2.0, 0.0]
+        assert limpiar_valores_monetarios(pd.Series([3, 4])).dtype == np.float64
+        assert limpiar_valores_monetarios(pd.Series([50000, 1.5], dtype=object)).tolist() == [50000.0, 1.5]
+        assert textos == []
+        # En una columna mixta solo los textos se parsean
+        assert limpiar_valores_monetarios(pd.Series([50000, '$ 1.000', None], dtype=object)).tolist() == [50000.0, 1000.0, 0.0]
+        assert textos == [1]
+
+    def test_columnas_vacias(self):
+        """Test que columnas vacías o sin valores no fallan"""
+        assert limpiar_valores_monetarios(pd.Series([], dtype=object)).empty
+        assert limpiar_valores_monetarios(pd.Series([None, None])).tolist() == [0.0, 0.0]
+        assert limpiar_valores_monetarios(pd.Series(['$ 1.000'], dtype='category')).tolist() == [1000.0]
+
+
+class TestLimpiarValoresMonetariosRendimiento:
+    """Benchmark sobre una columna sintética de 200k filas"""
+
+    @pytest.mark.benchmark
+    def test_benchmark_200k_filas(self):
+        """Test que la versión vectorizada es más rápida que la limpieza fila por fila"""
+        rng = np.random.default_rng(0)
+        montos = rng.integers(1_000, 5_000_000, size=200_000)
+        serie = pd.Series([f'$ {monto:,}' for monto in montos], dtype=object)
+
+        def medir(funcion):
+            """Mejor tiempo de tres corridas, para que el resultado no dependa de una pausa del sistema"""
+            tiempos = []
+            for _ in range(3):
+                inicio = time.perf_counter()
+                resultado = funcion()
+                tiempos.append(time.perf_counter() - inicio)
+            return resultado, min(tiempos)
+
+        esperado, tiempo_legacy = medir(lambda: serie.apply(limpiar_legacy))
+        resultado, tiempo_vectorizado = medir(lambda: limpiar_valores_monetarios(serie))
+
+        print(f"\nlimpiar_valores_monetarios 200k filas: apply {tiempo_legacy:.3f}s, "
+              f"vectorizado {tiempo_vectorizado:.3f}s ({tiempo_legacy / tiempo_vectorizado:.1f}x, "
+              f"{len(serie) / tiempo_vectorizado / 1e6:.1f}M filas/s)")
+        assert resultado.tolist() == esperado.tolist() == montos.astype(float).tolist()
+        assert tiempo_vectorizado < tiempo_legacy
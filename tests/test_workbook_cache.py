@@ -0,0 +1,113 @@
+"""
+Tests para la caché de libros Excel parseados.
+Valida el hash por contenido, la expulsión LRU y el aislamiento de copias.
+"""
+import io
+import pytest
+import pandas as pd
+from werkzeug.datastructures import FileStorage
+from config.config import Config
+from core import workbook_cache
+from core.workbook_cache import WorkbookCache, get_sheets, get_workbook_cache, hash_file
+from utils.temp_file_manager import temporary_excel_file, get_upload_digest
+
+
+@pytest.fixture(autouse=True)
+def cache_limpia():
+    """Cada test empieza con la caché vacía"""
+    get_workbook_cache().clear()
+    yield
+    get_workbook_cache().clear()
+
+
+@pytest.fixture
+def excel_dos_hojas(tmp_path):
+    """Crea un Excel con dos hojas"""
+    excel_path = tmp_path / "libro.xlsx"
+    with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
+        pd.DataFrame({'FECHA': pd.date_range('2025-01-01', periods=3), 'VALOR': [1, 2, 3]}).to_excel(writer, sheet_name='Enero', index=False)
+        pd.DataFrame({'FECHA': pd.date_range('2025-02-01', periods=2), 'VALOR': [4, 5]}).to_excel(writer, sheet_name='Febrero', index=False)
+    return str(excel_path)
+
+
+class TestWorkbookCache:
+    """Tests para get_sheets y WorkbookCache"""
+
+    def test_segunda_lectura_usa_cache(self, excel_dos_hojas, monkeypatch):
+        """Test que un archivo repetido no se vuelve a parsear"""
+        llamadas = []
+        original = workbook_cache._parse_workbook
+        monkeypatch.setattr(workbook_cache, '_parse_workbook', lambda path: llamadas.append(path) or original(path))
+
+        primera = get_sheets(excel_dos_hojas)
+        segunda = get_sheets(excel_dos_hojas)
+
+        assert len(llamadas) == 1
+        assert list(primera.keys()) == ['Enero', 'Febrero']
+        pd.testing.assert_frame_equal(primera['Enero'], segunda['Enero'])
+
+    def test_copias_no_modifican_cache(self, excel_dos_hojas):
+        """Test que modificar el DataFrame retornado no altera la caché"""
+        hojas = get_sheets(excel_dos_hojas)
+        hojas['Enero']['VALOR'] = 0
+
+        assert get_sheets(excel_dos_hojas)['Enero']['VALOR'].tolist() == [1, 2, 3]
+
+    def test_expulsion_lru_por_bytes(self):
+        """Test que se expulsa la entrada menos usada al superar el presupuesto"""
+        df = pd.DataFrame({'A': range(100)})
+        tamano = WorkbookCache.estimate_size({'h': df})
+        cache = WorkbookCache(max_bytes=tamano * 2)
+
+        cache.put('a', {'h': df})
+        cache.put('b', {'h': df})
+        cache.get('a')
+        cache.put('c', {'h': df})
+
+        assert 'a' in cache
+        assert 'b' not in cache
+        assert 'c' in cache
+        assert cache.current_bytes <= cache.max_bytes
+
+    def test_libro_mayor_al_presupuesto_no_se_guarda(self):
+        """Test que un libro más grande que el presupuesto no se guarda"""
+        cache = WorkbookCache(max_bytes=10)
+        assert cache.put('a', {'h': pd.DataFrame({'A': range(100)})}) is False
+        assert len(cache) == 0
+
+    def test_hash_calculado_al_subir(self, excel_dos_hojas):
+        """Test que temporary_excel_file calcula el hash del contenido subido"""
+        with open(excel_dos_hojas, 'rb') as f:
+            contenido = f.read()
+        upload = FileStorage(stream=io.BytesIO(contenido), filename='libro.xlsx')
+
+        with temporary_excel_file(upload) as archivo:
+            assert get_upload_digest(archivo) == hash_file(excel_dos_hojas)
+            get_sheets(archivo)
+
+        assert archivo.closed
+        assert hash_file(excel_dos_hojas) in get_workbook_cache()
+
+    def test_subida_pequena_queda_en_memoria(self, excel_dos_hojas):
+        """Test que un archivo bajo el umbral se parsea sin escribirse a disco"""
+        with open(excel_dos_hojas, 'rb') as f:
+            upload = FileStorage(stream=io.BytesIO(f.read()), filename='libro.xlsx')
+
+        with temporary_excel_file(upload) as archivo:
+            hojas = get_sheets(archivo)
+            assert not archivo._rolled
+
+        assert archivo.filename == 'libro.xlsx'
+        assert list(hojas.keys()) == ['Enero', 'Febrero']
+
+    def test_subida_grande_pasa_a_disco(self, excel_dos_hojas, monkeypatch):
+        """Test que un archivo sobre el umbral pasa a disco y se lee igual"""
+        monkeypatch.setattr(Config, 'UPLOAD_SPOOL_MAX_BYTES', 1024)
+        with open(excel_dos_hojas, 'rb') as f:
+            upload = FileStorage(stream=io.BytesIO(f.read()), filename='libro.xlsx')
+
+        with temporary_excel_file(upload) as archivo:
+            hojas = get_sheets(archivo)
+            assert archivo._rolled
+
+        pd.testing.assert_frame_equal(hojas['Febrero'], get_sheets(excel_dos_hojas)['Febrero'])
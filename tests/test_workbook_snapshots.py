@@ -0,0 +1,123 @@
+"""
+Tests para los snapshots columnares de libros Excel.
+Valida el round-trip de las hojas y el uso de workbook_id en los endpoints.
+"""
+import io
+import os
+import time
+from datetime import datetime
+import pytest
+import numpy as np
+import pandas as pd
+from config.config import Config
+from core.workbook_cache import get_workbook_cache, get_sheets
+from core.workbook_snapshots import create_snapshot, load_snapshot, get_snapshot_dir, get_snapshots_root
+from utils.temp_file_manager import cleanup_temp_directory
+
+
+WORKBOOK_ID = 'a' * 64
+
+
+@pytest.fixture(autouse=True)
+def upload_folder(tmp_path, monkeypatch):
+    """Guarda los snapshots en un directorio temporal"""
+    monkeypatch.setattr(Config, 'UPLOAD_FOLDER', str(tmp_path))
+    get_workbook_cache().clear()
+    yield tmp_path
+    get_workbook_cache().clear()
+
+
+@pytest.fixture
+def excel_bytes():
+    """Excel con columnas de tipos mezclados como los libros reales"""
+    df = pd.DataFrame({
+        'FECHA': pd.date_range('2025-01-01', periods=6, freq='D'),
+        'ESTADO DEL SERVICIO': ['YA RELACIONADO', 'PENDIENTE COBRAR', None, 'PENDIENTE COBRAR', 'YA RELACIONADO', 'OTRO'],
+        'FORMA DE PAGO': ['EFECTIVO'] * 4 + ['TRANSFERENCIA'] * 2,
+        'X50%/X25%': ['X50%'] * 6,
+        'SERVICIO REALIZADO': ['Instalación'] * 6,
+        'PARA JG': [50000, '30.000', None, 12.5, 0, '$ 1.000'],
+    })
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='Enero', index=False)
+        df.head(2).to_excel(writer, sheet_name='Febrero', index=False)
+    return output.getvalue()
+
+
+class TestWorkbookSnapshots:
+    """Tests para create_snapshot y load_snapshot"""
+
+    def test_round_trip_conserva_valores_y_tipos(self):
+        """Test que las columnas mezcladas vuelven con los mismos valores Python"""
+        df = pd.DataFrame({
+            'MIXTA': [datetime(2025, 1, 2), 'sin fecha', 3, 4.5, np.nan, True],
+            'NUMERO': [1.0, 2.0, np.nan, 4.0, 5.0, 6.0],
+            'FECHA': pd.to_datetime(['2025-01-01', None, '2025-01-03', '2025-01-04', '2025-01-05', '2025-01-06']),
+            'ENTERO': range(6),
+        })
+        df.columns = ['MIXTA', 'NUMERO', 'FECHA', 7]
+
+        snapshot_dir = create_snapshot(WORKBOOK_ID, {'Hoja 1': df})
+        hojas = load_snapshot(snapshot_dir)
+
+        pd.testing.assert_frame_equal(hojas['Hoja 1'], df)
+        assert [type(v) for v in hojas['Hoja 1']['MIXTA']] == [type(v) for v in df['MIXTA']]
+
+    def test_get_sheets_lee_snapshot(self):
+        """Test que get_sheets acepta el directorio del snapshot"""
+        df = pd.DataFrame({'A': [1, 2]})
+        snapshot_dir = create_snapshot(WORKBOOK_ID, {'Enero': df, 'Febrero': df})
+
+        hojas = get_sheets(snapshot_dir)
+
+        assert list(hojas.keys()) == ['Enero', 'Febrero']
+        assert WORKBOOK_ID in get_workbook_cache()
+
+    def test_id_invalido_no_resuelve_ruta(self):
+        """Test que ids con rutas relativas o inexistentes no se resuelven"""
+        assert get_snapshot_dir('../' + WORKBOOK_ID) is None
+        assert get_snapshot_dir(WORKBOOK_ID) is None
+
+    def test_snapshot_vencido_se_elimina(self, upload_folder):
+        """Test que cleanup_temp_directory elimina los snapshots sin usar y conserva los usados"""
+        df = pd.DataFrame({'A': [1, 2]})
+        vencido = create_snapshot(WORKBOOK_ID, {'Enero': df})
+        usado = create_snapshot('b' * 64, {'Enero': df})
+        hace_dos_semanas = time.time() - 14 * 24 * 3600
+        for ruta in (vencido, usado):
+            os.utime(ruta, (hace_dos_semanas, hace_dos_semanas))
+
+        # Usar el snapshot renueva su TTL
+        assert get_snapshot_dir('b' * 64) == usado
+        cleanup_temp_directory(str(upload_folder))
+
+        assert get_snapshot_dir(WORKBOOK_ID) is None
+        assert get_snapshot_dir('b' * 64) == usado
+        assert sorted(os.listdir(get_snapshots_root())) == ['b' * 64]
+
+
+class TestWorkbooksEndpoint:
+    """Tests para POST /api/workbooks y el campo workbook_id"""
+
+    def test_registrar_y_usar_workbook_id(self, client, excel_bytes):
+        """Test que los endpoints responden igual con archivo o con workbook_id"""
+        response = client.post('/api/workbooks', data={'file': (io.BytesIO(excel_bytes), 'test.xlsx')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 201
+        registro = response.get_json()
+        assert [h['nombre'] for h in registro['hojas']] == ['Enero', 'Febrero']
+
+        get_workbook_cache().clear()
+        for endpoint in ['/api/analytics', '/api/analytics_pendientes_efectivo', '/api/analytics_pendientes_cobrar']:
+            con_archivo = client.post(endpoint, data={'file': (io.BytesIO(excel_bytes), 'test.xlsx')},
+                                      content_type='multipart/form-data')
+            con_id = client.post(endpoint, data={'workbook_id': registro['workbook_id']})
+            assert con_id.status_code == con_archivo.status_code == 200
+            assert con_id.get_json() == con_archivo.get_json()
+
+    def test_workbook_id_desconocido_retorna_404(self, client):
+        """Test que un workbook_id que no existe retorna 404"""
+        for endpoint in ['/api/analytics', '/api/analytics_pendientes_efectivo', '/api/procesar_excel']:
+            response = client.post(endpoint, data={'workbook_id': WORKBOOK_ID})
+            assert response.status_code == 404
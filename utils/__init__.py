@@ -1,9 +1,12 @@
 from .file_utils import resource_path
 from .date_utils import fecha_larga
-from .validation_utils import limpiar_valor_monetario
+from .validation_utils import limpiar_valor_monetario, limpiar_valores_monetarios
+from .text_utils import transliterar
 
 __all__ = [
     'resource_path',
     'fecha_larga',
-    'limpiar_valor_monetario'
+    'limpiar_valor_monetario',
+    'limpiar_valores_monetarios',
+    'transliterar'
 ]
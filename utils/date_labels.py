@@ -0,0 +1,86 @@
+"""
+Etiquetas de fechas en español calculadas por columnas.
+
+Las fechas de un libro se repiten mucho (varios servicios por día, muchos
+por mes), así que las etiquetas se construyen una vez por valor distinto y
+luego se expanden a todas las filas, en lugar de formatear fila por fila con
+lambdas de Python.
+"""
+import numpy as np
+import pandas as pd
+
+
+MESES = (
+    'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
+    'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre'
+)
+MESES_MINUSCULA = tuple(mes.lower() for mes in MESES)
+
+
+def etiquetas_mes(fechas: pd.Series) -> pd.Series:
+    """
+    Etiqueta cada fecha con su mes, p. ej. 'Enero 2025'.
+
+    El resultado es un categórico ordenado cronológicamente, así que ordenar
+    o agrupar por la etiqueta respeta el calendario y no el orden alfabético.
+
+    Args:
+        fechas: Serie datetime64 (NaT para fechas inválidas)
+
+    Returns:
+        pd.Series: Categórico ordenado con el mismo índice; NaN donde no hay fecha
+    """
+    fechas = pd.to_datetime(fechas)
+    validas = fechas.notna().to_numpy()
+    periodos = np.full(len(fechas), -1, dtype=np.int64)
+    periodos[validas] = (fechas.dt.year.to_numpy()[validas].astype(np.int64) * 12
+                         + fechas.dt.month.to_numpy()[validas].astype(np.int64) - 1)
+
+    unicos = np.unique(periodos[validas])
+    categorias = [f"{MESES[p % 12]} {p // 12}" for p in unicos]
+    codigos = np.full(len(fechas), -1, dtype=np.int64)
+    codigos[validas] = np.searchsorted(unicos, periodos[validas])
+
+    return pd.Series(pd.Categorical.from_codes(codigos, categories=categorias, ordered=True),
+                     index=fechas.index)
+
+
+def fecha_larga_es(fecha, capitalizar: bool = False, vacio: str = 'N/A') -> str:
+    """
+    Formatea una fecha como '16 de enero de 2026'.
+
+    Args:
+        fecha: datetime o Timestamp
+        capitalizar: Usar 'Enero' en lugar de 'enero'
+        vacio: Texto a retornar si la fecha es nula
+
+    Returns:
+        str: Fecha en formato largo
+    """
+    if pd.isna(fecha):
+        return vacio
+    meses = MESES if capitalizar else MESES_MINUSCULA
+    return f"{fecha.day} de {meses[fecha.month - 1]} de {fecha.year}"
+
+
+def fechas_largas(fechas: pd.Series, capitalizar: bool = False, vacio: str = 'N/A') -> pd.Series:
+    """
+    Versión por columnas de fecha_larga_es: cada fecha distinta se formatea
+    una sola vez.
+
+    Args:
+        fechas: Serie datetime64
+        capitalizar: Usar 'Enero' en lugar de 'enero'
+        vacio: Texto para las fechas nulas
+
+    Returns:
+        pd.Series: Textos con el mismo índice que fechas
+    """
+    codigos, unicas = pd.factorize(pd.to_datetime(fechas))
+    meses = np.array(MESES if capitalizar else MESES_MINUSCULA, dtype=object)
+    etiquetas = (unicas.day.astype(str).to_numpy(dtype=object) + ' de '
+                 + meses[unicas.month.to_numpy() - 1] + ' de '
+                 + unicas.year.astype(str).to_numpy(dtype=object))
+    # El código -1 (fecha nula) toma el último elemento: el texto vacío
+    etiquetas = np.append(etiquetas, vacio).astype(object)
+    return pd.Series(etiquetas[codigos], index=fechas.index, dtype=object)
@@ -2,6 +2,7 @@ import pandas as pd
 import dateparser
 from datetime import datetime
 import re
+from utils.date_labels import MESES, fecha_larga_es
 
 def fecha_larga(fecha):
     """
@@ -13,10 +14,6 @@ def fecha_larga(fecha):
     Returns:
         str: Fecha en formato largo o cadena vacía si es inválida
 """
-    meses = [
-        "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
-        "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
-    ]
     if pd.isnull(fecha):
         return ""
     if isinstance(fecha, str):
@@ -24,19 +21,14 @@ def fecha_larga(fecha):
             fecha = pd.to_datetime(fecha, dayfirst=True)
         except Exception:
             return fecha
-    return f"{fecha.day} de {meses[fecha.month - 1]} de {fecha.year}" 
+    return fecha_larga_es(fecha, capitalizar=True, vacio="")
 
 def mes_espaniol(fecha):
     """
     Devuelve el mes y año en españos al log
     """
-    meses=[
-        "Enero", "Febrero", "Marzo", "Abril", "Mayo",
-        "junio", "julio", "Agosto", "septiembre", "octubre",
-        "Noviembre", "Diciembre"
-    ]
     if hasattr(fecha, "month",) and hasattr(fecha, "year"):
-        return f"{meses[fecha.month - 1].capitalize()} {fecha.year}"
+        return f"{MESES[fecha.month - 1]} {fecha.year}"
         
     return ""
 
@@ -6,12 +6,16 @@ from functools import wraps
 from flask import request, jsonify
 from utils.file_validator import FileValidator
 from utils.date_validator import DateValidator
+from core.workbook_snapshots import get_snapshot_dir
 
 
 def validate_excel_upload(f):
     """
     Decorador para validar que se haya subido un archivo Excel válido.
     
+    En lugar del archivo se puede enviar el campo workbook_id retornado por
+    POST /api/workbooks; en ese caso se pasa la ruta del snapshot como file.
+    
     Usage:
         @bp_excel.route('/endpoint', methods=['POST'])
         @validate_excel_upload
@@ -21,16 +25,9 @@ def validate_excel_upload(f):
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        # Verificar que existe el archivo
-        if 'file' not in request.files:
-            return jsonify({'error': 'No se envió archivo'}), 400
-        
-        file = request.files['file']
-        
-        # Validar el archivo
-        is_valid, error = FileValidator.validate_excel_file(file)
-        if not is_valid:
-            return jsonify({'error': error}), 400
+        file, error = get_excel_source()
+        if error is not None:
+            return error
         
         # Pasar el archivo como primer argumento
         return f(file, *args, **kwargs)
@@ -38,6 +35,40 @@ def validate_excel_upload(f):
     return decorated_function
 
 
+def get_excel_source(validar=FileValidator.validate_excel_file):
+    """
+    Obtiene el libro Excel de la petición: el archivo subido en file o, si
+    no viene, el snapshot del campo workbook_id retornado por
+    POST /api/workbooks.
+    
+    Args:
+        validar: Función que recibe el archivo subido y retorna
+            (es_valido, mensaje_error)
+        
+    Returns:
+        tuple: (archivo o ruta del snapshot, None) o (None, respuesta de error)
+    """
+    # Libro ya subido antes como snapshot
+    if 'file' not in request.files and request.form.get('workbook_id'):
+        snapshot_dir = get_snapshot_dir(request.form['workbook_id'])
+        if snapshot_dir is None:
+            return None, (jsonify({'error': 'workbook_id no encontrado'}), 404)
+        return snapshot_dir, None
+    
+    # Verificar que existe el archivo
+    if 'file' not in request.files:
+        return None, (jsonify({'error': 'No se envió archivo'}), 400)
+    
+    file = request.files['file']
+    
+    # Validar el archivo
+    is_valid, error = validar(file)
+    if not is_valid:
+        return None, (jsonify({'error': error}), 400)
+    
+    return file, None
+
+
 def validate_date_range(fecha_inicio_key='fecha_inicio', fecha_fin_key='fecha_fin', required=True):
     """
     Decorador para validar rango de fechas en form-data.
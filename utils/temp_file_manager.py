@@ -3,52 +3,137 @@ Módulo para manejo seguro de archivos temporales.
 Proporciona context managers que garantizan la limpieza de archivos temporales.
 """
 import os
+import hashlib
 import tempfile
 from contextlib import contextmanager
-from typing import Generator
+from typing import Generator, Optional, Union
 from werkzeug.datastructures import FileStorage
+from config.config import get_config_value
+
+
+# Tamaño de bloque al copiar el archivo subido
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class SpooledUpload(tempfile.SpooledTemporaryFile):
+    """
+    Copia de un archivo subido que vive en memoria hasta max_size bytes y
+    pasa automáticamente a un archivo temporal en disco si lo supera.
+    
+    Attributes:
+        filename: Nombre original del archivo subido
+        digest: Hash SHA-256 del contenido, calculado mientras se copió
+    """
+    
+    def __init__(self, max_size: int, filename: Optional[str] = None):
+        super().__init__(max_size=max_size, mode='w+b', suffix='.xlsx', prefix='excel_')
+        self.filename = filename
+        self.digest: Optional[str] = None
+
+
+class SpooledPDF(tempfile.SpooledTemporaryFile):
+    """
+    PDF generado que vive en memoria hasta max_size bytes y pasa
+    automáticamente a un archivo temporal en disco si lo supera. Los
+    generadores escriben en él y la respuesta HTTP lo envía por bloques.
+    """
+
+    def __init__(self, max_size: int):
+        super().__init__(max_size=max_size, mode='w+b', suffix='.pdf', prefix='pdf_')
+
+
+def new_pdf_spool() -> SpooledPDF:
+    """
+    Crea el buffer donde se escribe un PDF (hasta PDF_SPOOL_MAX_BYTES en
+    memoria). Quien lo crea lo cierra, o lo entrega a send_pdf, que lo
+    cierra al terminar de enviarlo.
+    """
+    return SpooledPDF(int(get_config_value('PDF_SPOOL_MAX_BYTES')))
+
+
+def get_upload_digest(upload) -> Optional[str]:
+    """
+    Retorna el hash SHA-256 calculado al copiar un archivo subido.
+    
+    Args:
+        upload: Objeto entregado por temporary_excel_file
+        
+    Returns:
+        str: Hash hexadecimal o None si no viene de una subida
+    """
+    return getattr(upload, 'digest', None)
 
 
 @contextmanager
-def temporary_excel_file(uploaded_file: FileStorage) -> Generator[str, None, None]:
+def temporary_excel_file(uploaded_file: Union[FileStorage, str]) -> Generator[Union[SpooledUpload, str], None, None]:
     """
-    Context manager para manejar archivos Excel temporales de forma segura.
+    Context manager para manejar archivos Excel subidos de forma segura.
     
-    Garantiza que el archivo temporal se elimine después de su uso,
-    incluso si ocurre una excepción durante el procesamiento.
+    El contenido se copia a un SpooledUpload: los archivos de hasta
+    UPLOAD_SPOOL_MAX_BYTES se quedan en memoria y se pasan directamente a
+    pd.ExcelFile; los más grandes pasan solos a un archivo temporal en
+    disco. Mientras se copia se calcula el hash SHA-256 para la caché de
+    libros parseados. La copia se libera al salir del bloque, incluso si
+    ocurre una excepción durante el procesamiento.
+    
+    Si recibe una ruta (el snapshot resuelto desde un workbook_id por
+    validate_excel_upload) la entrega tal cual y no la elimina.
     
     Args:
-        uploaded_file: Archivo subido desde Flask request.files
+        uploaded_file: Archivo subido desde Flask request.files o ruta a un
+            snapshot ya guardado
         
     Yields:
-        str: Ruta al archivo temporal guardado
+        SpooledUpload o str: Archivo listo para leer desde el inicio
         
     Example:
         >>> with temporary_excel_file(request.files['file']) as temp_path:
         ...     df = pd.read_excel(temp_path)
-        ...     # El archivo se elimina automáticamente al salir del bloque
+        ...     # La copia se libera automáticamente al salir del bloque
     """
-    # Crear archivo temporal con extensión .xlsx
-    fd, temp_path = tempfile.mkstemp(suffix='.xlsx', prefix='excel_')
+    if isinstance(uploaded_file, str):
+        yield uploaded_file
+        return
+    
+    upload = spool_upload(uploaded_file)
     
     try:
-        # Cerrar el file descriptor ya que FileStorage.save() abrirá el archivo
-        os.close(fd)
-        
-        # Guardar el archivo subido en la ruta temporal
-        uploaded_file.save(temp_path)
-        
-        # Yield la ruta para que el código la use
-        yield temp_path
+        yield upload
         
     finally:
-        # Garantizar que el archivo se elimine, incluso si hay excepciones
-        try:
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
-        except OSError as e:
-            # Log del error pero no fallar
-            print(f"Advertencia: No se pudo eliminar archivo temporal {temp_path}: {e}")
+        # Cierra el buffer; si pasó a disco el archivo temporal se elimina
+        upload.close()
+
+
+def spool_upload(uploaded_file: FileStorage) -> SpooledUpload:
+    """
+    Copia un archivo subido a un SpooledUpload calculando su hash.
+    
+    Quien llama debe cerrarlo; temporary_excel_file lo hace al salir del
+    bloque. Se usa directamente cuando el archivo debe sobrevivir a la
+    petición, p. ej. en un trabajo de core.job_queue.
+    
+    Args:
+        uploaded_file: Archivo subido desde Flask request.files
+        
+    Returns:
+        SpooledUpload: Copia lista para leer desde el inicio
+    """
+    upload = SpooledUpload(int(get_config_value('UPLOAD_SPOOL_MAX_BYTES')), uploaded_file.filename)
+    try:
+        hasher = hashlib.sha256()
+        while True:
+            chunk = uploaded_file.stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            upload.write(chunk)
+        upload.digest = hasher.hexdigest()
+        upload.seek(0)
+    except Exception:
+        upload.close()
+        raise
+    return upload
 
 
 @contextmanager
@@ -103,7 +188,10 @@ def ensure_temp_directory(directory: str = 'temp') -> str:
 
 def cleanup_temp_directory(directory: str = 'temp', max_age_hours: int = 24):
     """
-    Limpia archivos antiguos del directorio temporal.
+    Limpia archivos antiguos del directorio temporal, los resultados de
+    trabajos en segundo plano que superaron JOB_RESULT_TTL_SECONDS, los
+    adjuntos que superaron ATTACHMENT_TTL_SECONDS y los snapshots de libros
+    que superaron WORKBOOK_SNAPSHOT_TTL_SECONDS.
     
     Args:
         directory: Directorio a limpiar
@@ -140,3 +228,11 @@ def cleanup_temp_directory(directory: str = 'temp', max_age_hours: int = 24):
                     print(f"Eliminado archivo antiguo: {filepath}")
                 except OSError as e:
                     print(f"Error al eliminar {filepath}: {e}")
+    
+    # Estado y PDF de los trabajos en segundo plano ya vencidos, adjuntos y snapshots sin usar
+    from core.job_queue import cleanup_expired_jobs
+    from core.attachments import cleanup_expired_attachments
+    from core.workbook_snapshots import cleanup_expired_snapshots
+    cleanup_expired_jobs()
+    cleanup_expired_attachments()
+    cleanup_expired_snapshots()
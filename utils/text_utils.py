@@ -0,0 +1,27 @@
+"""
+Transformaciones de texto por columnas.
+
+Columnas como ESTADO DEL SERVICIO o FORMA DE PAGO tienen miles de filas pero
+pocos valores distintos, así que unidecode se aplica una vez por valor
+distinto (vía pd.factorize) y el resultado se expande a todas las filas.
+"""
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+
+def transliterar(serie: pd.Series) -> pd.Series:
+    """
+    Equivalente a serie.apply(unidecode) calculando cada valor distinto una
+    sola vez.
+
+    Args:
+        serie: Serie de strings; los nulos se conservan
+
+    Returns:
+        pd.Series: Textos sin tildes con el mismo índice
+    """
+    codigos, unicos = pd.factorize(serie)
+    convertidos = np.array([unidecode(valor) for valor in unicos] + [np.nan], dtype=object)
+    # El código -1 (nulo) toma el último elemento
+    return pd.Series(convertidos[codigos], index=serie.index, dtype=object)
@@ -1,20 +1,126 @@
+"""
+Limpieza de valores monetarios.
+
+Los montos llegan del Excel como números o como textos escritos a mano en
+formato colombiano ("$ 1.234.567", "1.500,50") o anglosajón ("1,234,567.50").
+Para cada texto se decide qué separador es el decimal:
+
+- Si aparecen '.' y ',', el último de los dos es el decimal.
+- Si solo aparece uno, una sola vez y seguido de 1, 2 o más de 3 dígitos,
+  es el decimal ("12,5", "1234.50"); en otro caso separa miles
+  ("30.000", "1,000", "1.234.567").
+
+El signo '-' solo cuenta al inicio del número, antes o después del símbolo
+de moneda ("-$ 2.000", "$ -2.000"); un '-' en otra posición hace el texto
+inválido ("5000-"). Los textos en notación científica ("1e3", "1.5E+06") se
+leen como float() igual que antes.
+
+Las celdas numéricas se usan tal cual, sin convertirlas a texto.
+"""
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Caracteres que se quitan de los extremos del texto: símbolo de moneda,
+# 'COP' y espacios (incluye el espacio duro que deja Excel)
+_SIMBOLOS = '$ \t\xa0COP'
+
+# Número en notación científica con punto decimal, como lo escribe float()
+_NOTACION_CIENTIFICA = r'^[0-9]+(\.[0-9]+)?[eE][+-]?[0-9]+$'
+
+# Tipos inferidos de una columna object que mezclan textos y números
+_TIPOS_MIXTOS = ('mixed', 'mixed-integer')
+
 
 def limpiar_valor_monetario(valor_str):
     """
     Limpia y convierte una cadena de valor monetario a float.
-    
+
     Args:
         valor_str: Valor en cadena o numérico a limpiar
-        
+
     Returns:
         float: Valor monetario limpio o 0 si es inválido
 """
-    try:
-        if pd.isna(valor_str) or valor_str == '':
-            return 0  
-        valor_str = str(valor_str).strip()
-        valor_str = valor_str.replace('$', '').replace(',', '').strip()
-        return float(valor_str)
-    except ValueError:
-        return 0
+    return float(limpiar_valores_monetarios(pd.Series([valor_str], dtype=object)).iloc[0])
+
+
+def limpiar_valores_monetarios(serie: pd.Series) -> pd.Series:
+    """
+    Convierte una columna completa de montos a float64 con las reglas del
+    módulo, sin recorrerla fila por fila.
+
+    Args:
+        serie: Columna con valores en cadena o numéricos
+
+    Returns:
+        pd.Series: float64 con el mismo índice; 0 donde el valor es vacío o inválido
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype(object)
+    if serie.dtype != object:
+        return pd.to_numeric(serie, errors='coerce').fillna(0.0).astype('float64')
+
+    tipo = pd.api.types.infer_dtype(serie, skipna=True)
+    if tipo in ('string', 'empty'):
+        es_texto = serie.notna().to_numpy()
+    elif tipo in _TIPOS_MIXTOS:
+        es_texto = serie.str.len().notna().to_numpy()
+    else:
+        es_texto = np.zeros(len(serie), dtype=bool)
+
+    if es_texto.all():
+        valores = _texto_a_numero(serie)
+    else:
+        # Celdas numéricas: fechas u otros objetos quedan como NaN
+        valores = pd.to_numeric(serie.where(~es_texto), errors='coerce').to_numpy(dtype=np.float64)
+        if es_texto.any():
+            valores[es_texto] = _texto_a_numero(serie[es_texto])
+    return pd.Series(np.nan_to_num(valores, nan=0.0), index=serie.index, name=serie.name)
+
+
+def _texto_a_numero(textos: pd.Series) -> np.ndarray:
+    """
+    Convierte textos de montos a float64 (NaN si no son un número) con
+    operaciones de pyarrow.compute sobre la columna completa.
+    """
+    textos = pc.utf8_trim(pa.array(textos, type=pa.string(), from_pandas=True), _SIMBOLOS)
+    # Solo un '-' o '+' inicial es signo; se quita junto con el símbolo que lo siga ("-$ 2.000")
+    menos = pc.fill_null(pc.starts_with(textos, '-'), False)
+    signo = pc.or_(menos, pc.fill_null(pc.starts_with(textos, '+'), False))
+    negativo = menos.to_numpy(zero_copy_only=False)
+    if pc.any(signo).as_py():
+        textos = pc.if_else(signo, pc.utf8_ltrim(pc.utf8_slice_codeunits(textos, 1), _SIMBOLOS), textos)
+
+    puntos = pc.count_substring(textos, '.').to_numpy()
+    comas = pc.count_substring(textos, ',').to_numpy()
+    primer_punto = pc.find_substring(textos, '.').to_numpy()
+    primera_coma = pc.find_substring(textos, ',').to_numpy()
+    largo = pc.utf8_length(textos).to_numpy()
+
+    # Candidato a decimal: el separador que aparece de último, una sola vez
+    coma_al_final = primera_coma > primer_punto
+    cantidad = np.where(coma_al_final, comas, puntos)
+    otro = np.where(coma_al_final, puntos, comas)
+    decimales = largo - np.maximum(primer_punto, primera_coma) - 1
+    es_decimal = (cantidad == 1) & ((otro > 0) | ((decimales > 0) & (decimales != 3)))
+
+    digitos = pc.replace_substring(pc.replace_substring(textos, '.', ''), ',', '')
+    validos = pc.ascii_is_decimal(digitos).to_numpy(zero_copy_only=False)
+    enteros = pc.cast(pc.if_else(validos, digitos, '0'), pa.float64()).to_numpy()
+
+    valores = enteros / 10.0 ** np.where(es_decimal, decimales, 0)
+
+    # Notación científica: solo se busca entre los textos que no son dígitos
+    invalidos = np.flatnonzero(~validos)
+    if len(invalidos):
+        candidatos = textos.take(invalidos)
+        cientifico = pc.fill_null(pc.match_substring_regex(candidatos, _NOTACION_CIENTIFICA), False)
+        posiciones = invalidos[cientifico.to_numpy(zero_copy_only=False)]
+        valores[posiciones] = pc.cast(pc.filter(candidatos, cientifico), pa.float64()).to_numpy()
+        validos[posiciones] = True
+
+    valores[negativo] *= -1
+    valores[~validos] = np.nan
+    return valores